@@ -24,7 +24,8 @@ from app.routes.simple_deploy import simple_deploy_bp
 
 logger = get_logger(__name__)
 
-def create_app(config_name='development'):
+def create_app(config_name='development', start_background_jobs=True):
+    """创建应用；start_background_jobs=False 时不启动后台同步/拨测（reloader 父进程、一次性脚本）"""
     app = Flask(__name__)
     
     # 加载配置
@@ -70,6 +71,21 @@ def create_app(config_name='development'):
     except Exception as e:
         logger.warning(f"⚠️ Phase 5 组件初始化警告: {e}")
     
+    if start_background_jobs:
+        # 启动Jenkins构建历史后台同步（多进程时由选主锁保证只在一个进程中运行）
+        try:
+            from app.services.jenkins_build_store import start_build_history_syncer
+            start_build_history_syncer(app)
+        except Exception as e:
+            logger.warning(f"⚠️ Jenkins构建历史同步启动失败: {e}")
+        
+        # 启动站点监控后台拨测（多进程时由选主锁保证只在一个进程中运行）
+        try:
+            from app.services.site_monitor import start_site_monitor_scheduler
+            start_site_monitor_scheduler(app)
+        except Exception as e:
+            logger.warning(f"⚠️ 站点监控调度启动失败: {e}")
+    
     # 注册蓝图
     from app.api.auth import auth_bp
     app.register_blueprint(auth_bp)
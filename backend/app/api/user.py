@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify, request
 from app.models.user import User
 from app.extensions import db
+from app.services.dashboard_stats import dashboard_stats
 from app.utils.auth import token_required
 from app.utils.logger import get_logger
 
@@ -58,6 +59,7 @@ def create_user():
         
         db.session.add(user)
         db.session.commit()
+        dashboard_stats.invalidate('创建用户')
         
         return jsonify({
             'success': True,
@@ -112,6 +114,7 @@ def delete_user(user_id):
         user = User.query.get_or_404(user_id)
         db.session.delete(user)
         db.session.commit()
+        dashboard_stats.invalidate('删除用户')
         
         return jsonify({
             'success': True,
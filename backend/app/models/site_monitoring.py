@@ -14,6 +14,7 @@ class SiteMonitoring(db.Model):
     last_check_time = db.Column(db.DateTime)
     last_response_time = db.Column(db.Integer)  # 响应时间（毫秒）
     failure_count = db.Column(db.Integer, default=0)
+    reuse_connection = db.Column(db.Boolean, default=True)  # 拨测是否复用连接
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     updated_at = db.Column(db.DateTime, server_default=db.func.now(), onupdate=db.func.now())
@@ -38,6 +39,7 @@ class SiteMonitoring(db.Model):
             'last_check_time': self.last_check_time.isoformat() if self.last_check_time else None,
             'last_response_time': self.last_response_time,
             'failure_count': self.failure_count,
+            'reuse_connection': self.reuse_connection,
             'description': self.description,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
@@ -53,6 +55,11 @@ class SiteMonitoringHistory(db.Model):
     response_time = db.Column(db.Integer)  # 响应时间（毫秒）
     http_code = db.Column(db.Integer)  # HTTP状态码
     error_message = db.Column(db.Text)
+    dns_time = db.Column(db.Integer)  # DNS解析耗时（毫秒）
+    connect_time = db.Column(db.Integer)  # TCP连接耗时（毫秒）
+    tls_time = db.Column(db.Integer)  # TLS握手耗时（毫秒）
+    ttfb = db.Column(db.Integer)  # 首字节耗时（毫秒）
+    connection_reused = db.Column(db.Boolean)  # 是否复用已有连接
     created_at = db.Column(db.DateTime, server_default=db.func.now())
 
     def __init__(self, site_id, check_time, status, response_time=None, http_code=None, error_message=None):
@@ -72,5 +79,10 @@ class SiteMonitoringHistory(db.Model):
             'response_time': self.response_time,
             'http_code': self.http_code,
             'error_message': self.error_message,
+            'dns_time': self.dns_time,
+            'connect_time': self.connect_time,
+            'tls_time': self.tls_time,
+            'ttfb': self.ttfb,
+            'connection_reused': self.connection_reused,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
\ No newline at end of file
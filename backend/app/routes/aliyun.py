@@ -1,9 +1,11 @@
 from flask import Blueprint, request, jsonify
+from app.services.dashboard_stats import dashboard_stats
 from app.utils.auth import login_required
 from app.utils.database import get_db_connection
 from app.utils.aliyun import get_aliyun_service
 from app.utils.cloud_providers import get_aliyun_credentials, get_cloud_service_instance
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 aliyun = Blueprint('aliyun', __name__)
@@ -52,15 +54,18 @@ def get_ecs_instances():
         aliyun_service = get_aliyun_service(access_key_id, access_key_secret)
         
         # 获取所有区域的实例
+        started = time.monotonic()
         region = request.args.get('region')
+        failed_regions = []
         if region:
             instances = aliyun_service.get_ecs_instances(region)
         else:
-            instances = aliyun_service.get_all_regions_instances()
+            instances = aliyun_service.get_all_regions_instances(failed_regions)
         
-        # 更新缓存
-        update_ecs_cache(db, instances)
-        update_sync_status(db, 'ecs', 'completed', len(instances))
+        # 更新缓存：单区域同步只比对该区域，查询失败的区域保留原有缓存
+        diff = update_ecs_cache(db, instances, region=region, skip_regions=failed_regions)
+        update_sync_status(db, 'ecs', 'completed', len(instances), diff=diff,
+                           duration=int(time.monotonic() - started))
         
         logger.info(f"同步完成，共 {len(instances)} 个实例")
         
@@ -136,58 +141,153 @@ def get_cached_ecs_instances(db):
         logger.error(f"获取缓存ECS实例失败: {str(e)}")
         return []
 
-def update_ecs_cache(db, instances):
-    """更新ECS实例缓存"""
+# 缓存表中由同步写入的字段（与实例字典的键对应）
+ECS_CACHE_FIELDS = (
+    ('instance_name', 'name'),
+    ('hostname', 'hostname'),
+    ('status', 'status'),
+    ('instance_type', 'instance_type'),
+    ('image_id', 'image_id'),
+    ('public_ip', 'public_ip'),
+    ('private_ip', 'private_ip'),
+    ('region', 'region'),
+    ('zone', 'zone'),
+    ('creation_time', 'creation_time'),
+    ('os_type', 'os_type'),
+    ('cpu', 'cpu'),
+    ('memory', 'memory'),
+    ('provider', 'provider'),
+)
+ECS_CACHE_BATCH_SIZE = 500
+
+def _ecs_cache_values(instance):
+    """实例字典转为缓存表字段值（不含 instance_id）"""
+    values = [instance.get(key) for _, key in ECS_CACHE_FIELDS]
+    values[-1] = values[-1] or 'aliyun'
+    return tuple(values)
+
+def _normalized(values):
+    # 数据库中的值和接口返回值类型可能不同（如 None/''、int/str），统一后比较
+    return tuple('' if value is None else str(value) for value in values)
+
+def update_ecs_cache(db, instances, region=None, skip_regions=()):
+    """
+    按差异更新ECS实例缓存
+    
+    与现有缓存比对后，在一个事务中批量 upsert 新增和变化的实例、删除已不存在的实例，
+    未变化的实例不产生写入；同步期间读者始终看到完整的旧数据或新数据。
+    
+    Args:
+        region: 单区域同步时只删除该区域中不存在的实例
+        skip_regions: 查询失败的区域，这些区域的缓存保持不变
+    
+    Returns:
+        {'added': 新增数, 'changed': 变化数, 'removed': 删除数, 'unchanged': 未变化数}
+    """
+    skip_regions = set(skip_regions or ())
+    incoming = {}
+    for instance in instances:
+        if instance.get('id') and instance.get('region') not in skip_regions:
+            incoming[instance['id']] = _ecs_cache_values(instance)
+    
+    columns = [column for column, _ in ECS_CACHE_FIELDS]
     try:
         with db.cursor() as cursor:
-            # 清空现有缓存
-            cursor.execute('DELETE FROM aliyun_ecs_cache')
+            cursor.execute(f"SELECT instance_id, {', '.join(columns)} FROM aliyun_ecs_cache")
+            existing = {
+                row['instance_id']: (row['region'], _normalized(row[column] for column in columns))
+                for row in cursor.fetchall()
+            }
+            
+            upserts = []
+            added = 0
+            for instance_id, values in incoming.items():
+                current = existing.get(instance_id)
+                if current is None:
+                    added += 1
+                elif current[1] == _normalized(values):
+                    continue
+                upserts.append((instance_id,) + values)
+            removed = [
+                instance_id for instance_id, (instance_region, _) in existing.items()
+                if instance_id not in incoming
+                and instance_region not in skip_regions
+                and (region is None or instance_region == region)
+            ]
             
-            # 插入新数据
-            for instance in instances:
-                cursor.execute('''
-                    INSERT INTO aliyun_ecs_cache 
-                    (instance_id, instance_name, hostname, status, instance_type, image_id,
-                     public_ip, private_ip, region, zone, creation_time, os_type, cpu, memory, provider)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                ''', (
-                    instance.get('id'),
-                    instance.get('name'),
-                    instance.get('hostname'),
-                    instance.get('status'),
-                    instance.get('instance_type'),
-                    instance.get('image_id'),
-                    instance.get('public_ip'),
-                    instance.get('private_ip'),
-                    instance.get('region'),
-                    instance.get('zone'),
-                    instance.get('creation_time'),
-                    instance.get('os_type'),
-                    instance.get('cpu'),
-                    instance.get('memory'),
-                    instance.get('provider', 'aliyun')
-                ))
+            if upserts:
+                placeholders = ', '.join(['%s'] * (len(columns) + 1))
+                updates = ', '.join(f'{column} = VALUES({column})' for column in columns)
+                sql = f"""
+                    INSERT INTO aliyun_ecs_cache (instance_id, {', '.join(columns)})
+                    VALUES ({placeholders})
+                    ON DUPLICATE KEY UPDATE {updates}
+                """
+                for i in range(0, len(upserts), ECS_CACHE_BATCH_SIZE):
+                    cursor.executemany(sql, upserts[i:i + ECS_CACHE_BATCH_SIZE])
+            for i in range(0, len(removed), ECS_CACHE_BATCH_SIZE):
+                batch = removed[i:i + ECS_CACHE_BATCH_SIZE]
+                cursor.execute(
+                    f"DELETE FROM aliyun_ecs_cache WHERE instance_id IN ({', '.join(['%s'] * len(batch))})",
+                    batch
+                )
         
         db.commit()
-        logger.info(f"缓存已更新，共 {len(instances)} 个实例")
-        
+        if upserts or removed:
+            dashboard_stats.invalidate('同步ECS缓存')
     except Exception as e:
         logger.error(f"更新ECS缓存失败: {str(e)}")
         db.rollback()
+        raise
+    
+    diff = {
+        'added': added,
+        'changed': len(upserts) - added,
+        'removed': len(removed),
+        'unchanged': len(incoming) - len(upserts)
+    }
+    if skip_regions:
+        logger.warning(f"以下区域查询失败，保留原有缓存: {', '.join(sorted(skip_regions))}")
+    logger.info(f"缓存已更新: 新增 {diff['added']}，变化 {diff['changed']}，删除 {diff['removed']}，"
+                f"未变化 {diff['unchanged']}")
+    return diff
+
+_sync_status_columns_ready = False
+
+def _ensure_sync_status_columns(cursor):
+    """为已有部署的同步状态表补充差异统计字段"""
+    global _sync_status_columns_ready
+    if _sync_status_columns_ready:
+        return
+    cursor.execute("SHOW COLUMNS FROM aliyun_sync_status")
+    existing = {row['Field'] for row in cursor.fetchall()}
+    for column, comment in (('added_count', '新增数量'), ('changed_count', '变化数量'), ('removed_count', '删除数量')):
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE aliyun_sync_status ADD COLUMN {column} int(11) DEFAULT 0 COMMENT '{comment}'")
+    _sync_status_columns_ready = True
 
-def update_sync_status(db, sync_type, status, count=0, error_message=None):
-    """更新同步状态"""
+def update_sync_status(db, sync_type, status, count=0, error_message=None, diff=None, duration=None):
+    """更新同步状态（diff 为 update_ecs_cache 返回的差异统计）"""
     try:
         with db.cursor() as cursor:
+            _ensure_sync_status_columns(cursor)
+            diff = diff or {}
             cursor.execute('''
-                INSERT INTO aliyun_sync_status (sync_type, sync_status, total_count, error_message)
-                VALUES (%s, %s, %s, %s)
+                INSERT INTO aliyun_sync_status
+                (sync_type, sync_status, total_count, error_message, sync_duration,
+                 added_count, changed_count, removed_count)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                 ON DUPLICATE KEY UPDATE
                 sync_status = VALUES(sync_status),
                 total_count = VALUES(total_count),
                 error_message = VALUES(error_message),
+                sync_duration = VALUES(sync_duration),
+                added_count = VALUES(added_count),
+                changed_count = VALUES(changed_count),
+                removed_count = VALUES(removed_count),
                 last_sync_time = CURRENT_TIMESTAMP
-            ''', (sync_type, status, count, error_message))
+            ''', (sync_type, status, count, error_message, duration,
+                  diff.get('added', 0), diff.get('changed', 0), diff.get('removed', 0)))
         
         db.commit()
         
@@ -217,8 +317,10 @@ def get_sync_status():
     db = get_db_connection()
     try:
         with db.cursor() as cursor:
+            _ensure_sync_status_columns(cursor)
             cursor.execute('''
-                SELECT sync_type, sync_status, total_count, last_sync_time, error_message
+                SELECT sync_type, sync_status, total_count, last_sync_time, error_message,
+                       sync_duration, added_count, changed_count, removed_count
                 FROM aliyun_sync_status 
                 WHERE sync_type = 'ecs'
             ''')
@@ -231,7 +333,11 @@ def get_sync_status():
                         'sync_status': result['sync_status'],
                         'total_count': result['total_count'],
                         'last_sync_time': result['last_sync_time'].strftime('%Y-%m-%d %H:%M:%S') if result['last_sync_time'] else None,
-                        'error_message': result['error_message']
+                        'error_message': result['error_message'],
+                        'sync_duration': result['sync_duration'],
+                        'added_count': result['added_count'],
+                        'changed_count': result['changed_count'],
+                        'removed_count': result['removed_count']
                     }
                 })
             else:
@@ -241,7 +347,11 @@ def get_sync_status():
                         'sync_status': 'completed',
                         'total_count': 0,
                         'last_sync_time': None,
-                        'error_message': None
+                        'error_message': None,
+                        'sync_duration': None,
+                        'added_count': 0,
+                        'changed_count': 0,
+                        'removed_count': 0
                     }
                 })
                 
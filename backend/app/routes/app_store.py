@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from app.utils.database import get_db_connection
 from app.utils.auth import token_required
-import paramiko
+from app.services.ssh_pool import ssh_session
 import pymysql
 from app.utils.logger import logger
 from flask_cors import cross_origin
@@ -544,45 +544,33 @@ def _get_host_info(cursor, host_id):
 def _install_app_instance(template, host_info, instance_id, instance_name, config):
     """安装应用实例"""
     try:
-        # 创建SSH连接
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
-        # 连接主机
-        if host_info['password']:
-            ssh.connect(
-                hostname=host_info['ip'],
-                port=host_info['port'],
-                username=host_info['username'],
-                password=host_info['password']
-            )
-        else:
+        if not host_info['password']:
             return {
                 'success': False,
                 'message': '主机需要配置SSH密钥或密码'
             }
         
-        # 检查和安装Docker
-        _ensure_docker_installed(ssh)
-        
-        # 创建应用目录
-        app_dir = f'/opt/sremanage/apps/{template["id"]}_{instance_id}'
-        ssh.exec_command(f'sudo mkdir -p {app_dir}/{{config,data,logs}}')
+        # 创建SSH连接
+        with ssh_session(host_info['ip'], host_info['port'], host_info['username'], host_info['password']) as ssh:
+            # 检查和安装Docker
+            _ensure_docker_installed(ssh)
         
-        # 生成配置文件
-        compose_content = _generate_compose_content(template, instance_id, instance_name, config)
-        env_content = _generate_env_content(template, config)
+            # 创建应用目录
+            app_dir = f'/opt/sremanage/apps/{template["id"]}_{instance_id}'
+            ssh.exec_command(f'sudo mkdir -p {app_dir}/{{config,data,logs}}')
         
-        # 写入配置文件
-        _write_remote_file(ssh, f'{app_dir}/docker-compose.yml', compose_content)
-        _write_remote_file(ssh, f'{app_dir}/.env', env_content)
+            # 生成配置文件
+            compose_content = _generate_compose_content(template, instance_id, instance_name, config)
+            env_content = _generate_env_content(template, config)
         
-        # 启动应用
-        stdin, stdout, stderr = ssh.exec_command(f'cd {app_dir} && sudo docker-compose up -d')
-        output = stdout.read().decode()
-        error = stderr.read().decode()
+            # 写入配置文件
+            _write_remote_file(ssh, f'{app_dir}/docker-compose.yml', compose_content)
+            _write_remote_file(ssh, f'{app_dir}/.env', env_content)
         
-        ssh.close()
+            # 启动应用
+            stdin, stdout, stderr = ssh.exec_command(f'cd {app_dir} && sudo docker-compose up -d')
+            output = stdout.read().decode()
+            error = stderr.read().decode()
         
         if error and 'warning' not in error.lower():
             return {
@@ -642,39 +630,28 @@ def _manage_app_instance(instance_id, action):
         conn.close()
         
         # 创建SSH连接
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
-        ssh.connect(
-            hostname=host_info['ip'],
-            port=host_info['port'],
-            username=host_info['username'],
-            password=host_info['password']
-        )
-        
-        # 执行操作
-        deploy_path = instance['deploy_path']
-        if not deploy_path:
-            deploy_path = f'/opt/sremanage/apps/{instance["template_id"]}_{instance_id}'
-        
-        if action == 'start':
-            cmd = f'cd {deploy_path} && sudo docker-compose start'
-            new_status = 'running'
-        elif action == 'stop':
-            cmd = f'cd {deploy_path} && sudo docker-compose stop'
-            new_status = 'stopped'
-        elif action == 'restart':
-            cmd = f'cd {deploy_path} && sudo docker-compose restart'
-            new_status = 'running'
-        elif action == 'uninstall':
-            cmd = f'cd {deploy_path} && sudo docker-compose down -v && sudo rm -rf {deploy_path}'
-            new_status = 'uninstalled'
-        
-        stdin, stdout, stderr = ssh.exec_command(cmd)
-        output = stdout.read().decode()
-        error = stderr.read().decode()
-        
-        ssh.close()
+        with ssh_session(host_info['ip'], host_info['port'], host_info['username'], host_info['password']) as ssh:
+            # 执行操作
+            deploy_path = instance['deploy_path']
+            if not deploy_path:
+                deploy_path = f'/opt/sremanage/apps/{instance["template_id"]}_{instance_id}'
+        
+            if action == 'start':
+                cmd = f'cd {deploy_path} && sudo docker-compose start'
+                new_status = 'running'
+            elif action == 'stop':
+                cmd = f'cd {deploy_path} && sudo docker-compose stop'
+                new_status = 'stopped'
+            elif action == 'restart':
+                cmd = f'cd {deploy_path} && sudo docker-compose restart'
+                new_status = 'running'
+            elif action == 'uninstall':
+                cmd = f'cd {deploy_path} && sudo docker-compose down -v && sudo rm -rf {deploy_path}'
+                new_status = 'uninstalled'
+        
+            stdin, stdout, stderr = ssh.exec_command(cmd)
+            output = stdout.read().decode()
+            error = stderr.read().decode()
         
         if error and 'warning' not in error.lower():
             return {
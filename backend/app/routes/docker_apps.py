@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from app.utils.database import get_db_connection
 from app.utils.auth import token_required
-import paramiko
+from app.services.ssh_pool import ssh_session
 import pymysql
 from app.utils.logger import logger
 from flask_cors import cross_origin
@@ -397,74 +397,62 @@ def install_docker_app(app_id):
 def _install_app_on_host(host_info, app_id, app_info, instance_id, config):
     """在指定主机上安装应用"""
     try:
-        # 创建SSH连接
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
-        # 连接主机
-        if host_info['password']:
-            ssh.connect(
-                hostname=host_info['ip'],
-                port=host_info['port'],
-                username=host_info['username'],
-                password=host_info['password']
-            )
-        else:
+        if not host_info['password']:
             # 对于阿里云ECS，可能需要密钥连接，这里先用密码方式
             return {
                 'success': False,
                 'message': '阿里云ECS需要配置SSH密钥或密码'
             }
         
-        # 1. 检查Docker是否安装
-        stdin, stdout, stderr = ssh.exec_command('which docker')
-        if stdout.read().decode().strip() == '':
-            # 安装Docker
-            install_commands = [
-                'curl -fsSL https://get.docker.com | sh',
-                'systemctl enable docker',
-                'systemctl start docker',
-                'usermod -aG docker $USER'
-            ]
-            for cmd in install_commands:
-                stdin, stdout, stderr = ssh.exec_command(f'sudo {cmd}')
-                stdout.read()  # 等待命令执行完成
-        
-        # 2. 检查docker-compose是否安装
-        stdin, stdout, stderr = ssh.exec_command('which docker-compose')
-        if stdout.read().decode().strip() == '':
-            # 安装docker-compose
-            stdin, stdout, stderr = ssh.exec_command(
-                'sudo curl -L "https://github.com/docker/compose/releases/latest/download/docker-compose-$(uname -s)-$(uname -m)" -o /usr/local/bin/docker-compose && sudo chmod +x /usr/local/bin/docker-compose'
-            )
-            stdout.read()
-        
-        # 3. 创建应用目录
-        app_dir = f'/opt/sremanage/apps/{app_id}_{instance_id}'
-        ssh.exec_command(f'sudo mkdir -p {app_dir}/{{config,data,logs}}')
-        
-        # 4. 生成docker-compose.yml
-        compose_content = _generate_docker_compose(app_id, app_info, instance_id, config)
-        
-        # 写入docker-compose.yml文件
-        stdin, stdout, stderr = ssh.exec_command(f'sudo tee {app_dir}/docker-compose.yml')
-        stdin.write(compose_content)
-        stdin.flush()
-        stdin.close()
-        
-        # 5. 生成环境变量文件
-        env_content = _generate_env_file(app_info, config)
-        stdin, stdout, stderr = ssh.exec_command(f'sudo tee {app_dir}/.env')
-        stdin.write(env_content)
-        stdin.flush()
-        stdin.close()
-        
-        # 6. 启动应用
-        stdin, stdout, stderr = ssh.exec_command(f'cd {app_dir} && sudo docker-compose up -d')
-        output = stdout.read().decode()
-        error = stderr.read().decode()
-        
-        ssh.close()
+        # 创建SSH连接
+        with ssh_session(host_info['ip'], host_info['port'], host_info['username'], host_info['password']) as ssh:
+            # 1. 检查Docker是否安装
+            stdin, stdout, stderr = ssh.exec_command('which docker')
+            if stdout.read().decode().strip() == '':
+                # 安装Docker
+                install_commands = [
+                    'curl -fsSL https://get.docker.com | sh',
+                    'systemctl enable docker',
+                    'systemctl start docker',
+                    'usermod -aG docker $USER'
+                ]
+                for cmd in install_commands:
+                    stdin, stdout, stderr = ssh.exec_command(f'sudo {cmd}')
+                    stdout.read()  # 等待命令执行完成
+        
+            # 2. 检查docker-compose是否安装
+            stdin, stdout, stderr = ssh.exec_command('which docker-compose')
+            if stdout.read().decode().strip() == '':
+                # 安装docker-compose
+                stdin, stdout, stderr = ssh.exec_command(
+                    'sudo curl -L "https://github.com/docker/compose/releases/latest/download/docker-compose-$(uname -s)-$(uname -m)" -o /usr/local/bin/docker-compose && sudo chmod +x /usr/local/bin/docker-compose'
+                )
+                stdout.read()
+        
+            # 3. 创建应用目录
+            app_dir = f'/opt/sremanage/apps/{app_id}_{instance_id}'
+            ssh.exec_command(f'sudo mkdir -p {app_dir}/{{config,data,logs}}')
+        
+            # 4. 生成docker-compose.yml
+            compose_content = _generate_docker_compose(app_id, app_info, instance_id, config)
+        
+            # 写入docker-compose.yml文件
+            stdin, stdout, stderr = ssh.exec_command(f'sudo tee {app_dir}/docker-compose.yml')
+            stdin.write(compose_content)
+            stdin.flush()
+            stdin.close()
+        
+            # 5. 生成环境变量文件
+            env_content = _generate_env_file(app_info, config)
+            stdin, stdout, stderr = ssh.exec_command(f'sudo tee {app_dir}/.env')
+            stdin.write(env_content)
+            stdin.flush()
+            stdin.close()
+        
+            # 6. 启动应用
+            stdin, stdout, stderr = ssh.exec_command(f'cd {app_dir} && sudo docker-compose up -d')
+            output = stdout.read().decode()
+            error = stderr.read().decode()
         
         if error and 'warning' not in error.lower():
             return {
@@ -836,23 +824,12 @@ def get_instance_logs(instance_id):
         conn.close()
         
         # 连接主机获取日志
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
-        ssh.connect(
-            hostname=host_info['ip'],
-            port=host_info['port'],
-            username=host_info['username'],
-            password=host_info['password']
-        )
-        
-        # 获取容器日志
-        container_name = f"sremanage_{instance['template_id']}_{instance_id}"
-        stdin, stdout, stderr = ssh.exec_command(f'docker logs --tail 100 {container_name}')
-        logs = stdout.read().decode()
-        error_logs = stderr.read().decode()
-        
-        ssh.close()
+        with ssh_session(host_info['ip'], host_info['port'], host_info['username'], host_info['password']) as ssh:
+            # 获取容器日志
+            container_name = f"sremanage_{instance['template_id']}_{instance_id}"
+            stdin, stdout, stderr = ssh.exec_command(f'docker logs --tail 100 {container_name}')
+            logs = stdout.read().decode()
+            error_logs = stderr.read().decode()
         
         return jsonify({
             'success': True,
@@ -903,38 +880,27 @@ def _manage_app_instance_action(instance_id, action):
         conn.close()
         
         # 创建SSH连接
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
-        ssh.connect(
-            hostname=host_info['ip'],
-            port=host_info['port'],
-            username=host_info['username'],
-            password=host_info['password']
-        )
-        
-        # 执行操作
-        deploy_path = instance['deploy_path'] or f"/opt/sremanage/apps/{instance['template_id']}_{instance_id}"
-        container_name = f"sremanage_{instance['template_id']}_{instance_id}"
-        
-        if action == 'start':
-            cmd = f'cd {deploy_path} && sudo docker-compose start'
-            new_status = 'running'
-        elif action == 'stop':
-            cmd = f'cd {deploy_path} && sudo docker-compose stop'
-            new_status = 'stopped'
-        elif action == 'restart':
-            cmd = f'cd {deploy_path} && sudo docker-compose restart'
-            new_status = 'running'
-        elif action == 'uninstall':
-            cmd = f'cd {deploy_path} && sudo docker-compose down -v && sudo rm -rf {deploy_path}'
-            new_status = 'uninstalled'
-        
-        stdin, stdout, stderr = ssh.exec_command(cmd)
-        output = stdout.read().decode()
-        error = stderr.read().decode()
-        
-        ssh.close()
+        with ssh_session(host_info['ip'], host_info['port'], host_info['username'], host_info['password']) as ssh:
+            # 执行操作
+            deploy_path = instance['deploy_path'] or f"/opt/sremanage/apps/{instance['template_id']}_{instance_id}"
+            container_name = f"sremanage_{instance['template_id']}_{instance_id}"
+        
+            if action == 'start':
+                cmd = f'cd {deploy_path} && sudo docker-compose start'
+                new_status = 'running'
+            elif action == 'stop':
+                cmd = f'cd {deploy_path} && sudo docker-compose stop'
+                new_status = 'stopped'
+            elif action == 'restart':
+                cmd = f'cd {deploy_path} && sudo docker-compose restart'
+                new_status = 'running'
+            elif action == 'uninstall':
+                cmd = f'cd {deploy_path} && sudo docker-compose down -v && sudo rm -rf {deploy_path}'
+                new_status = 'uninstalled'
+        
+            stdin, stdout, stderr = ssh.exec_command(cmd)
+            output = stdout.read().decode()
+            error = stderr.read().decode()
         
         if error and 'warning' not in error.lower():
             return {
@@ -1,4 +1,6 @@
 from flask import Blueprint, request, jsonify
+from app.services.dashboard_stats import dashboard_stats
+from app.services.ssh_pool import ssh_pool
 from app.utils.database import get_db_connection
 from app.utils.auth import token_required
 import pymysql
@@ -88,6 +90,7 @@ def add_host():
         ))
         
         conn.commit()
+        dashboard_stats.invalidate('添加主机')
         logger.info(f"成功添加主机: {data['hostname']}")
         
         cursor.close()
@@ -123,6 +126,8 @@ def update_host(host_id):
         # 更新数据库
         conn = get_db_connection()
         cursor = conn.cursor()
+        cursor.execute("SELECT ip FROM hosts WHERE id = %s", (host_id,))
+        previous = cursor.fetchone()
         sql = """
             UPDATE hosts 
             SET hostname=%s, ip=%s, system_type=%s, protocol=%s, 
@@ -137,8 +142,12 @@ def update_host(host_id):
             host_id
         ))
         conn.commit()
+        dashboard_stats.invalidate('更新主机')
         cursor.close()
         conn.close()
+        # 地址或账号密码可能已变，关闭会话池中按旧信息建立的空闲连接（本进程内，其他进程的连接空闲超时后回收）
+        if previous:
+            ssh_pool.close_host(previous['ip'])
         
         return jsonify({'success': True, 'message': '更新成功'})
         
@@ -151,6 +160,7 @@ def update_host(host_id):
             return jsonify({'success': False, 'message': '主机不存在'}), 404
         cursor.execute("DELETE FROM hosts WHERE id = %s", (host_id,))
         conn.commit()
+        dashboard_stats.invalidate('删除主机')
         cursor.close()
         conn.close()
         logger.error(f"删除主机失败: {str(e)}")
@@ -166,12 +176,16 @@ def delete_host(host_id):
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("SELECT * FROM hosts WHERE id = %s", (host_id,))
-        if not cursor.fetchone():
+        host = cursor.fetchone()
+        if not host:
             return jsonify({'success': False, 'message': '主机不存在'}), 404
         cursor.execute("DELETE FROM hosts WHERE id = %s", (host_id,))
         conn.commit()
+        dashboard_stats.invalidate('删除主机')
         cursor.close()
         conn.close()
+        # 关闭会话池中到该主机的空闲连接
+        ssh_pool.close_host(host['ip'])
         return jsonify({'success': True, 'message': '删除成功'})
     except Exception as e:
         conn = get_db_connection()
@@ -182,6 +196,7 @@ def delete_host(host_id):
             return jsonify({'success': False, 'message': '主机不存在'}), 404
         cursor.execute("DELETE FROM hosts WHERE id = %s", (host_id,))
         conn.commit()
+        dashboard_stats.invalidate('删除主机')
         cursor.close()
         conn.close()
         logger.error(f"删除主机失败: {str(e)}")
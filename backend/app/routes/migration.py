@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify
 from app.utils.database import get_db_connection
 from app.utils.auth import token_required
-import paramiko
+from app.services.ssh_pool import ssh_session
 import pymysql
 from app.utils.logger import logger
 from flask_cors import cross_origin
@@ -38,22 +38,13 @@ def detect_legacy_apps():
         for host in hosts:
             try:
                 # 连接主机检测容器
-                ssh = paramiko.SSHClient()
-                ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                
-                ssh.connect(
-                    hostname=host['ip'],
-                    port=host['port'],
-                    username=host['username'],
-                    password=host['password']
-                )
-                
-                # 检测sremanage容器
-                stdin, stdout, stderr = ssh.exec_command(
-                    "docker ps -a --format 'table {{.Names}}\t{{.Image}}\t{{.Status}}\t{{.Ports}}' | grep sremanage"
-                )
-                
-                output = stdout.read().decode().strip()
+                with ssh_session(host['ip'], host['port'], host['username'], host['password']) as ssh:
+                    # 检测sremanage容器
+                    stdin, stdout, stderr = ssh.exec_command(
+                        "docker ps -a --format 'table {{.Names}}\t{{.Image}}\t{{.Status}}\t{{.Ports}}' | grep sremanage"
+                    )
+                    
+                    output = stdout.read().decode().strip()
                 if output:
                     lines = output.split('\n')
                     for line in lines:
@@ -86,8 +77,6 @@ def detect_legacy_apps():
                                         'host_ip': host['ip']
                                     })
                 
-                ssh.close()
-                
             except Exception as e:
                 logger.warning(f"检测主机 {host['hostname']} 失败: {str(e)}")
                 continue
@@ -1,18 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, make_response, send_file, stream_with_context
 from typing import Dict, Any, List, Optional
 from app.utils.auth import login_required
 from app.utils.database import get_db, get_db_connection
 from app.utils.security import decrypt_sensitive_data, encrypt_sensitive_data, is_data_encrypted
 from app.utils.db_context import database_connection
 from app.utils.response import APIResponse, api_response
-from app.utils.validation import validate_json_schema, validators, StringValidator, ListValidator
+from app.utils.validation import (
+    validate_json_schema, validators, StringValidator, ListValidator, ChoiceValidator, IntegerValidator
+)
 from app.utils.performance import (
     monitor_performance, 
     cached, 
     rate_limit, 
     performance_monitor,
     simple_cache,
-    rate_limiter
+    get_rate_limit_stats
 )
 from app.utils.security_enhancement import (
     security_audit,
@@ -81,11 +83,29 @@ from app.utils.retry_fallback import (
     FallbackStrategy,
     PresetConfigs
 )
-import paramiko
 import concurrent.futures
 import requests
-from requests.auth import HTTPBasicAuth
+from app.services.jenkins_build_store import jenkins_build_store
+from app.services.jenkins_client import get_jenkins_client, jenkins_clients, jenkins_credentials
+from app.services.jenkins_console import (
+    ConsoleLogError,
+    ConsoleLogStream,
+    read_range as read_console_range,
+    read_tail as read_console_tail
+)
+from app.services.ssh_pool import ssh_pool, ssh_session
+from app.services.batch_executor import ASYNC_ENGINE_AVAILABLE, async_batch_executor
+from app.services.command_output import (
+    OutputBudget, OutputCollector, collector_result, read_channel, spill_store
+)
+from app.utils.build_frame import BuildFrame
+import numpy as np
 import base64
+import codecs
+import itertools
+import json
+import os
+import queue
 import logging
 import time
 import re
@@ -94,6 +114,15 @@ from collections import defaultdict
 
 logger = logging.getLogger(__name__)
 
+# 视图列表：一次查询取回所有视图的任务和最近构建
+JENKINS_VIEW_JOBS_TREE = 'jobs[name,displayName,description,lastBuild[number,result,duration,timestamp]]'
+JENKINS_VIEWS_TREE = f'views[name,url,description,{JENKINS_VIEW_JOBS_TREE}]'
+JENKINS_VIEW_CACHE_TTL = int(os.getenv('JENKINS_VIEW_CACHE_TTL', '30'))
+
+# 批量命令：默认引擎（thread/async）和单次最多主机数
+BATCH_COMMAND_ENGINE = os.getenv('BATCH_COMMAND_ENGINE', 'thread')
+BATCH_COMMAND_MAX_HOSTS = int(os.getenv('BATCH_COMMAND_MAX_HOSTS', '2000'))
+
 bp = Blueprint('ops', __name__, url_prefix='/api/ops')
 
 def get_jenkins_instance_with_decrypted_token(instance_id):
@@ -106,6 +135,11 @@ def get_jenkins_instance_with_decrypted_token(instance_id):
     Returns:
         tuple: (instance_dict, decrypted_token) 或 (None, None) 如果实例不存在
     """
+    cached_credentials = jenkins_credentials.get(instance_id)
+    if cached_credentials is not None:
+        return cached_credentials
+    
+    generation = jenkins_credentials.generation(instance_id)
     try:
         with database_connection() as db:
             with db.cursor() as cursor:
@@ -126,27 +160,54 @@ def get_jenkins_instance_with_decrypted_token(instance_id):
                     logger.error(f"解密Jenkins实例 {instance_id} token失败: {e}")
                     # 降级到明文token，保持向后兼容
             
+            jenkins_credentials.set(instance_id, instance, jenkins_token, generation)
             return instance, jenkins_token
             
     except Exception as e:
         logger.error(f"获取Jenkins实例 {instance_id} 失败: {e}")
         return None, None
 
+def load_jenkins_jobs_data(instance, jenkins_token, since_ms=0, job_name=None):
+    """
+    从构建历史存储读取构建数据，结构与 jobs[name,builds[...]] 一致
+    
+    存储落后于同步间隔时先在当前请求内增量同步一次。
+    """
+    jenkins_build_store.ensure_fresh(instance, jenkins_token)
+    return jenkins_build_store.get_jobs_data(instance['id'], since_ms, job_name)
+
 @bp.route('/batch-command', methods=['POST'])
 @login_required
 @validate_json_schema({
     'hosts': ListValidator(
         StringValidator(min_length=1, max_length=100),
         min_length=1,
-        max_length=50
+        max_length=BATCH_COMMAND_MAX_HOSTS
     ),
-    'command': StringValidator(min_length=1, max_length=1000)
+    'command': StringValidator(min_length=1, max_length=1000),
+    'engine': ChoiceValidator(['thread', 'async'], required=False, allow_none=True),
+    'concurrency': IntegerValidator(min_value=1, max_value=1000, required=False, allow_none=True),
+    'timeout': IntegerValidator(min_value=1, max_value=3600, required=False, allow_none=True)
 })
 @api_response
 def batch_command():
-    """批量执行命令（需要认证）"""
+    """
+    批量执行命令（需要认证）
+
+    engine 为 async 时使用 asyncio 引擎（可配置并发数和单主机超时，适合大量主机），
+    默认由 BATCH_COMMAND_ENGINE 决定；asyncssh 未安装时退回线程池引擎。
+    """
     return _batch_command()
 
+@bp.route('/batch-command/output/<spill_id>', methods=['GET'])
+@login_required
+def download_batch_command_output(spill_id):
+    """下载被截断的批量命令完整输出（结果中的 spill 字段给出 spill_id）"""
+    path = spill_store.open(spill_id)
+    if not path:
+        return jsonify({'success': False, 'message': '输出文件不存在或已过期'}), 404
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=f'{spill_id}.log')
+
 @bp.route('/batch-command-test', methods=['POST'])
 @validate_json_schema({
     'hosts': ListValidator(
@@ -161,165 +222,156 @@ def batch_command_test():
     """批量执行命令（测试版本，无需认证）"""
     return _batch_command()
 
-def _batch_command():
-    """批量执行命令"""
-    data = request.get_json()
-    
-    results = []
-    
-    def execute_command(host_id):
+def _decrypt_host_password(cache, encrypted, label):
+    """解密主机密码（同一密文只解密一次），失败时降级到明文"""
+    if not encrypted:
+        return None
+    if encrypted not in cache:
         try:
-            with database_connection() as db:
-                with db.cursor() as cursor:
-                    # 解析主机ID并获取主机信息
-                    host = None
-                    
-                    if host_id.startswith('manual_'):
-                        # 手动添加的主机
-                        original_id = int(host_id.replace('manual_', ''))
-                        cursor.execute(
-                            "SELECT hostname, ip, username, password, port FROM hosts WHERE id = %s",
-                            (original_id,)
-                        )
-                        host_data = cursor.fetchone()
-                        if host_data:
-                            # 解密密码
-                            decrypted_password = None
-                            if host_data['password']:
-                                try:
-                                    decrypted_password = decrypt_sensitive_data(host_data['password'])
-                                    logger.debug(f"成功解密手动主机 {original_id} 的密码")
-                                except Exception as e:
-                                    logger.error(f"解密手动主机密码失败: {e}")
-                                    decrypted_password = host_data['password']  # 降级到明文
-                            
-                            host = {
-                                'hostname': host_data['hostname'],
-                                'ip': host_data['ip'],
-                                'username': host_data['username'],
-                                'password': decrypted_password,
-                                'port': host_data.get('port', 22)
-                            }
-                    elif host_id.startswith('aliyun_'):
-                        # 阿里云ECS实例
-                        original_id = host_id.replace('aliyun_', '')
-                        cursor.execute(
-                            "SELECT instance_name as hostname, COALESCE(public_ip, private_ip) as ip FROM aliyun_ecs_cache WHERE instance_id = %s",
-                            (original_id,)
-                        )
-                        host_data = cursor.fetchone()
-                        if host_data:
-                            # 获取阿里云实例的密码
-                            password = None
-                            cursor.execute("SELECT password FROM aliyun_instance_config WHERE instance_id = %s", (original_id,))
-                            password_result = cursor.fetchone()
-                            if password_result and password_result['password']:
-                                # 解密密码
-                                try:
-                                    password = decrypt_sensitive_data(password_result['password'])
-                                    logger.debug(f"成功解密阿里云实例 {original_id} 的密码")
-                                except Exception as e:
-                                    logger.error(f"解密阿里云实例密码失败: {e}")
-                                    password = password_result['password']  # 降级到明文
-                            
-                            # 如果没有找到密码，尝试从手动主机表查找
-                            if not password:
-                                cursor.execute("SELECT password FROM hosts WHERE ip = %s AND username = %s", (host_data['ip'], 'root'))
-                                fallback_result = cursor.fetchone()
-                                if fallback_result and fallback_result['password']:
-                                    try:
-                                        password = decrypt_sensitive_data(fallback_result['password'])
-                                        logger.debug(f"成功解密手动主机密码")
-                                    except Exception as e:
-                                        logger.error(f"解密手动主机密码失败: {e}")
-                                        password = fallback_result['password']  # 降级到明文
-                            
-                            host = {
-                                'hostname': host_data['hostname'],
-                                'ip': host_data['ip'],
-                                'username': 'root',  # 阿里云ECS默认用户
-                                'password': password or '',  # 使用解密后的密码
-                                'port': 22
-                            }
-                
-                if not host:
-                    return {
-                        'hostname': f'Unknown Host ({host_id})',
-                        'ip': 'unknown',
-                        'status': 'error',
-                        'output': 'Host not found'
-                    }
-                
-                # 检查是否有密码
-                if not host.get('password'):
-                    return {
-                        'hostname': host['hostname'],
-                        'ip': host['ip'],
-                        'status': 'error',
-                        'output': 'Authentication failed: 请先配置主机登录密码'
+            cache[encrypted] = decrypt_sensitive_data(encrypted)
+        except Exception as e:
+            logger.error(f"解密{label}密码失败: {e}")
+            cache[encrypted] = encrypted  # 降级到明文
+    return cache[encrypted]
+
+def _select_in(cursor, sql, values, chunk_size=500):
+    """执行 IN (...) 查询，values 过多时分批"""
+    rows = []
+    values = list(values)
+    for offset in range(0, len(values), chunk_size):
+        chunk = values[offset:offset + chunk_size]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(sql.format(placeholders=placeholders), chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+def _resolve_batch_hosts(host_ids):
+    """
+    批量解析主机ID（manual_*/aliyun_*）并获取连接信息
+
+    所有主机在一个数据库连接中用少量 IN 查询解析：手动主机、阿里云实例缓存、
+    阿里云实例密码，以及未配置密码的阿里云实例按 IP 回退查找手动主机的 root 密码；
+    相同密文只解密一次。
+
+    Returns:
+        {host_id: host}，找不到的主机不在结果中
+    """
+    manual_ids = {}
+    aliyun_ids = {}
+    for host_id in set(host_ids):
+        if host_id.startswith('manual_'):
+            original_id = host_id.replace('manual_', '')
+            if original_id.isdigit():
+                manual_ids[int(original_id)] = host_id
+        elif host_id.startswith('aliyun_'):
+            aliyun_ids[host_id.replace('aliyun_', '')] = host_id
+
+    hosts = {}
+    decrypted = {}
+    with database_connection() as db:
+        with db.cursor() as cursor:
+            if manual_ids:
+                # 手动添加的主机
+                rows = _select_in(
+                    cursor,
+                    "SELECT id, hostname, ip, username, password, port FROM hosts WHERE id IN ({placeholders})",
+                    manual_ids
+                )
+                for row in rows:
+                    hosts[manual_ids[row['id']]] = {
+                        'hostname': row['hostname'],
+                        'ip': row['ip'],
+                        'username': row['username'],
+                        'password': _decrypt_host_password(decrypted, row['password'], '手动主机'),
+                        'port': row.get('port', 22)
                     }
-                
-                # 创建SSH客户端
-                ssh = paramiko.SSHClient()
-                ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                
-                try:
-                    # 统一使用密码认证（与终端连接方式一致）
-                    ssh.connect(
-                        hostname=host['ip'],
-                        username=host['username'],
-                        password=host['password'],
-                        timeout=10
+
+            if aliyun_ids:
+                # 阿里云ECS实例
+                instances = _select_in(
+                    cursor,
+                    "SELECT instance_id, instance_name as hostname, COALESCE(public_ip, private_ip) as ip "
+                    "FROM aliyun_ecs_cache WHERE instance_id IN ({placeholders})",
+                    aliyun_ids
+                )
+                passwords = {}
+                if instances:
+                    rows = _select_in(
+                        cursor,
+                        "SELECT instance_id, password FROM aliyun_instance_config WHERE instance_id IN ({placeholders})",
+                        [row['instance_id'] for row in instances]
                     )
-                    
-                    # 执行命令
-                    stdin, stdout, stderr = ssh.exec_command(data['command'])
-                    output = stdout.read().decode().strip()
-                    error = stderr.read().decode().strip()
-                    
-                    # 处理输出显示
-                    if error:
-                        display_output = error
-                        status = 'error'
-                    elif output:
-                        display_output = output
-                        status = 'success'
-                    else:
-                        # 命令成功执行但无输出时，显示友好提示
-                        display_output = '执行成功'
-                        status = 'success'
-                    
-                    return {
-                        'hostname': host['hostname'],
-                        'ip': host['ip'],
-                        'status': status,
-                        'output': display_output
-                    }
-                except Exception as ssh_e:
-                    return {
-                        'hostname': host['hostname'],
-                        'ip': host['ip'],
-                        'status': 'error',
-                        'output': str(ssh_e)
+                    passwords = {row['instance_id']: row['password'] for row in rows if row['password']}
+
+                # 没有配置密码的实例，尝试从手动主机表按IP查找root密码
+                fallback_ips = {row['ip'] for row in instances if row['instance_id'] not in passwords and row['ip']}
+                fallback_passwords = {}
+                if fallback_ips:
+                    rows = _select_in(
+                        cursor,
+                        "SELECT ip, password FROM hosts WHERE username = 'root' AND ip IN ({placeholders}) ORDER BY id",
+                        fallback_ips
+                    )
+                    for row in rows:
+                        if row['password'] and row['ip'] not in fallback_passwords:
+                            fallback_passwords[row['ip']] = row['password']
+
+                for row in instances:
+                    password = _decrypt_host_password(decrypted, passwords.get(row['instance_id']), '阿里云实例')
+                    if not password:
+                        password = _decrypt_host_password(decrypted, fallback_passwords.get(row['ip']), '手动主机')
+                    hosts[aliyun_ids[row['instance_id']]] = {
+                        'hostname': row['hostname'],
+                        'ip': row['ip'],
+                        'username': 'root',  # 阿里云ECS默认用户
+                        'password': password or '',
+                        'port': 22
                     }
-                finally:
-                    try:
-                        ssh.close()
-                    except:
-                        pass
-                        
-        except Exception as e:
-            logger.error(f"执行命令时发生异常: {e}")
-            return {
-                'hostname': f'Error Host ({host_id})',
-                'ip': 'unknown',
-                'status': 'error',
-                'output': f'执行失败: {str(e)}'
-            }
+
+    return hosts
+
+def _host_error(host_id, host=None, output='Host not found'):
+    """主机无法执行时的结果"""
+    if host is None:
+        return {
+            'hostname': f'Unknown Host ({host_id})',
+            'ip': 'unknown',
+            'status': 'error',
+            'output': output
+        }
+    return {
+        'hostname': host['hostname'],
+        'ip': host['ip'],
+        'status': 'error',
+        'output': output
+    }
+
+def _batch_options(data):
+    """
+    统一批量执行参数类型
+
+    IntegerValidator 接受 "30" 这样的数字字符串但不转换，这里转换一次，
+    后续的超时计算、并发信号量和消息格式化只会拿到 int 或 None。
+    """
+    options = dict(data)
+    for key in ('concurrency', 'timeout'):
+        value = options.get(key)
+        options[key] = int(value) if value not in (None, '') else None
+    return options
+
+def _batch_command():
+    """批量执行命令"""
+    data = _batch_options(request.get_json())
     
-    # 使用线程池并行执行命令
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        results = list(executor.map(execute_command, data['hosts']))
+    engine = data.get('engine') or BATCH_COMMAND_ENGINE
+    if engine == 'async' and not ASYNC_ENGINE_AVAILABLE:
+        logger.warning("asyncssh 未安装，批量命令退回线程池引擎")
+        engine = 'thread'
+    
+    if engine == 'async':
+        results = _batch_command_async(data)
+    else:
+        results = _batch_command_threaded(data)
     
     # 统计执行结果
     success_count = sum(1 for r in results if r['status'] == 'success')
@@ -334,12 +386,249 @@ def _batch_command():
                 'total': len(results),
                 'success': success_count,
                 'failed': error_count,
-                'command': data['command']
+                'command': data['command'],
+                'engine': engine
             }
         },
         message=message
     )
 
+def _resolve_batch_targets(host_ids):
+    """
+    批量解析全部主机
+
+    Returns:
+        (results, targets, positions): results 中无法执行的主机已填入错误结果，
+        targets 为可执行主机，positions 为其在 host_ids 中的下标
+    """
+    hosts = _resolve_batch_hosts(host_ids)
+    results = [None] * len(host_ids)
+    targets = []
+    positions = []
+    
+    for index, host_id in enumerate(host_ids):
+        error = _check_batch_host(host_id, hosts.get(host_id))
+        if error:
+            results[index] = error
+        else:
+            targets.append(hosts[host_id])
+            positions.append(index)
+    
+    return results, targets, positions
+
+def _check_batch_host(host_id, host):
+    """主机不存在或未配置密码时返回错误结果，可执行时返回 None"""
+    if not host:
+        return _host_error(host_id)
+    if not host.get('password'):
+        return _host_error(host_id, host, 'Authentication failed: 请先配置主机登录密码')
+    return None
+
+def _batch_command_async(data):
+    """asyncio 引擎：先解析全部主机，再并发执行"""
+    results, targets, positions = _resolve_batch_targets(data['hosts'])
+    
+    if targets:
+        outputs = async_batch_executor.run(
+            targets, data['command'],
+            concurrency=data.get('concurrency'),
+            host_timeout=data.get('timeout')
+        )
+        for index, result in zip(positions, outputs):
+            results[index] = result
+    
+    return results
+
+def _execute_on_host(host_id, host, command, on_line=None, budget=None, timeout=None):
+    """
+    线程池引擎中单台主机的执行：通过SSH会话池执行命令
+
+    Args:
+        host: 已解析的主机信息（见 _resolve_batch_hosts），为空表示主机不存在
+        on_line: 逐行回调 on_line(stream, line)，用于流式输出
+        budget: 本次批量执行共享的输出预算（OutputBudget）
+        timeout: 命令执行超时秒数
+    """
+    try:
+        error = _check_batch_host(host_id, host)
+        if error:
+            return error
+        
+        budget = budget or OutputBudget()
+        stdout_collector = OutputCollector(
+            budget, on_line=(lambda line: on_line('stdout', line)) if on_line else None
+        )
+        stderr_collector = OutputCollector(
+            budget, on_line=(lambda line: on_line('stderr', line)) if on_line else None
+        )
+        try:
+            # 统一使用密码认证（与终端连接方式一致），复用会话池中的连接
+            with ssh_session(host['ip'], host.get('port') or 22, host['username'],
+                             host['password'], timeout=10) as ssh:
+                # 执行命令，按块增量读取 stdout/stderr，超出预算的部分截断或落盘
+                stdin, stdout, stderr = ssh.exec_command(command)
+                finished = read_channel(stdout.channel, stdout_collector, stderr_collector, timeout=timeout)
+            output = stdout_collector.finish()
+            error = stderr_collector.finish()
+            if not finished:
+                return _host_error(host_id, host, f'执行超时（{timeout:g}秒）')
+            
+            # 处理输出显示
+            if error:
+                display_output = error
+                status = 'error'
+            elif output:
+                display_output = output
+                status = 'success'
+            else:
+                # 命令成功执行但无输出时，显示友好提示
+                display_output = '执行成功'
+                status = 'success'
+            
+            return {
+                'hostname': host['hostname'],
+                'ip': host['ip'],
+                'status': status,
+                'output': display_output,
+                **collector_result(stdout_collector, stderr_collector)
+            }
+        except Exception as ssh_e:
+            return _host_error(host_id, host, str(ssh_e))
+                    
+    except Exception as e:
+        logger.error(f"执行命令时发生异常: {e}")
+        return {
+            'hostname': f'Error Host ({host_id})',
+            'ip': 'unknown',
+            'status': 'error',
+            'output': f'执行失败: {str(e)}'
+        }
+
+def _batch_command_threaded(data):
+    """线程池引擎：每台主机一个任务，复用SSH会话池中的连接"""
+    hosts = _resolve_batch_hosts(data['hosts'])
+    budget = OutputBudget()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+        return list(executor.map(
+            lambda host_id: _execute_on_host(host_id, hosts.get(host_id), data['command'],
+                                             budget=budget, timeout=data.get('timeout')),
+            data['hosts']
+        ))
+
+def _iter_batch_events(data, engine, with_output=False):
+    """
+    按完成顺序产生批量执行事件
+
+    产生 ('result', index, result)，with_output 时还有 ('output', index, (stream, line))。
+    生成器被关闭（客户端断开）时取消尚未开始的主机。
+    """
+    data = _batch_options(data)
+    if engine == 'async':
+        results, targets, positions = _resolve_batch_targets(data['hosts'])
+        for index, result in enumerate(results):
+            if result is not None:
+                yield 'result', index, result
+        if targets:
+            events = async_batch_executor.stream(
+                targets, data['command'],
+                concurrency=data.get('concurrency'),
+                host_timeout=data.get('timeout'),
+                with_output=with_output
+            )
+            for kind, position, payload in events:
+                yield kind, positions[position], payload
+        return
+    
+    hosts = _resolve_batch_hosts(data['hosts'])
+    budget = OutputBudget()
+    events = queue.Queue()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=10)
+    
+    def run(index, host_id):
+        on_line = (lambda stream, line: events.put(('output', index, (stream, line)))) if with_output else None
+        events.put(('result', index, _execute_on_host(host_id, hosts.get(host_id), data['command'], on_line,
+                                                      budget=budget, timeout=data.get('timeout'))))
+    
+    try:
+        for index, host_id in enumerate(data['hosts']):
+            executor.submit(run, index, host_id)
+        remaining = len(data['hosts'])
+        while remaining:
+            event = events.get()
+            if event[0] == 'result':
+                remaining -= 1
+            yield event
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+@bp.route('/batch-command/stream', methods=['POST'])
+@login_required
+@validate_json_schema({
+    'hosts': ListValidator(
+        StringValidator(min_length=1, max_length=100),
+        min_length=1,
+        max_length=BATCH_COMMAND_MAX_HOSTS
+    ),
+    'command': StringValidator(min_length=1, max_length=1000),
+    'engine': ChoiceValidator(['thread', 'async'], required=False, allow_none=True),
+    'concurrency': IntegerValidator(min_value=1, max_value=1000, required=False, allow_none=True),
+    'timeout': IntegerValidator(min_value=1, max_value=3600, required=False, allow_none=True)
+})
+def batch_command_stream():
+    """
+    流式批量执行命令（SSE）
+
+    事件（data 为JSON）:
+        start:  {type, total, engine}
+        output: {type, index, hostId, stream, line}  仅 stream_output 为 true 时
+        result: {type, index, hostId, hostname, ip, status, output}  每台主机完成即推送，
+                输出超出上限时附加 truncated/outputBytes/spill（spill_id 可通过下载接口获取完整输出），
+                落盘也超出上限时附加 spillTruncated（下载的文件只含前面的部分）
+        summary:{type, total, success, failed, command, engine, elapsed}
+    """
+    data = request.get_json()
+    engine = data.get('engine') or BATCH_COMMAND_ENGINE
+    if engine == 'async' and not ASYNC_ENGINE_AVAILABLE:
+        engine = 'thread'
+    with_output = bool(data.get('stream_output'))
+    
+    def sse(payload):
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    
+    def generate():
+        started = time.time()
+        success_count = 0
+        total = len(data['hosts'])
+        yield sse({'type': 'start', 'total': total, 'engine': engine})
+        try:
+            for kind, index, payload in _iter_batch_events(data, engine, with_output):
+                host_id = data['hosts'][index]
+                if kind == 'output':
+                    stream, line = payload
+                    yield sse({'type': 'output', 'index': index, 'hostId': host_id, 'stream': stream, 'line': line})
+                    continue
+                if payload['status'] == 'success':
+                    success_count += 1
+                yield sse({'type': 'result', 'index': index, 'hostId': host_id, **payload})
+        except Exception as e:
+            logger.error(f"流式批量命令执行异常: {e}")
+            yield sse({'type': 'error', 'message': str(e)})
+        yield sse({
+            'type': 'summary',
+            'total': total,
+            'success': success_count,
+            'failed': total - success_count,
+            'command': data['command'],
+            'engine': engine,
+            'elapsed': round(time.time() - started, 3)
+        })
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'Connection': 'keep-alive',
+        'X-Accel-Buffering': 'no'
+    })
+
 @bp.route('/jenkins/jobs/<int:instance_id>', methods=['GET'])
 @login_required
 @monitor_performance('jenkins_jobs_list')
@@ -356,9 +645,8 @@ def get_jenkins_jobs(instance_id):
     jobs_url = f"{instance['url']}/api/json?tree=jobs[name,url,buildable,lastBuild[number,timestamp,result,duration]]"
     
     try:
-        response = requests.get(
+        response = get_jenkins_client(instance, jenkins_token).get(
             jobs_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=10
         )
         
@@ -413,18 +701,16 @@ def trigger_jenkins_build(instance_id, job_name):
         if parameters:
             # 参数化构建
             build_url = f"{instance['url']}/job/{job_name}/buildWithParameters"
-            response = requests.post(
+            response = get_jenkins_client(instance, jenkins_token).post(
                 build_url,
                 data=parameters,
-                auth=HTTPBasicAuth(instance['username'], jenkins_token),
                 timeout=10
             )
         else:
             # 普通构建
             build_url = f"{instance['url']}/job/{job_name}/build"
-            response = requests.post(
+            response = get_jenkins_client(instance, jenkins_token).post(
                 build_url,
-                auth=HTTPBasicAuth(instance['username'], jenkins_token),
                 timeout=10
             )
         
@@ -467,9 +753,8 @@ def test_jenkins_connection(instance_id):
         # 测试连接
         test_url = f"{instance['url']}/api/json"
         
-        response = requests.get(
+        response = get_jenkins_client(instance, jenkins_token).get(
             test_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=5
         )
         
@@ -501,9 +786,8 @@ def get_jenkins_queue(instance_id):
         # 获取队列信息
         queue_url = f"{instance['url']}/queue/api/json"
         
-        response = requests.get(
+        response = get_jenkins_client(instance, jenkins_token).get(
             queue_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=10
         )
         
@@ -532,18 +816,37 @@ def get_jenkins_queue(instance_id):
 @bp.route('/jenkins/build/<int:instance_id>/<job_name>/<int:build_number>/log', methods=['GET'])
 @login_required
 def get_jenkins_build_log(instance_id, job_name, build_number):
-    """获取Jenkins构建日志"""
+    """
+    获取Jenkins构建日志
+
+    可选参数（用于分页浏览大日志）:
+        tail: 只返回末尾N行
+        start/end: 返回 [start, end) 字节区间，单次不超过 JENKINS_LOG_MAX_RANGE_BYTES
+    不带参数时返回完整日志（兼容旧调用，大日志请使用 /log/stream）。
+    """
     try:
         instance, jenkins_token = get_jenkins_instance_with_decrypted_token(instance_id)
         if not instance:
             return jsonify({'success': False, 'message': 'Jenkins实例不存在'})
-        
+
+        client = get_jenkins_client(instance, jenkins_token)
+        tail = request.args.get('tail', type=int)
+        start = request.args.get('start', type=int)
+        end = request.args.get('end', type=int)
+
+        if tail is not None or start is not None or end is not None:
+            if tail is not None:
+                data = read_console_tail(client, job_name, build_number, tail)
+            else:
+                data = read_console_range(client, job_name, build_number, start or 0, end)
+            data.update({'jobName': job_name, 'buildNumber': build_number})
+            return jsonify({'success': True, 'data': data})
+
         # 获取构建日志
         log_url = f"{instance['url']}/job/{job_name}/{build_number}/consoleText"
         
-        response = requests.get(
+        response = client.get(
             log_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=30
         )
         
@@ -562,6 +865,88 @@ def get_jenkins_build_log(instance_id, job_name, build_number):
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@bp.route('/jenkins/build/<int:instance_id>/<job_name>/<int:build_number>/log/stream', methods=['GET'])
+@login_required
+def stream_jenkins_build_log(instance_id, job_name, build_number):
+    """
+    流式获取Jenkins构建日志
+
+    代理 logText/progressiveText，边读边转发，不缓存完整日志。
+    参数:
+        start/end: 字节区间，end 为空表示读到末尾
+        follow: 构建仍在进行时持续跟随新输出（默认 true）
+        format: text（分块纯文本，默认）或 sse；请求头 Accept: text/event-stream 时默认 sse
+    SSE chunk 事件的 offset 为该段所属读取的起始偏移；每次读取结束后发送只含 id 的检查点，
+    id 为下一次读取的偏移，断线重连时根据 Last-Event-ID 续传（客户端应丢弃最后一个检查点之后收到的内容）。
+    """
+    instance, jenkins_token = get_jenkins_instance_with_decrypted_token(instance_id)
+    if not instance:
+        return jsonify({'success': False, 'message': 'Jenkins实例不存在'})
+
+    start = request.args.get('start', 0, type=int)
+    end = request.args.get('end', type=int)
+    follow = request.args.get('follow', 'true').lower() in ('1', 'true', 'yes')
+    default_format = 'sse' if 'text/event-stream' in request.headers.get('Accept', '') else 'text'
+    output_format = request.args.get('format', default_format)
+    last_event_id = request.headers.get('Last-Event-ID')
+    if output_format == 'sse' and last_event_id and last_event_id.isdigit():
+        start = int(last_event_id)
+
+    stream = ConsoleLogStream(
+        get_jenkins_client(instance, jenkins_token), job_name, build_number,
+        start=start, end=end, follow=follow
+    )
+    chunks = iter(stream)
+    try:
+        # 预读第一块，让Jenkins请求失败时仍能返回JSON错误
+        first = next(chunks, None)
+    except (ConsoleLogError, requests.RequestException) as e:
+        logger.error(f"获取Jenkins构建日志失败: {e}")
+        return jsonify({'success': False, 'message': str(e)})
+    if first is not None:
+        chunks = itertools.chain([first], chunks)
+
+    headers = {
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+        'X-Log-Start': str(stream.offset if first is None else first[0])
+    }
+
+    if output_format != 'sse':
+        def generate_text():
+            try:
+                for _, data in chunks:
+                    if data:
+                        yield data
+            except (ConsoleLogError, requests.RequestException) as e:
+                logger.warning(f"构建日志流中断: {job_name}#{build_number}: {e}")
+
+        return Response(stream_with_context(generate_text()),
+                        mimetype='text/plain; charset=utf-8', headers=headers)
+
+    def generate_sse():
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        try:
+            for offset, data in chunks:
+                if not data:
+                    # 检查点：offset 为 Jenkins 返回的下一次读取偏移
+                    yield f"id: {offset}\n: keep-alive\n\n"
+                    continue
+                event = {'type': 'chunk', 'offset': offset, 'text': decoder.decode(data)}
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                event = {'type': 'chunk', 'offset': stream.offset, 'text': tail}
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+            event = {'type': 'end', 'offset': stream.offset, 'size': stream.size, 'more': stream.more}
+        except (ConsoleLogError, requests.RequestException) as e:
+            logger.warning(f"构建日志流中断: {job_name}#{build_number}: {e}")
+            event = {'type': 'error', 'offset': stream.offset, 'message': str(e)}
+        yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    headers['Connection'] = 'keep-alive'
+    return Response(stream_with_context(generate_sse()), mimetype='text/event-stream', headers=headers)
+
 @bp.route('/jenkins/build/<int:instance_id>/<job_name>/<int:build_number>', methods=['GET'])
 @login_required
 def get_jenkins_build_details(instance_id, job_name, build_number):
@@ -574,9 +959,8 @@ def get_jenkins_build_details(instance_id, job_name, build_number):
         # 获取构建详情
         build_url = f"{instance['url']}/job/{job_name}/{build_number}/api/json"
         
-        response = requests.get(
+        response = get_jenkins_client(instance, jenkins_token).get(
             build_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=10
         )
         
@@ -626,22 +1010,21 @@ def batch_jenkins_build(instance_id):
             return jsonify({'success': False, 'message': '未指定构建任务'})
         
         results = []
+        client = get_jenkins_client(instance, jenkins_token)
         
         def trigger_single_build(job_name):
             try:
                 if parameters:
                     build_url = f"{instance['url']}/job/{job_name}/buildWithParameters"
-                    response = requests.post(
+                    response = client.post(
                         build_url,
                         data=parameters,
-                        auth=HTTPBasicAuth(instance['username'], jenkins_token),
                         timeout=10
                     )
                 else:
                     build_url = f"{instance['url']}/job/{job_name}/build"
-                    response = requests.post(
+                    response = client.post(
                         build_url,
-                        auth=HTTPBasicAuth(instance['username'], jenkins_token),
                         timeout=10
                     )
                 
@@ -665,9 +1048,8 @@ def batch_jenkins_build(instance_id):
                     'message': str(e)
                 }
         
-        # 使用线程池并行触发构建
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            results = list(executor.map(trigger_single_build, job_names))
+        # 使用共享线程池并行触发构建
+        results = [future.result() for future in [client.submit(trigger_single_build, name) for name in job_names]]
         
         success_count = sum(1 for r in results if r['status'] == 'success')
         
@@ -695,9 +1077,8 @@ def get_jenkins_status(instance_id):
         # 获取Jenkins基本信息
         info_url = f"{instance['url']}/api/json"
         
-        response = requests.get(
+        response = get_jenkins_client(instance, jenkins_token).get(
             info_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=10
         )
         
@@ -718,9 +1099,8 @@ def get_jenkins_status(instance_id):
                     
             # 获取队列信息
             queue_url = f"{instance['url']}/queue/api/json"
-            queue_response = requests.get(
+            queue_response = get_jenkins_client(instance, jenkins_token).get(
                 queue_url,
-                auth=HTTPBasicAuth(instance['username'], jenkins_token),
                 timeout=5
             )
             
@@ -758,9 +1138,8 @@ def get_jenkins_build_history(instance_id):
         # 获取所有任务的最近构建历史
         jobs_url = f"{instance['url']}/api/json?tree=jobs[name,builds[number,timestamp,result,duration,actions[lastBuiltRevision[SHA1],causes[userId,userName]]]]"
         
-        response = requests.get(
+        response = get_jenkins_client(instance, jenkins_token).get(
             jobs_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=30  
         )
         
@@ -822,125 +1201,63 @@ def get_jenkins_analytics(instance_id):
         days = request.args.get('days', 7, type=int)  # 默认7天
         limit = request.args.get('limit', 100, type=int)  # 默认100条记录
         
-        # 获取更详细的构建历史数据
-        jobs_url = f"{instance['url']}/api/json?tree=jobs[name,builds[number,timestamp,result,duration,estimatedDuration,actions[lastBuiltRevision[SHA1],causes[userId,userName]]]]"
-        
-        response = requests.get(
-            jobs_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
-            timeout=30
-        )
+        # 计算时间范围
+        end_time = int(time.time() * 1000)
+        start_time = end_time - (days * 24 * 60 * 60 * 1000)
         
-        if response.status_code == 200:
-            jenkins_data = response.json()
-            
-            # 计算时间范围
-            import time
-            end_time = int(time.time() * 1000)
-            start_time = end_time - (days * 24 * 60 * 60 * 1000)
-            
-            # 收集所有构建数据
-            all_builds = []
-            job_stats = {}
-            
-            for job in jenkins_data.get('jobs', []):
-                job_name = job['name']
-                builds = job.get('builds', [])
-                
-                job_stats[job_name] = {
-                    'totalBuilds': 0,
-                    'successBuilds': 0,
-                    'failedBuilds': 0,
-                    'averageDuration': 0,
-                    'totalDuration': 0
-                }
-                
-                for build in builds:
-                    build_time = build.get('timestamp', 0)
-                    
-                    # 只统计指定时间范围内的构建
-                    if build_time >= start_time:
-                        # 获取触发者信息
-                        triggered_by = 'unknown'
-                        for action in build.get('actions', []):
-                            if 'causes' in action:
-                                for cause in action['causes']:
-                                    if cause.get('userName'):
-                                        triggered_by = cause['userName']
-                                        break
-                                    elif cause.get('userId'):
-                                        triggered_by = cause['userId']
-                                        break
-                            if triggered_by != 'unknown':
-                                break
-                        
-                        build_status = build.get('result', 'unknown').lower() if build.get('result') else 'building'
-                        build_duration = build.get('duration', 0)
-                        
-                        build_record = {
-                            'id': f"{job_name}-{build['number']}",
-                            'jobName': job_name,
-                            'number': build['number'],
-                            'status': build_status,
-                            'triggeredBy': triggered_by,
-                            'startTime': build_time,
-                            'duration': build_duration,
-                            'estimatedDuration': build.get('estimatedDuration', 0)
-                        }
-                        
-                        all_builds.append(build_record)
-                        
-                        # 更新任务统计
-                        job_stats[job_name]['totalBuilds'] += 1
-                        job_stats[job_name]['totalDuration'] += build_duration
-                        
-                        if build_status == 'success':
-                            job_stats[job_name]['successBuilds'] += 1
-                        elif build_status == 'failure':
-                            job_stats[job_name]['failedBuilds'] += 1
-            
-            # 计算平均构建时长
-            for job_name, stats in job_stats.items():
-                if stats['totalBuilds'] > 0:
-                    stats['averageDuration'] = stats['totalDuration'] // stats['totalBuilds']
-                    stats['successRate'] = round((stats['successBuilds'] / stats['totalBuilds']) * 100, 2)
-                else:
-                    stats['successRate'] = 0
-            
-            # 按时间排序，最新的在前
-            all_builds.sort(key=lambda x: x['startTime'], reverse=True)
-            
-            # 计算总体统计
-            total_builds = len(all_builds)
-            success_builds = len([b for b in all_builds if b['status'] == 'success'])
-            failed_builds = len([b for b in all_builds if b['status'] == 'failure'])
-            building_builds = len([b for b in all_builds if b['status'] == 'building'])
-            
-            overall_success_rate = round((success_builds / total_builds * 100), 2) if total_builds > 0 else 0
-            average_duration = sum([b['duration'] for b in all_builds]) // total_builds if total_builds > 0 else 0
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'summary': {
-                        'totalBuilds': total_builds,
-                        'successBuilds': success_builds,
-                        'failedBuilds': failed_builds,
-                        'buildingBuilds': building_builds,
-                        'successRate': overall_success_rate,
-                        'averageDuration': average_duration,
-                        'timeRange': {
-                            'days': days,
-                            'startTime': start_time,
-                            'endTime': end_time
-                        }
-                    },
-                    'jobStats': job_stats,
-                    'builds': all_builds[:limit]
-                }
+        # 从构建历史存储读取时间范围内的构建
+        jenkins_data = load_jenkins_jobs_data(instance, jenkins_token, since_ms=start_time)
+        
+        # 列式统计时间范围内的构建
+        frame = BuildFrame.from_jobs_data(jenkins_data).since(start_time)
+        job_stats = frame.job_stats()
+        status_counts = frame.status_counts()
+        
+        # 只为返回的最新 limit 条构建生成记录
+        latest_builds = []
+        for i in frame.latest(limit):
+            job_name, build, build_status = frame.record(i)
+            latest_builds.append({
+                'id': f"{job_name}-{build['number']}",
+                'jobName': job_name,
+                'number': build['number'],
+                'status': build_status,
+                'triggeredBy': build.get('triggeredBy') or 'unknown',
+                'startTime': build.get('timestamp', 0),
+                'duration': build.get('duration', 0),
+                'estimatedDuration': build.get('estimatedDuration', 0)
             })
-        else:
-            return jsonify({'success': False, 'message': 'Jenkins API调用失败'})
+        
+        # 计算总体统计
+        total_builds = len(frame)
+        success_builds = status_counts['success']
+        failed_builds = status_counts['failure']
+        building_builds = status_counts['building']
+        
+        overall_success_rate = frame.success_rate()
+        average_duration = frame.average_duration()
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'summary': {
+                    'totalBuilds': total_builds,
+                    'successBuilds': success_builds,
+                    'failedBuilds': failed_builds,
+                    'buildingBuilds': building_builds,
+                    'successRate': overall_success_rate,
+                    'averageDuration': average_duration,
+                    'durationPercentiles': frame.percentiles(),
+                    'timeRange': {
+                        'days': days,
+                        'startTime': start_time,
+                        'endTime': end_time
+                    }
+                },
+                'jobStats': job_stats,
+                'builds': latest_builds
+            }
+        })
             
     except Exception as e:
         logger.error(f"获取Jenkins分析数据失败: {e}")
@@ -959,112 +1276,30 @@ def get_jenkins_trends(instance_id):
         days = request.args.get('days', 30, type=int)  # 默认30天
         interval = request.args.get('interval', 'daily')  # daily, hourly, weekly
         
-        # 获取构建历史数据
-        jobs_url = f"{instance['url']}/api/json?tree=jobs[name,builds[number,timestamp,result,duration]]"
+        # 计算时间范围
+        end_time = int(time.time() * 1000)
+        start_time = end_time - (days * 24 * 60 * 60 * 1000)
         
-        response = requests.get(
-            jobs_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
-            timeout=30
-        )
+        # 从构建历史存储读取时间范围内的构建
+        jenkins_data = load_jenkins_jobs_data(instance, jenkins_token, since_ms=start_time)
         
-        if response.status_code == 200:
-            jenkins_data = response.json()
-            
-            # 计算时间范围
-            import time
-            from datetime import datetime, timedelta
-            
-            end_time = int(time.time() * 1000)
-            start_time = end_time - (days * 24 * 60 * 60 * 1000)
-            
-            # 收集时间段内的构建数据
-            builds_by_time = {}
-            duration_trends = {}
-            
-            # 根据interval确定时间间隔
-            if interval == 'hourly':
-                time_format = '%Y-%m-%d %H:00'
-                interval_ms = 60 * 60 * 1000  # 1小时
-            elif interval == 'weekly':
-                time_format = '%Y-W%U'
-                interval_ms = 7 * 24 * 60 * 60 * 1000  # 1周
-            else:  # daily
-                time_format = '%Y-%m-%d'
-                interval_ms = 24 * 60 * 60 * 1000  # 1天
-            
-            for job in jenkins_data.get('jobs', []):
-                builds = job.get('builds', [])
-                
-                for build in builds:
-                    build_time = build.get('timestamp', 0)
-                    
-                    if build_time >= start_time:
-                        # 格式化时间键
-                        time_key = datetime.fromtimestamp(build_time / 1000).strftime(time_format)
-                        
-                        if time_key not in builds_by_time:
-                            builds_by_time[time_key] = {
-                                'total': 0,
-                                'success': 0,
-                                'failure': 0,
-                                'building': 0,
-                                'totalDuration': 0,
-                                'builds': []
-                            }
-                        
-                        build_status = build.get('result', 'unknown').lower() if build.get('result') else 'building'
-                        build_duration = build.get('duration', 0)
-                        
-                        builds_by_time[time_key]['total'] += 1
-                        builds_by_time[time_key]['totalDuration'] += build_duration
-                        builds_by_time[time_key]['builds'].append({
-                            'jobName': job['name'],
-                            'number': build['number'],
-                            'status': build_status,
-                            'duration': build_duration,
-                            'timestamp': build_time
-                        })
-                        
-                        if build_status == 'success':
-                            builds_by_time[time_key]['success'] += 1
-                        elif build_status == 'failure':
-                            builds_by_time[time_key]['failure'] += 1
-                        elif build_status == 'building':
-                            builds_by_time[time_key]['building'] += 1
-            
-            # 计算趋势数据
-            trend_data = []
-            for time_key in sorted(builds_by_time.keys()):
-                stats = builds_by_time[time_key]
-                avg_duration = stats['totalDuration'] // stats['total'] if stats['total'] > 0 else 0
-                success_rate = round((stats['success'] / stats['total'] * 100), 2) if stats['total'] > 0 else 0
-                
-                trend_data.append({
-                    'time': time_key,
-                    'total': stats['total'],
-                    'success': stats['success'],
-                    'failure': stats['failure'],
-                    'building': stats['building'],
-                    'successRate': success_rate,
-                    'averageDuration': avg_duration
-                })
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'interval': interval,
-                    'days': days,
-                    'trends': trend_data,
-                    'summary': {
-                        'totalPeriods': len(trend_data),
-                        'averageBuildsPerPeriod': sum([t['total'] for t in trend_data]) / len(trend_data) if trend_data else 0,
-                        'overallSuccessRate': sum([t['successRate'] for t in trend_data]) / len(trend_data) if trend_data else 0
-                    }
+        # 按时间桶（daily, hourly, weekly）分组统计
+        frame = BuildFrame.from_jobs_data(jenkins_data).since(start_time)
+        trend_data = frame.time_series(interval)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'interval': interval,
+                'days': days,
+                'trends': trend_data,
+                'summary': {
+                    'totalPeriods': len(trend_data),
+                    'averageBuildsPerPeriod': sum([t['total'] for t in trend_data]) / len(trend_data) if trend_data else 0,
+                    'overallSuccessRate': sum([t['successRate'] for t in trend_data]) / len(trend_data) if trend_data else 0
                 }
-            })
-        else:
-            return jsonify({'success': False, 'message': 'Jenkins API调用失败'})
+            }
+        })
             
     except Exception as e:
         logger.error(f"获取Jenkins趋势数据失败: {e}")
@@ -1082,123 +1317,93 @@ def get_jenkins_metrics(instance_id):
         # 获取查询参数
         metric_type = request.args.get('type', 'overview')  # overview, performance, health
         
-        # 获取Jenkins系统信息和构建数据
+        # 获取Jenkins系统信息和队列（构建数据来自构建历史存储）
         system_url = f"{instance['url']}/api/json"
-        jobs_url = f"{instance['url']}/api/json?tree=jobs[name,builds[number,timestamp,result,duration,estimatedDuration]]"
         queue_url = f"{instance['url']}/queue/api/json"
         
-        # 并行请求多个API
-        import concurrent.futures
+        # 并行请求多个API（共享连接池和线程池）
+        client = get_jenkins_client(instance, jenkins_token)
         
-        def fetch_url(url):
-            return requests.get(
-                url,
-                auth=HTTPBasicAuth(instance['username'], jenkins_token),
-                timeout=15
-            )
+        # 计算时间范围（最近24小时）
+        end_time = int(time.time() * 1000)
+        start_time_24h = end_time - (24 * 60 * 60 * 1000)
+        start_time_7d = end_time - (7 * 24 * 60 * 60 * 1000)
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            system_future = executor.submit(fetch_url, system_url)
-            jobs_future = executor.submit(fetch_url, jobs_url)
-            queue_future = executor.submit(fetch_url, queue_url)
-            
-            system_response = system_future.result()
-            jobs_response = jobs_future.result()
-            queue_response = queue_future.result()
+        system_future = client.submit(client.get, system_url, timeout=15)
+        queue_future = client.submit(client.get, queue_url, timeout=15)
+        jobs_future = client.submit(load_jenkins_jobs_data, instance, jenkins_token, start_time_7d)
+        
+        system_response = system_future.result()
+        queue_response = queue_future.result()
+        jobs_data = jobs_future.result()
         
-        if all(r.status_code == 200 for r in [system_response, jobs_response, queue_response]):
+        if all(r.status_code == 200 for r in [system_response, queue_response]):
             system_data = system_response.json()
-            jobs_data = jobs_response.json()
             queue_data = queue_response.json()
             
-            # 计算时间范围（最近24小时）
-            import time
-            end_time = int(time.time() * 1000)
-            start_time_24h = end_time - (24 * 60 * 60 * 1000)
-            start_time_7d = end_time - (7 * 24 * 60 * 60 * 1000)
+            # 列式统计最近7天/24小时的构建
+            frame_7d = BuildFrame.from_jobs_data(jobs_data).since(start_time_7d)
+            frame_24h = frame_7d.since(start_time_24h)
             
-            # 收集性能数据
-            recent_builds = []
-            job_performance = {}
-            
-            for job in jobs_data.get('jobs', []):
-                job_name = job['name']
-                builds = job.get('builds', [])
-                
-                job_performance[job_name] = {
-                    'recent24h': {'count': 0, 'success': 0, 'failure': 0, 'totalDuration': 0, 'avgDuration': 0},
-                    'recent7d': {'count': 0, 'success': 0, 'failure': 0, 'totalDuration': 0, 'avgDuration': 0},
-                    'efficiency': 0,  # 实际时长 vs 预计时长的比率
-                    'stability': 0   # 成功率
-                }
-                
-                for build in builds:
-                    build_time = build.get('timestamp', 0)
-                    build_status = build.get('result', 'unknown').lower() if build.get('result') else 'building'
-                    build_duration = build.get('duration', 0)
-                    estimated_duration = build.get('estimatedDuration', 0)
-                    
-                    # 24小时内的构建
-                    if build_time >= start_time_24h:
-                        job_performance[job_name]['recent24h']['count'] += 1
-                        job_performance[job_name]['recent24h']['totalDuration'] += build_duration
-                        
-                        if build_status == 'success':
-                            job_performance[job_name]['recent24h']['success'] += 1
-                        elif build_status == 'failure':
-                            job_performance[job_name]['recent24h']['failure'] += 1
-                        
-                        recent_builds.append({
-                            'jobName': job_name,
-                            'number': build['number'],
-                            'status': build_status,
-                            'duration': build_duration,
-                            'estimatedDuration': estimated_duration,
-                            'timestamp': build_time,
-                            'efficiency': (build_duration / estimated_duration * 100) if estimated_duration > 0 else 100
-                        })
-                    
-                    # 7天内的构建
-                    if build_time >= start_time_7d:
-                        job_performance[job_name]['recent7d']['count'] += 1
-                        job_performance[job_name]['recent7d']['totalDuration'] += build_duration
-                        
-                        if build_status == 'success':
-                            job_performance[job_name]['recent7d']['success'] += 1
-                        elif build_status == 'failure':
-                            job_performance[job_name]['recent7d']['failure'] += 1
+            # 实际时长 vs 预计时长的比率（没有预计时长按100%计）
+            efficiency_24h = np.divide(
+                frame_24h.duration * 100.0, frame_24h.estimated_duration,
+                out=np.full(len(frame_24h), 100.0), where=frame_24h.estimated_duration > 0
+            )
+            job_efficiency = frame_24h.job_mean(efficiency_24h)
+            job_counts_24h = np.bincount(frame_24h.job, minlength=len(frame_7d.job_names))
             
-            # 计算性能指标
-            for job_name, perf in job_performance.items():
-                # 计算平均构建时长
-                for period in ['recent24h', 'recent7d']:
-                    if perf[period]['count'] > 0:
-                        perf[period]['avgDuration'] = perf[period]['totalDuration'] // perf[period]['count']
-                        perf[period]['successRate'] = round((perf[period]['success'] / perf[period]['count']) * 100, 2)
-                    else:
-                        perf[period]['successRate'] = 0
+            job_performance = {}
+            stats_24h = frame_24h.job_stats()
+            stats_7d = frame_7d.job_stats()
+            for index, job_name in enumerate(frame_7d.job_names):
+                perf = {'efficiency': 0, 'stability': 0}  # 效率: 实际时长 vs 预计时长; 稳定性: 成功率
+                for period, stats in (('recent24h', stats_24h[job_name]), ('recent7d', stats_7d[job_name])):
+                    perf[period] = {
+                        'count': stats['totalBuilds'],
+                        'success': stats['successBuilds'],
+                        'failure': stats['failedBuilds'],
+                        'totalDuration': stats['totalDuration'],
+                        'avgDuration': stats['averageDuration'],
+                        'successRate': stats['successRate']
+                    }
                 
                 # 计算稳定性（7天成功率）
                 perf['stability'] = perf['recent7d']['successRate']
                 
                 # 计算效率（实际时长 vs 预计时长）
-                job_builds = [b for b in recent_builds if b['jobName'] == job_name]
-                if job_builds:
-                    avg_efficiency = sum([b['efficiency'] for b in job_builds]) / len(job_builds)
-                    perf['efficiency'] = round(avg_efficiency, 2)
+                if job_counts_24h[index]:
+                    perf['efficiency'] = round(float(job_efficiency[index]), 2)
+                
+                job_performance[job_name] = perf
+            
+            # 最近的构建
+            recent_builds = []
+            for i in frame_24h.latest(20):
+                job_name, build, build_status = frame_24h.record(i)
+                recent_builds.append({
+                    'jobName': job_name,
+                    'number': build['number'],
+                    'status': build_status,
+                    'duration': build.get('duration', 0),
+                    'estimatedDuration': build.get('estimatedDuration', 0),
+                    'timestamp': build.get('timestamp', 0),
+                    'efficiency': float(efficiency_24h[i])
+                })
             
             # 系统性能概览
             total_jobs = len(jobs_data.get('jobs', []))
             queue_length = len(queue_data.get('items', []))
             
             # 计算24小时内的总体指标
-            total_builds_24h = len(recent_builds)
-            success_builds_24h = len([b for b in recent_builds if b['status'] == 'success'])
-            failed_builds_24h = len([b for b in recent_builds if b['status'] == 'failure'])
-            building_builds = len([b for b in recent_builds if b['status'] == 'building'])
+            status_counts_24h = frame_24h.status_counts()
+            total_builds_24h = len(frame_24h)
+            success_builds_24h = status_counts_24h['success']
+            failed_builds_24h = status_counts_24h['failure']
+            building_builds = status_counts_24h['building']
             
-            overall_success_rate = round((success_builds_24h / total_builds_24h * 100), 2) if total_builds_24h > 0 else 0
-            avg_build_duration = sum([b['duration'] for b in recent_builds]) // total_builds_24h if total_builds_24h > 0 else 0
+            overall_success_rate = frame_24h.success_rate()
+            avg_build_duration = frame_24h.average_duration()
             
             # 构建性能等级分类
             performance_levels = {
@@ -1255,7 +1460,7 @@ def get_jenkins_metrics(instance_id):
                     'performanceLevels': performance_levels
                 },
                 'jobPerformance': job_performance,
-                'recentBuilds': sorted(recent_builds, key=lambda x: x['timestamp'], reverse=True)[:20],
+                'recentBuilds': recent_builds,
                 'warnings': warnings,
                 'systemInfo': {
                     'jenkinsVersion': system_data.get('version', 'unknown'),
@@ -1298,9 +1503,8 @@ def jenkins_comprehensive_health_check(instance_id):
         # 1. 连接性检查
         try:
             start_time = time.time()
-            response = requests.get(
+            response = get_jenkins_client(instance, jenkins_token).get(
                 f"{instance['url']}/api/json",
-                auth=HTTPBasicAuth(instance['username'], jenkins_token),
                 timeout=10
             )
             response_time = round((time.time() - start_time) * 1000, 2)
@@ -1329,9 +1533,8 @@ def jenkins_comprehensive_health_check(instance_id):
         
         # 2. 系统状态检查
         try:
-            system_response = requests.get(
+            system_response = get_jenkins_client(instance, jenkins_token).get(
                 f"{instance['url']}/api/json",
-                auth=HTTPBasicAuth(instance['username'], jenkins_token),
                 timeout=10
             )
             
@@ -1362,9 +1565,8 @@ def jenkins_comprehensive_health_check(instance_id):
         
         # 3. 构建队列检查
         try:
-            queue_response = requests.get(
+            queue_response = get_jenkins_client(instance, jenkins_token).get(
                 f"{instance['url']}/queue/api/json",
-                auth=HTTPBasicAuth(instance['username'], jenkins_token),
                 timeout=10
             )
             
@@ -1413,9 +1615,8 @@ def jenkins_comprehensive_health_check(instance_id):
         
         # 4. 最近构建状态检查
         try:
-            jobs_response = requests.get(
+            jobs_response = get_jenkins_client(instance, jenkins_token).get(
                 f"{instance['url']}/api/json?tree=jobs[name,builds[number,timestamp,result,duration]]",
-                auth=HTTPBasicAuth(instance['username'], jenkins_token),
                 timeout=15
             )
             
@@ -1514,78 +1715,47 @@ def get_build_prediction(instance_id):
         job_name = request.args.get('job_name')  # 特定任务的预测，如果未指定则返回整体预测
         days = int(request.args.get('days', 30))  # 分析历史数据的天数
         
-        # 获取Jenkins构建历史数据
-        if job_name:
-            jobs_url = f"{instance['url']}/job/{job_name}/api/json?tree=builds[number,timestamp,result,duration,estimatedDuration,executor[displayName]]"
-        else:
-            jobs_url = f"{instance['url']}/api/json?tree=jobs[name,builds[number,timestamp,result,duration,estimatedDuration,executor[displayName]]]"
-        
+        # 构建历史来自构建历史存储，系统信息和队列实时获取
         system_url = f"{instance['url']}/api/json"
         queue_url = f"{instance['url']}/queue/api/json"
         
-        # 并行请求多个API
-        import concurrent.futures
+        # 并行请求多个API（共享连接池和线程池）
         import statistics
-        from datetime import datetime, timedelta
+        client = get_jenkins_client(instance, jenkins_token)
         
-        def fetch_url(url):
-            return requests.get(
-                url,
-                auth=HTTPBasicAuth(instance['username'], jenkins_token),
-                timeout=20
-            )
+        # 计算时间范围
+        end_time = int(time.time() * 1000)
+        start_time = end_time - (days * 24 * 60 * 60 * 1000)
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            jobs_future = executor.submit(fetch_url, jobs_url)
-            system_future = executor.submit(fetch_url, system_url)
-            queue_future = executor.submit(fetch_url, queue_url)
-            
-            jobs_response = jobs_future.result()
-            system_response = system_future.result()
-            queue_response = queue_future.result()
+        jobs_future = client.submit(load_jenkins_jobs_data, instance, jenkins_token, start_time, job_name)
+        system_future = client.submit(client.get, system_url, timeout=20)
+        queue_future = client.submit(client.get, queue_url, timeout=20)
+        
+        jobs_data = jobs_future.result()
+        system_response = system_future.result()
+        queue_response = queue_future.result()
         
-        if not all(r.status_code == 200 for r in [jobs_response, system_response, queue_response]):
+        if not all(r.status_code == 200 for r in [system_response, queue_response]):
             return jsonify({'success': False, 'message': 'Jenkins API调用失败'})
         
-        jobs_data = jobs_response.json()
         system_data = system_response.json()
         queue_data = queue_response.json()
         
-        # 计算时间范围
-        end_time = int(time.time() * 1000)
-        start_time = end_time - (days * 24 * 60 * 60 * 1000)
-        
-        # 收集历史构建数据
+        # 收集历史构建数据（指定job_name时只包含该任务）
         historical_builds = []
         
-        if job_name:
-            # 单个任务预测
-            builds = jobs_data.get('builds', [])
+        for job in jobs_data.get('jobs', []):
+            job_name_current = job['name']
+            builds = job.get('builds', [])
             for build in builds:
-                if build.get('timestamp', 0) >= start_time:
-                    historical_builds.append({
-                        'jobName': job_name,
-                        'timestamp': build.get('timestamp', 0),
-                        'result': build.get('result', 'unknown'),
-                        'duration': build.get('duration', 0),
-                        'estimatedDuration': build.get('estimatedDuration', 0),
-                        'executor': build.get('executor', {}).get('displayName', 'unknown') if build.get('executor') else 'unknown'
-                    })
-        else:
-            # 整体预测
-            for job in jobs_data.get('jobs', []):
-                job_name_current = job['name']
-                builds = job.get('builds', [])
-                for build in builds:
-                    if build.get('timestamp', 0) >= start_time:
-                        historical_builds.append({
-                            'jobName': job_name_current,
-                            'timestamp': build.get('timestamp', 0),
-                            'result': build.get('result', 'unknown'),
-                            'duration': build.get('duration', 0),
-                            'estimatedDuration': build.get('estimatedDuration', 0),
-                            'executor': build.get('executor', {}).get('displayName', 'unknown') if build.get('executor') else 'unknown'
-                        })
+                historical_builds.append({
+                    'jobName': job_name_current,
+                    'timestamp': build.get('timestamp', 0),
+                    'result': build.get('result') or 'unknown',
+                    'duration': build.get('duration', 0),
+                    'estimatedDuration': build.get('estimatedDuration', 0),
+                    'executor': build.get('executor') or 'unknown'
+                })
         
         if not historical_builds:
             return jsonify({
@@ -1752,43 +1922,28 @@ def get_failure_analysis(instance_id):
         days = int(request.args.get('days', 7))  # 分析最近几天的失败构建
         limit = int(request.args.get('limit', 20))  # 最多分析的失败构建数量
         
-        # 获取Jenkins失败构建数据
-        if job_name:
-            jobs_url = f"{instance['url']}/job/{job_name}/api/json?tree=builds[number,timestamp,result,duration,actions[causes[shortDescription]]]"
-        else:
-            jobs_url = f"{instance['url']}/api/json?tree=jobs[name,builds[number,timestamp,result,duration,actions[causes[shortDescription]]]]"
-        
-        response = requests.get(
-            jobs_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
-            timeout=20
-        )
-        
-        if response.status_code != 200:
-            return jsonify({'success': False, 'message': 'Jenkins API调用失败'})
-        
-        jobs_data = response.json()
-        
         # 计算时间范围
         end_time = int(time.time() * 1000)
         start_time = end_time - (days * 24 * 60 * 60 * 1000)
         
+        # 从构建历史存储读取时间范围内的构建
+        jobs_data = load_jenkins_jobs_data(instance, jenkins_token, since_ms=start_time, job_name=job_name)
+        
         # 收集失败构建数据
         failed_builds = []
         
         if job_name:
             # 单个任务分析
-            builds = jobs_data.get('builds', [])
+            builds = jobs_data['jobs'][0]['builds'] if jobs_data.get('jobs') else []
             for build in builds[:limit]:
-                if (build.get('timestamp', 0) >= start_time and 
-                    build.get('result') in ['FAILURE', 'ABORTED', 'UNSTABLE']):
+                if build.get('result') in ['FAILURE', 'ABORTED', 'UNSTABLE']:
                     failed_builds.append({
                         'jobName': job_name,
                         'buildNumber': build.get('number'),
                         'timestamp': build.get('timestamp', 0),
                         'result': build.get('result'),
                         'duration': build.get('duration', 0),
-                        'causes': [cause.get('shortDescription', '') for action in build.get('actions', []) for cause in action.get('causes', [])]
+                        'causes': build.get('causes', [])
                     })
         else:
             # 整体分析
@@ -1796,8 +1951,7 @@ def get_failure_analysis(instance_id):
                 job_name_current = job['name']
                 builds = job.get('builds', [])
                 for build in builds[:10]:  # 每个任务最多分析10个构建
-                    if (build.get('timestamp', 0) >= start_time and 
-                        build.get('result') in ['FAILURE', 'ABORTED', 'UNSTABLE'] and
+                    if (build.get('result') in ['FAILURE', 'ABORTED', 'UNSTABLE'] and
                         len(failed_builds) < limit):
                         failed_builds.append({
                             'jobName': job_name_current,
@@ -1805,7 +1959,7 @@ def get_failure_analysis(instance_id):
                             'timestamp': build.get('timestamp', 0),
                             'result': build.get('result'),
                             'duration': build.get('duration', 0),
-                            'causes': [cause.get('shortDescription', '') for action in build.get('actions', []) for cause in action.get('causes', [])]
+                            'causes': build.get('causes', [])
                         })
         
         if not failed_builds:
@@ -1824,42 +1978,39 @@ def get_failure_analysis(instance_id):
             })
         
         # 获取失败构建的详细日志进行分析（并行获取）
-        import concurrent.futures
-        import re
         from collections import Counter
+        client = get_jenkins_client(instance, jenkins_token)
         
         def get_build_log(job_name, build_number):
             """获取构建日志"""
             try:
                 log_url = f"{instance['url']}/job/{job_name}/{build_number}/consoleText"
-                log_response = requests.get(
+                log_response = client.get(
                     log_url,
-                    auth=HTTPBasicAuth(instance['username'], jenkins_token),
                     timeout=10
                 )
                 return log_response.text if log_response.status_code == 200 else ""
             except:
                 return ""
         
-        # 并行获取构建日志（限制并发数避免过载）
+        # 并行获取构建日志（共享线程池限制总并发，避免过载）
         build_logs = {}
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            log_futures = {
-                executor.submit(get_build_log, build['jobName'], build['buildNumber']): build
-                for build in failed_builds[:10]  # 最多分析10个构建的日志
-            }
-            
-            for future in concurrent.futures.as_completed(log_futures):
-                build = log_futures[future]
-                try:
-                    log_content = future.result()
-                    if log_content:
-                        build_logs[f"{build['jobName']}-{build['buildNumber']}"] = {
-                            'build': build,
-                            'log': log_content
-                        }
-                except Exception as e:
-                    logger.warning(f"获取构建日志失败: {e}")
+        log_futures = {
+            client.submit(get_build_log, build['jobName'], build['buildNumber']): build
+            for build in failed_builds[:10]  # 最多分析10个构建的日志
+        }
+        
+        for future in concurrent.futures.as_completed(log_futures):
+            build = log_futures[future]
+            try:
+                log_content = future.result()
+                if log_content:
+                    build_logs[f"{build['jobName']}-{build['buildNumber']}"] = {
+                        'build': build,
+                        'log': log_content
+                    }
+            except Exception as e:
+                logger.warning(f"获取构建日志失败: {e}")
         
         # 1. 失败原因分类分析
         failure_patterns = {
@@ -2057,44 +2208,32 @@ def get_optimization_recommendations(instance_id):
         # 获取查询参数
         days = int(request.args.get('days', 30))  # 分析历史数据的天数
         
-        # 获取Jenkins系统数据和构建历史
+        # 获取Jenkins系统数据（构建历史来自构建历史存储）
         system_url = f"{instance['url']}/api/json"
-        jobs_url = f"{instance['url']}/api/json?tree=jobs[name,builds[number,timestamp,result,duration,estimatedDuration]]"
         queue_url = f"{instance['url']}/queue/api/json"
         
-        # 并行请求多个API
-        import concurrent.futures
+        # 并行请求多个API（共享连接池和线程池）
         import statistics
-        from datetime import datetime, timedelta
-        from collections import defaultdict
-        
-        def fetch_url(url):
-            return requests.get(
-                url,
-                auth=HTTPBasicAuth(instance['username'], jenkins_token),
-                timeout=20
-            )
+        client = get_jenkins_client(instance, jenkins_token)
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
-            system_future = executor.submit(fetch_url, system_url)
-            jobs_future = executor.submit(fetch_url, jobs_url)
-            queue_future = executor.submit(fetch_url, queue_url)
-            
-            system_response = system_future.result()
-            jobs_response = jobs_future.result()
-            queue_response = queue_future.result()
+        # 计算时间范围
+        end_time = int(time.time() * 1000)
+        start_time = end_time - (days * 24 * 60 * 60 * 1000)
         
-        if not all(r.status_code == 200 for r in [system_response, jobs_response, queue_response]):
+        system_future = client.submit(client.get, system_url, timeout=20)
+        jobs_future = client.submit(load_jenkins_jobs_data, instance, jenkins_token, start_time)
+        queue_future = client.submit(client.get, queue_url, timeout=20)
+        
+        system_response = system_future.result()
+        jobs_data = jobs_future.result()
+        queue_response = queue_future.result()
+        
+        if not all(r.status_code == 200 for r in [system_response, queue_response]):
             return jsonify({'success': False, 'message': 'Jenkins API调用失败'})
         
         system_data = system_response.json()
-        jobs_data = jobs_response.json()
         queue_data = queue_response.json()
         
-        # 计算时间范围
-        end_time = int(time.time() * 1000)
-        start_time = end_time - (days * 24 * 60 * 60 * 1000)
-        
         # 收集历史构建数据
         historical_builds = []
         job_build_stats = defaultdict(list)
@@ -2370,19 +2509,15 @@ def get_performance_metrics():
         # 获取缓存统计
         cache_stats = simple_cache.get_stats()
         
-        # 获取限流统计 (示例数据，实际环境中应该从真实的限流器获取)
-        rate_limit_stats = {
-            'total_requests': sum(performance_metrics.get('overall', {}).get('total_requests', 0) for _ in [1]),
-            'blocked_requests': 0,  # 需要从实际的限流器获取
-            'current_limits': {
-                'jenkins_prediction': rate_limiter.get_stats('jenkins_prediction_global'),
-                'jenkins_failure': rate_limiter.get_stats('jenkins_failure_global'),
-            }
-        }
+        # 获取各端点限流器统计
+        rate_limit_stats = get_rate_limit_stats()
+        
+        # Jenkins HTTP客户端和凭据缓存统计
+        jenkins_client_stats = jenkins_clients.get_stats()
+        jenkins_client_stats['credentials'] = jenkins_credentials.get_stats()
         
         # 系统资源统计
         import psutil
-        import os
         
         system_stats = {
             'cpu_percent': psutil.cpu_percent(interval=1),
@@ -2398,6 +2533,9 @@ def get_performance_metrics():
                 'performance': performance_metrics,
                 'cache': cache_stats,
                 'rate_limit': rate_limit_stats,
+                'jenkins_clients': jenkins_client_stats,
+                'ssh_pool': ssh_pool.get_stats(),
+                'batch_executor': async_batch_executor.get_stats(),
                 'system': system_stats,
                 'timestamp': int(time.time() * 1000)
             }
@@ -2415,6 +2553,7 @@ def clear_performance_cache():
     try:
         # 清空所有缓存
         simple_cache.clear()
+        jenkins_credentials.clear()
         
         logger.info("系统缓存已清空")
         return jsonify({
@@ -3711,61 +3850,79 @@ def cleanup_resilience_data():
 @validate_input_security()
 @safe_execute()
 def get_jenkins_views(instance_id):
-    """获取Jenkins视图列表"""
+    """
+    获取Jenkins视图列表
+
+    一次深层 tree 查询同时取回所有视图的任务和最近构建；个别视图类型不返回任务列表时，
+    只对这些视图通过共享线程池并行补查。结果按实例缓存并以 ETag 重新验证，
+    客户端带 If-None-Match 且未变化时返回 304。
+    """
     try:
         instance, jenkins_token = get_jenkins_instance_with_decrypted_token(instance_id)
         if not instance:
             return jsonify({'success': False, 'message': 'Jenkins实例不存在'})
 
-        # 获取Jenkins视图列表
-        views_url = f"{instance['url']}/api/json?tree=views[name,url,description,jobs[name]]"
-        
-        response = requests.get(
-            views_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
-            timeout=15
+        client = get_jenkins_client(instance, jenkins_token)
+        data, etag = client.get_json_conditional(
+            'api/json', JENKINS_VIEWS_TREE, max_age=JENKINS_VIEW_CACHE_TTL, timeout=15
         )
-        
-        if response.status_code == 200:
-            data = response.json()
-            views = []
-            
-            for view in data.get('views', []):
-                view_detail = {
-                    'name': view.get('name', ''),
-                    'description': view.get('description', ''),
-                    'url': view.get('url', ''),
-                    'jobs': []
-                }
-                
-                # 获取视图的详细信息
-                view_url = f"{instance['url']}/view/{view['name']}/api/json?tree=jobs[name,displayName,description,lastBuild[number,result,duration,timestamp]]"
-                view_response = requests.get(
-                    view_url,
-                    auth=HTTPBasicAuth(instance['username'], jenkins_token),
-                    timeout=15
-                )
-                
-                if view_response.status_code == 200:
-                    view_data = view_response.json()
-                    view_detail['jobs'] = view_data.get('jobs', [])
-                
-                views.append(view_detail)
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'views': views,
-                    'total': len(views)
-                }
-            })
-        else:
-            return jsonify({'success': False, 'message': '获取Jenkins视图失败'})
-            
+        if data is None:
+            # 深层查询失败（例如视图插件序列化异常）时退回浅查询，再并行补查各视图
+            data, etag = client.get_json_conditional(
+                'api/json', 'views[name,url,description]', max_age=JENKINS_VIEW_CACHE_TTL, timeout=15
+            )
+            if data is None:
+                return jsonify({'success': False, 'message': '获取Jenkins视图失败'})
+
+        views = [
+            {
+                'name': view.get('name', ''),
+                'description': view.get('description', ''),
+                'url': view.get('url', ''),
+                'jobs': view.get('jobs') or []
+            }
+            for view in data.get('views', [])
+        ]
+
+        pending = {
+            client.submit(_fetch_view_jobs, client, view['name']): view
+            for view, raw in zip(views, data.get('views', []))
+            if 'jobs' not in raw
+        }
+        if pending:
+            etag = None
+            for future in concurrent.futures.as_completed(pending):
+                pending[future]['jobs'] = future.result()
+
+        if etag and request.if_none_match.contains(etag):
+            response = make_response('', 304)
+            response.set_etag(etag)
+            return response
+
+        response = jsonify({
+            'success': True,
+            'data': {
+                'views': views,
+                'total': len(views)
+            }
+        })
+        if etag:
+            response.set_etag(etag)
+        return response
+
     except Exception as e:
         logger.error(f"获取Jenkins视图失败: {e}")
         return jsonify({'success': False, 'message': str(e)})
 
+def _fetch_view_jobs(client, view_name):
+    """单独获取一个视图的任务（深层查询未返回任务列表时使用）"""
+    try:
+        view_data = client.get_json(f"view/{view_name}/api/json", JENKINS_VIEW_JOBS_TREE, timeout=15)
+    except requests.RequestException as e:
+        logger.warning(f"获取Jenkins视图 {view_name} 任务失败: {e}")
+        return []
+    return (view_data or {}).get('jobs', [])
+
 @bp.route('/jenkins/views/<int:instance_id>', methods=['POST'])
 @login_required
 @require_write(ResourceType.JENKINS)
@@ -3820,15 +3977,15 @@ def create_jenkins_view(instance_id):
         # 发送创建视图的请求
         create_url = f"{instance['url']}/createView"
         
-        response = requests.post(
+        response = get_jenkins_client(instance, jenkins_token).post(
             create_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             data={'name': view_name, 'mode': 'hudson.model.ListView', 'json': view_xml},
             headers={'Content-Type': 'application/x-www-form-urlencoded'},
             timeout=15
         )
         
         if response.status_code in [200, 201, 302]:  # 302 is redirect after successful creation
+            get_jenkins_client(instance, jenkins_token).invalidate_conditional('api/json')
             return jsonify({
                 'success': True,
                 'data': {
@@ -3863,13 +4020,13 @@ def delete_jenkins_view(instance_id, view_name):
 
         delete_url = f"{instance['url']}/view/{view_name}/doDelete"
         
-        response = requests.post(
+        response = get_jenkins_client(instance, jenkins_token).post(
             delete_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=15
         )
         
         if response.status_code in [200, 302, 404]:  # 404 means view might already be deleted
+            get_jenkins_client(instance, jenkins_token).invalidate_conditional('api/json')
             return jsonify({
                 'success': True,
                 'message': f'视图 "{view_name}" 删除成功'
@@ -3899,9 +4056,8 @@ def get_jenkins_view_jobs(instance_id, view_name):
 
         view_url = f"{instance['url']}/view/{view_name}/api/json?tree=jobs[name,displayName,description,lastBuild[number,result,duration,timestamp],color]"
         
-        response = requests.get(
+        response = get_jenkins_client(instance, jenkins_token).get(
             view_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=15
         )
         
@@ -3965,9 +4121,8 @@ def get_jenkins_job_config(instance_id, job_name):
 
         config_url = f"{instance['url']}/job/{job_name}/config.xml"
         
-        response = requests.get(
+        response = get_jenkins_client(instance, jenkins_token).get(
             config_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=15
         )
         
@@ -4046,9 +4201,8 @@ def update_jenkins_job_config(instance_id, job_name):
         # 更新任务配置
         config_url = f"{instance['url']}/job/{job_name}/config.xml"
         
-        response = requests.post(
+        response = get_jenkins_client(instance, jenkins_token).post(
             config_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             data=config_xml.encode('utf-8'),
             headers={'Content-Type': 'application/xml'},
             timeout=30
@@ -4122,9 +4276,8 @@ def create_jenkins_job(instance_id):
         
         # 检查任务是否已存在
         check_url = f"{instance['url']}/job/{job_name}/api/json"
-        check_response = requests.get(
+        check_response = get_jenkins_client(instance, jenkins_token).get(
             check_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=10
         )
         
@@ -4133,9 +4286,8 @@ def create_jenkins_job(instance_id):
         
         # 创建新任务
         create_url = f"{instance['url']}/createItem?name={job_name}"
-        response = requests.post(
+        response = get_jenkins_client(instance, jenkins_token).post(
             create_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             data=job_xml.encode('utf-8'),
             headers={'Content-Type': 'application/xml'},
             timeout=30
@@ -4191,9 +4343,8 @@ def update_jenkins_job(instance_id, job_name):
         
         # 更新任务配置
         config_url = f"{instance['url']}/job/{job_name}/config.xml"
-        response = requests.post(
+        response = get_jenkins_client(instance, jenkins_token).post(
             config_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             data=job_xml.encode('utf-8'),
             headers={'Content-Type': 'application/xml'},
             timeout=30
@@ -4510,9 +4661,8 @@ def get_jenkins_credentials(instance_id):
         # 获取凭据列表
         credentials_url = f"{instance['url']}/credentials/api/json?tree=credentials[id,description]"
         
-        response = requests.get(
+        response = get_jenkins_client(instance, jenkins_token).get(
             credentials_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=15
         )
         
@@ -4867,9 +5017,8 @@ def delete_jenkins_job(instance_id, job_name):
 
         # 删除任务
         delete_url = f"{instance['url']}/job/{job_name}/doDelete"
-        response = requests.post(
+        response = get_jenkins_client(instance, jenkins_token).post(
             delete_url,
-            auth=HTTPBasicAuth(instance['username'], jenkins_token),
             timeout=30
         )
         
@@ -4943,9 +5092,8 @@ def validate_jenkins_pipeline():
                 if instance:
                     # 使用Jenkins的Pipeline语法验证API
                     validate_url = f"{instance['url']}/pipeline-model-converter/validate"
-                    response = requests.post(
+                    response = get_jenkins_client(instance, jenkins_token).post(
                         validate_url,
-                        auth=HTTPBasicAuth(instance['username'], jenkins_token),
                         data={'jenkinsfile': pipeline_script},
                         timeout=15
                     )
@@ -4970,9 +5118,6 @@ def validate_jenkins_pipeline():
         logger.error(f"验证Jenkins Pipeline失败: {e}")
         return jsonify({'success': False, 'message': f'Pipeline验证失败: {str(e)}'})
 
-# 导入必要的模块 (如果尚未导入)
-import re
-
 # Jenkins配置测试和验证工具API
 @bp.route('/jenkins/test-config', methods=['POST'])
 @login_required
@@ -5026,9 +5171,8 @@ def test_jenkins_config():
         # 2. Jenkins连接测试
         try:
             test_url = f"{instance['url']}/api/json"
-            response = requests.get(
+            response = get_jenkins_client(instance, jenkins_token).get(
                 test_url,
-                auth=HTTPBasicAuth(instance['username'], jenkins_token),
                 timeout=10
             )
             
@@ -5111,9 +5255,8 @@ def test_jenkins_config():
                 
                 # 检查测试任务是否已存在
                 check_url = f"{instance['url']}/job/{test_job_name}/api/json"
-                check_response = requests.get(
+                check_response = get_jenkins_client(instance, jenkins_token).get(
                     check_url,
-                    auth=HTTPBasicAuth(instance['username'], jenkins_token),
                     timeout=10
                 )
                 
@@ -5122,9 +5265,8 @@ def test_jenkins_config():
                 
                 # 创建测试任务
                 create_url = f"{instance['url']}/createItem?name={test_job_name}"
-                create_response = requests.post(
+                create_response = get_jenkins_client(instance, jenkins_token).post(
                     create_url,
-                    auth=HTTPBasicAuth(instance['username'], jenkins_token),
                     data=job_xml.encode('utf-8'),
                     headers={'Content-Type': 'application/xml'},
                     timeout=30
@@ -5140,9 +5282,8 @@ def test_jenkins_config():
                     # 立即删除测试任务
                     try:
                         delete_url = f"{instance['url']}/job/{test_job_name}/doDelete"
-                        delete_response = requests.post(
+                        delete_response = get_jenkins_client(instance, jenkins_token).post(
                             delete_url,
-                            auth=HTTPBasicAuth(instance['username'], jenkins_token),
                             timeout=30
                         )
                         
@@ -5398,9 +5539,8 @@ def validate_jenkins_job_name():
                 instance, jenkins_token = get_jenkins_instance_with_decrypted_token(instance_id)
                 if instance:
                     check_url = f"{instance['url']}/job/{job_name}/api/json"
-                    response = requests.get(
+                    response = get_jenkins_client(instance, jenkins_token).get(
                         check_url,
-                        auth=HTTPBasicAuth(instance['username'], jenkins_token),
                         timeout=10
                     )
                     
@@ -5413,9 +5553,8 @@ def validate_jenkins_job_name():
                         for i in range(1, 6):
                             suggested_name = f"{base_name}-{i}"
                             check_url = f"{instance['url']}/job/{suggested_name}/api/json"
-                            response = requests.get(
+                            response = get_jenkins_client(instance, jenkins_token).get(
                                 check_url,
-                                auth=HTTPBasicAuth(instance['username'], jenkins_token),
                                 timeout=5
                             )
                             
@@ -5444,5 +5583,4 @@ def validate_jenkins_job_name():
         return jsonify({'success': False, 'message': f'名称验证失败: {str(e)}'})
 
 # 导入必要的模块
-import time
 import random 
\ No newline at end of file
@@ -251,6 +251,17 @@ def jenkins_settings():
     finally:
         db.close()
 
+def _invalidate_jenkins_instance(instance_id, purge_history=False):
+    """实例配置变更后失效凭据缓存、HTTP客户端（及构建历史），失败不影响设置保存"""
+    try:
+        from app.services.jenkins_client import invalidate_jenkins_instance
+        invalidate_jenkins_instance(instance_id)
+        if purge_history:
+            from app.services.jenkins_build_store import jenkins_build_store
+            jenkins_build_store.purge_instance(instance_id)
+    except Exception as e:
+        print(f"清理Jenkins实例缓存失败: {str(e)}")
+
 @settings.route('/api/settings/jenkins/<int:instance_id>', methods=['PUT', 'DELETE'])
 @login_required
 def jenkins_instance(instance_id):
@@ -260,11 +271,16 @@ def jenkins_instance(instance_id):
         data = request.get_json()
         try:
             with db.cursor() as cursor:
+                cursor.execute('SELECT url FROM jenkins_settings WHERE id=%s', (instance_id,))
+                previous = cursor.fetchone()
                 cursor.execute(
                     'UPDATE jenkins_settings SET name=%s, url=%s, username=%s, token=%s, enabled=%s WHERE id=%s',
                     (data['name'], data['url'], data['username'], data['token'], data.get('enabled', True), instance_id)
                 )
             db.commit()
+            # 地址变更后原有构建历史不再对应该实例
+            url_changed = bool(previous) and previous['url'].rstrip('/') != data['url'].rstrip('/')
+            _invalidate_jenkins_instance(instance_id, purge_history=url_changed)
             return jsonify({'success': True, 'message': 'Jenkins实例更新成功'})
         except Exception as e:
             return jsonify({'success': False, 'message': str(e)})
@@ -276,6 +292,7 @@ def jenkins_instance(instance_id):
             with db.cursor() as cursor:
                 cursor.execute('DELETE FROM jenkins_settings WHERE id=%s', (instance_id,))
             db.commit()
+            _invalidate_jenkins_instance(instance_id, purge_history=True)
             return jsonify({'success': True, 'message': 'Jenkins实例删除成功'})
         except Exception as e:
             return jsonify({'success': False, 'message': str(e)})
@@ -7,7 +7,7 @@ from flask import Blueprint, request, jsonify
 from flask_cors import cross_origin
 import yaml
 import uuid
-import paramiko
+from app.services.ssh_pool import ssh_session
 import os
 from app.utils.database import get_db_connection
 from app.utils.auth import token_required
@@ -399,39 +399,27 @@ def execute_deployment(host_id, compose_content, instance_name):
                 'message': '主机信息不存在'
             }
         
-        # 创建SSH连接
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        
-        # 连接主机
-        if host_info['password']:
-            ssh.connect(
-                hostname=host_info['ip'],
-                port=host_info.get('port', 22),
-                username=host_info['username'],
-                password=host_info['password']
-            )
-        else:
+        if not host_info['password']:
             return {
                 'success': False,
                 'message': '主机需要配置SSH密码'
             }
         
-        # 创建部署目录
-        deploy_path = f'/opt/sremanage/simple/{instance_name}'
-        ssh.exec_command(f'sudo mkdir -p {deploy_path}')
-        
-        # 写入docker-compose.yml
-        stdin, stdout, stderr = ssh.exec_command(f'sudo tee {deploy_path}/docker-compose.yml > /dev/null')
-        stdin.write(compose_content)
-        stdin.close()
+        # 创建SSH连接
+        with ssh_session(host_info['ip'], host_info.get('port', 22), host_info['username'], host_info['password']) as ssh:
+            # 创建部署目录
+            deploy_path = f'/opt/sremanage/simple/{instance_name}'
+            ssh.exec_command(f'sudo mkdir -p {deploy_path}')
         
-        # 启动服务
-        stdin, stdout, stderr = ssh.exec_command(f'cd {deploy_path} && sudo docker-compose up -d')
-        output = stdout.read().decode()
-        error = stderr.read().decode()
+            # 写入docker-compose.yml
+            stdin, stdout, stderr = ssh.exec_command(f'sudo tee {deploy_path}/docker-compose.yml > /dev/null')
+            stdin.write(compose_content)
+            stdin.close()
         
-        ssh.close()
+            # 启动服务
+            stdin, stdout, stderr = ssh.exec_command(f'cd {deploy_path} && sudo docker-compose up -d')
+            output = stdout.read().decode()
+            error = stderr.read().decode()
         
         if error and 'warning' not in error.lower() and 'pulling' not in error.lower():
             return {
@@ -523,32 +511,23 @@ def manage_instance(instance_name, action):
             })
         
         # SSH连接
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(
-            hostname=host_info['ip'],
-            port=host_info.get('port', 22),
-            username=host_info['username'],
-            password=host_info['password']
-        )
-        
-        deploy_path = instance['deploy_path']
-        
-        # 执行操作
-        if action == 'start':
-            cmd = f'cd {deploy_path} && sudo docker-compose start'
-            new_status = 'running'
-        elif action == 'stop':
-            cmd = f'cd {deploy_path} && sudo docker-compose stop'
-            new_status = 'stopped'
-        elif action == 'remove':
-            cmd = f'cd {deploy_path} && sudo docker-compose down -v && sudo rm -rf {deploy_path}'
-            new_status = 'removed'
-        
-        stdin, stdout, stderr = ssh.exec_command(cmd)
-        output = stdout.read().decode()
-        error = stderr.read().decode()
-        ssh.close()
+        with ssh_session(host_info['ip'], host_info.get('port', 22), host_info['username'], host_info['password']) as ssh:
+            deploy_path = instance['deploy_path']
+        
+            # 执行操作
+            if action == 'start':
+                cmd = f'cd {deploy_path} && sudo docker-compose start'
+                new_status = 'running'
+            elif action == 'stop':
+                cmd = f'cd {deploy_path} && sudo docker-compose stop'
+                new_status = 'stopped'
+            elif action == 'remove':
+                cmd = f'cd {deploy_path} && sudo docker-compose down -v && sudo rm -rf {deploy_path}'
+                new_status = 'removed'
+        
+            stdin, stdout, stderr = ssh.exec_command(cmd)
+            output = stdout.read().decode()
+            error = stderr.read().decode()
         
         # 更新数据库状态
         if action == 'remove':
@@ -2,21 +2,16 @@ from flask import Blueprint, request, jsonify
 from app.utils.database import get_db_connection
 from app.utils.auth import token_required
 from app.utils.logger import logger
+from app.services.site_history import (
+    CHINA_TZ, GRANULARITIES, choose_granularity, get_local_time, site_history_store
+)
+from app.services.dashboard_stats import dashboard_stats
+from app.services.site_monitor import site_monitor_scheduler
 from flask_cors import cross_origin
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timedelta
 import pymysql
-import requests
-import time
-import threading
 from urllib.parse import urlparse
 
-# 中国时区
-CHINA_TZ = timezone(timedelta(hours=8))
-
-def get_local_time():
-    """获取本地时间（中国时区）"""
-    return datetime.now(CHINA_TZ).replace(tzinfo=None)
-
 site_monitoring_bp = Blueprint('site_monitoring', __name__, url_prefix='/api')
 
 @site_monitoring_bp.route('/sites', methods=['GET', 'OPTIONS'])
@@ -131,17 +126,19 @@ def add_site():
             }), 400
         
         # 插入数据
+        site_history_store.ensure_tables()
         cursor.execute("""
             INSERT INTO site_monitoring 
-            (site_name, site_url, check_interval, timeout, enabled, description)
-            VALUES (%s, %s, %s, %s, %s, %s)
+            (site_name, site_url, check_interval, timeout, enabled, description, reuse_connection)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
         """, (
             data['site_name'],
             data['site_url'],
             data.get('check_interval', 300),
             data.get('timeout', 30),
             data.get('enabled', True),
-            data.get('description', '')
+            data.get('description', ''),
+            data.get('reuse_connection', True)
         ))
         
         site_id = cursor.lastrowid
@@ -149,6 +146,8 @@ def add_site():
         
         cursor.close()
         conn.close()
+        site_monitor_scheduler.refresh()
+        dashboard_stats.invalidate('添加站点监控')
         
         return jsonify({
             'success': True,
@@ -210,6 +209,12 @@ def update_site(site_id):
             update_fields.append('description = %s')
             update_values.append(data['description'])
         
+        if 'reuse_connection' in data:
+            # 关闭后每次拨测新建连接，用于测量冷启动（DNS+TCP+TLS）耗时
+            site_history_store.ensure_tables()
+            update_fields.append('reuse_connection = %s')
+            update_values.append(data['reuse_connection'])
+        
         if update_fields:
             update_values.append(site_id)
             cursor.execute(f"""
@@ -222,6 +227,8 @@ def update_site(site_id):
         
         cursor.close()
         conn.close()
+        site_monitor_scheduler.refresh()
+        dashboard_stats.invalidate('更新站点监控')
         
         return jsonify({
             'success': True,
@@ -258,6 +265,8 @@ def delete_site(site_id):
         
         cursor.close()
         conn.close()
+        site_monitor_scheduler.refresh()
+        dashboard_stats.invalidate('删除站点监控')
         
         return jsonify({
             'success': True,
@@ -290,39 +299,12 @@ def test_site(site_id):
                 'message': '站点不存在'
             }), 404
         
-        # 执行拨测
-        test_result = perform_site_check(site)
-        
-        # 记录拨测历史
-        cursor.execute("""
-            INSERT INTO site_monitoring_history 
-            (site_id, check_time, status, response_time, http_code, error_message)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (
-            site_id,
-            get_local_time(),
-            test_result['status'],
-            test_result['response_time'],
-            test_result['http_code'],
-            test_result['error_message']
-        ))
-        
-        # 更新站点状态和响应时间
-        cursor.execute("""
-            UPDATE site_monitoring 
-            SET status = %s, last_check_time = %s, last_response_time = %s
-            WHERE id = %s
-        """, (
-            test_result['status'],
-            get_local_time(),
-            test_result['response_time'],
-            site_id
-        ))
-        
-        conn.commit()
         cursor.close()
         conn.close()
         
+        # 执行拨测（结果写入历史并更新站点状态）
+        test_result = site_monitor_scheduler.check_sites([site])[0]
+        
         # 获取更新后的站点信息
         conn = get_db_connection()
         cursor = conn.cursor(pymysql.cursors.DictCursor)
@@ -347,43 +329,75 @@ def test_site(site_id):
             'message': f'站点拨测失败: {str(e)}'
         }), 500
 
+def _parse_time(value):
+    """解析查询参数中的时间（ISO格式，带时区的转换为本地时间）"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(CHINA_TZ).replace(tzinfo=None)
+    return parsed
+
 @site_monitoring_bp.route('/sites/<int:site_id>/history', methods=['GET'])
 @cross_origin(supports_credentials=True)
 @token_required
 def get_site_history(site_id):
-    """获取站点监控历史记录"""
+    """
+    获取站点监控历史记录
+
+    查询参数:
+        granularity: raw（默认，分页原始记录）/ minute / hour / day / auto（按时间范围自动选择汇总粒度）
+        start, end: 时间范围（ISO格式），汇总查询默认最近24小时
+        page, per_page: 原始记录分页
+    """
     try:
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
-        offset = (page - 1) * per_page
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(pymysql.cursors.DictCursor)
-        
-        # 获取历史记录
-        cursor.execute("""
-            SELECT * FROM site_monitoring_history 
-            WHERE site_id = %s 
-            ORDER BY check_time DESC 
-            LIMIT %s OFFSET %s
-        """, (site_id, per_page, offset))
-        
-        history = cursor.fetchall()
+        granularity = request.args.get('granularity', 'raw')
+        if granularity not in ('raw', 'auto') + GRANULARITIES:
+            return jsonify({
+                'success': False,
+                'message': f'不支持的粒度: {granularity}'
+            }), 400
+        try:
+            start = _parse_time(request.args.get('start'))
+            end = _parse_time(request.args.get('end'))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': '时间格式不正确'
+            }), 400
         
-        # 获取总数
-        cursor.execute("SELECT COUNT(*) as total FROM site_monitoring_history WHERE site_id = %s", (site_id,))
-        total = cursor.fetchone()['total']
+        if granularity == 'raw':
+            page = int(request.args.get('page', 1))
+            per_page = int(request.args.get('per_page', 20))
+            history, total = site_history_store.get_raw(
+                site_id, start, end, limit=per_page, offset=(page - 1) * per_page
+            )
+            return jsonify({
+                'success': True,
+                'data': {
+                    'history': history,
+                    'total': total,
+                    'page': page,
+                    'per_page': per_page
+                }
+            })
         
-        cursor.close()
-        conn.close()
+        # 长时间范围读取汇总表
+        end = end or get_local_time()
+        start = start or end - timedelta(hours=24)
+        if granularity == 'auto':
+            granularity = choose_granularity(start, end)
+        rollups = site_history_store.get_rollups([site_id], granularity, start, end)
+        for row in rollups:
+            row.pop('latency_histogram', None)
         
         return jsonify({
             'success': True,
             'data': {
-                'history': history,
-                'total': total,
-                'page': page,
-                'per_page': per_page
+                'granularity': granularity,
+                'start': start,
+                'end': end,
+                'rollups': rollups
             }
         })
         
@@ -394,63 +408,77 @@ def get_site_history(site_id):
             'message': f'获取站点历史记录失败: {str(e)}'
         }), 500
 
-def perform_site_check(site):
-    """执行站点检查"""
+@site_monitoring_bp.route('/sites/sla', methods=['GET'])
+@cross_origin(supports_credentials=True)
+@token_required
+def get_sites_sla():
+    """
+    获取站点SLA统计（读取汇总表，可查询任意时间范围和多个站点）
+
+    查询参数:
+        site_ids: 逗号分隔的站点ID，默认全部站点
+        start, end: 时间范围（ISO格式），默认最近24小时
+
+    每个站点返回可用率(uptime, %)、p50/p90/p99 响应时间和故障时段(incidents)
+    """
     try:
-        start_time = time.time()
-        
-        # 发送HTTP请求
-        response = requests.get(
-            site['site_url'],
-            timeout=site['timeout'],
-            headers={
-                'User-Agent': 'Site-Monitor/1.0'
-            }
-        )
-        
-        end_time = time.time()
-        response_time = int((end_time - start_time) * 1000)  # 转换为毫秒
+        try:
+            end = _parse_time(request.args.get('end')) or get_local_time()
+            start = _parse_time(request.args.get('start')) or end - timedelta(hours=24)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': '时间格式不正确'
+            }), 400
+        if start >= end:
+            return jsonify({
+                'success': False,
+                'message': '开始时间必须早于结束时间'
+            }), 400
         
-        # 判断状态
-        if response.status_code == 200:
-            status = 'online'
+        conn = get_db_connection()
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        site_ids = [int(v) for v in request.args.get('site_ids', '').split(',') if v.strip().isdigit()]
+        if site_ids:
+            placeholders = ', '.join(['%s'] * len(site_ids))
+            cursor.execute(f"SELECT id, site_name, site_url FROM site_monitoring WHERE id IN ({placeholders})", site_ids)
         else:
-            status = 'offline'
-        
-        return {
-            'status': status,
-            'response_time': response_time,
-            'http_code': response.status_code,
-            'error_message': None
-        }
-        
-    except requests.exceptions.Timeout:
-        return {
-            'status': 'timeout',
-            'response_time': None,
-            'http_code': None,
-            'error_message': '请求超时'
-        }
-    except requests.exceptions.ConnectionError:
-        return {
-            'status': 'offline',
-            'response_time': None,
-            'http_code': None,
-            'error_message': '连接失败'
-        }
+            cursor.execute("SELECT id, site_name, site_url FROM site_monitoring ORDER BY id")
+        sites = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        
+        report = site_history_store.get_sla([site['id'] for site in sites], start, end)
+        return jsonify({
+            'success': True,
+            'data': {
+                'start': start,
+                'end': end,
+                'sites': [
+                    {'site_id': site['id'], 'site_name': site['site_name'], 'site_url': site['site_url'],
+                     **report.get(site['id'], {})}
+                    for site in sites
+                ]
+            }
+        })
+        
     except Exception as e:
-        return {
-            'status': 'error',
-            'response_time': None,
-            'http_code': None,
-            'error_message': str(e)
-        }
+        logger.error(f"获取站点SLA统计失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'获取站点SLA统计失败: {str(e)}'
+        }), 500
 
 @site_monitoring_bp.route('/sites/batch-test', methods=['POST'])
 @cross_origin(supports_credentials=True)
 @token_required
 def batch_test_sites():
-    """批量拨测所有启用的站点"""
+    """
+    批量拨测所有启用的站点
+
+    立即返回各站点已保存的状态和最近的拨测记录，拨测在后台进行；
+    按返回的 job_id 查询 /sites/batch-test/<job_id>，任务结束后读取到的即为本次拨测结果。
+    """
     try:
         conn = get_db_connection()
         cursor = conn.cursor(pymysql.cursors.DictCursor)
@@ -459,57 +487,29 @@ def batch_test_sites():
         cursor.execute("SELECT * FROM site_monitoring WHERE enabled = 1")
         sites = cursor.fetchall()
         
+        cursor.close()
+        conn.close()
+        
         if not sites:
             return jsonify({
                 'success': True,
                 'message': '没有启用的站点需要拨测',
-                'data': []
+                'data': {'job_id': None, 'status': 'done', 'sites': []}
             })
         
-        # 批量拨测
-        results = []
-        for site in sites:
-            test_result = perform_site_check(site)
-            test_result['site_id'] = site['id']
-            test_result['site_name'] = site['site_name']
-            test_result['site_url'] = site['site_url']
-            
-            # 记录历史
-            cursor.execute("""
-                INSERT INTO site_monitoring_history 
-                (site_id, check_time, status, response_time, http_code, error_message)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                site['id'],
-                get_local_time(),
-                test_result['status'],
-                test_result['response_time'],
-                test_result['http_code'],
-                test_result['error_message']
-            ))
-            
-            # 更新站点状态
-            cursor.execute("""
-                UPDATE site_monitoring 
-                SET status = %s, last_check_time = %s, last_response_time = %s
-                WHERE id = %s
-            """, (
-                test_result['status'],
-                get_local_time(),
-                test_result['response_time'],
-                site['id']
-            ))
-            
-            results.append(test_result)
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        site_ids = [site['id'] for site in sites]
+        job_id, created = site_history_store.create_probe_job(site_ids)
+        if created:
+            site_monitor_scheduler.start_check_job(job_id, sites)
         
         return jsonify({
             'success': True,
-            'message': f'批量拨测完成，共检测 {len(results)} 个站点',
-            'data': results
+            'message': f'已开始批量拨测 {len(sites)} 个站点' if created else '已有批量拨测正在进行',
+            'data': {
+                'job_id': job_id,
+                'status': 'running',
+                'sites': site_history_store.get_latest_status(site_ids)
+            }
         })
         
     except Exception as e:
@@ -517,4 +517,55 @@ def batch_test_sites():
         return jsonify({
             'success': False,
             'message': f'批量拨测失败: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
+
+@site_monitoring_bp.route('/sites/batch-test/<job_id>', methods=['GET'])
+@cross_origin(supports_credentials=True)
+@token_required
+def get_batch_test(job_id):
+    """查询批量拨测任务：status 为 running/done/failed，sites 为站点当前已保存的状态和最近的拨测记录"""
+    try:
+        job = site_history_store.get_probe_job(job_id)
+        if not job:
+            return jsonify({
+                'success': False,
+                'message': '批量拨测任务不存在或已过期'
+            }), 404
+        
+        if job['status'] == 'done':
+            message = f"批量拨测完成，共检测 {job['total']} 个站点，在线 {job['online']} 个"
+        elif job['status'] == 'failed':
+            message = f"批量拨测失败: {job['error_message']}"
+        else:
+            message = '批量拨测进行中'
+        
+        return jsonify({
+            'success': True,
+            'message': message,
+            'data': {
+                'job_id': job['id'],
+                'status': job['status'],
+                'total': job['total'],
+                'online': job['online'],
+                'created_at': job['created_at'],
+                'finished_at': job['finished_at'],
+                'sites': site_history_store.get_latest_status(job['site_ids'])
+            }
+        })
+        
+    except Exception as e:
+        logger.error(f"查询批量拨测任务失败: {str(e)}")
+        return jsonify({
+            'success': False,
+            'message': f'查询批量拨测任务失败: {str(e)}'
+        }), 500
+
+@site_monitoring_bp.route('/sites/monitor/status', methods=['GET'])
+@cross_origin(supports_credentials=True)
+@token_required
+def get_monitor_status():
+    """获取后台拨测调度状态"""
+    return jsonify({
+        'success': True,
+        'data': site_monitor_scheduler.get_stats()
+    })
@@ -1,11 +1,14 @@
-from flask import Blueprint, request
+from flask import Blueprint, request, jsonify, send_file
 from flask_sock import Sock
+import jwt
 import paramiko
-import threading
-import select
-import time
+import socket
+from app.services.terminal_bridge import terminal_bridge
+from app.services.terminal_recorder import RecordingNotFound, recording_writer
+from app.utils.auth import token_required
 from app.utils.database import get_db_connection
 from app.utils.logger import logger
+from config import Config
 
 # 创建一个新的 Sock 实例
 sock = Sock()
@@ -16,12 +19,12 @@ terminal_bp = Blueprint('terminal', __name__)  # 移除 url_prefix
 def ssh_terminal(ws):
     try:
         logger.info("=== WebSocket连接开始 ===")
-        logger.info(f"请求参数: {request.args}")
-        logger.info(f"请求头: {request.headers}")
+        # token 和会话令牌不写入日志
+        args = {key: value for key, value in request.args.items() if key not in ('token', 'session')}
+        logger.info(f"请求参数: {args}")
         
         # 添加日志
         logger.info("收到终端连接请求")
-        logger.info(f"连接参数: {request.args}")
         
         # 获取连接参数
         host = request.args.get('host')
@@ -34,6 +37,23 @@ def ssh_terminal(ws):
             logger.error("缺少必要的连接参数")
             ws.send('Error: Missing required connection parameters\r\n')
             return
+        
+        # 带会话令牌重连：接回宽限期内保留的SSH通道，补发断开期间的输出
+        session_token = request.args.get('session')
+        if session_token:
+            offset = request.args.get('offset')
+            session, attach_id = terminal_bridge.attach(
+                session_token, ws.send, on_close=ws.close,
+                offset=int(offset) if offset and offset.isdigit() else None, host=host
+            )
+            if session is None:
+                ws.send('session-expired')
+                ws.send('\r\n会话已过期，请重新连接\r\n')
+                return
+            logger.info(f"终端会话已重新接入: {host}")
+            _set_nodelay(ws)
+            _pump_input(ws, session)
+            return
             
         # 从数据库获取密码
         try:
@@ -87,39 +107,23 @@ def ssh_terminal(ws):
             
             # 获取SSH通道
             channel = ssh.invoke_shell()
+            recording = recording_writer.start_recording(
+                host, port, username, instance_id, operator=_operator_from_request()
+            )
+            
+            _set_nodelay(ws)
             
-            # 创建双向数据传输
-            def ssh_to_ws():
-                while True:
-                    if channel.exit_status_ready():
-                        break
-                    try:
-                        r, w, e = select.select([channel], [], [], 0.1)
-                        if r:
-                            data = channel.recv(1024)
-                            if not data:
-                                break
-                            ws.send(data.decode())
-                    except Exception as e:
-                        logger.error(f"SSH读取错误: {str(e)}")
-                        break
-                    
-            thread = threading.Thread(target=ssh_to_ws)
-            thread.daemon = True
-            thread.start()
+            def cleanup(channel=channel, ssh=ssh, recording=recording):
+                recording_writer.stop_recording(recording)
+                channel.close()
+                ssh.close()
             
-            # 处理WebSocket消息
-            while True:
-                try:
-                    data = ws.receive()
-                    if data.startswith('resize:'):
-                        rows, cols = map(int, data[7:].split(','))
-                        channel.resize_pty(width=cols, height=rows)
-                    else:
-                        channel.send(data)
-                except Exception as e:
-                    logger.error(f"WebSocket错误: {str(e)}")
-                    break
+            # SSH输出由共享的终端桥接线程转发（二进制帧），通道结束后关闭WebSocket；
+            # 此后通道和SSH连接由会话负责关闭（WebSocket 断开后保留一段时间等待重连）
+            session = terminal_bridge.open(channel, ws.send, on_close=ws.close, recording=recording,
+                                           cleanup=cleanup, host=host)
+            attach_id = session.attach_id
+            _pump_input(ws, session)
                 
         except Exception as e:
             logger.error(f"SSH连接错误: {str(e)}")
@@ -129,7 +133,157 @@ def ssh_terminal(ws):
         ws.send(f"Error: {str(e)}\r\n")
     finally:
         logger.info("=== WebSocket连接结束 ===")
-        if 'channel' in locals():
-            channel.close()
-        if 'ssh' in locals():
-            ssh.close() 
\ No newline at end of file
+        if 'session' in locals() and session is not None:
+            terminal_bridge.detach(session, attach_id)
+        else:
+            if 'recording' in locals():
+                recording_writer.stop_recording(recording)
+            if 'channel' in locals():
+                channel.close()
+            if 'ssh' in locals():
+                ssh.close()
+
+def _set_nodelay(ws):
+    # 按键回显是小包，关闭 Nagle 避免与延迟确认叠加产生几十毫秒延迟
+    try:
+        ws.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except (AttributeError, OSError):
+        pass
+
+def _pump_input(ws, session):
+    """把 WebSocket 输入写入通道，直到连接断开"""
+    channel = session.channel
+    recording = session.recording
+    while True:
+        try:
+            data = ws.receive()
+            if isinstance(data, str) and data.startswith('resize:'):
+                rows, cols = map(int, data[7:].split(','))
+                channel.resize_pty(width=cols, height=rows)
+                if recording:
+                    recording.resize(cols, rows)
+            else:
+                channel.sendall(data)
+                if recording:
+                    recording.input(data if isinstance(data, str) else data.decode('utf-8', 'replace'))
+        except Exception as e:
+            if not session.closed:
+                logger.info(f"终端WebSocket断开: {str(e)}")
+            break
+
+def _operator_from_request():
+    """从 token 参数或 Authorization 头解析当前用户名（WebSocket 连接未强制认证，解析失败返回 None）"""
+    token = request.args.get('token')
+    auth_header = request.headers.get('Authorization', '')
+    if not token and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ')[1]
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, Config.JWT_SECRET_KEY, algorithms=["HS256"]).get('username')
+    except jwt.InvalidTokenError:
+        return None
+
+@terminal_bp.route('/api/terminal/recordings', methods=['GET'])
+@token_required
+def list_recordings():
+    """终端录制列表（可按主机、操作用户过滤，分页）"""
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(100, max(1, int(request.args.get('per_page', 20))))
+    except ValueError:
+        return jsonify({'success': False, 'message': '分页参数无效'}), 400
+    
+    conditions = []
+    params = []
+    for field in ('host', 'operator'):
+        value = request.args.get(field)
+        if value:
+            conditions.append(f'{field} = %s')
+            params.append(value)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
+    try:
+        recording_writer.ensure_tables()
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) AS total FROM terminal_recordings {where}", params)
+                total = cursor.fetchone()['total']
+                cursor.execute(f"""
+                    SELECT id, operator, host, port, username, instance_id, status, started_at, ended_at,
+                           duration, output_chars, file_bytes, chunk_count
+                    FROM terminal_recordings {where}
+                    ORDER BY started_at DESC
+                    LIMIT %s OFFSET %s
+                """, params + [per_page, (page - 1) * per_page])
+                rows = cursor.fetchall()
+        finally:
+            conn.close()
+        
+        for row in rows:
+            for key in ('started_at', 'ended_at'):
+                if row[key]:
+                    row[key] = row[key].strftime('%Y-%m-%d %H:%M:%S')
+            if row['duration'] is not None:
+                row['duration'] = float(row['duration'])
+        return jsonify({'success': True, 'data': {'items': rows, 'total': total, 'page': page, 'per_page': per_page}})
+    except Exception as e:
+        logger.error(f"获取终端录制列表失败: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@terminal_bp.route('/api/terminal/recordings/<recording_id>', methods=['GET'])
+@token_required
+def get_recording(recording_id):
+    """录制头部信息和分块索引（每块的开始/结束时间），用于回放定位"""
+    try:
+        header = recording_writer.read_header(recording_id)
+        index = recording_writer.get_index(recording_id)
+        return jsonify({
+            'success': True,
+            'data': {
+                'header': header,
+                'duration': index[-1]['end'] if index else 0,
+                'chunks': [{'start': c['start'], 'end': c['end'], 'events': c['events']} for c in index]
+            }
+        })
+    except (RecordingNotFound, ValueError):
+        return jsonify({'success': False, 'message': '录制不存在'}), 404
+    except Exception as e:
+        logger.error(f"读取终端录制失败: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@terminal_bp.route('/api/terminal/recordings/<recording_id>/events', methods=['GET'])
+@token_required
+def get_recording_events(recording_id):
+    """
+    按时间范围读取录制事件
+    
+    查询参数 start/end 为相对会话开始的秒数，end 省略时读到结尾；
+    返回的 next 为下一块的开始时间，回放端可据此继续分段加载。
+    """
+    try:
+        start = float(request.args.get('start', 0))
+        end = request.args.get('end')
+        end = float(end) if end not in (None, '') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': '时间参数无效'}), 400
+    
+    try:
+        return jsonify({'success': True, 'data': recording_writer.read_events(recording_id, start, end)})
+    except (RecordingNotFound, ValueError):
+        return jsonify({'success': False, 'message': '录制不存在'}), 404
+    except Exception as e:
+        logger.error(f"读取终端录制事件失败: {str(e)}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@terminal_bp.route('/api/terminal/recordings/<recording_id>/download', methods=['GET'])
+@token_required
+def download_recording(recording_id):
+    """下载录制文件（gunzip 后为 asciicast v2 格式，可用 asciinema play 播放）"""
+    try:
+        path = recording_writer.file_path(recording_id)
+    except (RecordingNotFound, ValueError):
+        return jsonify({'success': False, 'message': '录制不存在'}), 404
+    return send_file(path, mimetype='application/gzip', as_attachment=True,
+                     download_name=f'terminal-{recording_id}.cast.gz')
@@ -1,9 +1,10 @@
 import jwt
 from datetime import datetime, timedelta
 from os import getenv
-from flask import session
+from flask import has_request_context, request, session
 from app.utils.logger import get_logger
 from app.models.user import User
+from app.services.login_events import login_event_store
 from config import Config
 
 logger = get_logger(__name__)
@@ -22,6 +23,7 @@ class AuthService:
             
             if not user:
                 logger.info(f"用户不存在: {username}")
+                AuthService._record_login(username, False, '用户不存在')
                 return {
                     'success': False,
                     'message': '用户名或密码错误'
@@ -30,6 +32,7 @@ class AuthService:
             # 验证密码 - 直接比较
             if user.password != password:
                 logger.info(f"密码错误，用户: {username}")
+                AuthService._record_login(username, False, '密码错误')
                 return {
                     'success': False,
                     'message': '用户名或密码错误'
@@ -47,6 +50,7 @@ class AuthService:
             )
             
             logger.info(f"登录成功，用户: {username}")
+            AuthService._record_login(username, True)
             logger.debug(f"使用的JWT_SECRET_KEY: {Config.JWT_SECRET_KEY[:5]}***")
             
             return {
@@ -62,6 +66,16 @@ class AuthService:
             logger.error(f"登录服务错误: {str(e)}")
             raise Exception('登录失败，请稍后重试')
 
+    @staticmethod
+    def _record_login(username, success, reason=None):
+        """记录登录事件（客户端IP取 X-Forwarded-For 的第一个地址）"""
+        ip = user_agent = None
+        if has_request_context():
+            forwarded = request.headers.get('X-Forwarded-For', '')
+            ip = forwarded.split(',')[0].strip() or request.remote_addr
+            user_agent = request.headers.get('User-Agent')
+        login_event_store.record(username, success, reason, ip=ip, user_agent=user_agent)
+
     @staticmethod
     def verify_token(token):
         try:
@@ -0,0 +1,313 @@
+"""
+异步批量命令执行引擎
+
+基于 asyncio + asyncssh，在一个后台事件循环线程中并发连接大量主机执行命令：
+- 并发数可配置（默认200），不再受固定线程池大小限制
+- 每台主机独立超时（连接+执行），慢主机不拖慢其他主机
+- 按 (主机, 端口, 用户名) 缓存已认证连接，跨请求复用，空闲超时后关闭（执行中的连接不会被关闭）
+- 输出按块增量读取，每台主机和整批执行各有内存上限，超出部分截断或落盘（见 command_output）
+
+asyncssh 为可选依赖，未安装时 ASYNC_ENGINE_AVAILABLE 为 False，调用方应退回线程池引擎。
+"""
+import asyncio
+import hashlib
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.services.command_output import (
+    CHUNK_SIZE, MAX_HOST_BYTES, OutputBudget, OutputCollector, collector_result
+)
+from app.utils.logger import get_logger
+
+try:
+    import asyncssh
+    ASYNC_ENGINE_AVAILABLE = True
+except ImportError:
+    asyncssh = None
+    ASYNC_ENGINE_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+class BatchExecutorError(Exception):
+    """异步批量执行引擎不可用或执行失败"""
+
+def _digest(password: Optional[str]) -> str:
+    return hashlib.sha256((password or '').encode('utf-8')).hexdigest()
+
+class _CachedConnection:
+    """缓存的 asyncssh 连接；in_use 为正在其上执行命令的任务数"""
+
+    __slots__ = ('conn', 'digest', 'in_use', 'last_used', 'retired')
+
+    def __init__(self, conn, digest: str):
+        self.conn = conn
+        self.digest = digest
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        # 已被新连接替换或判定失效，最后一个使用者释放后关闭
+        self.retired = False
+
+class _LoopThread:
+    """运行 asyncio 事件循环的后台守护线程"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(ready,), name=self.name, daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self.loop
+
+    def _run(self, ready: threading.Event) -> None:
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        ready.set()
+        self.loop.run_forever()
+
+class AsyncBatchExecutor:
+    """asyncssh 批量命令执行器"""
+
+    def __init__(self, concurrency: int = None, host_timeout: float = None, connect_timeout: float = None,
+                 max_output_bytes: int = None, idle_timeout: int = None):
+        self.concurrency = concurrency or int(os.getenv('BATCH_COMMAND_CONCURRENCY', '200'))
+        self.host_timeout = host_timeout or float(os.getenv('BATCH_COMMAND_HOST_TIMEOUT', '60'))
+        self.connect_timeout = connect_timeout or float(os.getenv('BATCH_COMMAND_CONNECT_TIMEOUT', '10'))
+        self.max_output_bytes = max_output_bytes
+        self.idle_timeout = idle_timeout or int(os.getenv('BATCH_COMMAND_IDLE_TIMEOUT', '300'))
+        self._loop_thread = _LoopThread('batch-command-loop')
+        # 以下状态只在事件循环线程中访问
+        self._connections: Dict[Tuple[str, int, str], _CachedConnection] = {}
+        self._connecting: Dict[Tuple[str, int, str], asyncio.Task] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self._stats = {'runs': 0, 'hosts': 0, 'connects': 0, 'reuses': 0, 'timeouts': 0, 'truncated': 0}
+
+    def run(self, targets: List[Dict[str, Any]], command: str, concurrency: int = None,
+            host_timeout: float = None) -> List[Dict[str, Any]]:
+        """
+        在多台主机上执行命令（阻塞直到全部完成），结果顺序与 targets 一致
+
+        Args:
+            targets: 主机列表，每项包含 hostname/ip/port/username/password
+            concurrency: 本次最大并发主机数，默认使用全局配置
+            host_timeout: 单台主机连接加执行的超时秒数
+        """
+        if not ASYNC_ENGINE_AVAILABLE:
+            raise BatchExecutorError('asyncssh 未安装，无法使用异步执行引擎')
+        loop = self._loop_thread.ensure_started()
+        future = asyncio.run_coroutine_threadsafe(
+            self._run_all(targets, command, concurrency or self.concurrency, host_timeout or self.host_timeout),
+            loop
+        )
+        return future.result()
+
+    def stream(self, targets: List[Dict[str, Any]], command: str, concurrency: int = None,
+               host_timeout: float = None, with_output: bool = False) -> Iterator[Tuple[str, int, Any]]:
+        """
+        在多台主机上执行命令，按完成顺序产生事件
+
+        产生 ('result', index, result)；with_output 时还会逐行产生
+        ('output', index, (stream, line))。生成器被关闭时取消未完成的主机。
+        """
+        if not ASYNC_ENGINE_AVAILABLE:
+            raise BatchExecutorError('asyncssh 未安装，无法使用异步执行引擎')
+        events = queue.Queue()
+        on_line = (lambda index, name, line: events.put(('output', index, (name, line)))) if with_output else None
+        loop = self._loop_thread.ensure_started()
+        future = asyncio.run_coroutine_threadsafe(
+            self._run_all(targets, command, concurrency or self.concurrency, host_timeout or self.host_timeout,
+                          on_result=lambda index, result: events.put(('result', index, result)),
+                          on_line=on_line),
+            loop
+        )
+        future.add_done_callback(lambda _: events.put(None))
+        try:
+            while True:
+                event = events.get()
+                if event is None:
+                    break
+                yield event
+            future.result()
+        finally:
+            if not future.done():
+                future.cancel()
+
+    async def _run_all(self, targets: List[Dict[str, Any]], command: str, concurrency: int,
+                       host_timeout: float, on_result: Callable = None,
+                       on_line: Callable = None) -> List[Dict[str, Any]]:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.ensure_future(self._reap_loop())
+        self._stats['runs'] += 1
+        self._stats['hosts'] += len(targets)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        budget = OutputBudget()
+
+        async def run_one(index, target):
+            async with semaphore:
+                line_callback = (lambda name, line: on_line(index, name, line)) if on_line else None
+                result = await self._run_host(target, command, host_timeout, budget, line_callback)
+            if on_result:
+                on_result(index, result)
+            return result
+
+        return await asyncio.gather(*(run_one(index, target) for index, target in enumerate(targets)))
+
+    async def _run_host(self, target: Dict[str, Any], command: str, host_timeout: float,
+                        budget: OutputBudget, on_line: Callable = None) -> Dict[str, Any]:
+        result = {'hostname': target['hostname'], 'ip': target['ip']}
+        collectors = {
+            name: OutputCollector(
+                budget, limit=self.max_output_bytes,
+                on_line=(lambda line, name=name: on_line(name, line)) if on_line else None
+            )
+            for name in ('stdout', 'stderr')
+        }
+        try:
+            await asyncio.wait_for(self._execute(target, command, collectors), timeout=host_timeout)
+        except asyncio.TimeoutError:
+            self._stats['timeouts'] += 1
+            return {**result, 'status': 'error', 'output': f'执行超时（{host_timeout:g}秒）'}
+        except (OSError, asyncssh.Error) as e:
+            return {**result, 'status': 'error', 'output': str(e) or e.__class__.__name__}
+        finally:
+            output = collectors['stdout'].finish()
+            error = collectors['stderr'].finish()
+
+        extra = collector_result(collectors['stdout'], collectors['stderr'])
+        if extra:
+            self._stats['truncated'] += 1
+        # 与线程池引擎一致：有错误输出视为失败，无输出显示友好提示
+        if error:
+            return {**result, 'status': 'error', 'output': error, **extra}
+        return {**result, 'status': 'success', 'output': output or '执行成功', **extra}
+
+    async def _execute(self, target: Dict[str, Any], command: str,
+                       collectors: Dict[str, OutputCollector]) -> None:
+        key = self._key(target)
+        cached = await self._connection(target)
+        try:
+            try:
+                process = await cached.conn.create_process(command, encoding=None)
+            except asyncssh.ChannelOpenError:
+                # 缓存的连接已失效，换下后重连一次（其他任务仍在使用时等其结束再关闭）
+                self._retire(key, cached)
+                self._release(cached)
+                cached = None
+                cached = await self._connection(target)
+                process = await cached.conn.create_process(command, encoding=None)
+
+            async with process:
+                await asyncio.gather(
+                    self._read_into(process.stdout, collectors['stdout']),
+                    self._read_into(process.stderr, collectors['stderr'])
+                )
+        finally:
+            if cached is not None:
+                self._release(cached)
+
+    @staticmethod
+    async def _read_into(stream, collector: OutputCollector) -> None:
+        """增量读取到收集器，超过上限后仍读到结束以便通道正常关闭；落盘写文件在线程池中进行"""
+        loop = asyncio.get_running_loop()
+        while True:
+            data = await stream.read(CHUNK_SIZE)
+            if not data:
+                break
+            overflow = collector.keep(data)
+            if overflow:
+                await loop.run_in_executor(None, collector.write_spill, overflow)
+
+    def _key(self, target: Dict[str, Any]) -> Tuple[str, int, str]:
+        return (target['ip'], int(target.get('port') or 22), target['username'])
+
+    async def _connection(self, target: Dict[str, Any]) -> _CachedConnection:
+        """
+        获取已认证连接并登记使用中，用完后调用 _release()
+
+        同一主机的并发请求共享一次握手；握手在独立任务中进行，
+        某个等待者超时取消不会中断其他等待者。
+        """
+        key = self._key(target)
+        digest = _digest(target.get('password'))
+        cached = self._connections.get(key)
+        if cached is not None and cached.digest == digest and not cached.conn.is_closed():
+            self._stats['reuses'] += 1
+        else:
+            task = self._connecting.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._open(key, target.get('password'), digest))
+                self._connecting[key] = task
+                task.add_done_callback(lambda done: self._connect_done(key, done))
+            cached = await asyncio.shield(task)
+        # 与上面的 await 之间没有挂起点，登记后不会被清理任务关闭
+        cached.in_use += 1
+        cached.last_used = time.monotonic()
+        return cached
+
+    def _connect_done(self, key: Tuple[str, int, str], task: asyncio.Task) -> None:
+        self._connecting.pop(key, None)
+        # 等待者都已超时时，取走异常避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    async def _open(self, key: Tuple[str, int, str], password: Optional[str], digest: str) -> _CachedConnection:
+        conn = await asyncssh.connect(
+            key[0], port=key[1], username=key[2], password=password,
+            known_hosts=None, client_keys=None, agent_path=None,
+            connect_timeout=self.connect_timeout, keepalive_interval=30
+        )
+        stale = self._connections.get(key)
+        if stale is not None:
+            # 密码变更或连接失效：换下旧连接，仍在执行的命令结束后再关闭
+            self._retire(key, stale)
+        cached = _CachedConnection(conn, digest)
+        self._connections[key] = cached
+        self._stats['connects'] += 1
+        return cached
+
+    def _release(self, cached: _CachedConnection) -> None:
+        cached.in_use -= 1
+        cached.last_used = time.monotonic()
+        if cached.retired and cached.in_use == 0:
+            cached.conn.close()
+
+    def _retire(self, key: Tuple[str, int, str], cached: _CachedConnection) -> None:
+        """从缓存中移除连接；没有使用者时立即关闭，否则由最后一个使用者释放时关闭"""
+        if self._connections.get(key) is cached:
+            del self._connections[key]
+        cached.retired = True
+        if cached.in_use == 0:
+            cached.conn.close()
+
+    async def _reap_loop(self) -> None:
+        interval = max(5, min(60, self.idle_timeout // 2))
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for key, cached in list(self._connections.items()):
+                # 执行中的连接不按空闲清理
+                if cached.conn.is_closed() or (cached.in_use == 0 and now - cached.last_used >= self.idle_timeout):
+                    self._retire(key, cached)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'available': ASYNC_ENGINE_AVAILABLE,
+            'concurrency': self.concurrency,
+            'host_timeout': self.host_timeout,
+            'max_output_bytes': self.max_output_bytes or MAX_HOST_BYTES,
+            'connections': len(self._connections),
+            'connections_in_use': sum(1 for cached in self._connections.values() if cached.in_use),
+            **self._stats
+        }
+
+# 全局异步执行器
+async_batch_executor = AsyncBatchExecutor()
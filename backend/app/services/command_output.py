@@ -0,0 +1,284 @@
+"""
+远程命令输出收集
+
+批量命令的输出按块增量读取并计入两级预算：
+- 每台主机（每个输出流）最多在内存中保留 BATCH_COMMAND_MAX_OUTPUT_BYTES 字节
+- 一次批量执行所有主机合计最多保留 BATCH_OUTPUT_MAX_TOTAL_BYTES 字节
+超出预算的部分在结果中以截断标记代替；启用落盘时完整输出写入临时文件，
+可通过下载接口按 spill_id 获取，文件超过保留时间后自动清理。落盘同样有两级上限：
+每个输出流 BATCH_OUTPUT_SPILL_MAX_BYTES 字节，一次批量执行合计 BATCH_OUTPUT_SPILL_MAX_TOTAL_BYTES 字节，
+用完后文件只含前面的部分，结果中标记 spillTruncated。
+
+异步引擎中 keep() 在事件循环线程内完成内存部分，返回的溢出数据由 write_spill() 在线程池中写盘。
+"""
+import os
+import re
+import select
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 32 * 1024
+
+MAX_HOST_BYTES = int(os.getenv('BATCH_COMMAND_MAX_OUTPUT_BYTES', str(64 * 1024)))
+MAX_TOTAL_BYTES = int(os.getenv('BATCH_OUTPUT_MAX_TOTAL_BYTES', str(32 * 1024 * 1024)))
+SPILL_ENABLED = os.getenv('BATCH_OUTPUT_SPILL_ENABLED', 'true').lower() == 'true'
+SPILL_DIR = os.getenv('BATCH_OUTPUT_SPILL_DIR') or os.path.join(tempfile.gettempdir(), 'sremanage-batch-output')
+SPILL_MAX_BYTES = int(os.getenv('BATCH_OUTPUT_SPILL_MAX_BYTES', str(256 * 1024 * 1024)))
+SPILL_MAX_TOTAL_BYTES = int(os.getenv('BATCH_OUTPUT_SPILL_MAX_TOTAL_BYTES', str(1024 * 1024 * 1024)))
+SPILL_TTL = int(os.getenv('BATCH_OUTPUT_SPILL_TTL', '3600'))
+
+_SPILL_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+class OutputBudget:
+    """一次批量执行共享的输出预算：内存保留和落盘各一份"""
+
+    def __init__(self, total_bytes: int = None, spill_bytes: int = None):
+        self.total_bytes = total_bytes if total_bytes is not None else MAX_TOTAL_BYTES
+        self.spill_bytes = spill_bytes if spill_bytes is not None else SPILL_MAX_TOTAL_BYTES
+        self.used = 0
+        self.spilled = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, size: int) -> int:
+        """申请 size 字节内存，返回实际获得的字节数"""
+        with self._lock:
+            granted = max(0, min(size, self.total_bytes - self.used))
+            self.used += granted
+            return granted
+
+    def reserve_spill(self, size: int) -> int:
+        """申请 size 字节落盘空间，返回实际获得的字节数"""
+        with self._lock:
+            granted = max(0, min(size, self.spill_bytes - self.spilled))
+            self.spilled += granted
+            return granted
+
+    @property
+    def spill_exhausted(self) -> bool:
+        with self._lock:
+            return self.spilled >= self.spill_bytes
+
+class SpillStore:
+    """落盘输出文件的存储和清理"""
+
+    def __init__(self, directory: str = None, ttl: int = None):
+        self.directory = directory or SPILL_DIR
+        self.ttl = ttl if ttl is not None else SPILL_TTL
+        self._last_cleanup = 0.0
+        self._lock = threading.Lock()
+
+    def create(self):
+        """创建落盘文件，返回 (spill_id, 文件对象)"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.cleanup()
+        spill_id = uuid.uuid4().hex
+        return spill_id, open(self.path(spill_id), 'wb')
+
+    def path(self, spill_id: str) -> Optional[str]:
+        if not _SPILL_ID_PATTERN.match(spill_id or ''):
+            return None
+        return os.path.join(self.directory, f'{spill_id}.log')
+
+    def open(self, spill_id: str) -> Optional[str]:
+        """下载前获取文件路径，不存在或已过期时返回 None"""
+        path = self.path(spill_id)
+        if path is None or not os.path.isfile(path):
+            return None
+        if time.time() - os.path.getmtime(path) > self.ttl:
+            return None
+        return path
+
+    def cleanup(self, force: bool = False) -> int:
+        """删除超过保留时间的文件（默认每分钟最多扫描一次）"""
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_cleanup < 60:
+                return 0
+            self._last_cleanup = now
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_file() and now - entry.stat().st_mtime > self.ttl:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+
+# 全局落盘存储
+spill_store = SpillStore()
+
+class OutputCollector:
+    """
+    单个输出流的收集器
+
+    feed 增量写入原始字节：预算内的部分保留在内存，超出后若启用落盘，
+    把已保留部分和后续输出写入临时文件（单个文件和整批落盘各有上限）。
+    feed = keep + write_spill；keep 只操作内存，write_spill 做文件IO，可在其他线程执行，
+    同一收集器的 write_spill 需按顺序调用。
+    """
+
+    def __init__(self, budget: OutputBudget, limit: int = None, spill: bool = None,
+                 on_line: Callable[[str], None] = None):
+        self.budget = budget
+        self.limit = limit if limit is not None else MAX_HOST_BYTES
+        self.spill = SPILL_ENABLED if spill is None else spill
+        self.on_line = on_line
+        self.total = 0
+        self.truncated = False
+        self.spill_truncated = False  # 落盘文件也不完整
+        self.spill_id: Optional[str] = None
+        self._chunks = []
+        self._kept = 0
+        self._file = None
+        self._spill_started = False
+        self._spilled = 0
+        self._finished = False
+        self._spill_lock = threading.Lock()
+        self._pending = b''
+
+    def feed(self, data: bytes) -> None:
+        self.write_spill(self.keep(data))
+
+    def keep(self, data: bytes) -> bytes:
+        """计入内存预算，返回需要落盘的部分（未启用落盘或无需落盘时为空）"""
+        if not data:
+            return b''
+        self.total += len(data)
+        if self.truncated:
+            return data if self.spill else b''
+
+        keep = self.budget.reserve(min(len(data), self.limit - self._kept))
+        if keep:
+            self._chunks.append(data[:keep])
+            self._kept += keep
+            if self.on_line:
+                self._emit_lines(data[:keep])
+        if keep < len(data):
+            self.truncated = True
+            if self.spill:
+                return data[keep:]
+        return b''
+
+    def write_spill(self, data: bytes) -> None:
+        """把 keep() 返回的数据写入落盘文件，首次调用时创建文件并写入已保留的部分"""
+        if not data:
+            return
+        with self._spill_lock:
+            if self._finished:
+                return
+            if not self._spill_started:
+                self._spill_started = True
+                self._start_spill()
+            if self._file is not None:
+                self._write_spill(data)
+            else:
+                self.spill_truncated = True
+
+    def _emit_lines(self, data: bytes) -> None:
+        *lines, self._pending = (self._pending + data).split(b'\n')
+        for line in lines:
+            self.on_line(line.decode('utf-8', errors='replace'))
+
+    def _start_spill(self) -> None:
+        if self.budget.spill_exhausted:
+            # 整批落盘空间已用完，不再创建文件
+            self.spill_truncated = True
+            return
+        try:
+            self.spill_id, self._file = spill_store.create()
+            # 已保留在内存中的部分也写入文件，保证文件是完整输出
+            for chunk in self._chunks:
+                self._write_spill(chunk)
+        except OSError as e:
+            logger.warning(f"命令输出落盘失败: {e}")
+            self.spill_id = None
+            self._file = None
+
+    def _write_spill(self, data: bytes) -> None:
+        room = self.budget.reserve_spill(min(len(data), SPILL_MAX_BYTES - self._spilled))
+        if room < len(data):
+            self.spill_truncated = True
+        if room <= 0:
+            return
+        try:
+            self._file.write(data[:room])
+            self._spilled += room
+        except OSError as e:
+            logger.warning(f"命令输出落盘失败: {e}")
+            self.spill_truncated = True
+            self._close_file()
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def finish(self) -> str:
+        """结束收集，返回保留的文本（超出预算时附加截断标记）"""
+        with self._spill_lock:
+            self._finished = True
+            self._close_file()
+        if self.on_line and self._pending:
+            self.on_line(self._pending.decode('utf-8', errors='replace'))
+            self._pending = b''
+        text = b''.join(self._chunks).decode('utf-8', errors='replace').strip()
+        if self.truncated:
+            text += f'\n...[输出共 {self.total} 字节，超出部分已截断'
+            if self.spill_id and self.spill_truncated:
+                text += f'，已落盘的前 {self._spilled} 字节可下载]'
+            else:
+                text += '，完整输出可下载]' if self.spill_id else ']'
+        return text
+
+def read_channel(channel, stdout: OutputCollector, stderr: OutputCollector, timeout: float = None) -> bool:
+    """
+    从 paramiko 通道增量读取 stdout/stderr，直到远端结束
+
+    用 select 等待任一输出流可读，避免先读完 stdout 再读 stderr 时
+    stderr 写满窗口导致远端阻塞。
+
+    Returns:
+        True 表示正常结束，False 表示超时
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        while channel.recv_ready():
+            stdout.feed(channel.recv(CHUNK_SIZE))
+        while channel.recv_stderr_ready():
+            stderr.feed(channel.recv_stderr(CHUNK_SIZE))
+        if (channel.eof_received or channel.closed) and not channel.recv_ready() and not channel.recv_stderr_ready():
+            return True
+        wait = 1.0
+        if deadline is not None:
+            wait = deadline - time.monotonic()
+            if wait <= 0:
+                return False
+            wait = min(wait, 1.0)
+        select.select([channel], [], [], wait)
+
+def collector_result(stdout: OutputCollector, stderr: OutputCollector) -> Dict[str, Any]:
+    """结果中附加的截断/落盘信息（未截断时为空）"""
+    if not (stdout.truncated or stderr.truncated):
+        return {}
+    spill = {name: c.spill_id for name, c in (('stdout', stdout), ('stderr', stderr)) if c.spill_id}
+    result = {'truncated': True, 'outputBytes': stdout.total + stderr.total}
+    if spill:
+        result['spill'] = spill
+    if stdout.spill_truncated or stderr.spill_truncated:
+        result['spillTruncated'] = True
+    return result
@@ -0,0 +1,352 @@
+"""
+仪表板统计聚合
+
+主机（手动添加 + 阿里云ECS缓存）、用户、站点数量、当天登录失败次数以及主机类型、
+站点连通性分布由一条 UNION ALL 查询一次取回，结果缓存在进程内：
+
+- 主机、站点、用户和ECS缓存的增删改以及登录失败在提交后调用 invalidate() 标记失效，
+  下次读取时重新计算；有浏览器订阅时由后台线程合并短时间内的多次失效后重新计算一次，
+  与上次推送的数值不同才推送（包括期间由普通读取重新计算出的变化）
+- gunicorn 多 worker 时每个进程各有一份缓存：invalidate() 同时给 dashboard_stats_version 表中的
+  计数加一，各进程（读取时以及推送线程中）每隔 DASHBOARD_STATS_SYNC_INTERVAL 秒读取一次该计数，
+  变化说明其他进程有变更（包括选主进程中站点拨测更新的状态），随即标记本进程缓存失效
+- 缓存超过 DASHBOARD_STATS_TTL 秒也会重新计算，覆盖绕过接口直接修改数据库的情况
+"""
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Set
+
+import pymysql
+
+from app.utils.db_context import database_connection, database_transaction
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+STATS_TTL = float(os.getenv('DASHBOARD_STATS_TTL', '30'))
+DEBOUNCE_SECONDS = float(os.getenv('DASHBOARD_STATS_DEBOUNCE', '1'))
+SYNC_INTERVAL = float(os.getenv('DASHBOARD_STATS_SYNC_INTERVAL', '2'))
+
+# 跨进程的变更计数，只有 id = 1 一行
+CREATE_VERSION_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS dashboard_stats_version (
+        id TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+        version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='仪表板统计跨进程失效计数'
+"""
+
+# 可能尚未创建的表，缺失时不参与统计
+OPTIONAL_TABLES = ('aliyun_ecs_cache', 'site_monitoring', 'login_daily_stats')
+# 有表缺失时，每隔该秒数才重新查询 information_schema
+TABLE_RECHECK_SECONDS = 300
+
+ER_NO_SUCH_TABLE = 1146
+
+# 每段返回 (metric, name, count)；查询带参数执行，LIKE 中的 % 需写成 %%
+STATS_QUERY_PARTS = {
+    'hosts': "SELECT 'hosts' AS metric, system_type AS name, COUNT(*) AS count FROM hosts GROUP BY system_type",
+    'users': "SELECT 'users', NULL, COUNT(*) FROM users",
+    'aliyun_ecs_cache': """
+        SELECT 'aliyun_ecs',
+            CASE
+                WHEN os_type IS NULL OR os_type = '' THEN NULL
+                WHEN os_type LIKE '%%Windows%%' OR os_type LIKE '%%windows%%' THEN 'Windows'
+                WHEN os_type LIKE '%%Linux%%' OR os_type LIKE '%%linux%%' OR os_type LIKE '%%CentOS%%' OR os_type LIKE '%%Ubuntu%%' THEN 'Linux'
+                ELSE 'Other'
+            END AS system_type,
+            COUNT(*)
+        FROM aliyun_ecs_cache GROUP BY system_type
+    """,
+    'site_monitoring': """
+        SELECT 'sites',
+            CASE
+                WHEN enabled = 1 AND status = 'online' THEN '正常'
+                WHEN enabled = 1 THEN '异常'
+            END AS status_name,
+            COUNT(*)
+        FROM site_monitoring GROUP BY status_name
+    """,
+    # 参数：当天日期
+    'login_daily_stats': "SELECT 'failed_logins', NULL, failure_count FROM login_daily_stats WHERE stat_date = %(today)s"
+}
+
+def _default_chart(*names: str) -> List[Dict[str, Any]]:
+    return [{'name': name, 'value': 0} for name in names]
+
+class DashboardStats:
+    """仪表板统计缓存，get() 返回快照，invalidate() 标记失效，subscribe() 订阅变化"""
+
+    def __init__(self, ttl: float = None, debounce: float = None, sync_interval: float = None):
+        self.ttl = STATS_TTL if ttl is None else ttl
+        self.debounce = DEBOUNCE_SECONDS if debounce is None else debounce
+        self.sync_interval = SYNC_INTERVAL if sync_interval is None else sync_interval
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._computed_at = 0.0
+        self._version = 0  # 每次 invalidate() 加一
+        self._snapshot_version = -1
+        self._published: Optional[Dict[str, Any]] = None  # 最近一次推送给订阅者的快照
+        self._lock = threading.Lock()
+        self._compute_lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._subscribers: Set[queue.Queue] = set()
+        self._tables: Optional[Set[str]] = None
+        self._tables_checked_at = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._shared_version: Optional[int] = None  # 最近一次读到的跨进程计数
+        self._synced_at = 0.0
+        self._table_ready = False
+        self._stats = {'queries': 0, 'hits': 0, 'invalidations': 0, 'remote_invalidations': 0, 'pushes': 0}
+
+    def get(self) -> Dict[str, Any]:
+        """返回当前统计快照，缓存失效或过期时重新查询（并发读取只查询一次）"""
+        self._sync_shared()
+        with self._lock:
+            if self._fresh():
+                self._stats['hits'] += 1
+                return self._snapshot
+        with self._compute_lock:
+            with self._lock:
+                if self._fresh():
+                    self._stats['hits'] += 1
+                    return self._snapshot
+            return self._refresh()
+
+    def invalidate(self, reason: str = None) -> None:
+        """数据变更提交后调用；标记本进程失效并给跨进程计数加一，不在调用方线程中查询统计"""
+        with self._lock:
+            self._version += 1
+            self._stats['invalidations'] += 1
+            if self._subscribers:
+                self._changed.notify()
+        if reason:
+            logger.debug(f"仪表板统计缓存失效: {reason}")
+        self._bump_shared()
+
+    def subscribe(self) -> queue.Queue:
+        """订阅统计变化，队列中只保留最新的快照"""
+        subscriber = queue.Queue(maxsize=1)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                # 新的推送线程：订阅方先自行读取当前快照，以此为推送基准
+                self._published = self._snapshot
+                self._thread = threading.Thread(target=self._run, name='dashboard-stats', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: queue.Queue) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def recheck_tables(self) -> None:
+        """可选表被创建后调用，下次查询时重新检查存在的表"""
+        self._tables = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, 'subscribers': len(self._subscribers), 'ttl': self.ttl}
+
+    def _ensure_table(self, cursor) -> None:
+        if not self._table_ready:
+            cursor.execute(CREATE_VERSION_TABLE_SQL)
+            self._table_ready = True
+
+    def _bump_shared(self) -> None:
+        """跨进程计数加一，通知其他进程"""
+        try:
+            with database_transaction() as db:
+                with db.cursor() as cursor:
+                    self._ensure_table(cursor)
+                    cursor.execute("""
+                        INSERT INTO dashboard_stats_version (id, version) VALUES (1, LAST_INSERT_ID(1))
+                        ON DUPLICATE KEY UPDATE version = LAST_INSERT_ID(version + 1)
+                    """)
+                    cursor.execute("SELECT LAST_INSERT_ID() AS version")
+                    version = int(cursor.fetchone()['version'])
+        except Exception as e:
+            logger.warning(f"更新仪表板统计跨进程计数失败，其他进程将在 TTL 到期后刷新: {e}")
+            return
+        with self._lock:
+            # 期间没有其他进程的变更时直接记下新计数，避免本进程因自己的变更再失效一次
+            if self._shared_version == version - 1:
+                self._shared_version = version
+
+    def _sync_shared(self) -> None:
+        """每隔 sync_interval 秒读取一次跨进程计数，发生变化时标记本进程缓存失效"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._synced_at < self.sync_interval:
+                return
+            self._synced_at = now
+        try:
+            with database_connection() as db:
+                with db.cursor() as cursor:
+                    self._ensure_table(cursor)
+                    cursor.execute("SELECT version FROM dashboard_stats_version WHERE id = 1")
+                    row = cursor.fetchone()
+        except Exception as e:
+            logger.warning(f"读取仪表板统计跨进程计数失败: {e}")
+            return
+        version = int(row['version']) if row else 0
+        with self._lock:
+            changed = self._shared_version is not None and version != self._shared_version
+            self._shared_version = version
+            if changed:
+                self._version += 1
+                self._stats['remote_invalidations'] += 1
+                if self._subscribers:
+                    self._changed.notify()
+
+    def _fresh(self) -> bool:
+        return (self._snapshot is not None and self._snapshot_version == self._version
+                and time.monotonic() - self._computed_at < self.ttl)
+
+    def _refresh(self) -> Dict[str, Any]:
+        """查询并替换快照（调用方持有 _compute_lock），返回新快照"""
+        with self._lock:
+            version = self._version
+        snapshot = self._query()
+        with self._lock:
+            self._snapshot = snapshot
+            self._snapshot_version = version
+            self._computed_at = time.monotonic()
+        return snapshot
+
+    def _query(self) -> Dict[str, Any]:
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                tables = self._tables
+                if tables is None or (len(tables) < len(OPTIONAL_TABLES) + 2
+                                      and time.monotonic() - self._tables_checked_at >= TABLE_RECHECK_SECONDS):
+                    tables = self._tables = self._existing_tables(cursor)
+                    self._tables_checked_at = time.monotonic()
+                parts = [sql for table, sql in STATS_QUERY_PARTS.items() if table in tables]
+                try:
+                    cursor.execute(' UNION ALL '.join(parts), {'today': date.today()})
+                except pymysql.err.ProgrammingError as e:
+                    if e.args and e.args[0] == ER_NO_SUCH_TABLE:
+                        self._tables = None  # 表被删除，下次重新检查
+                    raise
+                rows = cursor.fetchall()
+        with self._lock:
+            self._stats['queries'] += 1
+        return self._build_snapshot(rows)
+
+    @staticmethod
+    def _existing_tables(cursor) -> Set[str]:
+        cursor.execute(f"""
+            SELECT table_name AS name FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name IN ({', '.join(['%s'] * len(OPTIONAL_TABLES))})
+        """, OPTIONAL_TABLES)
+        return {'hosts', 'users'} | {row['name'] for row in cursor.fetchall()}
+
+    @staticmethod
+    def _build_snapshot(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        totals = {'hosts': 0, 'users': 0, 'aliyun_ecs': 0, 'sites': 0, 'failed_logins': 0}
+        host_types: Dict[str, Dict[Any, int]] = {'hosts': {}, 'aliyun_ecs': {}}
+        connectivity = {'正常': 0, '异常': 0}
+        for row in rows:
+            metric, name, count = row['metric'], row['name'], int(row['count'])
+            totals[metric] += count
+            if metric in host_types and (metric == 'hosts' or name is not None):
+                host_types[metric][name] = host_types[metric].get(name, 0) + count
+            elif metric == 'sites' and name is not None:
+                connectivity[name] = count
+
+        type_counts: Dict[Any, int] = {}
+        for counts in host_types.values():
+            for system_type, count in counts.items():
+                type_counts[system_type] = type_counts.get(system_type, 0) + count
+
+        def type_rows(counts):
+            return [{'system_type': system_type, 'count': count} for system_type, count in counts.items()]
+
+        hosts_count = totals['hosts'] + totals['aliyun_ecs']
+        return {
+            'stats': {
+                'hosts_count': hosts_count,
+                'users_count': totals['users'],
+                'alerts_count': 0,  # 目前没有告警表
+                'assets_count': hosts_count,
+                'sessions_count': 0,  # 目前没有会话表
+                'failed_logins': totals['failed_logins'],  # 当天登录失败次数
+                'sites_count': totals['sites'],
+                'asset_data_count': hosts_count
+            },
+            'host_types': [{'name': name, 'value': value} for name, value in type_counts.items()]
+                          or _default_chart('Linux', 'Windows'),
+            'connectivity': [{'name': name, 'value': value} for name, value in connectivity.items()],
+            'host_breakdown': {
+                'manual_hosts': totals['hosts'],
+                'aliyun_ecs': totals['aliyun_ecs'],
+                'total_hosts': hosts_count,
+                'manual_host_types': type_rows(host_types['hosts']),
+                'aliyun_host_types': type_rows(host_types['aliyun_ecs'])
+            },
+            'updated_at': datetime.now().isoformat()
+        }
+
+    def _run(self) -> None:
+        """有订阅者时：失效后等待 debounce 秒合并多次变更，再重新计算并推送变化；空闲时按 TTL 刷新，
+        并每隔 sync_interval 秒检查其他进程的变更"""
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+                if self._snapshot_version == self._version:
+                    remaining = self.ttl - (time.monotonic() - self._computed_at)
+                    self._changed.wait(timeout=max(0.0, min(remaining, self.sync_interval)))
+            self._sync_shared()
+            with self._lock:
+                idle = (self._snapshot_version == self._version
+                        and time.monotonic() - self._computed_at < self.ttl)
+            if idle and self._published is self._snapshot:
+                continue
+            time.sleep(self.debounce)
+            with self._lock:
+                snapshot = self._snapshot
+                due = (self._snapshot_version != self._version
+                       or time.monotonic() - self._computed_at >= self.ttl)
+            if due:
+                try:
+                    with self._compute_lock:
+                        snapshot = self._refresh()
+                except Exception as e:
+                    logger.error(f"刷新仪表板统计失败: {e}")
+                    with self._lock:
+                        self._computed_at = time.monotonic()  # 出错后等待一个 TTL 再重试
+                    continue
+            # 与上次推送的快照比较：等待期间普通读取可能已经重新计算过
+            if snapshot is not None and (self._published is None
+                                         or self._values(self._published) != self._values(snapshot)):
+                self._publish(snapshot)
+            elif snapshot is not None:
+                with self._lock:
+                    self._published = snapshot  # 数值未变，以新快照为基准，空闲轮询时不再比较
+
+    @staticmethod
+    def _values(snapshot: Dict[str, Any]) -> tuple:
+        return snapshot['stats'], snapshot['host_types'], snapshot['connectivity']
+
+    def _publish(self, snapshot: Dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._published = snapshot
+            self._stats['pushes'] += 1
+        for subscriber in subscribers:
+            try:
+                subscriber.get_nowait()  # 丢弃未取走的旧快照
+            except queue.Empty:
+                pass
+            try:
+                subscriber.put_nowait(snapshot)
+            except queue.Full:
+                pass
+
+# 全局仪表板统计实例
+dashboard_stats = DashboardStats()
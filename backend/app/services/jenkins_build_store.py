@@ -0,0 +1,486 @@
+"""
+Jenkins构建历史存储
+
+后台同步任务按任务增量拉取比上次记录更新的构建（以及仍在构建中的构建），
+写入 jenkins_build_history 表；分析、趋势、指标、预测等接口直接读取该表，
+不再在每次请求时拉取整个 jobs[builds[...]] 构建树。
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+from app.services.jenkins_client import JenkinsClient, get_jenkins_client, tree, tree_field
+from app.utils.db_context import database_connection, database_transaction
+from app.utils.leader_lock import LeaderLock
+from app.utils.logger import get_logger
+from app.utils.security import decrypt_sensitive_data
+
+logger = get_logger(__name__)
+
+BUILD_FIELDS = (
+    'number,timestamp,result,duration,estimatedDuration,building,'
+    'actions[lastBuiltRevision[SHA1],causes[userId,userName,shortDescription]],'
+    'executor[displayName]'
+)
+
+# 构建中记录已无法从Jenkins获取（被删除、轮转或超出回看范围）时写入的结果
+STALE_BUILD_RESULT = 'UNKNOWN'
+
+CREATE_HISTORY_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS `jenkins_build_history` (
+  `id` bigint NOT NULL AUTO_INCREMENT,
+  `instance_id` int NOT NULL COMMENT 'Jenkins实例ID',
+  `job_name` varchar(255) NOT NULL COMMENT '任务名称',
+  `build_number` int NOT NULL COMMENT '构建号',
+  `timestamp` bigint NOT NULL DEFAULT 0 COMMENT '构建开始时间(毫秒)',
+  `duration` bigint NOT NULL DEFAULT 0 COMMENT '构建时长(毫秒)',
+  `estimated_duration` bigint NOT NULL DEFAULT 0 COMMENT '预计时长(毫秒)',
+  `result` varchar(20) DEFAULT NULL COMMENT '构建结果，构建中为NULL',
+  `building` tinyint(1) NOT NULL DEFAULT 0 COMMENT '是否构建中',
+  `triggered_by` varchar(100) DEFAULT NULL COMMENT '触发者',
+  `commit_sha` varchar(64) DEFAULT NULL COMMENT '构建版本',
+  `executor` varchar(100) DEFAULT NULL COMMENT '执行节点',
+  `causes` text DEFAULT NULL COMMENT '触发原因(JSON)',
+  `synced_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '同步时间',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `unique_build` (`instance_id`, `job_name`, `build_number`),
+  KEY `idx_instance_time` (`instance_id`, `timestamp`),
+  KEY `idx_instance_building` (`instance_id`, `building`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Jenkins构建历史表'
+"""
+
+CREATE_SYNC_STATUS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS `jenkins_build_sync_status` (
+  `instance_id` int NOT NULL COMMENT 'Jenkins实例ID',
+  `last_sync_time` timestamp NULL DEFAULT NULL COMMENT '最后成功同步时间',
+  `sync_status` enum('running','completed','failed') NOT NULL DEFAULT 'completed' COMMENT '同步状态',
+  `job_names` mediumtext DEFAULT NULL COMMENT '当前任务列表(JSON)',
+  `builds_synced` int DEFAULT 0 COMMENT '本次同步写入的构建数',
+  `error_message` text DEFAULT NULL COMMENT '错误信息',
+  `sync_duration` int DEFAULT NULL COMMENT '同步耗时(毫秒)',
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`instance_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Jenkins构建历史同步状态表'
+"""
+
+UPSERT_BUILD_SQL = """
+INSERT INTO jenkins_build_history
+    (instance_id, job_name, build_number, timestamp, duration, estimated_duration,
+     result, building, triggered_by, commit_sha, executor, causes)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    timestamp = VALUES(timestamp),
+    duration = VALUES(duration),
+    estimated_duration = VALUES(estimated_duration),
+    result = VALUES(result),
+    building = VALUES(building),
+    triggered_by = VALUES(triggered_by),
+    commit_sha = VALUES(commit_sha),
+    executor = VALUES(executor),
+    causes = VALUES(causes)
+"""
+
+class BuildSyncError(Exception):
+    """构建历史同步失败"""
+    pass
+
+def _parse_build(build: Dict[str, Any]) -> Dict[str, Any]:
+    """从Jenkins构建JSON中提取需要持久化的字段"""
+    triggered_by = None
+    commit_sha = None
+    causes = []
+    for action in build.get('actions') or []:
+        if not action:
+            continue
+        revision = action.get('lastBuiltRevision')
+        if revision and not commit_sha:
+            commit_sha = revision.get('SHA1')
+        for cause in action.get('causes') or []:
+            if not triggered_by:
+                triggered_by = cause.get('userName') or cause.get('userId')
+            if cause.get('shortDescription'):
+                causes.append(cause['shortDescription'])
+
+    executor = build.get('executor') or {}
+    return {
+        'number': build['number'],
+        'timestamp': build.get('timestamp') or 0,
+        'duration': build.get('duration') or 0,
+        'estimatedDuration': build.get('estimatedDuration') or 0,
+        'result': build.get('result'),
+        'building': bool(build.get('building')) or build.get('result') is None,
+        'triggeredBy': triggered_by,
+        'commitSha': commit_sha,
+        'executor': executor.get('displayName'),
+        'causes': causes
+    }
+
+class JenkinsBuildStore:
+    """Jenkins构建历史存储（按实例增量同步）"""
+
+    def __init__(self, sync_interval: int = None, backfill: int = None, fetch_workers: int = None):
+        self.sync_interval = sync_interval or int(os.getenv('JENKINS_BUILD_SYNC_INTERVAL', '60'))
+        self.backfill = backfill or int(os.getenv('JENKINS_BUILD_SYNC_BACKFILL', '100'))
+        self.fetch_workers = fetch_workers or int(os.getenv('JENKINS_BUILD_SYNC_WORKERS', '4'))
+        self._tables_ready = False
+        self._lock = threading.Lock()
+        self._instance_locks: Dict[int, threading.Lock] = {}
+        self._last_sync: Dict[int, float] = {}
+
+    def ensure_tables(self) -> None:
+        """创建构建历史相关表（仅首次调用时执行）"""
+        if self._tables_ready:
+            return
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute(CREATE_HISTORY_TABLE_SQL)
+                cursor.execute(CREATE_SYNC_STATUS_TABLE_SQL)
+            db.commit()
+        self._tables_ready = True
+
+    def _instance_lock(self, instance_id: int) -> threading.Lock:
+        with self._lock:
+            lock = self._instance_locks.get(instance_id)
+            if lock is None:
+                lock = threading.Lock()
+                self._instance_locks[instance_id] = lock
+            return lock
+
+    def _fetch_json(self, client: JenkinsClient, path: str, tree_spec: str, timeout: int = 30) -> Dict[str, Any]:
+        response = client.get(path, tree_spec, timeout=timeout)
+        if response.status_code != 200:
+            raise BuildSyncError(f"Jenkins API调用失败: {response.status_code} {path}")
+        return response.json()
+
+    def _load_job_positions(self, instance_id: int) -> Dict[str, Dict[str, Optional[int]]]:
+        """读取每个任务已记录的最大构建号和最早的构建中构建号"""
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    SELECT job_name,
+                           MAX(build_number) AS last_number,
+                           MIN(CASE WHEN building = 1 THEN build_number END) AS pending_number
+                    FROM jenkins_build_history
+                    WHERE instance_id = %s
+                    GROUP BY job_name
+                """, (instance_id,))
+                return {
+                    row['job_name']: {
+                        'last_number': row['last_number'],
+                        'pending_number': row['pending_number']
+                    }
+                    for row in cursor.fetchall()
+                }
+
+    def _save_sync_status(self, instance_id: int, status: str, job_names: List[str] = None,
+                          builds_synced: int = 0, error_message: str = None,
+                          duration_ms: int = None) -> None:
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO jenkins_build_sync_status
+                        (instance_id, last_sync_time, sync_status, job_names, builds_synced, error_message, sync_duration)
+                    VALUES (%s, IF(%s = 'completed', NOW(), NULL), %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                        last_sync_time = IF(VALUES(sync_status) = 'completed', NOW(), last_sync_time),
+                        sync_status = VALUES(sync_status),
+                        job_names = COALESCE(VALUES(job_names), job_names),
+                        builds_synced = VALUES(builds_synced),
+                        error_message = VALUES(error_message),
+                        sync_duration = VALUES(sync_duration)
+                """, (
+                    instance_id, status, status,
+                    json.dumps(job_names, ensure_ascii=False) if job_names is not None else None,
+                    builds_synced, error_message, duration_ms
+                ))
+            db.commit()
+
+    def sync_instance(self, instance: Dict[str, Any], jenkins_token: str) -> int:
+        """
+        增量同步一个Jenkins实例的构建历史
+
+        先用 jobs[name,lastBuild[number]] 获取每个任务的最新构建号，
+        只对有新构建或仍有构建中记录的任务拉取 builds{0,N}。
+
+        Returns:
+            本次写入（新增或更新）的构建数
+        """
+        self.ensure_tables()
+        instance_id = instance['id']
+        client = get_jenkins_client(instance, jenkins_token)
+        started = time.time()
+
+        try:
+            jobs_data = self._fetch_json(client, 'api/json', tree_field('jobs', tree('name', tree_field('lastBuild', 'number'))))
+            jobs = jobs_data.get('jobs', [])
+            positions = self._load_job_positions(instance_id)
+
+            # 计算每个任务需要拉取的构建数量
+            plan = []
+            for job in jobs:
+                last_build = (job.get('lastBuild') or {}).get('number')
+                if not last_build:
+                    continue
+                known = positions.get(job['name'], {})
+                # 最多回看最近 backfill 个构建，更早的构建中记录不再拉取（见下方 stale_pending）
+                floor = max(last_build - self.backfill + 1, 1)
+                lower = floor
+                if known.get('last_number'):
+                    lower = known['last_number'] + 1
+                if known.get('pending_number'):
+                    lower = min(lower, known['pending_number'])
+                lower = max(lower, floor)
+                if last_build < lower:
+                    continue
+                plan.append((job['name'], lower, last_build - lower + 1, bool(known.get('pending_number'))))
+
+            def fetch_job_builds(item):
+                job_name, lower, count, _ = item
+                data = self._fetch_json(client, f"job/{quote(job_name, safe='')}/api/json", tree_field('builds', BUILD_FIELDS, 0, count))
+                return job_name, [b for b in data.get('builds', []) if b.get('number', 0) >= lower]
+
+            rows = []
+            # 有构建中记录的任务 -> 本次拉取到的构建号；未拉取到的构建中记录
+            # （已被删除/轮转，或落后超过 backfill 个构建）不会再被更新，标记为结束、结果未知
+            stale_pending: Dict[str, List[int]] = {}
+            if plan:
+                with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(plan))) as executor:
+                    for (_, _, _, has_pending), (job_name, builds) in zip(plan, executor.map(fetch_job_builds, plan)):
+                        if has_pending:
+                            stale_pending[job_name] = [build['number'] for build in builds]
+                        for build in builds:
+                            parsed = _parse_build(build)
+                            rows.append((
+                                instance_id, job_name, parsed['number'], parsed['timestamp'],
+                                parsed['duration'], parsed['estimatedDuration'], parsed['result'],
+                                1 if parsed['building'] else 0, parsed['triggeredBy'],
+                                parsed['commitSha'], parsed['executor'],
+                                json.dumps(parsed['causes'], ensure_ascii=False) if parsed['causes'] else None
+                            ))
+
+            closed = 0
+            if rows or stale_pending:
+                with database_transaction() as db:
+                    with db.cursor() as cursor:
+                        if rows:
+                            cursor.executemany(UPSERT_BUILD_SQL, rows)
+                        for job_name, fetched in stale_pending.items():
+                            closed += self._close_stale_pending(cursor, instance_id, job_name, fetched)
+            if closed:
+                logger.info(f"Jenkins实例 {instance_id} 有 {closed} 条构建中记录已无法从Jenkins获取，标记为 {STALE_BUILD_RESULT}")
+
+            duration_ms = int((time.time() - started) * 1000)
+            self._save_sync_status(instance_id, 'completed', [job['name'] for job in jobs], len(rows), None, duration_ms)
+            self._last_sync[instance_id] = time.time()
+            logger.info(f"Jenkins实例 {instance_id} 构建历史同步完成: {len(plan)} 个任务有更新, 写入 {len(rows)} 条, 耗时 {duration_ms}ms")
+            return len(rows)
+
+        except Exception as e:
+            duration_ms = int((time.time() - started) * 1000)
+            logger.error(f"Jenkins实例 {instance_id} 构建历史同步失败: {e}")
+            try:
+                self._save_sync_status(instance_id, 'failed', None, 0, str(e)[:1000], duration_ms)
+            except Exception as status_error:
+                logger.warning(f"记录Jenkins同步状态失败: {status_error}")
+            if isinstance(e, BuildSyncError):
+                raise
+            raise BuildSyncError(str(e)) from e
+
+    @staticmethod
+    def _close_stale_pending(cursor, instance_id: int, job_name: str, fetched: List[int]) -> int:
+        """把任务中本次未拉取到的构建中记录标记为结束，返回更新的行数"""
+        sql = f"""
+            UPDATE jenkins_build_history SET building = 0, result = COALESCE(result, '{STALE_BUILD_RESULT}')
+            WHERE instance_id = %s AND job_name = %s AND building = 1
+        """
+        params: List[Any] = [instance_id, job_name]
+        if fetched:
+            sql += f" AND build_number NOT IN ({', '.join(['%s'] * len(fetched))})"
+            params.extend(fetched)
+        return cursor.execute(sql, params)
+
+    def _last_sync_time(self, instance_id: int, refresh: bool = False) -> Optional[float]:
+        last = self._last_sync.get(instance_id)
+        if last is not None and not refresh:
+            return last
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute(
+                    'SELECT UNIX_TIMESTAMP(last_sync_time) AS ts FROM jenkins_build_sync_status WHERE instance_id = %s',
+                    (instance_id,)
+                )
+                row = cursor.fetchone()
+        if row and row['ts']:
+            self._last_sync[instance_id] = float(row['ts'])
+            return self._last_sync[instance_id]
+        return None
+
+    def ensure_fresh(self, instance: Dict[str, Any], jenkins_token: str, max_age: int = None) -> None:
+        """
+        确保实例的构建历史不早于 max_age 秒
+
+        后台同步正常运行时这里只是一次状态检查；同步滞后或首次访问时在当前请求内补同步。
+        已有历史数据时同步失败只记录日志，继续返回已有数据。
+        """
+        self.ensure_tables()
+        instance_id = instance['id']
+        max_age = self.sync_interval * 2 if max_age is None else max_age
+
+        last = self._last_sync_time(instance_id)
+        if last is not None and time.time() - last < max_age:
+            return
+
+        with self._instance_lock(instance_id):
+            # 等锁期间可能已由其他线程或进程完成同步
+            last = self._last_sync_time(instance_id, refresh=True)
+            if last is not None and time.time() - last < max_age:
+                return
+            try:
+                self.sync_instance(instance, jenkins_token)
+            except BuildSyncError:
+                if last is None:
+                    raise
+                logger.warning(f"Jenkins实例 {instance_id} 同步失败，使用已有构建历史")
+
+    def get_job_names(self, instance_id: int) -> Optional[List[str]]:
+        """获取最近一次同步时Jenkins上的任务列表"""
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute('SELECT job_names FROM jenkins_build_sync_status WHERE instance_id = %s', (instance_id,))
+                row = cursor.fetchone()
+        if row and row['job_names']:
+            return json.loads(row['job_names'])
+        return None
+
+    def get_jobs_data(self, instance_id: int, since_ms: int = 0, job_name: str = None) -> Dict[str, Any]:
+        """
+        以 Jenkins jobs[name,builds[...]] 的结构返回时间范围内的构建
+
+        每个任务的构建按构建号倒序排列（与Jenkins API一致），
+        构建字段: number, timestamp, result, duration, estimatedDuration, building,
+        triggeredBy, commitSha, executor, causes
+        """
+        sql = """
+            SELECT job_name, build_number, timestamp, duration, estimated_duration, result,
+                   building, triggered_by, commit_sha, executor, causes
+            FROM jenkins_build_history
+            WHERE instance_id = %s AND timestamp >= %s
+        """
+        params = [instance_id, since_ms]
+        if job_name:
+            sql += ' AND job_name = %s'
+            params.append(job_name)
+        sql += ' ORDER BY job_name, build_number DESC'
+
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+
+        job_names = [job_name] if job_name else self.get_job_names(instance_id)
+        jobs: Dict[str, List[Dict[str, Any]]] = {name: [] for name in (job_names or [])}
+        for row in rows:
+            # 已从Jenkins删除的任务不再展示
+            if job_names is not None and row['job_name'] not in jobs:
+                continue
+            jobs.setdefault(row['job_name'], []).append({
+                'number': row['build_number'],
+                'timestamp': row['timestamp'],
+                'result': row['result'],
+                'duration': row['duration'],
+                'estimatedDuration': row['estimated_duration'],
+                'building': bool(row['building']),
+                'triggeredBy': row['triggered_by'],
+                'commitSha': row['commit_sha'],
+                'executor': row['executor'],
+                'causes': json.loads(row['causes']) if row['causes'] else []
+            })
+
+        return {'jobs': [{'name': name, 'builds': builds} for name, builds in jobs.items()]}
+
+    def purge_instance(self, instance_id: int) -> None:
+        """删除实例的全部构建历史（实例删除或地址变更时调用）"""
+        self._last_sync.pop(instance_id, None)
+        if not self._tables_ready:
+            try:
+                self.ensure_tables()
+            except Exception as e:
+                logger.warning(f"清理Jenkins构建历史失败: {e}")
+                return
+        with database_transaction() as db:
+            with db.cursor() as cursor:
+                cursor.execute('DELETE FROM jenkins_build_history WHERE instance_id = %s', (instance_id,))
+                cursor.execute('DELETE FROM jenkins_build_sync_status WHERE instance_id = %s', (instance_id,))
+
+class JenkinsBuildSyncer:
+    """后台构建历史同步线程，周期性同步所有启用的Jenkins实例"""
+
+    def __init__(self, store: JenkinsBuildStore):
+        self.store = store
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        # 先清除停止标记：stop() 后线程可能仍在同步中，重新启动时让它继续运行
+        self._stop_event.clear()
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name='jenkins-build-syncer', daemon=True)
+        self._thread.start()
+        logger.info(f"Jenkins构建历史同步已启动，间隔 {self.store.sync_interval}s")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.sync_all()
+            except Exception as e:
+                logger.error(f"Jenkins构建历史同步循环异常: {e}")
+            self._stop_event.wait(self.store.sync_interval)
+
+    def sync_all(self) -> None:
+        self.store.ensure_tables()
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute('SELECT * FROM jenkins_settings WHERE enabled = 1')
+                instances = cursor.fetchall()
+
+        for instance in instances:
+            if self._stop_event.is_set():
+                break
+            token = instance['token']
+            if token:
+                try:
+                    token = decrypt_sensitive_data(token)
+                except Exception as e:
+                    logger.error(f"解密Jenkins实例 {instance['id']} token失败: {e}")
+
+            lock = self.store._instance_lock(instance['id'])
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                self.store.sync_instance(instance, token)
+            except BuildSyncError:
+                pass
+            finally:
+                lock.release()
+
+# 全局构建历史存储实例
+jenkins_build_store = JenkinsBuildStore()
+jenkins_build_syncer = JenkinsBuildSyncer(jenkins_build_store)
+# 多进程部署时只有持有锁的进程同步
+jenkins_build_sync_leader = LeaderLock('jenkins_build_sync', jenkins_build_syncer.start, jenkins_build_syncer.stop)
+
+def start_build_history_syncer(app=None) -> None:
+    """启动后台构建历史同步（JENKINS_BUILD_SYNC_ENABLED=false 时不启动），由获得选主锁的进程执行"""
+    enabled = os.getenv('JENKINS_BUILD_SYNC_ENABLED', 'true').lower() == 'true'
+    if app is not None:
+        enabled = app.config.get('JENKINS_BUILD_SYNC_ENABLED', enabled)
+    if enabled:
+        jenkins_build_sync_leader.start()
@@ -0,0 +1,307 @@
+"""
+Jenkins HTTP客户端
+
+按实例ID缓存 JenkinsClient：每个客户端持有一个带连接池的 requests.Session
+（keep-alive，复用TCP/TLS连接）和解密后的凭据，所有客户端共享一个有界线程池
+用于并行请求；解密后的实例凭据也在进程内按TTL缓存。
+客户端还提供按URL的条件请求缓存（ETag/Last-Modified 重新验证），用于视图列表等
+变化不频繁的大响应。
+实例配置变更时由设置接口调用 invalidate_jenkins_instance 失效。
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def tree_field(name: str, children: str = None, start: int = None, end: int = None) -> str:
+    """
+    构造 tree 参数中的一个字段
+
+    Examples:
+        tree_field('lastBuild', 'number,result') -> 'lastBuild[number,result]'
+        tree_field('builds', 'number', 0, 10)    -> 'builds[number]{0,10}'
+    """
+    field = f"{name}[{children}]" if children else name
+    if start is not None or end is not None:
+        field += '{' + (str(start) if start is not None else '') + ',' + (str(end) if end is not None else '') + '}'
+    return field
+
+def tree(*fields: str) -> str:
+    """用逗号拼接多个 tree 字段"""
+    return ','.join(fields)
+
+class JenkinsClient:
+    """单个Jenkins实例的HTTP客户端"""
+
+    def __init__(self, instance: Dict[str, Any], token: str, pool_size: int = 10,
+                 executor: ThreadPoolExecutor = None):
+        self.instance_id = instance['id']
+        self.base_url = instance['url'].rstrip('/')
+        self.fingerprint = _fingerprint(instance, token)
+        self.executor = executor
+        # 条件请求缓存: url -> [data, etag, remote_etag, last_modified, fetched_at]
+        self._conditional: 'OrderedDict[str, list]' = OrderedDict()
+        self._conditional_lock = threading.Lock()
+        self._conditional_max_entries = 64
+
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(instance['username'], token)
+        self.session.headers.update({
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate'
+        })
+        # 同一实例只有一个主机，连接池容量即最大并发连接数；
+        # max_retries 只重试建立连接失败（请求未发出），对POST也是安全的
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=2)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def url(self, path: str, tree_spec: str = None, depth: int = None) -> str:
+        """拼接完整URL，path 可以是相对路径或完整URL"""
+        url = path if path.startswith(('http://', 'https://')) else f"{self.base_url}/{path.lstrip('/')}"
+        params = []
+        if tree_spec:
+            params.append(f"tree={tree_spec}")
+        if depth is not None:
+            params.append(f"depth={depth}")
+        if params:
+            url += ('&' if '?' in url else '?') + '&'.join(params)
+        return url
+
+    def request(self, method: str, path: str, tree_spec: str = None, depth: int = None,
+                **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', 15)
+        return self.session.request(method, self.url(path, tree_spec, depth), **kwargs)
+
+    def get(self, path: str, tree_spec: str = None, depth: int = None, **kwargs) -> requests.Response:
+        return self.request('GET', path, tree_spec, depth, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request('POST', path, **kwargs)
+
+    def get_json(self, path: str = 'api/json', tree_spec: str = None, depth: int = None,
+                 **kwargs) -> Optional[Dict[str, Any]]:
+        """GET并解析JSON，非200返回 None"""
+        response = self.get(path, tree_spec, depth, **kwargs)
+        if response.status_code != 200:
+            logger.warning(f"Jenkins实例 {self.instance_id} 请求失败: {response.status_code} {path}")
+            return None
+        return response.json()
+
+    def get_json_conditional(self, path: str = 'api/json', tree_spec: str = None,
+                             max_age: float = 0, **kwargs) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        带条件重新验证的 GET JSON
+
+        max_age 秒内直接返回缓存；过期后带上 If-None-Match / If-Modified-Since 重新请求，
+        304 或响应体摘要未变时复用已解析的数据。Jenkins 的 api/json 多数不返回 ETag，
+        因此以响应体 SHA1 作为本地 ETag。
+
+        Returns:
+            (data, etag): 请求失败时为 (None, None)
+        """
+        url = self.url(path, tree_spec)
+        now = time.monotonic()
+        with self._conditional_lock:
+            entry = self._conditional.get(url)
+            if entry is not None:
+                self._conditional.move_to_end(url)
+                if now - entry[4] < max_age:
+                    return entry[0], entry[1]
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            if entry[2]:
+                headers['If-None-Match'] = entry[2]
+            if entry[3]:
+                headers['If-Modified-Since'] = entry[3]
+
+        response = self.get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            entry[4] = now
+            return entry[0], entry[1]
+        if response.status_code != 200:
+            logger.warning(f"Jenkins实例 {self.instance_id} 请求失败: {response.status_code} {path}")
+            return None, None
+
+        etag = hashlib.sha1(response.content).hexdigest()
+        if entry is not None and entry[1] == etag:
+            entry[4] = now
+            return entry[0], etag
+
+        data = response.json()
+        with self._conditional_lock:
+            self._conditional[url] = [data, etag, response.headers.get('ETag'),
+                                      response.headers.get('Last-Modified'), now]
+            self._conditional.move_to_end(url)
+            while len(self._conditional) > self._conditional_max_entries:
+                self._conditional.popitem(last=False)
+        return data, etag
+
+    def invalidate_conditional(self, path: str = None) -> None:
+        """清除条件请求缓存，path 为空时全部清除，否则清除以该路径开头的URL"""
+        with self._conditional_lock:
+            if path is None:
+                self._conditional.clear()
+                return
+            prefix = self.url(path)
+            for url in [u for u in self._conditional if u.startswith(prefix)]:
+                del self._conditional[url]
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """提交到共享线程池执行"""
+        return self.executor.submit(func, *args, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+def _fingerprint(instance: Dict[str, Any], token: str) -> Tuple:
+    return (instance['url'].rstrip('/'), instance['username'], token)
+
+class JenkinsClientCache:
+    """按实例ID缓存 JenkinsClient"""
+
+    def __init__(self, pool_size: int = None, max_workers: int = None):
+        self.pool_size = pool_size or int(os.getenv('JENKINS_HTTP_POOL_SIZE', '10'))
+        max_workers = max_workers or int(os.getenv('JENKINS_HTTP_WORKERS', '16'))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='jenkins-http')
+        self._clients: Dict[int, JenkinsClient] = {}
+        self._lock = threading.Lock()
+        self._created = 0
+        self._reused = 0
+
+    def get(self, instance: Dict[str, Any], token: str) -> JenkinsClient:
+        """
+        获取实例的客户端
+
+        地址、用户名或token与缓存的客户端不一致时（例如其他进程修改了配置）重新创建。
+        """
+        fingerprint = _fingerprint(instance, token)
+        with self._lock:
+            client = self._clients.get(instance['id'])
+            if client is not None and client.fingerprint == fingerprint:
+                self._reused += 1
+                return client
+            stale = client
+            client = JenkinsClient(instance, token, self.pool_size, self.executor)
+            self._clients[instance['id']] = client
+            self._created += 1
+        if stale is not None:
+            stale.close()
+        return client
+
+    def invalidate(self, instance_id: int) -> None:
+        """实例配置更新或删除时失效"""
+        with self._lock:
+            client = self._clients.pop(instance_id, None)
+        if client is not None:
+            client.close()
+            logger.info(f"Jenkins实例 {instance_id} 的HTTP客户端已失效")
+
+    def clear(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'clients': len(self._clients),
+                'created': self._created,
+                'reused': self._reused,
+                'pool_size': self.pool_size,
+                'max_workers': self.executor._max_workers
+            }
+
+class JenkinsCredentialCache:
+    """
+    Jenkins实例凭据缓存
+
+    缓存 jenkins_settings 行和解密后的token，只保存在进程内存中；
+    TTL 限制跨进程修改配置后的最长不一致时间，本进程内的修改通过 invalidate 立即生效。
+    """
+
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl if ttl is not None else int(os.getenv('JENKINS_CREDENTIAL_CACHE_TTL', '300'))
+        self._entries: Dict[int, Tuple[Dict[str, Any], str, float]] = {}
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, instance_id: int) -> Optional[Tuple[Dict[str, Any], str]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(instance_id)
+            if entry is not None and entry[2] > now:
+                self._hits += 1
+                return entry[0], entry[1]
+            if entry is not None:
+                del self._entries[instance_id]
+            self._misses += 1
+            return None
+
+    def generation(self, instance_id: int) -> int:
+        """读库前获取版本号，写入缓存时版本未变才生效（防止失效期间的旧数据回填）"""
+        with self._lock:
+            return self._generations.get(instance_id, 0)
+
+    def set(self, instance_id: int, instance: Dict[str, Any], token: str, generation: int = None) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generations.get(instance_id, 0):
+                return
+            self._entries[instance_id] = (instance, token, time.monotonic() + self.ttl)
+
+    def invalidate(self, instance_id: int) -> None:
+        with self._lock:
+            self._generations[instance_id] = self._generations.get(instance_id, 0) + 1
+            if self._entries.pop(instance_id, None) is not None:
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'invalidations': self._invalidations,
+                'hit_rate': round(self._hits / total * 100, 2) if total > 0 else 0
+            }
+
+# 全局客户端缓存
+jenkins_clients = JenkinsClientCache()
+
+# 全局凭据缓存
+jenkins_credentials = JenkinsCredentialCache()
+
+def invalidate_jenkins_instance(instance_id: int) -> None:
+    """实例配置更新或删除后，清除凭据缓存和HTTP客户端"""
+    jenkins_credentials.invalidate(instance_id)
+    jenkins_clients.invalidate(instance_id)
+
+def get_jenkins_client(instance: Dict[str, Any], token: str) -> JenkinsClient:
+    """获取Jenkins实例的共享客户端"""
+    return jenkins_clients.get(instance, token)
@@ -0,0 +1,304 @@
+"""
+Jenkins控制台日志读取
+
+基于 Jenkins 的 logText/progressiveText 接口按偏移读取构建日志：
+- 流式转发：边从Jenkins读边输出，不在内存中缓存完整日志；构建中可持续跟随
+- 区间：读取 [start, end) 区间，供前端分页浏览大日志；每页只请求一次，读够即断开
+- 末尾N行：从日志末尾按窗口倍增向前读取，只传输需要的部分
+
+progressiveText 返回 [start, 日志末尾) 的内容，响应头 X-Text-Size 为本次读取结束的偏移，
+X-More-Data 表示构建仍在输出。响应体与日志文件的字节数并不一致（换行统一转换为 CRLF，
+控制台注释被去除），因此所有偏移都取自 X-Text-Size，不按已读字节数累加。
+Jenkins 先把 [start, 末尾) 整段读入内存再返回，从 0 开始读取大日志代价很高，
+已知的日志长度会缓存下来，后续读取从末尾附近开始。
+区间在客户端按行截断，截断处的偏移按"CRLF 计 1 字节"估算（见 _raw_length）；
+读到日志末尾时偏移即 X-Text-Size，是精确的。
+注意 start 超过日志长度时 Jenkins 会从 0 重新返回全文（日志回卷），此时只读响应头即关闭连接。
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import requests
+
+from app.services.jenkins_client import JenkinsClient
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# 单次区间/末尾读取的最大字节数
+MAX_RANGE_BYTES = int(os.getenv('JENKINS_LOG_MAX_RANGE_BYTES', str(2 * 1024 * 1024)))
+# 跟随模式的轮询间隔和最长持续时间（秒）
+FOLLOW_POLL_INTERVAL = float(os.getenv('JENKINS_LOG_POLL_INTERVAL', '1.0'))
+FOLLOW_MAX_SECONDS = int(os.getenv('JENKINS_LOG_FOLLOW_TIMEOUT', '1800'))
+
+# 估算末尾读取窗口时使用的平均行长
+_AVERAGE_LINE_BYTES = 160
+# 缓存日志长度的构建数
+_KNOWN_SIZES_MAX = 256
+
+# (实例地址, 任务, 构建号) -> 最近一次 X-Text-Size
+_known_sizes: 'OrderedDict[Tuple[str, str, int], int]' = OrderedDict()
+_known_sizes_lock = threading.Lock()
+
+class ConsoleLogError(Exception):
+    """读取控制台日志失败"""
+
+def _log_path(job_name: str, build_number: int) -> str:
+    return f"job/{job_name}/{build_number}/logText/progressiveText"
+
+def _remember_size(client: JenkinsClient, job_name: str, build_number: int, size: int) -> None:
+    key = (client.base_url, job_name, build_number)
+    with _known_sizes_lock:
+        _known_sizes[key] = size
+        _known_sizes.move_to_end(key)
+        while len(_known_sizes) > _KNOWN_SIZES_MAX:
+            _known_sizes.popitem(last=False)
+
+def _known_size(client: JenkinsClient, job_name: str, build_number: int) -> Optional[int]:
+    with _known_sizes_lock:
+        return _known_sizes.get((client.base_url, job_name, build_number))
+
+def _open(client: JenkinsClient, job_name: str, build_number: int,
+          start: int) -> Tuple[requests.Response, int, bool]:
+    """
+    发起 progressiveText 流式请求
+
+    Returns:
+        (response, size, more): size 为日志当前长度（本次读取结束的偏移）
+    """
+    response = client.get(
+        _log_path(job_name, build_number),
+        params={'start': start},
+        stream=True,
+        timeout=30
+    )
+    if response.status_code != 200:
+        response.close()
+        raise ConsoleLogError(f"Jenkins日志获取失败: {response.status_code}")
+    try:
+        size = int(response.headers.get('X-Text-Size', '0'))
+    except ValueError:
+        size = 0
+    more = response.headers.get('X-More-Data', '').lower() == 'true'
+    _remember_size(client, job_name, build_number, size)
+    return response, size, more
+
+def _raw_length(body: bytes) -> int:
+    """响应体对应的日志字节数估算：CRLF 按日志中的单个 LF 计，被去除的控制台注释无法计入"""
+    return len(body) - body.count(b'\r\n')
+
+def _read_head(client: JenkinsClient, job_name: str, build_number: int, start: int,
+               keep: int) -> Tuple[bytes, bool, int, bool]:
+    """
+    从 start 读取，读满 keep 字节即断开连接
+
+    start 超过日志长度时不读取响应体。
+
+    Returns:
+        (data, complete, size, more): complete 表示已读到日志末尾（data 为 [start, size) 的全部内容）
+    """
+    response, size, more = _open(client, job_name, build_number, start)
+    data = bytearray()
+    try:
+        if size < start:
+            return b'', True, size, more
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            data += chunk
+            if len(data) > keep:
+                return bytes(data[:keep]), False, size, more
+    finally:
+        response.close()
+    return bytes(data), True, size, more
+
+def _read_tail(client: JenkinsClient, job_name: str, build_number: int, start: int,
+               keep: int) -> Tuple[bytes, bool, int, bool]:
+    """
+    从 start 读到日志末尾，只保留最后 keep 字节
+
+    Returns:
+        (data, complete, size, more): complete 表示 data 从 start 开始（没有丢弃开头部分）
+    """
+    response, size, more = _open(client, job_name, build_number, start)
+    data = bytearray()
+    complete = True
+    try:
+        if size < start:
+            return b'', True, size, more
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            data += chunk
+            if len(data) > 2 * keep:
+                del data[:len(data) - keep]
+                complete = False
+    finally:
+        response.close()
+    if len(data) > keep:
+        del data[:len(data) - keep]
+        complete = False
+    return bytes(data), complete, size, more
+
+def _cut_lines(data: bytes, limit: int) -> bytes:
+    """取 data 开头日志字节数不超过 limit 的整行；第一行就超过时按字节截断"""
+    cut = 0
+    raw = 0
+    while cut < len(data):
+        newline = data.find(b'\n', cut)
+        line_end = len(data) if newline < 0 else newline + 1
+        line_raw = _raw_length(data[cut:line_end])
+        if raw + line_raw > limit:
+            break
+        raw += line_raw
+        cut = line_end
+    return data[:cut] if cut else data[:limit]
+
+def get_log_size(client: JenkinsClient, job_name: str, build_number: int) -> Tuple[int, bool]:
+    """
+    获取日志当前长度和构建是否仍在输出
+
+    从已知长度处读取，Jenkins 只需处理此后新增的部分；只读取响应头即关闭连接。
+    首次读取的构建没有已知长度，Jenkins 只能从 0 开始处理整个日志，
+    需要内容的调用方（如 read_tail）应直接读取，顺带得到长度，不要先调用本函数。
+    """
+    response, size, more = _open(client, job_name, build_number,
+                                 _known_size(client, job_name, build_number) or 0)
+    response.close()
+    return size, more
+
+class ConsoleLogStream:
+    """
+    控制台日志流
+
+    迭代产生 (offset, data)：非空 data 为日志内容，offset 为该段所属读取的起始偏移；
+    每次读取结束后产生一个空块作为检查点，此时 offset 为下一次读取的偏移（X-Text-Size），
+    可作为断线续传的位置，跟随模式下也兼作心跳。
+    end 按读取粒度生效：读到不小于 end 的偏移后停止，不在响应中间截断。
+    迭代结束后 offset 为已读到的位置，more 表示构建是否仍在输出。
+    """
+
+    def __init__(self, client: JenkinsClient, job_name: str, build_number: int,
+                 start: int = 0, end: Optional[int] = None, follow: bool = False,
+                 poll_interval: float = None, max_seconds: int = None):
+        self.client = client
+        self.job_name = job_name
+        self.build_number = build_number
+        self.offset = max(0, start)
+        self.end = end
+        self.follow = follow
+        self.poll_interval = poll_interval if poll_interval is not None else FOLLOW_POLL_INTERVAL
+        self.max_seconds = max_seconds if max_seconds is not None else FOLLOW_MAX_SECONDS
+        self.more = True
+        self.size = 0
+
+    def _read_once(self) -> Iterator[Tuple[int, bytes]]:
+        start = self.offset
+        response, size, self.more = _open(self.client, self.job_name, self.build_number, start)
+        try:
+            self.size = size
+            if size < start:
+                # 请求偏移超过日志长度，Jenkins 会回卷返回全文，不读取响应体，之后从日志末尾继续
+                logger.warning(f"日志偏移 {start} 超过日志长度 {size}: {self.job_name}#{self.build_number}")
+                self.offset = size
+                return
+            for data in response.iter_content(chunk_size=CHUNK_SIZE):
+                if data:
+                    yield start, data
+            self.offset = size
+        finally:
+            response.close()
+
+    def __iter__(self) -> Iterator[Tuple[int, bytes]]:
+        deadline = time.monotonic() + self.max_seconds
+        while True:
+            yield from self._read_once()
+            yield self.offset, b''
+            if not self.follow or not self.more:
+                return
+            if self.end is not None and self.offset >= self.end:
+                return
+            if time.monotonic() >= deadline:
+                logger.info(f"日志跟随超时: {self.job_name}#{self.build_number}")
+                return
+            time.sleep(self.poll_interval)
+
+def _range_result(data: bytes, start: int, end: int, size: int, more: bool) -> Dict[str, Any]:
+    return {
+        'log': data.decode('utf-8', errors='replace'),
+        'start': start,
+        'end': end,
+        'size': size,
+        'more': more,
+        'hasNext': end < size
+    }
+
+def read_range(client: JenkinsClient, job_name: str, build_number: int,
+               start: int = 0, end: Optional[int] = None) -> Dict[str, Any]:
+    """
+    读取 [start, end) 区间，区间大小不超过 MAX_RANGE_BYTES
+
+    从 start 读取一次，在客户端按整行截断到 end，读够后即断开连接。
+    区间到达日志末尾时返回的 end 为 X-Text-Size（精确）；否则 end 按 _raw_length 估算，
+    截断之前有被去除的控制台注释时估算值偏小，下一页开头会与本页末尾有少量重复，不会漏内容。
+    构建仍在输出时返回当前已有的部分（more 为 True）。
+    """
+    start = max(0, start)
+    limit = start + MAX_RANGE_BYTES
+    end = limit if end is None else max(start, min(end, limit))
+    span = end - start
+    # 换行转换最多使内容变为两倍，多读这些就一定够截断
+    data, complete, size, more = _read_head(client, job_name, build_number, start, keep=2 * span)
+    if size <= start:
+        return _range_result(b'', start, start, size, more)
+    if complete and _raw_length(data) <= span:
+        return _range_result(data, start, size, size, more)
+    data = _cut_lines(data, span)
+    return _range_result(data, start, min(start + _raw_length(data), size), size, more)
+
+def read_tail(client: JenkinsClient, job_name: str, build_number: int, lines: int) -> Dict[str, Any]:
+    """
+    读取末尾至少 lines 行
+
+    从已知长度向前按窗口倍增读取，直到凑够行数、读到开头或达到 MAX_RANGE_BYTES；
+    首次读取的构建没有已知长度，从 0 读一次并只保留末尾部分，同时记下长度。
+    返回的内容从 start 开始（首行可能不完整），向前翻页时以 start 为 end 读取区间。
+    窗口没有截掉开头时 start 是精确的；否则按 _raw_length 估算。
+    构建仍在输出时窗口取到读取时的日志末尾，end 为本次读取结束的偏移。
+    """
+    known = _known_size(client, job_name, build_number)
+    window = min(max(lines, 1) * _AVERAGE_LINE_BYTES, MAX_RANGE_BYTES)
+    while True:
+        request_start = 0 if known is None else max(0, known - window)
+        data, complete, size, more = _read_tail(client, job_name, build_number, request_start,
+                                                keep=MAX_RANGE_BYTES)
+        if size < request_start:
+            # 日志回卷，按新的长度重新读取
+            known = size
+            continue
+        if not complete:
+            # 从 0 读取时窗口可能远大于所需，只保留末尾 lines 行（从行首开始）
+            cut = len(data)
+            for _ in range(max(lines, 1) + (1 if data.endswith(b'\n') else 0)):
+                cut = data.rfind(b'\n', 0, cut)
+                if cut < 0:
+                    break
+            if cut >= 0:
+                data = data[cut + 1:]
+        start = request_start if complete else max(0, size - _raw_length(data))
+        # 窗口开头的不完整行不计入行数
+        enough = data.count(b'\n') >= lines + (1 if start > 0 else 0)
+        if enough or start == 0 or window >= MAX_RANGE_BYTES or not complete:
+            break
+        known = size
+        window = min(window * 4, MAX_RANGE_BYTES)
+
+    return {
+        'log': data.decode('utf-8', errors='replace'),
+        'start': start,
+        'end': size,
+        'size': size,
+        'more': more,
+        'hasPrevious': start > 0
+    }
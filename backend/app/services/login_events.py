@@ -0,0 +1,140 @@
+"""
+登录事件记录
+
+AuthService.login 每次登录（成功或失败）写入一条 login_events 记录，
+同一事务中累加 login_daily_stats 的当天计数；
+仪表板的登录趋势按天读取计数表，失败记录按 (success, created_at) 索引读取最近的事件，
+不再扫描日志文件。
+"""
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.dashboard_stats import dashboard_stats
+from app.utils.db_context import database_connection, database_transaction
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+RETENTION_DAYS = int(os.getenv('LOGIN_EVENT_RETENTION_DAYS', '180'))
+PURGE_INTERVAL_SECONDS = 24 * 3600
+PURGE_BATCH_SIZE = 10000
+
+CREATE_EVENTS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS login_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(100) COMMENT '登录用户名',
+    success TINYINT(1) NOT NULL COMMENT '是否成功',
+    reason VARCHAR(255) COMMENT '失败原因',
+    ip VARCHAR(64) COMMENT '客户端IP',
+    user_agent VARCHAR(255) COMMENT '客户端User-Agent',
+    created_at DATETIME NOT NULL COMMENT '登录时间',
+    INDEX idx_created_at (created_at),
+    INDEX idx_success_created (success, created_at),
+    INDEX idx_username_created (username, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='登录事件'
+"""
+
+CREATE_DAILY_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS login_daily_stats (
+    stat_date DATE PRIMARY KEY COMMENT '日期',
+    success_count INT NOT NULL DEFAULT 0 COMMENT '登录成功次数',
+    failure_count INT NOT NULL DEFAULT 0 COMMENT '登录失败次数'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='登录次数按天汇总'
+"""
+
+class LoginEventStore:
+    """登录事件和按天计数"""
+
+    def __init__(self, retention_days: int = None):
+        self.retention_days = RETENTION_DAYS if retention_days is None else retention_days
+        self._tables_ready = False
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+    def ensure_tables(self) -> None:
+        if self._tables_ready:
+            return
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute(CREATE_EVENTS_TABLE_SQL)
+                cursor.execute(CREATE_DAILY_TABLE_SQL)
+            db.commit()
+        self._tables_ready = True
+        dashboard_stats.recheck_tables()
+
+    def record(self, username: Optional[str], success: bool, reason: str = None,
+               ip: str = None, user_agent: str = None) -> None:
+        """记录一次登录，写入失败只记日志，不影响登录结果"""
+        now = datetime.now()
+        try:
+            self.ensure_tables()
+            with database_transaction() as db:
+                with db.cursor() as cursor:
+                    cursor.execute("""
+                        INSERT INTO login_events (username, success, reason, ip, user_agent, created_at)
+                        VALUES (%s, %s, %s, %s, %s, %s)
+                    """, ((username or '')[:100], 1 if success else 0, reason, (ip or '')[:64] or None,
+                          (user_agent or '')[:255] or None, now))
+                    column = 'success_count' if success else 'failure_count'
+                    cursor.execute(f"""
+                        INSERT INTO login_daily_stats (stat_date, {column}) VALUES (%s, 1)
+                        ON DUPLICATE KEY UPDATE {column} = {column} + 1
+                    """, (now.date(),))
+        except Exception as e:
+            logger.error(f"记录登录事件失败: {e}")
+            return
+        if not success:
+            dashboard_stats.invalidate('登录失败')
+        self._purge_if_due()
+
+    def daily_counts(self, days: int, today: date = None) -> Dict[date, Tuple[int, int]]:
+        """最近 days 天（含今天）每天的 (成功次数, 失败次数)，没有登录的日期不在结果中"""
+        self.ensure_tables()
+        today = today or datetime.now().date()
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    SELECT stat_date, success_count, failure_count FROM login_daily_stats
+                    WHERE stat_date BETWEEN %s AND %s
+                """, (today - timedelta(days=days - 1), today))
+                return {
+                    row['stat_date']: (row['success_count'], row['failure_count'])
+                    for row in cursor.fetchall()
+                }
+
+    def recent_failures(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """最近的登录失败记录"""
+        self.ensure_tables()
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    SELECT username, ip, reason, created_at FROM login_events
+                    WHERE success = 0 ORDER BY created_at DESC LIMIT %s
+                """, (limit,))
+                return cursor.fetchall()
+
+    def _purge_if_due(self) -> None:
+        """每天最多清理一次超过保留天数的事件（按天计数保留）"""
+        if self.retention_days <= 0:
+            return
+        with self._lock:
+            if self._last_purge and time.monotonic() - self._last_purge < PURGE_INTERVAL_SECONDS:
+                return
+            self._last_purge = time.monotonic()
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        try:
+            with database_transaction() as db:
+                with db.cursor() as cursor:
+                    deleted = cursor.execute(
+                        "DELETE FROM login_events WHERE created_at < %s LIMIT %s", (cutoff, PURGE_BATCH_SIZE)
+                    )
+            if deleted:
+                logger.info(f"已清理 {deleted} 条过期登录事件")
+        except Exception as e:
+            logger.error(f"清理过期登录事件失败: {e}")
+
+# 全局登录事件存储实例
+login_event_store = LoginEventStore()
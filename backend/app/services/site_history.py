@@ -0,0 +1,780 @@
+"""
+站点拨测历史存储
+
+- 拨测结果（含 DNS/连接/TLS/首字节分阶段耗时）批量写入 site_monitoring_history（多行 INSERT），
+  站点当前状态用一条 UPDATE 批量更新
+- 按分钟/小时/天汇总到 site_monitoring_rollup_minute/hour/day：拨测次数、在线次数、
+  超时/错误次数、响应时间 min/max/avg/p50/p95/p99，以及响应时间直方图
+- 分钟汇总由原始记录计算（精确分位数），小时/天汇总由下一级合并直方图得到（估算分位数），
+  直方图可任意合并，长时间范围的统计只需读取汇总表
+- 原始记录和分钟/小时汇总按保留天数定期清理
+
+汇总任务每次重算最近的若干个桶（ON DUPLICATE KEY UPDATE），可重复执行，
+晚到的拨测结果（例如长超时）会在后续执行中计入。
+"""
+import json
+import math
+import os
+import uuid
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pymysql
+
+from app.services.dashboard_stats import dashboard_stats
+from app.utils.db_context import database_connection, database_transaction
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 中国时区，拨测时间按本地时间保存
+CHINA_TZ = timezone(timedelta(hours=8))
+
+# 响应时间直方图的桶上界（毫秒），最后一个桶为超出最大上界的部分
+LATENCY_BOUNDS = (
+    5, 10, 25, 50, 75, 100, 150, 200, 300, 400, 500, 750,
+    1000, 1500, 2000, 3000, 5000, 7500, 10000, 15000, 30000, 60000
+)
+
+GRANULARITIES = ('minute', 'hour', 'day')
+ROLLUP_TABLES = {g: f'site_monitoring_rollup_{g}' for g in GRANULARITIES}
+_BUCKET_SECONDS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+RAW_RETENTION_DAYS = int(os.getenv('SITE_MONITOR_HISTORY_RETENTION_DAYS', '7'))
+MINUTE_RETENTION_DAYS = int(os.getenv('SITE_MONITOR_MINUTE_ROLLUP_RETENTION_DAYS', '30'))
+HOUR_RETENTION_DAYS = int(os.getenv('SITE_MONITOR_HOUR_ROLLUP_RETENTION_DAYS', '365'))
+# 已汇总过的桶在该秒数内仍会重算，用于计入晚到的结果
+ROLLUP_LATE_SECONDS = 300
+# 清理时每条 DELETE 删除的最大行数，避免长事务
+PURGE_BATCH_SIZE = 10000
+# 手动批量拨测任务：超过该秒数仍未结束视为失败（执行任务的进程可能已退出），任务记录保留天数
+PROBE_JOB_TIMEOUT_SECONDS = int(os.getenv('SITE_MONITOR_PROBE_JOB_TIMEOUT', '600'))
+PROBE_JOB_RETENTION_DAYS = 1
+# 批量拨测接口为每个站点附带的最近拨测记录条数
+RECENT_HISTORY_LIMIT = 5
+
+CREATE_PROBE_JOB_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS `site_monitoring_probe_jobs` (
+  `id` char(32) NOT NULL COMMENT '任务ID',
+  `status` varchar(16) NOT NULL DEFAULT 'running' COMMENT 'running/done/failed',
+  `site_ids` text NOT NULL COMMENT '拨测的站点ID(JSON数组)',
+  `total` int NOT NULL DEFAULT 0 COMMENT '站点数',
+  `online` int DEFAULT NULL COMMENT '在线站点数',
+  `error_message` varchar(500) DEFAULT NULL COMMENT '失败原因',
+  `created_at` datetime NOT NULL COMMENT '创建时间',
+  `finished_at` datetime DEFAULT NULL COMMENT '结束时间',
+  PRIMARY KEY (`id`),
+  KEY `idx_status_created` (`status`, `created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='站点手动批量拨测任务'
+"""
+
+CREATE_ROLLUP_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS `{table}` (
+  `site_id` int NOT NULL COMMENT '站点ID',
+  `bucket_start` datetime NOT NULL COMMENT '时间桶开始时间',
+  `check_count` int NOT NULL DEFAULT 0 COMMENT '拨测次数',
+  `up_count` int NOT NULL DEFAULT 0 COMMENT '在线次数',
+  `timeout_count` int NOT NULL DEFAULT 0 COMMENT '超时次数',
+  `error_count` int NOT NULL DEFAULT 0 COMMENT '离线/错误次数',
+  `latency_count` int NOT NULL DEFAULT 0 COMMENT '有响应时间的次数',
+  `latency_sum` bigint NOT NULL DEFAULT 0 COMMENT '响应时间合计(毫秒)',
+  `latency_min` int DEFAULT NULL COMMENT '最小响应时间(毫秒)',
+  `latency_max` int DEFAULT NULL COMMENT '最大响应时间(毫秒)',
+  `p50` int DEFAULT NULL COMMENT 'P50响应时间(毫秒)',
+  `p95` int DEFAULT NULL COMMENT 'P95响应时间(毫秒)',
+  `p99` int DEFAULT NULL COMMENT 'P99响应时间(毫秒)',
+  `latency_histogram` varchar(512) NOT NULL DEFAULT '' COMMENT '响应时间直方图(逗号分隔计数)',
+  PRIMARY KEY (`site_id`, `bucket_start`),
+  KEY `idx_bucket_start` (`bucket_start`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='站点拨测{label}汇总表'
+"""
+
+# 在初始建表脚本之后新增的字段，启动时检查并补齐
+_ADDED_COLUMNS = {
+    'site_monitoring': (
+        ('reuse_connection', "tinyint(1) NOT NULL DEFAULT 1 COMMENT '拨测是否复用连接'"),
+    ),
+    'site_monitoring_history': (
+        ('dns_time', "int DEFAULT NULL COMMENT 'DNS解析耗时(毫秒)'"),
+        ('connect_time', "int DEFAULT NULL COMMENT 'TCP连接耗时(毫秒)'"),
+        ('tls_time', "int DEFAULT NULL COMMENT 'TLS握手耗时(毫秒)'"),
+        ('ttfb', "int DEFAULT NULL COMMENT '首字节耗时(毫秒)'"),
+        ('connection_reused', "tinyint(1) DEFAULT NULL COMMENT '是否复用已有连接'"),
+    ),
+}
+
+_ROLLUP_LABELS = {'minute': '分钟', 'hour': '小时', 'day': '天'}
+
+_ROLLUP_COLUMNS = (
+    'site_id', 'bucket_start', 'check_count', 'up_count', 'timeout_count', 'error_count',
+    'latency_count', 'latency_sum', 'latency_min', 'latency_max', 'p50', 'p95', 'p99', 'latency_histogram'
+)
+
+def get_local_time():
+    """获取本地时间（中国时区）"""
+    return datetime.now(CHINA_TZ).replace(tzinfo=None)
+
+def floor_time(value: datetime, granularity: str) -> datetime:
+    """时间向下取整到桶开始时间"""
+    value = value.replace(second=0, microsecond=0)
+    if granularity in ('hour', 'day'):
+        value = value.replace(minute=0)
+    if granularity == 'day':
+        value = value.replace(hour=0)
+    return value
+
+def _bucket_index(latency: int) -> int:
+    for index, bound in enumerate(LATENCY_BOUNDS):
+        if latency <= bound:
+            return index
+    return len(LATENCY_BOUNDS)
+
+def parse_histogram(text: str) -> List[int]:
+    counts = [int(v) for v in text.split(',')] if text else []
+    return counts + [0] * (len(LATENCY_BOUNDS) + 1 - len(counts))
+
+def histogram_percentile(histogram: List[int], q: float, latency_min: Optional[int] = None,
+                         latency_max: Optional[int] = None) -> Optional[int]:
+    """由直方图估算分位数（桶内线性插值，首尾桶用实际最小/最大值收紧）"""
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    for index, count in enumerate(histogram):
+        if not count:
+            continue
+        if cumulative + count >= rank:
+            lower = LATENCY_BOUNDS[index - 1] if index > 0 else 0
+            upper = LATENCY_BOUNDS[index] if index < len(LATENCY_BOUNDS) else (latency_max or lower)
+            if latency_min is not None:
+                lower = max(lower, min(latency_min, upper))
+            if latency_max is not None:
+                upper = min(upper, latency_max)
+            value = lower + (upper - lower) * (rank - cumulative) / count
+            return int(round(value))
+        cumulative += count
+    return latency_max
+
+def exact_percentile(sorted_values: List[int], q: float) -> Optional[int]:
+    """最近秩法分位数"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+class RollupAccumulator:
+    """一个 (站点, 时间桶) 的汇总值，可逐条添加原始记录或合并下级汇总"""
+
+    __slots__ = ('check_count', 'up_count', 'timeout_count', 'error_count', 'latency_count',
+                 'latency_sum', 'latency_min', 'latency_max', 'histogram', 'latencies')
+
+    def __init__(self):
+        self.check_count = 0
+        self.up_count = 0
+        self.timeout_count = 0
+        self.error_count = 0
+        self.latency_count = 0
+        self.latency_sum = 0
+        self.latency_min: Optional[int] = None
+        self.latency_max: Optional[int] = None
+        self.histogram = [0] * (len(LATENCY_BOUNDS) + 1)
+        # 只由原始记录组成时保留全部响应时间，用于计算精确分位数
+        self.latencies: Optional[List[int]] = []
+
+    def add(self, status: str, response_time: Optional[int]) -> None:
+        self.check_count += 1
+        if status == 'online':
+            self.up_count += 1
+        elif status == 'timeout':
+            self.timeout_count += 1
+        else:
+            self.error_count += 1
+        if response_time is None:
+            return
+        value = int(response_time)
+        self.latency_count += 1
+        self.latency_sum += value
+        self.latency_min = value if self.latency_min is None else min(self.latency_min, value)
+        self.latency_max = value if self.latency_max is None else max(self.latency_max, value)
+        self.histogram[_bucket_index(value)] += 1
+        if self.latencies is not None:
+            self.latencies.append(value)
+
+    def merge(self, row: Dict[str, Any]) -> None:
+        """合并一行汇总记录（合并后只能用直方图估算分位数）"""
+        self.latencies = None
+        self.check_count += row['check_count']
+        self.up_count += row['up_count']
+        self.timeout_count += row['timeout_count']
+        self.error_count += row['error_count']
+        self.latency_count += row['latency_count']
+        self.latency_sum += row['latency_sum']
+        if row['latency_min'] is not None:
+            self.latency_min = row['latency_min'] if self.latency_min is None else min(self.latency_min, row['latency_min'])
+        if row['latency_max'] is not None:
+            self.latency_max = row['latency_max'] if self.latency_max is None else max(self.latency_max, row['latency_max'])
+        for index, count in enumerate(parse_histogram(row['latency_histogram'])):
+            self.histogram[index] += count
+
+    def percentiles(self, quantiles: Iterable[float]) -> List[Optional[int]]:
+        if self.latencies is not None:
+            values = sorted(self.latencies)
+            return [exact_percentile(values, q) for q in quantiles]
+        return [histogram_percentile(self.histogram, q, self.latency_min, self.latency_max) for q in quantiles]
+
+    def to_row(self, site_id: int, bucket_start: datetime) -> Tuple:
+        p50, p95, p99 = self.percentiles((0.5, 0.95, 0.99))
+        return (
+            site_id, bucket_start, self.check_count, self.up_count, self.timeout_count, self.error_count,
+            self.latency_count, self.latency_sum, self.latency_min, self.latency_max, p50, p95, p99,
+            format_histogram(self.histogram)
+        )
+
+def format_histogram(histogram: List[int]) -> str:
+    """直方图序列化：去掉末尾的零桶"""
+    end = len(histogram)
+    while end and not histogram[end - 1]:
+        end -= 1
+    return ','.join(str(c) for c in histogram[:end])
+
+class SiteHistoryStore:
+    """拨测历史写入、汇总和清理"""
+
+    def __init__(self):
+        self._tables_ready = False
+        self._rolled_until: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def ensure_tables(self) -> None:
+        """
+        创建汇总表和批量拨测任务表，为已有部署补充历史表的 (site_id, check_time) 索引、
+        分阶段耗时字段和站点的连接复用开关（仅首次调用时执行）
+        """
+        if self._tables_ready:
+            return
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                for granularity, table in ROLLUP_TABLES.items():
+                    cursor.execute(CREATE_ROLLUP_TABLE_SQL.format(table=table, label=_ROLLUP_LABELS[granularity]))
+                cursor.execute(CREATE_PROBE_JOB_TABLE_SQL)
+                for table, columns in _ADDED_COLUMNS.items():
+                    cursor.execute(f"SHOW COLUMNS FROM {table}")
+                    existing = {row['Field'] for row in cursor.fetchall()}
+                    for name, definition in columns:
+                        if name not in existing:
+                            logger.info(f"为 {table} 添加字段 {name}")
+                            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+                cursor.execute("SHOW INDEX FROM site_monitoring_history WHERE Key_name = 'idx_site_check_time'")
+                if not cursor.fetchall():
+                    logger.info("为 site_monitoring_history 添加 (site_id, check_time) 索引")
+                    cursor.execute(
+                        "ALTER TABLE site_monitoring_history ADD INDEX idx_site_check_time (site_id, check_time)"
+                    )
+            db.commit()
+        self._tables_ready = True
+
+    def record_results(self, results: List[Dict[str, Any]]) -> None:
+        """
+        在一个事务中保存一批拨测结果
+
+        历史记录用一条多行 INSERT 写入；站点当前状态按站点合并后用一条 UPDATE ... CASE 更新，
+        连续失败次数按本批结果顺序计算（在线清零，否则累加）。
+        results 每项包含 site_id、check_time 以及 perform_site_check 的返回字段。
+        """
+        if not results:
+            return
+        history_rows = [
+            (r['site_id'], r['check_time'], r['status'], r['response_time'], r['http_code'], r['error_message'],
+             r.get('dns_time'), r.get('connect_time'), r.get('tls_time'), r.get('ttfb'), r.get('connection_reused'))
+            for r in results
+        ]
+
+        # 每个站点取最后一条结果，并统计末尾连续失败次数
+        latest: Dict[int, Dict[str, Any]] = {}
+        failures: Dict[int, Tuple[int, bool]] = {}
+        for r in sorted(results, key=lambda item: item['check_time']):
+            latest[r['site_id']] = r
+            trailing, reset = failures.get(r['site_id'], (0, False))
+            failures[r['site_id']] = (0, True) if r['status'] == 'online' else (trailing + 1, reset)
+
+        with database_transaction() as db:
+            with db.cursor() as cursor:
+                insert_sql = """
+                    INSERT INTO site_monitoring_history
+                    (site_id, check_time, status, response_time, http_code, error_message,
+                     dns_time, connect_time, tls_time, ttfb, connection_reused)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """
+                try:
+                    cursor.executemany(insert_sql, history_rows)
+                except pymysql.err.IntegrityError:
+                    # 拨测期间站点被删除（外键约束），逐条写入并跳过已删除的站点
+                    for row in history_rows:
+                        try:
+                            cursor.execute(insert_sql, row)
+                        except pymysql.err.IntegrityError:
+                            pass
+                status_changed = self._update_site_status(cursor, latest, failures)
+        # 站点状态变化影响仪表板连通性统计；每批拨测都失效会让各进程频繁重新统计，只在状态变化时通知
+        if status_changed:
+            dashboard_stats.invalidate('站点状态变化')
+
+    @staticmethod
+    def _update_site_status(cursor, latest: Dict[int, Dict[str, Any]],
+                            failures: Dict[int, Tuple[int, bool]]) -> bool:
+        """更新站点当前状态，返回是否有站点的状态（online/offline 等）发生变化"""
+        site_ids = list(latest)
+        placeholders = ', '.join(['%s'] * len(site_ids))
+        cursor.execute(f"SELECT id, status FROM site_monitoring WHERE id IN ({placeholders}) FOR UPDATE", site_ids)
+        changed = any(row['status'] != latest[row['id']]['status'] for row in cursor.fetchall())
+
+        cases = {'status': [], 'last_check_time': [], 'last_response_time': [], 'failure_count': []}
+        params = {key: [] for key in cases}
+        for site_id in site_ids:
+            r = latest[site_id]
+            trailing, reset = failures[site_id]
+            for column, value in (('status', r['status']), ('last_check_time', r['check_time']),
+                                  ('last_response_time', r['response_time'])):
+                cases[column].append('WHEN %s THEN %s')
+                params[column].extend((site_id, value))
+            cases['failure_count'].append('WHEN %s THEN ' + ('%s' if reset else 'failure_count + %s'))
+            params['failure_count'].extend((site_id, trailing))
+
+        assignments = ', '.join(f"{column} = CASE id {' '.join(whens)} END" for column, whens in cases.items())
+        values = [value for column in cases for value in params[column]] + site_ids
+        cursor.execute(f"UPDATE site_monitoring SET {assignments} WHERE id IN ({placeholders})", values)
+        return changed
+
+    # ---- 汇总 ----
+
+    def rollup(self, now: datetime = None) -> int:
+        """
+        汇总到目前为止的拨测记录，返回写入的分钟桶数
+
+        从上次汇总位置（减去 ROLLUP_LATE_SECONDS）开始，按小时分段依次计算分钟、小时、天汇总；
+        首次运行时从已有分钟汇总的最后位置继续，没有汇总时从最早的原始记录开始补算。
+        """
+        self.ensure_tables()
+        with self._lock:
+            now = now or get_local_time()
+            start = self._rollup_start(now)
+            written = 0
+            chunk_start = floor_time(start, 'minute')
+            while chunk_start <= now:
+                chunk_end = min(floor_time(chunk_start, 'hour') + timedelta(hours=1), now + timedelta(minutes=1))
+                chunk_end = floor_time(chunk_end, 'minute')
+                if chunk_end <= chunk_start:
+                    chunk_end = chunk_start + timedelta(minutes=1)
+                written += self._rollup_minutes(chunk_start, chunk_end)
+                hour = floor_time(chunk_start, 'hour')
+                self._rollup_from('hour', 'minute', hour, hour + timedelta(hours=1))
+                day = floor_time(chunk_start, 'day')
+                self._rollup_from('day', 'hour', day, day + timedelta(days=1))
+                chunk_start = chunk_end
+            self._rolled_until = now
+            return written
+
+    def _rollup_start(self, now: datetime) -> datetime:
+        if self._rolled_until is not None:
+            return self._rolled_until - timedelta(seconds=ROLLUP_LATE_SECONDS)
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute(f"SELECT MAX(bucket_start) AS last FROM {ROLLUP_TABLES['minute']}")
+                last = cursor.fetchone()['last']
+                if last is not None:
+                    return last - timedelta(seconds=ROLLUP_LATE_SECONDS)
+                cursor.execute("SELECT MIN(check_time) AS first FROM site_monitoring_history")
+                first = cursor.fetchone()['first']
+        if first is None:
+            return now - timedelta(seconds=ROLLUP_LATE_SECONDS)
+        if RAW_RETENTION_DAYS:
+            first = max(first, now - timedelta(days=RAW_RETENTION_DAYS))
+        return first
+
+    def _rollup_minutes(self, start: datetime, end: datetime) -> int:
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    SELECT site_id, check_time, status, response_time
+                    FROM site_monitoring_history
+                    WHERE check_time >= %s AND check_time < %s
+                """, (start, end))
+                rows = cursor.fetchall()
+        buckets: Dict[Tuple[int, datetime], RollupAccumulator] = {}
+        for row in rows:
+            key = (row['site_id'], floor_time(row['check_time'], 'minute'))
+            accumulator = buckets.get(key)
+            if accumulator is None:
+                accumulator = buckets[key] = RollupAccumulator()
+            accumulator.add(row['status'], row['response_time'])
+        self._upsert('minute', [acc.to_row(site_id, bucket) for (site_id, bucket), acc in buckets.items()])
+        return len(buckets)
+
+    def _rollup_from(self, granularity: str, source: str, start: datetime, end: datetime) -> None:
+        """由下一级汇总合并出 [start, end) 内的汇总"""
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT * FROM {ROLLUP_TABLES[source]}
+                    WHERE bucket_start >= %s AND bucket_start < %s
+                """, (start, end))
+                rows = cursor.fetchall()
+        buckets: Dict[Tuple[int, datetime], RollupAccumulator] = {}
+        for row in rows:
+            key = (row['site_id'], floor_time(row['bucket_start'], granularity))
+            accumulator = buckets.get(key)
+            if accumulator is None:
+                accumulator = buckets[key] = RollupAccumulator()
+            accumulator.merge(row)
+        self._upsert(granularity, [acc.to_row(site_id, bucket) for (site_id, bucket), acc in buckets.items()])
+
+    def _upsert(self, granularity: str, rows: List[Tuple]) -> None:
+        if not rows:
+            return
+        columns = ', '.join(_ROLLUP_COLUMNS)
+        placeholders = ', '.join(['%s'] * len(_ROLLUP_COLUMNS))
+        updates = ', '.join(f'{c} = VALUES({c})' for c in _ROLLUP_COLUMNS[2:])
+        sql = (f"INSERT INTO {ROLLUP_TABLES[granularity]} ({columns}) VALUES ({placeholders}) "
+               f"ON DUPLICATE KEY UPDATE {updates}")
+        with database_transaction() as db:
+            with db.cursor() as cursor:
+                for offset in range(0, len(rows), 1000):
+                    cursor.executemany(sql, rows[offset:offset + 1000])
+
+    # ---- 清理 ----
+
+    def purge_expired(self, now: datetime = None) -> Dict[str, int]:
+        """按保留天数删除过期的原始记录和汇总（保留天数为0表示不清理）"""
+        self.ensure_tables()
+        now = now or get_local_time()
+        removed = {}
+        for name, table, column, days in (
+            ('history', 'site_monitoring_history', 'check_time', RAW_RETENTION_DAYS),
+            ('minute', ROLLUP_TABLES['minute'], 'bucket_start', MINUTE_RETENTION_DAYS),
+            ('hour', ROLLUP_TABLES['hour'], 'bucket_start', HOUR_RETENTION_DAYS),
+        ):
+            if days <= 0:
+                continue
+            removed[name] = self._delete_before(table, column, now - timedelta(days=days))
+        if any(removed.values()):
+            logger.info(f"清理过期站点拨测记录: {removed}")
+        return removed
+
+    @staticmethod
+    def _delete_before(table: str, column: str, cutoff: datetime) -> int:
+        total = 0
+        while True:
+            with database_transaction() as db:
+                with db.cursor() as cursor:
+                    deleted = cursor.execute(
+                        f"DELETE FROM {table} WHERE {column} < %s LIMIT {PURGE_BATCH_SIZE}", (cutoff,)
+                    )
+            total += deleted
+            if deleted < PURGE_BATCH_SIZE:
+                return total
+
+    # ---- 手动批量拨测任务 ----
+    # 任务记录保存在数据库中，gunicorn 多 worker 时任一进程都能查询其他进程启动的任务
+
+    def create_probe_job(self, site_ids: List[int]) -> Tuple[str, bool]:
+        """
+        创建批量拨测任务，返回 (任务ID, 是否新建)
+
+        已有未超时的进行中任务时直接返回该任务，避免重复点击叠加多轮拨测。
+        """
+        self.ensure_tables()
+        now = get_local_time()
+        with database_transaction() as db:
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    SELECT id FROM site_monitoring_probe_jobs
+                    WHERE status = 'running' AND created_at >= %s
+                    ORDER BY created_at DESC LIMIT 1 FOR UPDATE
+                """, (now - timedelta(seconds=PROBE_JOB_TIMEOUT_SECONDS),))
+                running = cursor.fetchone()
+                if running:
+                    return running['id'], False
+                cursor.execute("DELETE FROM site_monitoring_probe_jobs WHERE created_at < %s",
+                               (now - timedelta(days=PROBE_JOB_RETENTION_DAYS),))
+                job_id = uuid.uuid4().hex
+                cursor.execute("""
+                    INSERT INTO site_monitoring_probe_jobs (id, status, site_ids, total, created_at)
+                    VALUES (%s, 'running', %s, %s, %s)
+                """, (job_id, json.dumps(site_ids), len(site_ids), now))
+        return job_id, True
+
+    def finish_probe_job(self, job_id: str, results: List[Dict[str, Any]] = None, error: str = None) -> None:
+        """记录任务结束（results 为空且 error 不为空时记为失败）"""
+        online = sum(1 for r in results if r['status'] == 'online') if results is not None else None
+        with database_transaction() as db:
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE site_monitoring_probe_jobs
+                    SET status = %s, online = %s, error_message = %s, finished_at = %s
+                    WHERE id = %s
+                """, ('failed' if error else 'done', online, error[:500] if error else None,
+                      get_local_time(), job_id))
+
+    def get_probe_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """读取任务，超时未结束的进行中任务按失败返回"""
+        self.ensure_tables()
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute("SELECT * FROM site_monitoring_probe_jobs WHERE id = %s", (job_id,))
+                job = cursor.fetchone()
+        if job is None:
+            return None
+        job['site_ids'] = json.loads(job['site_ids'])
+        if job['status'] == 'running' and \
+                get_local_time() - job['created_at'] > timedelta(seconds=PROBE_JOB_TIMEOUT_SECONDS):
+            job['status'] = 'failed'
+            job['error_message'] = '任务超时未完成'
+        return job
+
+    def get_latest_status(self, site_ids: List[int], history_limit: int = RECENT_HISTORY_LIMIT) -> List[Dict[str, Any]]:
+        """读取站点已保存的当前状态，每个站点附带最近 history_limit 条拨测记录（recent_history）"""
+        if not site_ids:
+            return []
+        placeholders = ', '.join(['%s'] * len(site_ids))
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT id, site_name, site_url, enabled, status, last_check_time, last_response_time,
+                           failure_count
+                    FROM site_monitoring WHERE id IN ({placeholders}) ORDER BY id
+                """, site_ids)
+                sites = cursor.fetchall()
+                # 每个站点一段 LIMIT 子查询，走 (site_id, check_time) 索引
+                parts = ' UNION ALL '.join(
+                    "(SELECT site_id, check_time, status, response_time, http_code, error_message "
+                    "FROM site_monitoring_history WHERE site_id = %s ORDER BY check_time DESC LIMIT %s)"
+                    for _ in sites
+                )
+                history: Dict[int, List[Dict[str, Any]]] = {site['id']: [] for site in sites}
+                if parts:
+                    cursor.execute(parts, [value for site in sites for value in (site['id'], history_limit)])
+                    for row in cursor.fetchall():
+                        history[row['site_id']].append(row)
+        for site in sites:
+            site['recent_history'] = sorted(history[site['id']], key=lambda row: row['check_time'], reverse=True)
+        return sites
+
+    # ---- 查询 ----
+
+    def get_raw(self, site_id: int, start: datetime = None, end: datetime = None,
+                limit: int = 20, offset: int = 0) -> Tuple[List[Dict[str, Any]], int]:
+        """分页读取原始记录，返回 (记录, 总数)"""
+        conditions, params = self._range_conditions('check_time', site_id, start, end)
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT * FROM site_monitoring_history
+                    WHERE {conditions}
+                    ORDER BY check_time DESC
+                    LIMIT %s OFFSET %s
+                """, params + [limit, offset])
+                rows = cursor.fetchall()
+                if offset == 0 and len(rows) < limit:
+                    total = len(rows)
+                else:
+                    cursor.execute(f"SELECT COUNT(*) AS total FROM site_monitoring_history WHERE {conditions}", params)
+                    total = cursor.fetchone()['total']
+        return rows, total
+
+    def get_rollups(self, site_ids: Iterable[int], granularity: str, start: datetime = None,
+                    end: datetime = None) -> List[Dict[str, Any]]:
+        """读取汇总记录（按站点、时间升序），每行附加 up_ratio 和 avg_response_time"""
+        site_ids = list(site_ids)
+        if not site_ids:
+            return []
+        self.ensure_tables()
+        placeholders = ', '.join(['%s'] * len(site_ids))
+        conditions = [f'site_id IN ({placeholders})']
+        params: List[Any] = list(site_ids)
+        if start is not None:
+            conditions.append('bucket_start >= %s')
+            params.append(floor_time(start, granularity))
+        if end is not None:
+            conditions.append('bucket_start < %s')
+            params.append(end)
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT * FROM {ROLLUP_TABLES[granularity]}
+                    WHERE {' AND '.join(conditions)}
+                    ORDER BY site_id, bucket_start
+                """, params)
+                rows = cursor.fetchall()
+        for row in rows:
+            row['up_ratio'] = round(row['up_count'] / row['check_count'], 4) if row['check_count'] else None
+            row['avg_response_time'] = (
+                int(row['latency_sum'] / row['latency_count']) if row['latency_count'] else None
+            )
+        return rows
+
+    def get_sla(self, site_ids: Iterable[int], start: datetime, end: datetime,
+                quantiles: Tuple[float, ...] = (0.5, 0.9, 0.99)) -> Dict[int, Dict[str, Any]]:
+        """
+        计算站点在 [start, end) 内的SLA：可用率、响应时间分位数和故障时段
+
+        时间范围拆分为整天、整小时和剩余分钟三类区段，分别读取天/小时/分钟汇总
+        （最多三次查询），合并直方图得到分位数；超出汇总保留期的区段退回到更粗的粒度。
+        """
+        site_ids = list(site_ids)
+        if not site_ids or end <= start:
+            return {}
+        self.ensure_tables()
+        rows_by_site: Dict[int, List[Tuple[datetime, datetime, Dict[str, Any]]]] = {site_id: [] for site_id in site_ids}
+        placeholders = ', '.join(['%s'] * len(site_ids))
+        segments = split_range(start, end, get_local_time())
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                for granularity in GRANULARITIES:
+                    ranges = [(s, e) for g, s, e in segments if g == granularity]
+                    if not ranges:
+                        continue
+                    range_sql = ' OR '.join(['(bucket_start >= %s AND bucket_start < %s)'] * len(ranges))
+                    cursor.execute(f"""
+                        SELECT * FROM {ROLLUP_TABLES[granularity]}
+                        WHERE site_id IN ({placeholders}) AND ({range_sql})
+                    """, list(site_ids) + [value for pair in ranges for value in pair])
+                    size = timedelta(seconds=_BUCKET_SECONDS[granularity])
+                    for row in cursor.fetchall():
+                        rows_by_site[row['site_id']].append((row['bucket_start'], row['bucket_start'] + size, row))
+
+        report = {}
+        for site_id, buckets in rows_by_site.items():
+            buckets.sort(key=lambda item: item[0])
+            accumulator = RollupAccumulator()
+            for _, _, row in buckets:
+                accumulator.merge(row)
+            incidents = find_incidents(buckets, start, end)
+            report[site_id] = {
+                'checks': accumulator.check_count,
+                'up_checks': accumulator.up_count,
+                'timeout_checks': accumulator.timeout_count,
+                'error_checks': accumulator.error_count,
+                'uptime': (
+                    round(accumulator.up_count * 100 / accumulator.check_count, 4)
+                    if accumulator.check_count else None
+                ),
+                'avg_response_time': (
+                    int(accumulator.latency_sum / accumulator.latency_count) if accumulator.latency_count else None
+                ),
+                'min_response_time': accumulator.latency_min,
+                'max_response_time': accumulator.latency_max,
+                **{f'p{int(q * 100)}': value for q, value in zip(quantiles, accumulator.percentiles(quantiles))},
+                'incidents': incidents,
+                'incident_count': len(incidents),
+                'downtime_seconds': sum(incident['duration_seconds'] for incident in incidents)
+            }
+        return report
+
+    @staticmethod
+    def _range_conditions(column: str, site_id: int, start: Optional[datetime],
+                          end: Optional[datetime]) -> Tuple[str, List[Any]]:
+        conditions = ['site_id = %s']
+        params: List[Any] = [site_id]
+        if start is not None:
+            conditions.append(f'{column} >= %s')
+            params.append(start)
+        if end is not None:
+            conditions.append(f'{column} < %s')
+            params.append(end)
+        return ' AND '.join(conditions), params
+
+def ceil_time(value: datetime, granularity: str) -> datetime:
+    """时间向上取整到桶边界"""
+    floored = floor_time(value, granularity)
+    if floored == value:
+        return value
+    return floored + timedelta(seconds=_BUCKET_SECONDS[granularity])
+
+_RETENTION_DAYS = {'minute': MINUTE_RETENTION_DAYS, 'hour': HOUR_RETENTION_DAYS, 'day': 0}
+
+def split_range(start: datetime, end: datetime, now: datetime) -> List[Tuple[str, datetime, datetime]]:
+    """
+    把 [start, end) 拆成 (粒度, 区段开始, 区段结束) 列表：中间的整天用天汇总，
+    两端的整小时用小时汇总，其余用分钟汇总；区段早于该粒度汇总的保留期时扩大到更粗的粒度，
+    返回的区段互不重叠
+    """
+    def split(granularity: str, seg_start: datetime, seg_end: datetime) -> List[Tuple[str, datetime, datetime]]:
+        if seg_start >= seg_end:
+            return []
+        if granularity == 'minute':
+            return [('minute', floor_time(seg_start, 'minute'), seg_end)]
+        finer = GRANULARITIES[GRANULARITIES.index(granularity) - 1]
+        inner_start = ceil_time(seg_start, granularity)
+        inner_end = floor_time(seg_end, granularity)
+        if inner_start >= inner_end:
+            return split(finer, seg_start, seg_end)
+        return (split(finer, seg_start, inner_start) + [(granularity, inner_start, inner_end)]
+                + split(finer, inner_end, seg_end))
+
+    escalated = []
+    for granularity, seg_start, seg_end in split('day', start, end):
+        # 超出保留期的细粒度汇总已被清理，扩大到包含该区段的更粗粒度桶
+        while _RETENTION_DAYS[granularity] and seg_start < now - timedelta(days=_RETENTION_DAYS[granularity]):
+            granularity = GRANULARITIES[GRANULARITIES.index(granularity) + 1]
+            seg_start, seg_end = floor_time(seg_start, granularity), ceil_time(seg_end, granularity)
+        escalated.append((granularity, seg_start, seg_end))
+
+    # 扩大后的区段可能覆盖相邻的细粒度区段，先放粗粒度，细粒度只保留未被覆盖的部分，
+    # 避免同一时段被统计两次（细粒度桶边界总是粗粒度桶边界的细分，裁剪后仍然对齐）
+    segments: List[Tuple[str, datetime, datetime]] = []
+    for granularity, seg_start, seg_end in sorted(escalated, key=lambda item: -GRANULARITIES.index(item[0])):
+        pieces = [(seg_start, seg_end)]
+        for _, covered_start, covered_end in segments:
+            pieces = [
+                (piece_start, piece_end)
+                for old_start, old_end in pieces
+                for piece_start, piece_end in ((old_start, min(old_end, covered_start)),
+                                               (max(old_start, covered_end), old_end))
+                if piece_start < piece_end
+            ]
+        segments.extend((granularity, piece_start, piece_end) for piece_start, piece_end in pieces)
+    return sorted(segments, key=lambda item: item[1])
+
+def find_incidents(buckets: List[Tuple[datetime, datetime, Dict[str, Any]]], start: datetime,
+                   end: datetime) -> List[Dict[str, Any]]:
+    """
+    由按时间排序的汇总桶找出故障时段
+
+    多数拨测失败的桶视为故障；连续的故障桶（中间没有拨测的空档也算在内）合并为一个时段，
+    时段从第一个故障桶开始，到下一个正常桶开始（或查询范围结束）为止。
+    """
+    incidents = []
+    current = None
+    for bucket_start, _, row in buckets:
+        down = row['check_count'] and row['up_count'] * 2 < row['check_count']
+        if down:
+            if current is None:
+                current = {'start': max(bucket_start, start), 'end': None, 'checks': 0, 'failed_checks': 0}
+            current['checks'] += row['check_count']
+            current['failed_checks'] += row['check_count'] - row['up_count']
+        elif current is not None and row['check_count']:
+            current['end'] = bucket_start
+            incidents.append(current)
+            current = None
+    if current is not None:
+        current['end'] = end
+        current['ongoing'] = True
+        incidents.append(current)
+    for incident in incidents:
+        incident.setdefault('ongoing', False)
+        incident['end'] = min(incident['end'], end)
+        incident['duration_seconds'] = int((incident['end'] - incident['start']).total_seconds())
+    return incidents
+
+def choose_granularity(start: datetime, end: datetime, max_points: int = 1500) -> str:
+    """按时间范围选择汇总粒度，使返回的点数不超过 max_points"""
+    seconds = max(0.0, (end - start).total_seconds())
+    for granularity in GRANULARITIES:
+        if seconds / _BUCKET_SECONDS[granularity] <= max_points:
+            return granularity
+    return 'day'
+
+# 全局拨测历史存储
+site_history_store = SiteHistoryStore()
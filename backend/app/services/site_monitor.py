@@ -0,0 +1,340 @@
+"""
+站点监控调度器
+
+后台事件循环线程按每个站点的 check_interval 定时拨测启用的站点：
+- 以下次到期时间为键的最小堆调度，每次调度加入随机抖动，避免站点集中在同一时刻拨测
+- 并发拨测数可配置，单个站点使用自己的 timeout，慢站点不阻塞其他站点
+- 拨测请求由 SiteProbeClient 发出（长连接、DNS缓存、分阶段计时，见 site_probe）
+- 拨测结果缓冲后批量写入 site_monitoring_history 并更新 site_monitoring 的状态字段，
+  接口只读取已保存的结果；定期汇总和清理历史记录（见 site_history）
+
+站点增删改后调用 site_monitor_scheduler.refresh() 立即重新加载，另有定时全量重新加载兜底。
+"""
+import asyncio
+import heapq
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.services.site_history import get_local_time, site_history_store
+from app.services.site_probe import ProbeEventLoop, SiteProbeClient
+from app.utils.db_context import database_connection
+from app.utils.leader_lock import LeaderLock
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 从未拨测过的站点在启动后该秒数内分散开始
+STARTUP_SPREAD_SECONDS = 10
+
+class SiteMonitorScheduler:
+    """站点拨测调度器"""
+
+    def __init__(self, concurrency: int = None, jitter: float = None, reload_interval: int = None,
+                 min_interval: int = None, keepalive: int = None, flush_interval: float = None,
+                 flush_size: int = None, rollup_interval: int = None):
+        self.concurrency = concurrency or int(os.getenv('SITE_MONITOR_CONCURRENCY', '50'))
+        self.jitter = jitter if jitter is not None else float(os.getenv('SITE_MONITOR_JITTER', '0.1'))
+        self.reload_interval = reload_interval or int(os.getenv('SITE_MONITOR_RELOAD_INTERVAL', '60'))
+        self.min_interval = min_interval or int(os.getenv('SITE_MONITOR_MIN_INTERVAL', '10'))
+        self.flush_interval = flush_interval or float(os.getenv('SITE_MONITOR_FLUSH_INTERVAL', '2'))
+        self.flush_size = flush_size or int(os.getenv('SITE_MONITOR_FLUSH_SIZE', '200'))
+        self.rollup_interval = rollup_interval or int(os.getenv('SITE_MONITOR_ROLLUP_INTERVAL', '60'))
+        self._client = SiteProbeClient(self.concurrency, keepalive=keepalive)
+        self.engine = self._client.engine
+        self.running = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # 以下状态只在事件循环线程中访问
+        self._sites: Dict[int, Dict[str, Any]] = {}
+        self._heap: List[tuple] = []
+        self._due: Dict[int, float] = {}
+        self._inflight: set = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._reload_at = 0.0
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._maintenance_at = 0.0
+        self._purge_at = 0.0
+        self._stats = {'checks': 0, 'failures': 0, 'timeouts': 0, 'reloads': 0, 'max_lag': 0.0,
+                       'flushes': 0, 'rows_written': 0}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                ready = threading.Event()
+                self._thread = threading.Thread(target=self._run_loop, args=(ready,),
+                                                name='site-monitor-loop', daemon=True)
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def _run_loop(self, ready: threading.Event) -> None:
+        self._loop = ProbeEventLoop()
+        asyncio.set_event_loop(self._loop)
+        self._wake = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(max(1, self.concurrency))
+        ready.set()
+        self._loop.run_forever()
+
+    def start(self) -> None:
+        loop = self._ensure_loop()
+        if self.running:
+            return
+        self.running = True
+        asyncio.run_coroutine_threadsafe(self._start(), loop).result()
+        logger.info(f"站点监控调度已启动，并发 {self.concurrency}，引擎 {self.engine}")
+
+    async def _start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        self.running = False
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    def refresh(self) -> None:
+        """站点配置变更后通知调度器重新加载"""
+        if self.running and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._request_reload)
+
+    def _request_reload(self) -> None:
+        self._reload_at = 0.0
+        self._wake.set()
+
+    def check_sites(self, sites: List[Dict[str, Any]], record: bool = True) -> List[Dict[str, Any]]:
+        """
+        立即并发拨测指定站点（阻塞直到全部完成），结果顺序与 sites 一致
+
+        Args:
+            record: 是否保存结果（写入历史并更新站点状态）
+        """
+        if not sites:
+            return []
+        loop = self._ensure_loop()
+        timeout = max(int(site.get('timeout') or 30) for site in sites)
+        future = asyncio.run_coroutine_threadsafe(self._check_many(sites, record), loop)
+        return future.result(timeout=timeout * (len(sites) // self.concurrency + 1) + 30)
+
+    def start_check_job(self, job_id: str, sites: List[Dict[str, Any]]) -> None:
+        """在后台并发拨测指定站点并保存结果，结束后更新批量拨测任务（见 site_history_store.create_probe_job）"""
+        loop = self._ensure_loop()
+        asyncio.run_coroutine_threadsafe(self._check_job(job_id, sites), loop)
+
+    async def _check_job(self, job_id: str, sites: List[Dict[str, Any]]) -> None:
+        results, error = None, None
+        try:
+            results = await self._check_many(sites, record=False)
+            if not await self._record(results):
+                error = '保存拨测结果失败'
+        except Exception as e:
+            logger.error(f"批量拨测任务 {job_id} 失败: {e}")
+            error = str(e) or e.__class__.__name__
+        try:
+            await self._loop.run_in_executor(None, site_history_store.finish_probe_job, job_id, results, error)
+        except Exception as e:
+            logger.error(f"更新批量拨测任务 {job_id} 失败: {e}")
+
+    async def _check_many(self, sites: List[Dict[str, Any]], record: bool) -> List[Dict[str, Any]]:
+        results = await asyncio.gather(*(self._check(site) for site in sites))
+        if record:
+            await self._record(results)
+        for site in sites:
+            # 手动拨测后顺延该站点的下次定时拨测
+            if site['id'] in self._sites:
+                self._schedule(site['id'], time.monotonic() + self._interval(site))
+        return results
+
+    async def _check(self, site: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._semaphore:
+            check_time = get_local_time()
+            result = await self._client.probe(site)
+        self._stats['checks'] += 1
+        if result['status'] != 'online':
+            self._stats['failures'] += 1
+        if result['status'] == 'timeout':
+            self._stats['timeouts'] += 1
+        return {**result, 'site_id': site['id'], 'check_time': check_time}
+
+    async def _record(self, results: List[Dict[str, Any]]) -> bool:
+        try:
+            await self._loop.run_in_executor(None, site_history_store.record_results, results)
+            self._stats['flushes'] += 1
+            self._stats['rows_written'] += len(results)
+            return True
+        except Exception as e:
+            logger.error(f"保存站点拨测结果失败: {e}")
+            return False
+
+    def _buffer(self, result: Dict[str, Any]) -> None:
+        """定时拨测结果先缓冲，攒够 flush_size 条或每 flush_interval 秒批量写入"""
+        self._pending.append(result)
+        if len(self._pending) >= self.flush_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending or (self._flush_task is not None and not self._flush_task.done()):
+            return
+        results, self._pending = self._pending, []
+        self._flush_task = asyncio.ensure_future(self._record(results))
+
+    async def _flush_loop(self) -> None:
+        while self.running:
+            await asyncio.sleep(self.flush_interval)
+            self._flush()
+        if self._flush_task is not None:
+            await self._flush_task
+        self._flush()
+        if self._flush_task is not None:
+            await self._flush_task
+
+    def _maintain(self, now: float) -> None:
+        """定期在后台汇总历史记录，每小时清理一次过期数据"""
+        if now < self._maintenance_at or (self._maintenance_task is not None and not self._maintenance_task.done()):
+            return
+        self._maintenance_at = now + self.rollup_interval
+        purge = now >= self._purge_at
+        if purge:
+            self._purge_at = now + 3600
+        self._maintenance_task = asyncio.ensure_future(self._loop.run_in_executor(None, self._run_maintenance, purge))
+
+    @staticmethod
+    def _run_maintenance(purge: bool) -> None:
+        try:
+            site_history_store.rollup()
+            if purge:
+                site_history_store.purge_expired()
+        except Exception as e:
+            logger.error(f"站点拨测历史汇总失败: {e}")
+
+    def _interval(self, site: Dict[str, Any]) -> float:
+        return max(self.min_interval, int(site.get('check_interval') or 300))
+
+    def _jittered(self, interval: float) -> float:
+        spread = interval * self.jitter
+        return interval + random.uniform(-spread, spread)
+
+    def _schedule(self, site_id: int, due: float) -> None:
+        self._due[site_id] = due
+        heapq.heappush(self._heap, (due, site_id))
+
+    async def _reload(self) -> None:
+        """从数据库加载启用的站点，增量更新调度"""
+        def load():
+            site_history_store.ensure_tables()
+            with database_connection() as db:
+                with db.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT id, site_name, site_url, check_interval, timeout, reuse_connection, last_check_time
+                        FROM site_monitoring WHERE enabled = 1
+                    """)
+                    return cursor.fetchall()
+
+        rows = await self._loop.run_in_executor(None, load)
+        self._stats['reloads'] += 1
+        now = time.monotonic()
+        local_now = get_local_time()
+        sites = {row['id']: row for row in rows}
+
+        for site_id in list(self._sites):
+            if site_id not in sites:
+                # 已删除或停用的站点：堆中剩余条目在弹出时跳过
+                del self._sites[site_id]
+                self._due.pop(site_id, None)
+
+        for site_id, site in sites.items():
+            current = self._sites.get(site_id)
+            self._sites[site_id] = site
+            if current is None:
+                # 新站点：按上次拨测时间接续，从未拨测的在短时间内分散开始
+                interval = self._interval(site)
+                if site['last_check_time']:
+                    elapsed = (local_now - site['last_check_time']).total_seconds()
+                    delay = max(0.0, interval - elapsed) + random.uniform(0, interval * self.jitter)
+                else:
+                    delay = random.uniform(0, min(interval, STARTUP_SPREAD_SECONDS))
+                self._schedule(site_id, now + delay)
+            elif (current['site_url'], current['check_interval'], current['timeout'], current['reuse_connection']) != \
+                    (site['site_url'], site['check_interval'], site['timeout'], site['reuse_connection']):
+                # 配置变更后尽快按新配置拨测
+                self._schedule(site_id, now + random.uniform(0, 1))
+
+    async def _run(self) -> None:
+        self._reload_at = 0.0
+        flusher = asyncio.ensure_future(self._flush_loop())
+        while self.running:
+            try:
+                now = time.monotonic()
+                if now >= self._reload_at:
+                    self._reload_at = now + self.reload_interval
+                    await self._reload()
+                self._dispatch_due(now)
+                self._maintain(now)
+            except Exception as e:
+                logger.error(f"站点监控调度循环异常: {e}")
+
+            wait = self._reload_at - time.monotonic()
+            if self._heap and len(self._inflight) < self.concurrency:
+                wait = min(wait, self._heap[0][0] - time.monotonic())
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, wait))
+            except asyncio.TimeoutError:
+                pass
+
+        await flusher
+        await self._client.close()
+
+    def _dispatch_due(self, now: float) -> None:
+        """弹出所有已到期的站点并启动拨测（正在拨测的站点不重复启动）"""
+        while self._heap and self._heap[0][0] <= now and len(self._inflight) < self.concurrency:
+            due, site_id = heapq.heappop(self._heap)
+            if self._due.get(site_id) != due or site_id not in self._sites:
+                continue  # 已被重新调度或站点已移除
+            site = self._sites[site_id]
+            self._stats['max_lag'] = max(self._stats['max_lag'], round(now - due, 3))
+            next_due = due + self._jittered(self._interval(site))
+            if next_due <= now:
+                # 落后超过一个周期（例如长时间阻塞），从当前时间重新计算
+                next_due = now + self._jittered(self._interval(site))
+            self._schedule(site_id, next_due)
+            if site_id in self._inflight:
+                continue
+            self._inflight.add(site_id)
+            asyncio.ensure_future(self._scheduled_check(site))
+
+    async def _scheduled_check(self, site: Dict[str, Any]) -> None:
+        try:
+            self._buffer(await self._check(site))
+        finally:
+            self._inflight.discard(site['id'])
+            self._wake.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self.running,
+            'engine': self.engine,
+            'concurrency': self.concurrency,
+            'sites': len(self._sites),
+            'inflight': len(self._inflight),
+            **self._stats
+        }
+
+# 全局站点监控调度器
+site_monitor_scheduler = SiteMonitorScheduler()
+# 多进程部署时只有持有锁的进程拨测
+site_monitor_leader = LeaderLock('site_monitor', site_monitor_scheduler.start, site_monitor_scheduler.stop)
+
+def start_site_monitor_scheduler(app=None) -> None:
+    """启动后台站点拨测（SITE_MONITOR_ENABLED=false 时不启动），由获得选主锁的进程执行"""
+    enabled = os.getenv('SITE_MONITOR_ENABLED', 'true').lower() == 'true'
+    if app is not None:
+        enabled = app.config.get('SITE_MONITOR_ENABLED', enabled)
+    if enabled:
+        site_monitor_leader.start()
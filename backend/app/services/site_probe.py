@@ -0,0 +1,261 @@
+"""
+站点拨测HTTP客户端
+
+- 复用连接池中的长连接，DNS 解析结果按 TTL 缓存；站点可关闭连接复用（reuse_connection=0），
+  此时每次拨测新建连接且不使用DNS缓存，用于测量冷启动耗时
+- 收到响应头后按块读取并丢弃响应体（最多 MAX_BODY_BYTES，超出则关闭连接），不在内存中保留
+- 分别记录 DNS 解析、TCP 连接、TLS 握手和首字节（TTFB）耗时，复用连接时前三项为空
+
+aiohttp 通过 TraceConfig 记录 DNS、建连和请求阶段；TLS 握手在 aiohttp 建好 TCP 连接后调用
+loop.create_connection(sock=..., ssl=...) 完成，拨测事件循环在这里单独计时。
+未安装 aiohttp 时退回 requests 会话，只记录 TTFB。
+"""
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.logger import get_logger
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+USER_AGENT = 'Site-Monitor/1.0'
+CHUNK_SIZE = 64 * 1024
+MAX_BODY_BYTES = int(os.getenv('SITE_MONITOR_MAX_BODY_BYTES', str(1024 * 1024)))
+
+# 当前拨测的阶段计时，由 trace 回调和事件循环写入
+_current_timings: contextvars.ContextVar[Optional['_Timings']] = contextvars.ContextVar(
+    'site_probe_timings', default=None
+)
+
+def _ms(seconds: Optional[float]) -> Optional[int]:
+    return None if seconds is None else int(round(seconds * 1000))
+
+def check_result(status: str, response_time: int = None, http_code: int = None,
+                 error_message: str = None, **timings) -> Dict[str, Any]:
+    return {
+        'status': status,
+        'response_time': response_time,
+        'http_code': http_code,
+        'error_message': error_message,
+        'dns_time': timings.get('dns_time'),
+        'connect_time': timings.get('connect_time'),
+        'tls_time': timings.get('tls_time'),
+        'ttfb': timings.get('ttfb'),
+        'connection_reused': timings.get('connection_reused')
+    }
+
+class _Timings:
+    """一次拨测（含重定向）各阶段耗时，单位秒"""
+
+    __slots__ = ('dns', 'connection', 'tls', 'ttfb', 'reused', '_marks')
+
+    def __init__(self):
+        self.dns = 0.0
+        self.connection = 0.0
+        self.tls = 0.0
+        self.ttfb: Optional[float] = None
+        self.reused: Optional[bool] = None
+        self._marks: Dict[str, float] = {}
+
+    def start(self, name: str) -> None:
+        self._marks[name] = time.monotonic()
+
+    def elapsed(self, name: str) -> float:
+        started = self._marks.pop(name, None)
+        return 0.0 if started is None else time.monotonic() - started
+
+    def as_fields(self) -> Dict[str, Any]:
+        if self.reused:
+            fields = {'dns_time': None, 'connect_time': None, 'tls_time': None}
+        else:
+            fields = {
+                'dns_time': _ms(self.dns),
+                # 建连阶段包含DNS解析和TLS握手，单独扣除
+                'connect_time': _ms(max(0.0, self.connection - self.dns - self.tls)),
+                'tls_time': _ms(self.tls) if self.tls else None
+            }
+        return {**fields, 'ttfb': _ms(self.ttfb), 'connection_reused': self.reused}
+
+class ProbeEventLoop(asyncio.SelectorEventLoop):
+    """拨测事件循环：对已连接套接字上的 TLS 握手单独计时"""
+
+    async def create_connection(self, protocol_factory, host=None, port=None, *, ssl=None, sock=None, **kwargs):
+        timings = _current_timings.get()
+        if timings is None or sock is None or not ssl:
+            return await super().create_connection(protocol_factory, host, port, ssl=ssl, sock=sock, **kwargs)
+        started = time.monotonic()
+        try:
+            return await super().create_connection(protocol_factory, host, port, ssl=ssl, sock=sock, **kwargs)
+        finally:
+            timings.tls += time.monotonic() - started
+
+def _trace_config():
+    """aiohttp 阶段计时回调"""
+    async def dns_start(session, ctx, params):
+        _current_timings.get().start('dns')
+
+    async def dns_end(session, ctx, params):
+        timings = _current_timings.get()
+        timings.dns += timings.elapsed('dns')
+
+    async def connection_start(session, ctx, params):
+        _current_timings.get().start('connection')
+
+    async def connection_end(session, ctx, params):
+        timings = _current_timings.get()
+        timings.connection += timings.elapsed('connection')
+        timings.reused = False
+
+    async def connection_reused(session, ctx, params):
+        timings = _current_timings.get()
+        if timings.reused is None:
+            timings.reused = True
+
+    async def headers_sent(session, ctx, params):
+        _current_timings.get().start('ttfb')
+
+    async def request_end(session, ctx, params):
+        timings = _current_timings.get()
+        timings.ttfb = timings.elapsed('ttfb')
+
+    config = aiohttp.TraceConfig()
+    config.on_dns_resolvehost_start.append(dns_start)
+    config.on_dns_resolvehost_end.append(dns_end)
+    config.on_connection_create_start.append(connection_start)
+    config.on_connection_create_end.append(connection_end)
+    config.on_connection_reuseconn.append(connection_reused)
+    config.on_request_headers_sent.append(headers_sent)
+    config.on_request_end.append(request_end)
+    return config
+
+def perform_site_check(site: Dict[str, Any], session: requests.Session = None) -> Dict[str, Any]:
+    """执行站点检查（同步版本，流式读取并丢弃响应体）"""
+    try:
+        start_time = time.time()
+
+        # 发送HTTP请求，收到响应头后流式读取响应体
+        headers = {'User-Agent': USER_AGENT}
+        if session is None:
+            headers['Connection'] = 'close'
+        response = (session or requests).get(
+            site['site_url'],
+            timeout=site['timeout'],
+            headers=headers,
+            stream=True
+        )
+        try:
+            ttfb = response.elapsed.total_seconds()
+            received = 0
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                received += len(chunk)
+                if received >= MAX_BODY_BYTES:
+                    break
+        finally:
+            response.close()
+
+        response_time = int((time.time() - start_time) * 1000)  # 转换为毫秒
+
+        # 判断状态
+        status = 'online' if response.status_code == 200 else 'offline'
+        return check_result(status, response_time, response.status_code, ttfb=_ms(ttfb))
+
+    except requests.exceptions.Timeout:
+        return check_result('timeout', error_message='请求超时')
+    except requests.exceptions.ConnectionError:
+        return check_result('offline', error_message='连接失败')
+    except Exception as e:
+        return check_result('error', error_message=str(e))
+
+class SiteProbeClient:
+    """
+    拨测客户端，probe() 必须在 ProbeEventLoop 中调用
+
+    长连接会话和DNS缓存在同一事件循环内共享；关闭复用的站点每次使用独立的一次性会话。
+    """
+
+    def __init__(self, concurrency: int, keepalive: int = None, dns_ttl: int = None):
+        self.concurrency = concurrency
+        self.keepalive = keepalive or int(os.getenv('SITE_MONITOR_KEEPALIVE', '60'))
+        self.dns_ttl = dns_ttl or int(os.getenv('SITE_MONITOR_DNS_CACHE_TTL', '300'))
+        self.engine = 'aiohttp' if AIOHTTP_AVAILABLE else 'requests'
+        self._session = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._requests_session: Optional[requests.Session] = None
+
+    async def probe(self, site: Dict[str, Any]) -> Dict[str, Any]:
+        reuse = site.get('reuse_connection', 1) not in (0, False)
+        if not AIOHTTP_AVAILABLE:
+            executor = self._thread_pool()
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, perform_site_check, site, self._requests_session if reuse else None
+            )
+        if reuse:
+            return await self._probe(self._pooled_session(), site)
+        # 冷启动测量：新建连接、不使用DNS缓存
+        connector = aiohttp.TCPConnector(force_close=True, use_dns_cache=False, limit=1)
+        async with self._new_session(connector) as session:
+            return await self._probe(session, site)
+
+    async def _probe(self, session, site: Dict[str, Any]) -> Dict[str, Any]:
+        """判定规则与 perform_site_check 一致"""
+        timings = _Timings()
+        token = _current_timings.set(timings)
+        started = time.monotonic()
+        try:
+            async with session.get(site['site_url'], timeout=aiohttp.ClientTimeout(total=site['timeout'])) as response:
+                received = 0
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    received += len(chunk)
+                    if received >= MAX_BODY_BYTES:
+                        # 响应体过大时不再读取，关闭连接
+                        response.close()
+                        break
+                response_time = int((time.monotonic() - started) * 1000)
+                status = 'online' if response.status == 200 else 'offline'
+                return check_result(status, response_time, response.status, **timings.as_fields())
+        except asyncio.TimeoutError:
+            return check_result('timeout', error_message='请求超时', **timings.as_fields())
+        except aiohttp.ClientConnectionError:
+            return check_result('offline', error_message='连接失败', **timings.as_fields())
+        except Exception as e:
+            return check_result('error', error_message=str(e) or e.__class__.__name__)
+        finally:
+            _current_timings.reset(token)
+
+    def _new_session(self, connector):
+        return aiohttp.ClientSession(connector=connector, headers={'User-Agent': USER_AGENT},
+                                     trace_configs=[_trace_config()])
+
+    def _pooled_session(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=self.keepalive,
+                                             ttl_dns_cache=self.dns_ttl)
+            self._session = self._new_session(connector)
+        return self._session
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='site-probe')
+            self._requests_session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.concurrency, pool_maxsize=self.concurrency)
+            self._requests_session.mount('http://', adapter)
+            self._requests_session.mount('https://', adapter)
+        return self._executor
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
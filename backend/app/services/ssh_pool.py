@@ -0,0 +1,307 @@
+"""
+SSH会话池
+
+按 (主机, 端口, 用户名) 缓存已认证的 paramiko Transport，每次操作在已有连接上新开通道，
+避免每个动作都重新握手和密码认证：
+- 复用前检查连接是否存活，开通道失败时丢弃旧连接并重连一次
+- 每个主机限制同时使用的会话数（OpenSSH 默认 MaxSessions=10）
+- 后台线程关闭空闲超时的连接
+- 密码变更后不复用旧连接；被替换的旧连接等借用它的会话全部归还后再关闭
+
+用法:
+    with ssh_session(ip, port, username, password) as ssh:
+        stdin, stdout, stderr = ssh.exec_command('docker ps')
+        output = stdout.read().decode()
+"""
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import paramiko
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 连接空闲超过该秒数后，复用前先做健康检查
+HEALTH_CHECK_IDLE_SECONDS = 5
+
+class SSHPoolError(Exception):
+    """获取SSH会话失败（例如等待会话槽位超时）"""
+
+def _secret_digest(password: Optional[str]) -> str:
+    return hashlib.sha256((password or '').encode('utf-8')).hexdigest()
+
+class PooledSSHSession:
+    """
+    一次借用的SSH会话
+
+    提供与 paramiko.SSHClient 相同签名的 exec_command，每条命令开一个新通道；
+    归还时关闭本次打开的所有通道，底层连接保留在池中。
+    """
+
+    def __init__(self, transport: paramiko.Transport, hostname: str):
+        self.transport = transport
+        self.hostname = hostname
+        self._channels: List[paramiko.Channel] = []
+
+    def open_channel(self, timeout: float = None) -> paramiko.Channel:
+        channel = self.transport.open_session(timeout=timeout)
+        self._channels.append(channel)
+        return channel
+
+    def exec_command(self, command: str, bufsize: int = -1, timeout: float = None,
+                     get_pty: bool = False, environment: Dict[str, str] = None):
+        """在新通道上执行命令，返回 (stdin, stdout, stderr)"""
+        channel = self.open_channel(timeout=timeout)
+        if get_pty:
+            channel.get_pty()
+        channel.settimeout(timeout)
+        if environment:
+            channel.update_environment(environment)
+        channel.exec_command(command)
+        stdin = channel.makefile_stdin('wb', bufsize)
+        stdout = channel.makefile('r', bufsize)
+        stderr = channel.makefile_stderr('r', bufsize)
+        return stdin, stdout, stderr
+
+    def get_transport(self) -> paramiko.Transport:
+        return self.transport
+
+    def close(self) -> None:
+        for channel in self._channels:
+            try:
+                channel.close()
+            except Exception:
+                pass
+        self._channels.clear()
+
+class _HostEntry:
+    """一个 (主机, 端口, 用户名) 的连接和会话槽位"""
+
+    __slots__ = ('key', 'lock', 'slots', 'client', 'digest', 'active', 'last_used', 'users')
+
+    def __init__(self, key: Tuple[str, int, str], max_sessions: int):
+        self.key = key
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_sessions)
+        self.client: Optional[paramiko.SSHClient] = None
+        self.digest = ''
+        self.active = 0
+        self.last_used = time.monotonic()
+        # 连接 -> 正在借用它的会话数；包括已被替换但仍有会话在用的旧连接
+        self.users: Dict[paramiko.SSHClient, int] = {}
+
+    def is_alive(self) -> bool:
+        if self.client is None:
+            return False
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active() and transport.is_authenticated()
+
+    def close(self) -> None:
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+            self.client = None
+
+class SSHSessionPool:
+    """按主机复用已认证连接的SSH会话池"""
+
+    def __init__(self, max_sessions_per_host: int = None, idle_timeout: int = None,
+                 acquire_timeout: int = None, keepalive: int = None):
+        self.max_sessions_per_host = max_sessions_per_host or int(os.getenv('SSH_POOL_MAX_SESSIONS_PER_HOST', '8'))
+        self.idle_timeout = idle_timeout or int(os.getenv('SSH_POOL_IDLE_TIMEOUT', '300'))
+        self.acquire_timeout = acquire_timeout or int(os.getenv('SSH_POOL_ACQUIRE_TIMEOUT', '60'))
+        self.keepalive = keepalive if keepalive is not None else int(os.getenv('SSH_POOL_KEEPALIVE', '30'))
+        self._entries: Dict[Tuple[str, int, str], _HostEntry] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stats = {'connects': 0, 'reuses': 0, 'reconnects': 0, 'evictions': 0, 'failures': 0}
+
+    def _entry(self, key: Tuple[str, int, str]) -> _HostEntry:
+        """取得主机条目并登记使用中（登记后不会被空闲清理）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _HostEntry(key, self.max_sessions_per_host)
+                self._entries[key] = entry
+            entry.active += 1
+            if self._reaper is None or not self._reaper.is_alive():
+                self._reaper = threading.Thread(target=self._reap_loop, name='ssh-pool-reaper', daemon=True)
+                self._reaper.start()
+            return entry
+
+    def _connect(self, entry: _HostEntry, password: str, timeout: float) -> None:
+        host, port, username = entry.key
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            client.connect(hostname=host, port=port, username=username, password=password, timeout=timeout)
+        except Exception:
+            client.close()
+            with self._lock:
+                self._stats['failures'] += 1
+            raise
+        if self.keepalive:
+            client.get_transport().set_keepalive(self.keepalive)
+        # 其他会话仍在旧连接上执行时不能关闭，由最后一个会话归还时关闭
+        if not entry.users.get(entry.client):
+            entry.close()
+        entry.client = client
+        entry.digest = _secret_digest(password)
+        with self._lock:
+            self._stats['connects'] += 1
+        logger.debug(f"SSH连接已建立: {username}@{host}:{port}")
+
+    def _transport(self, entry: _HostEntry, password: str, timeout: float) -> Tuple[paramiko.SSHClient, bool]:
+        """
+        取得可用连接并登记借用：已有且存活、密码一致则复用，否则重新连接
+
+        Returns:
+            (client, reused)，用完后调用 _release_client()
+        """
+        with entry.lock:
+            reused = entry.is_alive() and entry.digest == _secret_digest(password)
+            if reused:
+                with self._lock:
+                    self._stats['reuses'] += 1
+            else:
+                self._connect(entry, password, timeout)
+            entry.users[entry.client] = entry.users.get(entry.client, 0) + 1
+            return entry.client, reused
+
+    def _reconnect(self, entry: _HostEntry, stale: paramiko.SSHClient, password: str,
+                   timeout: float) -> paramiko.SSHClient:
+        """开通道失败时重连（其他线程已经重连过则直接使用新连接），借用从旧连接转到新连接"""
+        self._release_client(entry, stale)
+        with entry.lock:
+            if entry.client is None or entry.client is stale or not entry.is_alive():
+                self._connect(entry, password, timeout)
+                with self._lock:
+                    self._stats['reconnects'] += 1
+            entry.users[entry.client] = entry.users.get(entry.client, 0) + 1
+            return entry.client
+
+    @staticmethod
+    def _release_client(entry: _HostEntry, client: paramiko.SSHClient) -> None:
+        """归还连接；已被替换的旧连接在最后一个会话归还时关闭"""
+        with entry.lock:
+            remaining = entry.users.get(client, 0) - 1
+            if remaining > 0:
+                entry.users[client] = remaining
+                return
+            entry.users.pop(client, None)
+            if client is entry.client:
+                return
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def session(self, host: str, port: int = 22, username: str = 'root', password: str = None,
+                timeout: float = 10) -> Iterator[PooledSSHSession]:
+        """
+        借用一个SSH会话
+
+        Args:
+            timeout: 建立连接的超时时间（秒）
+
+        Raises:
+            SSHPoolError: 等待会话槽位超时
+            paramiko.SSHException / socket.error: 连接或认证失败
+        """
+        entry = self._entry((host, int(port or 22), username))
+        acquired = False
+        client = None
+        session = None
+        try:
+            acquired = entry.slots.acquire(timeout=self.acquire_timeout)
+            if not acquired:
+                raise SSHPoolError(f"主机 {host} 的SSH会话数已达上限 {self.max_sessions_per_host}，等待超时")
+            idle = time.monotonic() - entry.last_used
+            client, reused = self._transport(entry, password, timeout)
+            if reused and idle >= HEALTH_CHECK_IDLE_SECONDS:
+                # 健康检查：空闲过的连接先试开一个通道，失败说明已失效（例如对端重启、NAT超时）
+                try:
+                    client.get_transport().open_session(timeout=timeout).close()
+                except (paramiko.SSHException, EOFError, OSError):
+                    stale, client = client, None
+                    client = self._reconnect(entry, stale, password, timeout)
+            session = PooledSSHSession(client.get_transport(), host)
+            yield session
+        finally:
+            if session is not None:
+                session.close()
+            if client is not None:
+                self._release_client(entry, client)
+            with self._lock:
+                entry.active -= 1
+                entry.last_used = time.monotonic()
+            if acquired:
+                entry.slots.release()
+
+    def _reap_loop(self) -> None:
+        interval = max(5, min(60, self.idle_timeout // 2))
+        while True:
+            time.sleep(interval)
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.error(f"清理空闲SSH连接失败: {e}")
+
+    def evict_idle(self) -> int:
+        """关闭空闲超时或已断开的连接"""
+        now = time.monotonic()
+        with self._lock:
+            stale = [
+                entry for entry in self._entries.values()
+                if entry.active == 0 and (now - entry.last_used >= self.idle_timeout or not entry.is_alive())
+            ]
+            for entry in stale:
+                del self._entries[entry.key]
+            self._stats['evictions'] += len(stale)
+        for entry in stale:
+            entry.close()
+        return len(stale)
+
+    def close_host(self, host: str) -> None:
+        """关闭某主机的所有连接（主机信息修改或删除时调用）"""
+        with self._lock:
+            entries = [e for key, e in self._entries.items() if key[0] == host and e.active == 0]
+            for entry in entries:
+                del self._entries[entry.key]
+        for entry in entries:
+            entry.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = [e for e in self._entries.values() if e.active == 0]
+            for entry in entries:
+                del self._entries[entry.key]
+        for entry in entries:
+            entry.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'hosts': len(self._entries),
+                'connected': sum(1 for e in self._entries.values() if e.is_alive()),
+                'active_sessions': sum(e.active for e in self._entries.values()),
+                'max_sessions_per_host': self.max_sessions_per_host,
+                'idle_timeout': self.idle_timeout,
+                **self._stats
+            }
+
+# 全局SSH会话池
+ssh_pool = SSHSessionPool()
+
+def ssh_session(host: str, port: int = 22, username: str = 'root', password: str = None,
+                timeout: float = 10):
+    """从全局会话池借用SSH会话"""
+    return ssh_pool.session(host, port, username, password, timeout)
@@ -0,0 +1,461 @@
+"""
+SSH终端桥接
+
+所有终端会话的 SSH 通道由一个选择器线程统一等待，有数据立即读取（无轮询间隔）：
+- 可读时连续读取通道中已到达的数据（最多 TERMINAL_READ_SIZE 字节）合并为一帧
+- 用增量 UTF-8 解码器在字符边界切分，多字节字符跨读取边界时留到下一帧，以二进制帧发送
+- 发送由共享线程池完成，浏览器接收慢时未发送数据超过 TERMINAL_BUFFER_HIGH 字节即暂停读取该通道
+  （SSH 窗口随之填满，远端停止输出），降到 TERMINAL_BUFFER_LOW 以下后恢复
+
+会话可分离：WebSocket 断开后 SSH 通道保留 TERMINAL_DETACH_GRACE_SECONDS 秒，期间输出继续写入
+每个会话固定大小（TERMINAL_SCROLLBACK_BYTES）的环形缓冲。浏览器带会话令牌和已接收的字节偏移重连后，
+补发缺失的输出并继续转发；超时未重连则关闭通道。
+
+会话按令牌登记在进程内。gunicorn 多 worker（GUNICORN_WORKERS / WEB_CONCURRENCY 大于 1）时重连可能
+落到其他进程而找不到会话，因此默认不保留分离的会话（宽限期为 0，断开即关闭通道）。需要断线重连时，
+由反向代理把 /api/terminal 转发到单独的单 worker 实例（或按会话保持粘性），再显式设置
+TERMINAL_DETACH_GRACE_SECONDS。
+
+与浏览器之间，二进制帧是终端输出，文本帧是控制消息：
+- session:<令牌>  会话令牌，重连时通过 session 参数带回
+- offset:<字节数> 其后的二进制数据在输出流中的起始偏移；与浏览器已接收的字节数不同时浏览器应先清屏
+- session-closed / session-expired  会话已结束 / 重连时会话已不存在，不再重连
+
+WebSocket 的接收仍由 flask-sock 的请求线程完成（输入直接写入通道）。
+"""
+import codecs
+import os
+import selectors
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+READ_SIZE = int(os.getenv('TERMINAL_READ_SIZE', str(64 * 1024)))
+BUFFER_HIGH = int(os.getenv('TERMINAL_BUFFER_HIGH', str(256 * 1024)))
+BUFFER_LOW = int(os.getenv('TERMINAL_BUFFER_LOW', str(64 * 1024)))
+SEND_WORKERS = int(os.getenv('TERMINAL_SEND_WORKERS', '16'))
+# start.sh 导出 GUNICORN_WORKERS；WEB_CONCURRENCY 是 gunicorn 自身读取的 worker 数
+WORKER_COUNT = int(os.getenv('GUNICORN_WORKERS') or os.getenv('WEB_CONCURRENCY') or '1')
+# 未设置时单进程保留 300 秒，多 worker 时为 0（见模块说明）
+DETACH_GRACE_SECONDS = float(os.getenv('TERMINAL_DETACH_GRACE_SECONDS') or ('300' if WORKER_COUNT <= 1 else '0'))
+SCROLLBACK_BYTES = int(os.getenv('TERMINAL_SCROLLBACK_BYTES', str(256 * 1024)))
+
+Frame = Union[bytes, str]
+
+class TerminalSession:
+    """
+    一个终端会话：SSH 通道输出经解码切分后写入环形缓冲，已连接时同时排队由发送线程写入 WebSocket
+
+    send/on_close 属于当前连接的 WebSocket，分离后为 None；cleanup 在会话结束时调用一次，
+    负责关闭通道和 SSH 连接。recording 不为空时解码后的输出同时写入录制。
+    """
+
+    def __init__(self, channel, send: Callable[[Frame], Any], on_close: Callable[[], Any] = None,
+                 cleanup: Callable[[], Any] = None, host: str = None):
+        self.channel = channel
+        self.token = uuid.uuid4().hex
+        self.host = host
+        self.send = send
+        self.on_close = on_close
+        self.cleanup = cleanup
+        self.recording = None
+        self.attach_id = 1
+        self.expires_at: Optional[float] = None
+        self.paused = False
+        self.closed = False
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._scrollback = bytearray()
+        self._end_offset = 0
+        self._pending = deque()
+        self._pending_bytes = 0
+        self._flushing = False
+        self._lock = threading.Lock()
+
+    def read(self) -> bool:
+        """
+        读取通道中已到达的数据（选择器线程调用）
+
+        Returns:
+            False 表示通道已结束
+        """
+        chunks = []
+        size = 0
+        eof = False
+        # 通道保持阻塞模式（输入方向的 send 需要等待窗口），只在有数据或已结束时 recv
+        while size < READ_SIZE:
+            if not self.channel.recv_ready():
+                eof = self.channel.eof_received or self.channel.closed
+                break
+            data = self.channel.recv(READ_SIZE - size)
+            if not data:
+                eof = True
+                break
+            chunks.append(data)
+            size += len(data)
+        text = self._decoder.decode(b''.join(chunks), final=eof)
+        if text:
+            if self.recording is not None:
+                self.recording.output(text)
+            self._append(text.encode('utf-8'))
+        return not eof
+
+    def _append(self, frame: bytes) -> None:
+        with self._lock:
+            self._scrollback += frame
+            self._end_offset += len(frame)
+            excess = len(self._scrollback) - SCROLLBACK_BYTES
+            if excess > 0:
+                # 从字符边界开始保留，跳过被截断字符的后续字节
+                while excess < len(self._scrollback) and (self._scrollback[excess] & 0xC0) == 0x80:
+                    excess += 1
+                del self._scrollback[:excess]
+            if self.send is None:
+                return
+            self._pending.append(frame)
+            self._pending_bytes += len(frame)
+            if self._pending_bytes >= BUFFER_HIGH:
+                self.paused = True
+
+    def push_control(self, message: str) -> None:
+        """排队一条控制消息（文本帧），与输出保持顺序"""
+        with self._lock:
+            if self.send is not None:
+                self._pending.append(message)
+
+    def take(self) -> Optional[Tuple[List[Frame], Callable[[Frame], Any], int]]:
+        """
+        取出全部待发送数据（相邻的输出合并为一帧），没有数据或已分离时结束发送
+
+        Returns:
+            (帧列表, 发送函数, 连接序号) 或 None
+        """
+        with self._lock:
+            if not self._pending or self.send is None:
+                self._pending.clear()
+                self._pending_bytes = 0
+                self._flushing = False
+                return None
+            frames: List[Frame] = []
+            for item in self._pending:
+                if isinstance(item, bytes) and frames and isinstance(frames[-1], bytes):
+                    frames[-1] += item
+                else:
+                    frames.append(item)
+            self._pending.clear()
+            self._pending_bytes = 0
+            return frames, self.send, self.attach_id
+
+    def start_flush(self) -> bool:
+        """有待发送数据且没有发送任务时返回 True，由调用方提交发送任务"""
+        with self._lock:
+            if self._flushing or not self._pending or self.send is None:
+                return False
+            self._flushing = True
+            return True
+
+    def attach(self, send: Callable[[Frame], Any], on_close: Callable[[], Any],
+               offset: Optional[int]) -> Tuple[int, Optional[Callable[[], Any]]]:
+        """
+        接入新的 WebSocket，排队会话令牌、起始偏移和需要补发的输出
+
+        offset 为浏览器已接收的字节数，仍在环形缓冲内时只补发之后的部分，否则补发整个缓冲。
+
+        Returns:
+            (连接序号, 被取代的旧连接的关闭函数)
+        """
+        with self._lock:
+            previous = self.on_close
+            self.send = send
+            self.on_close = on_close
+            self.attach_id += 1
+            self.expires_at = None
+            start = self._end_offset - len(self._scrollback)
+            if offset is None or not start <= offset <= self._end_offset:
+                offset = start
+            self._pending.clear()
+            self._pending.append(f'session:{self.token}')
+            self._pending.append(f'offset:{offset}')
+            replay = bytes(self._scrollback[offset - start:])
+            if replay:
+                self._pending.append(replay)
+            self._pending_bytes = len(replay)
+            return self.attach_id, previous
+
+    def detach(self, attach_id: int, grace: float) -> bool:
+        """
+        当前 WebSocket 断开；attach_id 不是当前连接（已被新连接取代）时忽略
+
+        Returns:
+            True 表示已分离并开始计时
+        """
+        with self._lock:
+            if attach_id != self.attach_id or self.send is None:
+                return False
+            self.send = None
+            self.on_close = None
+            self._pending.clear()
+            self._pending_bytes = 0
+            self.expires_at = time.monotonic() + grace
+            return True
+
+    @property
+    def pending_bytes(self) -> int:
+        return self._pending_bytes
+
+    @property
+    def detached(self) -> bool:
+        return self.send is None
+
+class TerminalBridge:
+    """所有终端会话共享的选择器线程和发送线程池"""
+
+    def __init__(self, send_workers: int = None, grace: float = None):
+        self.send_workers = send_workers or SEND_WORKERS
+        self.grace = DETACH_GRACE_SECONDS if grace is None else grace
+        if self.grace > 0 and WORKER_COUNT > 1:
+            logger.warning(f"当前有 {WORKER_COUNT} 个 worker，终端会话只登记在建立它的进程中，"
+                           f"请确保 /api/terminal 的重连转发到同一进程，否则重连会提示会话已过期")
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._wakeup_r: Optional[socket.socket] = None
+        self._wakeup_w: Optional[socket.socket] = None
+        self._ops = deque()
+        # 以下两项只在选择器线程中修改
+        self._sessions: Dict[int, TerminalSession] = {}
+        self._detached: Dict[int, TerminalSession] = {}
+        self._by_token: Dict[str, TerminalSession] = {}
+        self._lock = threading.Lock()
+        self._stats = {'sessions': 0, 'frames': 0, 'bytes': 0, 'pauses': 0, 'reattaches': 0, 'expired': 0}
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._selector = selectors.DefaultSelector()
+            self._wakeup_r, self._wakeup_w = socket.socketpair()
+            self._wakeup_r.setblocking(False)
+            self._wakeup_w.setblocking(False)
+            self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+            self._executor = ThreadPoolExecutor(max_workers=self.send_workers, thread_name_prefix='terminal-send')
+            self._thread = threading.Thread(target=self._run, name='terminal-bridge', daemon=True)
+            self._thread.start()
+
+    def open(self, channel, send: Callable[[Frame], Any], on_close: Callable[[], Any] = None,
+             recording=None, cleanup: Callable[[], Any] = None, host: str = None) -> TerminalSession:
+        """
+        开始转发通道输出，send 用于向 WebSocket 发送一帧
+
+        cleanup 在会话结束（通道关闭、分离超时或不允许分离时断开）后调用一次。
+        """
+        self._ensure_started()
+        session = TerminalSession(channel, send, on_close, cleanup, host)
+        session.recording = recording
+        if self.grace > 0:
+            session.push_control(f'session:{session.token}')
+        with self._lock:
+            self._by_token[session.token] = session
+        self._call(self._register, session)
+        return session
+
+    def attach(self, token: str, send: Callable[[Frame], Any], on_close: Callable[[], Any] = None,
+               offset: Optional[int] = None, host: str = None) -> Tuple[Optional[TerminalSession], int]:
+        """
+        按令牌接回会话（会话仍在宽限期内或仍被旧连接占用时），host 不为空时需与会话主机一致
+
+        Returns:
+            (会话, 连接序号)，会话不存在或已结束时为 (None, 0)
+        """
+        with self._lock:
+            session = self._by_token.get(token or '')
+        if session is None or session.closed or (host and session.host and host != session.host):
+            return None, 0
+        attach_id, previous_close = session.attach(send, on_close, offset)
+        self._stats['reattaches'] += 1
+        if previous_close:
+            # 网络闪断时服务端可能还没发现旧连接断开，由新连接取代
+            try:
+                previous_close()
+            except Exception:
+                pass
+        self._call(self._reattached, session)
+        return session, attach_id
+
+    def detach(self, session: TerminalSession, attach_id: int) -> None:
+        """WebSocket 断开时调用：允许分离时保留通道，否则结束会话"""
+        if session.closed:
+            return
+        if self.grace <= 0:
+            self._call(self._end, session)
+        elif session.detach(attach_id, self.grace):
+            self._call(self._detached_op, session)
+
+    def close(self, session: TerminalSession) -> None:
+        """立即结束会话"""
+        self._call(self._end, session)
+
+    def _call(self, func: Callable, *args) -> None:
+        """在选择器线程中执行 func"""
+        self._ops.append((func, args))
+        try:
+            self._wakeup_w.send(b'\0')
+        except (BlockingIOError, InterruptedError):
+            pass  # 唤醒缓冲区已满，说明选择器线程已经会被唤醒
+
+    def _register(self, session: TerminalSession) -> None:
+        key = id(session)
+        if key in self._sessions or session.closed:
+            return
+        self._sessions[key] = session
+        self._stats['sessions'] += 1
+        self._selector.register(session.channel, selectors.EVENT_READ, session)
+        self._schedule_flush(session)
+
+    def _end(self, session: TerminalSession) -> None:
+        """结束会话：停止读取，已连接时发完剩余输出后关闭 WebSocket，然后清理通道"""
+        if self._sessions.pop(id(session), None) is not None and not session.paused:
+            self._selector.unregister(session.channel)
+        self._detached.pop(id(session), None)
+        with self._lock:
+            self._by_token.pop(session.token, None)
+        session.closed = True
+        session.push_control('session-closed')
+        self._schedule_flush(session)
+
+    def _resume(self, session: TerminalSession) -> None:
+        if session.paused and id(session) in self._sessions:
+            session.paused = False
+            self._selector.register(session.channel, selectors.EVENT_READ, session)
+
+    def _detached_op(self, session: TerminalSession) -> None:
+        if id(session) not in self._sessions:
+            return
+        self._detached[id(session)] = session
+        # 分离期间没有发送方，输出只进入环形缓冲，恢复读取以免远端阻塞
+        self._resume(session)
+
+    def _reattached(self, session: TerminalSession) -> None:
+        self._detached.pop(id(session), None)
+        self._schedule_flush(session)
+
+    def _expire(self) -> Optional[float]:
+        """关闭分离超时的会话，返回距下一个超时的秒数"""
+        now = time.monotonic()
+        timeout = None
+        for session in list(self._detached.values()):
+            expires_at = session.expires_at
+            if expires_at is None:
+                continue
+            if expires_at <= now:
+                logger.info(f"终端会话分离超时，关闭SSH通道: {session.host}")
+                self._stats['expired'] += 1
+                self._end(session)
+            else:
+                timeout = expires_at - now if timeout is None else min(timeout, expires_at - now)
+        return timeout
+
+    def _run(self) -> None:
+        while True:
+            try:
+                events = self._selector.select(self._expire())
+            except Exception as e:
+                logger.error(f"终端桥接选择器异常: {e}")
+                continue
+            for key, _ in events:
+                session = key.data
+                if session is None:
+                    self._drain_wakeup()
+                elif id(session) in self._sessions:
+                    # 同一批事件中可能已被唤醒操作注销
+                    self._on_readable(session)
+
+    def _drain_wakeup(self) -> None:
+        try:
+            while self._wakeup_r.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while self._ops:
+            func, args = self._ops.popleft()
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"终端桥接操作失败: {e}")
+
+    def _on_readable(self, session: TerminalSession) -> None:
+        try:
+            alive = session.read()
+        except Exception as e:
+            logger.error(f"SSH读取错误: {str(e)}")
+            alive = False
+
+        if not alive:
+            self._end(session)
+            return
+        if session.paused:
+            # 浏览器接收慢，暂停读取该通道直到缓冲降到低水位
+            self._selector.unregister(session.channel)
+            self._stats['pauses'] += 1
+        self._schedule_flush(session)
+
+    def _schedule_flush(self, session: TerminalSession) -> None:
+        if session.start_flush():
+            self._executor.submit(self._flush, session)
+        elif session.closed and not session._flushing:
+            self._finish(session)
+
+    def _flush(self, session: TerminalSession) -> None:
+        """发送线程：发送缓冲数据直到为空"""
+        while True:
+            taken = session.take()
+            if taken is None:
+                break
+            frames, send, attach_id = taken
+            try:
+                for frame in frames:
+                    send(frame)
+                    if isinstance(frame, bytes):
+                        self._stats['frames'] += 1
+                        self._stats['bytes'] += len(frame)
+            except Exception as e:
+                # 连接已断开：分离会话（请求线程随后的分离会因连接序号已失效而忽略）
+                logger.info(f"终端WebSocket发送失败: {e}")
+                self.detach(session, attach_id)
+                if self.grace <= 0:
+                    break
+                continue
+            if session.paused and session.pending_bytes <= BUFFER_LOW:
+                self._call(self._resume, session)
+        if session.closed:
+            self._finish(session)
+
+    def _finish(self, session: TerminalSession) -> None:
+        with session._lock:
+            on_close, session.on_close = session.on_close, None
+            cleanup, session.cleanup = session.cleanup, None
+        for callback in (on_close, cleanup):
+            if callback:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.warning(f"关闭终端会话失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'active': len(self._sessions),
+            'detached': len(self._detached),
+            'send_workers': self.send_workers,
+            'detach_grace_seconds': self.grace,
+            **self._stats
+        }
+
+# 全局终端桥接
+terminal_bridge = TerminalBridge()
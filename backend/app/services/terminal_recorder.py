@@ -0,0 +1,358 @@
+"""
+Web终端会话录制
+
+录制文件为追加写入的分块 gzip 文件（<id>.cast.gz），格式兼容 asciicast v2：
+- 第一个 gzip 成员是头部行，之后每个 gzip 成员是一段时间内的事件行 [秒, "o"|"i"|"r", 数据]
+- gzip 允许多个成员首尾相接，整个文件 gunzip 后即是完整的 .cast 文件
+- 每写入一块，在索引文件（<id>.idx）追加一行 {"offset", "length", "start", "end", "events"}，
+  回放时按时间定位到相关块，只解压这些块
+
+终端读写线程只把事件追加到内存缓冲；压缩和写盘由后台写入线程完成，
+缓冲满 TERMINAL_RECORDING_CHUNK_BYTES 或超过 TERMINAL_RECORDING_CHUNK_SECONDS 秒时写出一块。
+录制元数据保存在 terminal_recordings 表中。
+"""
+import gzip
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.db_context import database_connection
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+RECORDING_ENABLED = os.getenv('TERMINAL_RECORDING_ENABLED', 'false').lower() == 'true'
+# 是否录制键盘输入（可能包含 sudo 等交互输入的密码，默认不录制）
+RECORD_INPUT = os.getenv('TERMINAL_RECORDING_INPUT', 'false').lower() == 'true'
+RECORDING_DIR = os.getenv('TERMINAL_RECORDING_DIR') or os.path.join(os.getcwd(), 'recordings')
+CHUNK_SECONDS = float(os.getenv('TERMINAL_RECORDING_CHUNK_SECONDS', '10'))
+CHUNK_BYTES = int(os.getenv('TERMINAL_RECORDING_CHUNK_BYTES', str(256 * 1024)))
+# 写入线程跟不上时单个会话内存中最多缓冲的字节数，超出的输出丢弃并计数
+MAX_BUFFER_BYTES = int(os.getenv('TERMINAL_RECORDING_MAX_BUFFER_BYTES', str(8 * 1024 * 1024)))
+RETENTION_DAYS = int(os.getenv('TERMINAL_RECORDING_RETENTION_DAYS', '90'))
+
+COMPRESS_LEVEL = 6
+
+_RECORDING_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+CREATE_RECORDINGS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS terminal_recordings (
+    id CHAR(32) PRIMARY KEY COMMENT '录制ID',
+    operator VARCHAR(100) COMMENT '操作用户',
+    host VARCHAR(255) NOT NULL COMMENT '目标主机',
+    port INT COMMENT 'SSH端口',
+    username VARCHAR(100) COMMENT 'SSH用户名',
+    instance_id VARCHAR(100) COMMENT '云实例ID',
+    status VARCHAR(20) NOT NULL DEFAULT 'recording' COMMENT '状态: recording/completed',
+    started_at DATETIME NOT NULL COMMENT '开始时间',
+    ended_at DATETIME COMMENT '结束时间',
+    duration DECIMAL(12,3) COMMENT '时长（秒）',
+    output_chars BIGINT DEFAULT 0 COMMENT '终端输出字符数',
+    file_bytes BIGINT DEFAULT 0 COMMENT '录制文件字节数',
+    chunk_count INT DEFAULT 0 COMMENT '分块数',
+    dropped_events INT DEFAULT 0 COMMENT '缓冲溢出丢弃的事件数',
+    INDEX idx_started_at (started_at),
+    INDEX idx_host_started (host, started_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Web终端会话录制'
+"""
+
+class RecordingNotFound(Exception):
+    """录制不存在或文件已清理"""
+
+def _paths(recording_id: str, directory: str = None) -> Tuple[str, str]:
+    if not _RECORDING_ID_PATTERN.match(recording_id or ''):
+        raise RecordingNotFound(recording_id)
+    base = os.path.join(directory or RECORDING_DIR, recording_id)
+    return f'{base}.cast.gz', f'{base}.idx'
+
+class TerminalRecording:
+    """
+    一个会话的录制：事件先进入内存缓冲，由写入线程分块压缩写盘
+
+    output/input/resize 在终端读写线程中调用，只做追加。
+    """
+
+    def __init__(self, recording_id: str, meta: Dict[str, Any], directory: str = None,
+                 width: int = 80, height: int = 24):
+        self.id = recording_id
+        self.meta = meta
+        self.data_path, self.index_path = _paths(recording_id, directory)
+        self.started_at = datetime.now()
+        self.closed = False
+        self.output_chars = 0
+        self.file_bytes = 0
+        self.chunk_count = 0
+        self.dropped = 0
+        self._started = time.monotonic()
+        self._events: List[Tuple[float, str, str]] = []
+        self._buffered = 0
+        self._chunk_started: Optional[float] = None
+        self._lock = threading.Lock()
+        header = {
+            'version': 2, 'width': width, 'height': height,
+            'timestamp': int(time.time()),
+            'title': f"{meta.get('username') or ''}@{meta.get('host')}",
+            'env': {'TERM': 'xterm'}
+        }
+        self._header = json.dumps(header, ensure_ascii=False) + '\n'
+
+    def output(self, text: str) -> None:
+        self.output_chars += len(text)
+        self._record('o', text)
+
+    def input(self, text: str) -> None:
+        if RECORD_INPUT:
+            self._record('i', text)
+
+    def resize(self, cols: int, rows: int) -> None:
+        self._record('r', f'{cols}x{rows}')
+
+    def _record(self, kind: str, data: str) -> None:
+        if self.closed:
+            return
+        now = time.monotonic() - self._started
+        with self._lock:
+            if self._buffered + len(data) > MAX_BUFFER_BYTES:
+                self.dropped += 1
+                return
+            if self._chunk_started is None:
+                self._chunk_started = now
+            self._events.append((now, kind, data))
+            self._buffered += len(data)
+            full = self._buffered >= CHUNK_BYTES
+        if full:
+            recording_writer.wake()
+
+    def due(self, now: float) -> bool:
+        """缓冲是否需要写出一块（写入线程调用）"""
+        with self._lock:
+            if not self._events:
+                return False
+            return (self.closed or self._buffered >= CHUNK_BYTES
+                    or now - self._started - self._chunk_started >= CHUNK_SECONDS)
+
+    def write_chunk(self) -> None:
+        """把当前缓冲压缩为一个 gzip 成员追加到文件，并追加索引行（写入线程调用）"""
+        with self._lock:
+            events, self._events = self._events, []
+            self._buffered = 0
+            self._chunk_started = None
+        if self.chunk_count == 0 and not os.path.exists(self.data_path):
+            os.makedirs(os.path.dirname(self.data_path), exist_ok=True)
+            with open(self.data_path, 'ab') as f:
+                f.write(gzip.compress(self._header.encode('utf-8'), COMPRESS_LEVEL))
+        if not events:
+            return
+        lines = ''.join(
+            json.dumps([round(t, 3), kind, data], ensure_ascii=False) + '\n'
+            for t, kind, data in events
+        )
+        member = gzip.compress(lines.encode('utf-8'), COMPRESS_LEVEL)
+        with open(self.data_path, 'ab') as f:
+            offset = f.tell()
+            f.write(member)
+        entry = {
+            'offset': offset, 'length': len(member),
+            'start': round(events[0][0], 3), 'end': round(events[-1][0], 3), 'events': len(events)
+        }
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+        self.chunk_count += 1
+        self.file_bytes = offset + len(member)
+
+    @property
+    def duration(self) -> float:
+        return time.monotonic() - self._started
+
+class RecordingWriter:
+    """所有录制共享的后台写入线程"""
+
+    def __init__(self):
+        self.directory = RECORDING_DIR
+        self._recordings: Dict[str, TerminalRecording] = {}
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._tables_ready = False
+        self._last_purge = 0.0
+
+    def ensure_tables(self) -> None:
+        if self._tables_ready:
+            return
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute(CREATE_RECORDINGS_TABLE_SQL)
+            db.commit()
+        self._tables_ready = True
+
+    def start_recording(self, host: str, port: int = None, username: str = None, instance_id: str = None,
+                        operator: str = None) -> Optional[TerminalRecording]:
+        """开始录制（未启用或登记失败时返回 None，不影响终端使用）"""
+        if not RECORDING_ENABLED:
+            return None
+        meta = {'host': host, 'port': port, 'username': username, 'instance_id': instance_id, 'operator': operator}
+        recording = TerminalRecording(uuid.uuid4().hex, meta, self.directory)
+        try:
+            self.ensure_tables()
+            with database_connection() as db:
+                with db.cursor() as cursor:
+                    cursor.execute("""
+                        INSERT INTO terminal_recordings (id, operator, host, port, username, instance_id, started_at)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """, (recording.id, operator, host, port, username, instance_id, recording.started_at))
+                db.commit()
+        except Exception as e:
+            logger.error(f"登记终端录制失败: {e}")
+            return None
+        self._ensure_started()
+        with self._lock:
+            self._recordings[recording.id] = recording
+        return recording
+
+    def stop_recording(self, recording: Optional[TerminalRecording]) -> None:
+        """结束录制，剩余缓冲由写入线程写出后更新元数据"""
+        if recording is None or recording.closed:
+            return
+        recording.closed = True
+        self.wake()
+
+    def wake(self) -> None:
+        self._event.set()
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='terminal-recorder', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._event.wait(timeout=1.0)
+            self._event.clear()
+            now = time.monotonic()
+            with self._lock:
+                recordings = list(self._recordings.values())
+            for recording in recordings:
+                try:
+                    closed = recording.closed
+                    if recording.due(now) or (closed and recording.chunk_count == 0):
+                        recording.write_chunk()
+                    if closed:
+                        with self._lock:
+                            self._recordings.pop(recording.id, None)
+                        self._finish(recording)
+                except Exception as e:
+                    logger.error(f"写入终端录制 {recording.id} 失败: {e}")
+            if now - self._last_purge >= 3600:
+                self._last_purge = now
+                self.purge_expired()
+
+    def _finish(self, recording: TerminalRecording) -> None:
+        with database_connection() as db:
+            with db.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE terminal_recordings
+                    SET status = 'completed', ended_at = %s, duration = %s, output_chars = %s,
+                        file_bytes = %s, chunk_count = %s, dropped_events = %s
+                    WHERE id = %s
+                """, (datetime.now(), round(recording.duration, 3), recording.output_chars,
+                      recording.file_bytes, recording.chunk_count, recording.dropped, recording.id))
+            db.commit()
+        if recording.dropped:
+            logger.warning(f"终端录制 {recording.id} 缓冲溢出，丢弃 {recording.dropped} 个事件")
+
+    def purge_expired(self) -> int:
+        """删除超过保留天数的录制文件和记录（RETENTION_DAYS 为 0 时不清理）"""
+        if RETENTION_DAYS <= 0:
+            return 0
+        cutoff = datetime.now() - timedelta(days=RETENTION_DAYS)
+        try:
+            self.ensure_tables()
+            with database_connection() as db:
+                with db.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT id FROM terminal_recordings WHERE started_at < %s",
+                        (cutoff,)
+                    )
+                    ids = [row['id'] for row in cursor.fetchall()]
+                    for recording_id in ids:
+                        for path in _paths(recording_id, self.directory):
+                            try:
+                                os.remove(path)
+                            except FileNotFoundError:
+                                pass
+                    if ids:
+                        cursor.execute(
+                            f"DELETE FROM terminal_recordings WHERE id IN ({', '.join(['%s'] * len(ids))})", ids
+                        )
+                db.commit()
+            if ids:
+                logger.info(f"清理过期终端录制 {len(ids)} 个")
+            return len(ids)
+        except Exception as e:
+            logger.error(f"清理过期终端录制失败: {e}")
+            return 0
+
+    # ---- 回放 ----
+
+    def get_index(self, recording_id: str) -> List[Dict[str, Any]]:
+        """读取分块索引"""
+        data_path, index_path = _paths(recording_id, self.directory)
+        if not os.path.isfile(data_path):
+            raise RecordingNotFound(recording_id)
+        try:
+            with open(index_path, encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def read_header(self, recording_id: str) -> Dict[str, Any]:
+        data_path, _ = _paths(recording_id, self.directory)
+        index = self.get_index(recording_id)
+        with open(data_path, 'rb') as f:
+            # 头部成员在第一块之前
+            header = f.read(index[0]['offset']) if index else f.read()
+        return json.loads(gzip.decompress(header).decode('utf-8').splitlines()[0])
+
+    def read_events(self, recording_id: str, start: float = 0.0, end: float = None) -> Dict[str, Any]:
+        """
+        读取 [start, end] 秒内的事件，只解压与时间范围重叠的块
+
+        Returns:
+            {'events': [[秒, 类型, 数据], ...], 'chunks': 读取的块数, 'next': 下一块开始时间或 None}
+        """
+        data_path, _ = _paths(recording_id, self.directory)
+        index = self.get_index(recording_id)
+        selected = [c for c in index if c['end'] >= start and (end is None or c['start'] <= end)]
+        events = []
+        with open(data_path, 'rb') as f:
+            for chunk in selected:
+                f.seek(chunk['offset'])
+                for line in gzip.decompress(f.read(chunk['length'])).decode('utf-8').splitlines():
+                    event = json.loads(line)
+                    if event[0] >= start and (end is None or event[0] <= end):
+                        events.append(event)
+        following = [c['start'] for c in index if end is not None and c['start'] > end]
+        return {'events': events, 'chunks': len(selected), 'next': following[0] if following else None}
+
+    def file_path(self, recording_id: str) -> str:
+        data_path, _ = _paths(recording_id, self.directory)
+        if not os.path.isfile(data_path):
+            raise RecordingNotFound(recording_id)
+        return data_path
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': RECORDING_ENABLED,
+            'record_input': RECORD_INPUT,
+            'directory': self.directory,
+            'active': len(self._recordings)
+        }
+
+# 全局录制写入器
+recording_writer = RecordingWriter()
@@ -6,11 +6,64 @@ from alibabacloud_cdn20180510.client import Client as CdnClient
 from alibabacloud_cdn20180510 import models as cdn_models
 from alibabacloud_tea_openapi import models as open_api_models
 from alibabacloud_tea_util import models as util_models
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 import logging
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# DescribeInstances 单页最大条数
+ECS_PAGE_SIZE = 100
+# 并行查询的区域数
+SYNC_CONCURRENCY = int(os.getenv('ALIYUN_SYNC_CONCURRENCY', '8'))
+# DescribeRegions 结果缓存时间（秒）
+REGION_CACHE_TTL = int(os.getenv('ALIYUN_REGION_CACHE_TTL', '3600'))
+
+# DescribeRegions 查询失败时使用的区域列表
+# 基于阿里云官网2024年最新区域列表
+# 来源: https://help.aliyun.com/zh/ecs/regions-and-zones
+DEFAULT_ECS_REGIONS = [
+    # 中国地区 (15个)
+    'cn-qingdao',       # 华北1（青岛）
+    'cn-beijing',       # 华北2（北京）
+    'cn-zhangjiakou',   # 华北3（张家口）
+    'cn-huhehaote',     # 华北5（呼和浩特）
+    'cn-wulanchabu',    # 华北6（乌兰察布）
+    'cn-hangzhou',      # 华东1（杭州）
+    'cn-shanghai',      # 华东2（上海）
+    'cn-nanjing',       # 华东5（南京）
+    'cn-fuzhou',        # 华东6（福州）
+    'cn-wuhan-lr',      # 华中1（武汉）
+    'cn-shenzhen',      # 华南1（深圳）
+    'cn-heyuan',        # 华南2（河源）
+    'cn-guangzhou',     # 华南3（广州）
+    'cn-chengdu',       # 西南1（成都）
+    'cn-hongkong',      # 中国香港
+    
+    # 海外地区 (14个)
+    'ap-southeast-1',   # 新加坡
+    'ap-southeast-3',   # 马来西亚（吉隆坡）
+    'ap-southeast-5',   # 印度尼西亚（雅加达）
+    'ap-southeast-6',   # 菲律宾（马尼拉）
+    'ap-southeast-7',   # 泰国（曼谷）
+    'ap-northeast-1',   # 日本（东京）
+    'ap-northeast-2',   # 韩国（首尔）
+    'us-west-1',        # 美国（硅谷）
+    'us-east-1',        # 美国（弗吉尼亚）
+    'eu-central-1',     # 德国（法兰克福）
+    'eu-west-1',        # 英国（伦敦）
+    'me-east-1',        # 阿联酋（迪拜）
+    'me-central-1',     # 沙特（利雅得）
+    'na-south-1'        # 墨西哥
+]
+
+# 按凭证缓存的服务实例，跨请求复用区域客户端和区域列表
+_services: Dict[Tuple[str, str, str], 'AliyunService'] = {}
+_services_lock = threading.Lock()
+
 class AliyunService:
     def __init__(self, access_key_id: str, access_key_secret: str, region: str = 'cn-hangzhou'):
         self.access_key_id = access_key_id
@@ -21,14 +74,24 @@ class AliyunService:
             access_key_id=access_key_id,
             access_key_secret=access_key_secret
         )
+        self._lock = threading.Lock()
+        self._ecs_clients: Dict[str, EcsClient] = {}
+        self._regions: List[str] = []
+        self._regions_expire_at = 0.0
         
-    def _get_ecs_client(self) -> EcsClient:
-        config = open_api_models.Config(
-            access_key_id=self.access_key_id,
-            access_key_secret=self.access_key_secret
-        )
-        config.endpoint = f'ecs.{self.region}.aliyuncs.com'
-        return EcsClient(config)
+    def _get_ecs_client(self, region: str = None) -> EcsClient:
+        """获取区域的ECS客户端（按区域缓存复用）"""
+        region = region or self.region
+        with self._lock:
+            client = self._ecs_clients.get(region)
+            if client is None:
+                config = open_api_models.Config(
+                    access_key_id=self.access_key_id,
+                    access_key_secret=self.access_key_secret
+                )
+                config.endpoint = f'ecs.{region}.aliyuncs.com'
+                client = self._ecs_clients[region] = EcsClient(config)
+            return client
     
     def _get_domain_client(self) -> DomainClient:
         config = open_api_models.Config(
@@ -47,67 +110,28 @@ class AliyunService:
         return CdnClient(config)
     
     def get_ecs_instances(self, region: str = None) -> List[Dict]:
-        """获取ECS实例列表"""
+        """获取ECS实例列表（按 NextToken 翻页获取区域内全部实例）"""
+        region = region or self.region
         try:
-            if region:
-                config = open_api_models.Config(
-                    access_key_id=self.access_key_id,
-                    access_key_secret=self.access_key_secret
-                )
-                config.endpoint = f'ecs.{region}.aliyuncs.com'
-                client = EcsClient(config)
-            else:
-                client = self._get_ecs_client()
-            
-            request = ecs_models.DescribeInstancesRequest()
-            request.page_number = 1
-            request.page_size = 100
-            # 设置必需的RegionId参数
-            if region:
-                request.region_id = region
-            else:
-                request.region_id = self.region
+            client = self._get_ecs_client(region)
             runtime = util_models.RuntimeOptions()
-            
-            response = client.describe_instances_with_options(request, runtime)
             instances = []
-            
-            if response.body.instances and response.body.instances.instance:
-                for instance in response.body.instances.instance:
-                    # 获取公网IP
-                    public_ip = ''
-                    if hasattr(instance, 'public_ip_address') and instance.public_ip_address and hasattr(instance.public_ip_address, 'ip_address'):
-                        public_ip = instance.public_ip_address.ip_address[0] if instance.public_ip_address.ip_address else ''
-                    elif hasattr(instance, 'eip_address') and instance.eip_address and hasattr(instance.eip_address, 'ip_address'):
-                        public_ip = instance.eip_address.ip_address or ''
-                    
-                    # 获取私网IP
-                    private_ip = ''
-                    if hasattr(instance, 'inner_ip_address') and instance.inner_ip_address and hasattr(instance.inner_ip_address, 'ip_address'):
-                        private_ip = instance.inner_ip_address.ip_address[0] if instance.inner_ip_address.ip_address else ''
-                    elif hasattr(instance, 'vpc_attributes') and instance.vpc_attributes and hasattr(instance.vpc_attributes, 'private_ip_address'):
-                        if hasattr(instance.vpc_attributes.private_ip_address, 'ip_address'):
-                            private_ip = instance.vpc_attributes.private_ip_address.ip_address[0] if instance.vpc_attributes.private_ip_address.ip_address else ''
-                        else:
-                            private_ip = getattr(instance.vpc_attributes, 'private_ip_address', '')
-                    
-                    instances.append({
-                        'id': getattr(instance, 'instance_id', ''),
-                        'name': getattr(instance, 'instance_name', ''),
-                        'hostname': getattr(instance, 'hostname', '') or getattr(instance, 'instance_name', ''),
-                        'status': getattr(instance, 'status', ''),
-                        'instance_type': getattr(instance, 'instance_type', ''),
-                        'image_id': getattr(instance, 'image_id', ''),
-                        'public_ip': public_ip,
-                        'private_ip': private_ip,
-                        'region': getattr(instance, 'region_id', region or self.region),
-                        'zone': getattr(instance, 'zone_id', ''),
-                        'creation_time': getattr(instance, 'creation_time', ''),
-                        'os_type': getattr(instance, 'ostype', ''),
-                        'cpu': getattr(instance, 'cpu', 0),
-                        'memory': getattr(instance, 'memory', 0),
-                        'provider': 'aliyun'
-                    })
+            next_token = None
+            while True:
+                request = ecs_models.DescribeInstancesRequest()
+                # 设置必需的RegionId参数
+                request.region_id = region
+                request.max_results = ECS_PAGE_SIZE
+                request.next_token = next_token
+                
+                response = client.describe_instances_with_options(request, runtime)
+                if response.body.instances and response.body.instances.instance:
+                    for instance in response.body.instances.instance:
+                        instances.append(self._format_instance(instance, region))
+                
+                next_token = response.body.next_token
+                if not next_token:
+                    break
             
             return instances
             
@@ -115,54 +139,97 @@ class AliyunService:
             logger.error(f"获取ECS实例失败: {str(e)}")
             raise Exception(f"获取ECS实例失败: {str(e)}")
     
-    def get_all_regions_instances(self) -> List[Dict]:
-        """获取所有区域的ECS实例"""
-        # 基于阿里云官网2024年最新区域列表
-        # 来源: https://help.aliyun.com/zh/ecs/regions-and-zones
-        regions = [
-            # 中国地区 (15个)
-            'cn-qingdao',       # 华北1（青岛）
-            'cn-beijing',       # 华北2（北京）
-            'cn-zhangjiakou',   # 华北3（张家口）
-            'cn-huhehaote',     # 华北5（呼和浩特）
-            'cn-wulanchabu',    # 华北6（乌兰察布）
-            'cn-hangzhou',      # 华东1（杭州）
-            'cn-shanghai',      # 华东2（上海）
-            'cn-nanjing',       # 华东5（南京）
-            'cn-fuzhou',        # 华东6（福州）
-            'cn-wuhan-lr',      # 华中1（武汉）
-            'cn-shenzhen',      # 华南1（深圳）
-            'cn-heyuan',        # 华南2（河源）
-            'cn-guangzhou',     # 华南3（广州）
-            'cn-chengdu',       # 西南1（成都）
-            'cn-hongkong',      # 中国香港
-            
-            # 海外地区 (14个)
-            'ap-southeast-1',   # 新加坡
-            'ap-southeast-3',   # 马来西亚（吉隆坡）
-            'ap-southeast-5',   # 印度尼西亚（雅加达）
-            'ap-southeast-6',   # 菲律宾（马尼拉）
-            'ap-southeast-7',   # 泰国（曼谷）
-            'ap-northeast-1',   # 日本（东京）
-            'ap-northeast-2',   # 韩国（首尔）
-            'us-west-1',        # 美国（硅谷）
-            'us-east-1',        # 美国（弗吉尼亚）
-            'eu-central-1',     # 德国（法兰克福）
-            'eu-west-1',        # 英国（伦敦）
-            'me-east-1',        # 阿联酋（迪拜）
-            'me-central-1',     # 沙特（利雅得）
-            'na-south-1'        # 墨西哥
-        ]
+    @staticmethod
+    def _format_instance(instance, region: str) -> Dict:
+        # 获取公网IP
+        public_ip = ''
+        if hasattr(instance, 'public_ip_address') and instance.public_ip_address and hasattr(instance.public_ip_address, 'ip_address'):
+            public_ip = instance.public_ip_address.ip_address[0] if instance.public_ip_address.ip_address else ''
+        elif hasattr(instance, 'eip_address') and instance.eip_address and hasattr(instance.eip_address, 'ip_address'):
+            public_ip = instance.eip_address.ip_address or ''
         
-        all_instances = []
-        for region in regions:
+        # 获取私网IP
+        private_ip = ''
+        if hasattr(instance, 'inner_ip_address') and instance.inner_ip_address and hasattr(instance.inner_ip_address, 'ip_address'):
+            private_ip = instance.inner_ip_address.ip_address[0] if instance.inner_ip_address.ip_address else ''
+        elif hasattr(instance, 'vpc_attributes') and instance.vpc_attributes and hasattr(instance.vpc_attributes, 'private_ip_address'):
+            if hasattr(instance.vpc_attributes.private_ip_address, 'ip_address'):
+                private_ip = instance.vpc_attributes.private_ip_address.ip_address[0] if instance.vpc_attributes.private_ip_address.ip_address else ''
+            else:
+                private_ip = getattr(instance.vpc_attributes, 'private_ip_address', '')
+        
+        return {
+            'id': getattr(instance, 'instance_id', ''),
+            'name': getattr(instance, 'instance_name', ''),
+            'hostname': getattr(instance, 'hostname', '') or getattr(instance, 'instance_name', ''),
+            'status': getattr(instance, 'status', ''),
+            'instance_type': getattr(instance, 'instance_type', ''),
+            'image_id': getattr(instance, 'image_id', ''),
+            'public_ip': public_ip,
+            'private_ip': private_ip,
+            'region': getattr(instance, 'region_id', None) or region,
+            'zone': getattr(instance, 'zone_id', ''),
+            'creation_time': getattr(instance, 'creation_time', ''),
+            'os_type': getattr(instance, 'ostype', ''),
+            'cpu': getattr(instance, 'cpu', 0),
+            'memory': getattr(instance, 'memory', 0),
+            'provider': 'aliyun'
+        }
+    
+    def get_ecs_regions(self) -> List[str]:
+        """
+        获取当前账号可用的ECS区域
+        
+        通过 DescribeRegions 查询并缓存 ALIYUN_REGION_CACHE_TTL 秒（包含售罄区域，其中仍可能有存量实例）；
+        查询失败时使用内置区域列表。
+        """
+        with self._lock:
+            if self._regions and time.monotonic() < self._regions_expire_at:
+                return self._regions
+        try:
+            request = ecs_models.DescribeRegionsRequest()
+            response = self._get_ecs_client().describe_regions_with_options(request, util_models.RuntimeOptions())
+            regions = [
+                region.region_id
+                for region in (response.body.regions.region if response.body.regions else None) or []
+                if region.region_id
+            ]
+        except Exception as e:
+            logger.warning(f"查询ECS区域列表失败，使用内置区域列表: {str(e)}")
+            return DEFAULT_ECS_REGIONS
+        if not regions:
+            return DEFAULT_ECS_REGIONS
+        with self._lock:
+            self._regions = regions
+            self._regions_expire_at = time.monotonic() + REGION_CACHE_TTL
+        return regions
+    
+    def get_all_regions_instances(self, failed_regions: List[str] = None) -> List[Dict]:
+        """
+        获取所有区域的ECS实例（有限并发并行查询各区域，结果按区域顺序合并）
+        
+        Args:
+            failed_regions: 传入列表时追加查询失败的区域，调用方据此避免把这些区域的实例当作已删除
+        """
+        regions = self.get_ecs_regions()
+        
+        def fetch(region):
             try:
-                instances = self.get_ecs_instances(region)
-                all_instances.extend(instances)
+                return self.get_ecs_instances(region)
             except Exception as e:
                 logger.warning(f"获取区域 {region} ECS实例失败: {str(e)}")
-                continue
+                if failed_regions is not None:
+                    failed_regions.append(region)
+                return []
+        
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, min(SYNC_CONCURRENCY, len(regions))),
+                                thread_name_prefix='aliyun-ecs') as executor:
+            results = list(executor.map(fetch, regions))
         
+        all_instances = [instance for instances in results for instance in instances]
+        logger.info(f"查询 {len(regions)} 个区域ECS实例完成，共 {len(all_instances)} 个，"
+                    f"耗时 {time.monotonic() - started:.2f} 秒")
         return all_instances
     
     def get_domains(self) -> List[Dict]:
@@ -269,5 +336,10 @@ class AliyunService:
             raise Exception(f"获取CDN域名列表失败: {str(e)}")
 
 def get_aliyun_service(access_key_id: str, access_key_secret: str, region: str = 'cn-hangzhou') -> AliyunService:
-    """获取阿里云服务实例"""
-    return AliyunService(access_key_id, access_key_secret, region)
\ No newline at end of file
+    """获取阿里云服务实例（相同凭证和区域复用同一实例）"""
+    key = (access_key_id, access_key_secret, region)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = _services[key] = AliyunService(access_key_id, access_key_secret, region)
+        return service
\ No newline at end of file
@@ -0,0 +1,265 @@
+"""
+Jenkins构建数据列式计算
+
+把 jobs[name,builds[...]] 结构的构建数据展开为 NumPy 列（时间戳、时长、预计时长、
+状态码、任务下标），提供按任务、按时间桶（小时/天/周）分组统计和分位数等内核，
+供分析、趋势、指标等接口共用，替代逐条构建的嵌套 Python 循环。
+"""
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# 状态码（与 Jenkins result 对应）
+STATUS_SUCCESS = 0
+STATUS_FAILURE = 1
+STATUS_ABORTED = 2
+STATUS_UNSTABLE = 3
+STATUS_BUILDING = 4
+STATUS_OTHER = 5
+
+STATUS_CODES = {
+    'SUCCESS': STATUS_SUCCESS,
+    'FAILURE': STATUS_FAILURE,
+    'ABORTED': STATUS_ABORTED,
+    'UNSTABLE': STATUS_UNSTABLE
+}
+
+STATUS_NAMES = ['success', 'failure', 'aborted', 'unstable', 'building', 'unknown']
+
+HOUR_MS = 60 * 60 * 1000
+DAY_MS = 24 * HOUR_MS
+
+INTERVAL_FORMATS = {
+    'hourly': '%Y-%m-%d %H:00',
+    'daily': '%Y-%m-%d',
+    'weekly': '%Y-W%U'
+}
+
+def _status_code(result: Optional[str]) -> int:
+    if not result:
+        return STATUS_BUILDING
+    return STATUS_CODES.get(result, STATUS_OTHER)
+
+def _round_rate(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """百分比，分母为0时为0，保留两位小数"""
+    rate = np.divide(numerator * 100.0, denominator, out=np.zeros(len(denominator)), where=denominator > 0)
+    return np.round(rate, 2)
+
+class BuildFrame:
+    """
+    构建数据的列式视图
+
+    所有列等长，第 i 行对应 source[row[i]] 的一次构建；过滤只生成新的下标数组，
+    不复制原始构建字典。
+    """
+
+    __slots__ = ('job_names', 'source', 'row', 'timestamp', 'duration',
+                 'estimated_duration', 'status', 'job')
+
+    def __init__(self, job_names: List[str], source: List[tuple], row: np.ndarray,
+                 timestamp: np.ndarray, duration: np.ndarray, estimated_duration: np.ndarray,
+                 status: np.ndarray, job: np.ndarray):
+        self.job_names = job_names
+        self.source = source
+        self.row = row
+        self.timestamp = timestamp
+        self.duration = duration
+        self.estimated_duration = estimated_duration
+        self.status = status
+        self.job = job
+
+    @classmethod
+    def from_jobs_data(cls, jobs_data: Dict[str, Any]) -> 'BuildFrame':
+        """从 jobs[name,builds[...]] 结构构建（包含没有构建的任务）"""
+        job_names = []
+        source = []
+        timestamps = []
+        durations = []
+        estimated = []
+        statuses = []
+        jobs = []
+
+        for job_index, job in enumerate(jobs_data.get('jobs', [])):
+            job_names.append(job['name'])
+            for build in job.get('builds', []):
+                source.append((job['name'], build))
+                timestamps.append(build.get('timestamp') or 0)
+                durations.append(build.get('duration') or 0)
+                estimated.append(build.get('estimatedDuration') or 0)
+                statuses.append(_status_code(build.get('result')))
+                jobs.append(job_index)
+
+        count = len(source)
+        return cls(
+            job_names,
+            source,
+            np.arange(count, dtype=np.int64),
+            np.asarray(timestamps, dtype=np.int64),
+            np.asarray(durations, dtype=np.int64),
+            np.asarray(estimated, dtype=np.int64),
+            np.asarray(statuses, dtype=np.int8),
+            np.asarray(jobs, dtype=np.int32)
+        )
+
+    def __len__(self) -> int:
+        return len(self.row)
+
+    def filter(self, mask: np.ndarray) -> 'BuildFrame':
+        """按布尔掩码过滤"""
+        return BuildFrame(
+            self.job_names, self.source, self.row[mask], self.timestamp[mask],
+            self.duration[mask], self.estimated_duration[mask], self.status[mask], self.job[mask]
+        )
+
+    def since(self, start_ms: int) -> 'BuildFrame':
+        """只保留 start_ms 之后开始的构建"""
+        return self.filter(self.timestamp >= start_ms)
+
+    def status_counts(self) -> Dict[str, int]:
+        """各状态的构建数"""
+        counts = np.bincount(self.status, minlength=len(STATUS_NAMES))
+        return {name: int(counts[code]) for code, name in enumerate(STATUS_NAMES)}
+
+    def success_rate(self) -> float:
+        if not len(self):
+            return 0
+        return round(float(np.count_nonzero(self.status == STATUS_SUCCESS)) / len(self) * 100, 2)
+
+    def average_duration(self) -> int:
+        if not len(self):
+            return 0
+        return int(self.duration.sum()) // len(self)
+
+    def percentiles(self, values: np.ndarray = None, q: Sequence[float] = (50, 90, 95, 99)) -> Dict[str, int]:
+        """分位数（默认对构建时长）"""
+        values = self.duration if values is None else values
+        if not len(values):
+            return {f'p{int(p)}': 0 for p in q}
+        result = np.percentile(values, q)
+        return {f'p{int(p)}': int(v) for p, v in zip(q, result)}
+
+    def group_stats(self, keys: np.ndarray, size: int) -> Dict[str, np.ndarray]:
+        """
+        按整数键分组统计
+
+        Args:
+            keys: 每行所属的组号（0..size-1）
+            size: 组数
+
+        Returns:
+            各组的 count/success/failure/building/totalDuration 数组
+        """
+        return {
+            'count': np.bincount(keys, minlength=size),
+            'success': np.bincount(keys, weights=self.status == STATUS_SUCCESS, minlength=size).astype(np.int64),
+            'failure': np.bincount(keys, weights=self.status == STATUS_FAILURE, minlength=size).astype(np.int64),
+            'building': np.bincount(keys, weights=self.status == STATUS_BUILDING, minlength=size).astype(np.int64),
+            'totalDuration': np.bincount(keys, weights=self.duration, minlength=size).astype(np.int64)
+        }
+
+    def job_stats(self) -> Dict[str, Dict[str, Any]]:
+        """按任务统计：总数、成功/失败数、总时长、平均时长、成功率"""
+        size = len(self.job_names)
+        stats = self.group_stats(self.job, size)
+        count = stats['count']
+        average = np.floor_divide(stats['totalDuration'], count, out=np.zeros(size, dtype=np.int64), where=count > 0)
+        rate = _round_rate(stats['success'], count)
+
+        return {
+            name: {
+                'totalBuilds': int(count[i]),
+                'successBuilds': int(stats['success'][i]),
+                'failedBuilds': int(stats['failure'][i]),
+                'averageDuration': int(average[i]),
+                'totalDuration': int(stats['totalDuration'][i]),
+                'successRate': float(rate[i])
+            }
+            for i, name in enumerate(self.job_names)
+        }
+
+    def job_mean(self, values: np.ndarray) -> np.ndarray:
+        """按任务求平均值（没有构建的任务为0）"""
+        size = len(self.job_names)
+        count = np.bincount(self.job, minlength=size)
+        total = np.bincount(self.job, weights=values, minlength=size)
+        return np.divide(total, count, out=np.zeros(size), where=count > 0)
+
+    def job_percentiles(self, values: np.ndarray = None, q: Sequence[float] = (50, 90, 95, 99)) -> Dict[str, Dict[str, int]]:
+        """按任务计算分位数（排序一次后按任务切片）"""
+        values = self.duration if values is None else values
+        order = np.lexsort((values, self.job))
+        sorted_jobs = self.job[order]
+        sorted_values = values[order]
+        bounds = np.searchsorted(sorted_jobs, np.arange(len(self.job_names) + 1))
+
+        result = {}
+        for i, name in enumerate(self.job_names):
+            chunk = sorted_values[bounds[i]:bounds[i + 1]]
+            if len(chunk):
+                result[name] = {f'p{int(p)}': int(v) for p, v in zip(q, np.percentile(chunk, q))}
+        return result
+
+    def time_buckets(self, interval: str = 'daily'):
+        """
+        按本地时间分桶
+
+        先按UTC小时去重，每个不同的小时只调用一次 localtime 计算时区偏移（兼容夏令时），
+        再对不同的本地小时/天格式化标签，最后映射回每一行。
+
+        Returns:
+            (labels, keys): 排好序的桶标签列表，以及每行对应的桶下标
+        """
+        time_format = INTERVAL_FORMATS.get(interval, INTERVAL_FORMATS['daily'])
+        if not len(self):
+            return [], np.zeros(0, dtype=np.int64)
+
+        utc_hours, hour_index = np.unique(self.timestamp // HOUR_MS, return_inverse=True)
+        offsets = np.array([time.localtime(int(h) * 3600).tm_gmtoff for h in utc_hours], dtype=np.int64) * 1000
+        local_ms = self.timestamp + offsets[hour_index]
+
+        unit = HOUR_MS if interval == 'hourly' else DAY_MS
+        units, unit_index = np.unique(local_ms // unit, return_inverse=True)
+        unit_labels = [datetime.fromtimestamp(int(u) * unit // 1000, timezone.utc).strftime(time_format) for u in units]
+
+        labels, label_index = np.unique(np.asarray(unit_labels), return_inverse=True)
+        return [str(label) for label in labels], label_index[unit_index]
+
+    def time_series(self, interval: str = 'daily') -> List[Dict[str, Any]]:
+        """按时间桶统计构建数、成功率、平均时长（按时间升序）"""
+        labels, keys = self.time_buckets(interval)
+        if not labels:
+            return []
+        stats = self.group_stats(keys, len(labels))
+        count = stats['count']
+        average = np.floor_divide(stats['totalDuration'], count, out=np.zeros(len(labels), dtype=np.int64), where=count > 0)
+        rate = _round_rate(stats['success'], count)
+
+        return [
+            {
+                'time': label,
+                'total': int(count[i]),
+                'success': int(stats['success'][i]),
+                'failure': int(stats['failure'][i]),
+                'building': int(stats['building'][i]),
+                'successRate': float(rate[i]),
+                'averageDuration': int(average[i])
+            }
+            for i, label in enumerate(labels)
+        ]
+
+    def latest(self, limit: int) -> Iterable[int]:
+        """按开始时间倒序的前 limit 行（返回行号）"""
+        if limit <= 0 or not len(self):
+            return []
+        if limit < len(self):
+            top = np.argpartition(-self.timestamp, limit - 1)[:limit]
+            return top[np.argsort(-self.timestamp[top], kind='stable')]
+        return np.argsort(-self.timestamp, kind='stable')
+
+    def record(self, i: int):
+        """第 i 行对应的 (任务名, 原始构建字典, 小写状态)"""
+        job_name, build = self.source[self.row[i]]
+        status = build['result'].lower() if build.get('result') else 'building'
+        return job_name, build, status
@@ -38,20 +38,32 @@ def init_app(app):
     # 注册数据库连接关闭的回调函数
     app.teardown_appcontext(close_db)
     
+    # 预热共享连接池，失败时不影响启动（首次借用时会再次尝试）
+    try:
+        from app.utils.db_context import connection_pool
+        connection_pool.warm_up()
+    except Exception as e:
+        logger.warning(f"数据库连接池预热失败: {str(e)}")
+    
     # 在应用上下文中初始化默认应用
     with app.app_context():
         _init_default_apps()
 
+def get_database_config():
+    """获取pymysql连接参数（连接池与普通连接共用）"""
+    return {
+        'host': os.getenv('DB_HOST'),
+        'port': int(os.getenv('DB_PORT', 3306)),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'db': os.getenv('DB_NAME'),
+        'charset': 'utf8mb4',
+        'cursorclass': pymysql.cursors.DictCursor
+    }
+
 def get_db_connection():
     try:
-        connection = pymysql.connect(
-            host=os.getenv('DB_HOST'),
-            user=os.getenv('DB_USER'),
-            password=os.getenv('DB_PASSWORD'),
-            db=os.getenv('DB_NAME'),
-            charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
-        )
+        connection = pymysql.connect(**get_database_config())
         return connection
     except Exception as e:
         logger.error(f"数据库连接失败: {str(e)}")
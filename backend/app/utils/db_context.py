@@ -4,8 +4,12 @@
 集成性能监控和查询优化功能
 """
 import logging
+import os
+import threading
 import time
+from collections import deque
 from contextlib import contextmanager
+from pymysql.constants import SERVER_STATUS
 from app.utils.database import get_db_connection
 from app.utils.database_optimization import (
     db_optimizer, 
@@ -29,9 +33,10 @@ def database_connection():
             result = cursor.fetchall()
     """
     db = None
+    broken = False
     try:
-        db = get_db_connection()
-        logger.debug("数据库连接已建立")
+        db = connection_pool.get_connection()
+        logger.debug("数据库连接已借出")
         yield db
     except Exception as e:
         logger.error(f"数据库操作失败: {e}")
@@ -41,14 +46,12 @@ def database_connection():
                 logger.debug("数据库事务已回滚")
             except Exception as rollback_error:
                 logger.error(f"数据库回滚失败: {rollback_error}")
+                broken = True
         raise
     finally:
         if db:
-            try:
-                db.close()
-                logger.debug("数据库连接已关闭")
-            except Exception as close_error:
-                logger.error(f"关闭数据库连接失败: {close_error}")
+            connection_pool.return_connection(db, discard=broken)
+            logger.debug("数据库连接已归还连接池")
 
 @contextmanager
 def database_transaction():
@@ -63,8 +66,9 @@ def database_transaction():
             # 成功时自动提交，失败时自动回滚
     """
     db = None
+    broken = False
     try:
-        db = get_db_connection()
+        db = connection_pool.get_connection()
         logger.debug("数据库事务已开始")
         yield db
         db.commit()
@@ -77,39 +81,272 @@ def database_transaction():
                 logger.debug("数据库事务已回滚")
             except Exception as rollback_error:
                 logger.error(f"数据库回滚失败: {rollback_error}")
+                broken = True
         raise
     finally:
         if db:
-            try:
-                db.close()
-                logger.debug("数据库连接已关闭")
-            except Exception as close_error:
-                logger.error(f"关闭数据库连接失败: {close_error}")
+            connection_pool.return_connection(db, discard=broken)
+            logger.debug("数据库连接已归还连接池")
+
+class PoolTimeoutError(Exception):
+    """连接池在等待超时内无法借出连接"""
+    pass
+
+class _PooledConnection:
+    """连接池内部记录：原始连接及其生命周期时间戳"""
+    __slots__ = ('connection', 'created_at', 'last_used')
+    
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
 
 class DatabaseConnectionPool:
     """
-    数据库连接池管理器（为未来扩展准备）
+    线程安全的有界PyMySQL连接池
+    
+    - 启动时预热 min_idle 个连接
+    - 借出时对空闲超过 ping_interval 的连接做存活检测
+    - 超过 max_lifetime 的连接归还/借出时回收重建
+    - 连接耗尽时借用方排队等待，超过 timeout 抛出 PoolTimeoutError
     """
-    def __init__(self, max_connections=10):
-        self.max_connections = max_connections
-        self._connections = []
-        self._used_connections = set()
-    
-    def get_connection(self):
-        """获取数据库连接"""
-        # 这里可以实现连接池逻辑
-        # 目前简单返回新连接
-        return get_db_connection()
-    
-    def return_connection(self, connection):
-        """归还数据库连接"""
+    def __init__(self, max_connections=None, min_idle=None, timeout=None,
+                 max_lifetime=None, ping_interval=None, connection_factory=None):
+        self.max_connections = max_connections or int(os.getenv('DATABASE_POOL_SIZE', '20'))
+        self.min_idle = min(
+            min_idle if min_idle is not None else int(os.getenv('DATABASE_POOL_MIN_IDLE', '2')),
+            self.max_connections
+        )
+        self.timeout = timeout if timeout is not None else float(os.getenv('DATABASE_POOL_TIMEOUT', '30'))
+        self.max_lifetime = max_lifetime if max_lifetime is not None else float(os.getenv('DATABASE_POOL_RECYCLE', '3600'))
+        self.ping_interval = ping_interval if ping_interval is not None else float(os.getenv('DATABASE_POOL_PING_INTERVAL', '30'))
+        self._connection_factory = connection_factory or get_db_connection
+        
+        self._idle = deque()  # 空闲连接，右端为最近归还（LIFO，保持热连接）
+        self._in_use = {}  # id(connection) -> _PooledConnection
+        self._size = 0  # 已创建（含正在创建）的连接数
+        self._waiting = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        
+        self._stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'created': 0,
+            'recycled': 0,
+            'ping_failures': 0,
+            'discarded': 0,
+            'total_wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'waited_checkouts': 0,
+            'peak_in_use': 0
+        }
+        self._recent_waits = deque(maxlen=1000)
+    
+    def warm_up(self):
+        """预热连接池，建立 min_idle 个空闲连接"""
+        created = 0
+        while True:
+            with self._lock:
+                if len(self._idle) >= self.min_idle or self._size >= self.max_connections:
+                    break
+                self._size += 1
+            try:
+                record = self._create()
+            except Exception:
+                with self._available:
+                    self._size -= 1
+                    self._available.notify()
+                raise
+            with self._available:
+                self._idle.append(record)
+                self._available.notify()
+            created += 1
+        if created:
+            logger.info(f"数据库连接池预热完成，新建 {created} 个连接")
+        return created
+    
+    def get_connection(self, timeout=None):
+        """借出连接，连接池耗尽时最多等待 timeout 秒"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        waited = False
+        
+        while True:
+            record = None
+            create_new = False
+            with self._available:
+                while not self._idle and self._size >= self.max_connections:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"数据库连接池已耗尽({self.max_connections})，等待 {timeout} 秒后超时"
+                        )
+                    waited = True
+                    self._waiting += 1
+                    try:
+                        self._available.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                
+                if self._idle:
+                    record = self._idle.pop()
+                else:
+                    self._size += 1
+                    create_new = True
+            
+            if create_new:
+                try:
+                    record = self._create()
+                except Exception:
+                    self._release_slot()
+                    raise
+            elif not self._validate(record):
+                self._release_slot()
+                continue
+            
+            record.last_used = time.monotonic()
+            wait_time = record.last_used - start
+            with self._lock:
+                self._in_use[id(record.connection)] = record
+                self._stats['checkouts'] += 1
+                self._stats['total_wait_time'] += wait_time
+                self._stats['max_wait_time'] = max(self._stats['max_wait_time'], wait_time)
+                self._stats['peak_in_use'] = max(self._stats['peak_in_use'], len(self._in_use))
+                if waited:
+                    self._stats['waited_checkouts'] += 1
+                self._recent_waits.append(wait_time)
+            return record.connection
+    
+    def return_connection(self, connection, discard=False):
+        """归还连接；连接已损坏、已关闭或超过生命周期时直接丢弃"""
+        if connection is None:
+            return
+        with self._lock:
+            record = self._in_use.pop(id(connection), None)
+        if record is None:
+            # 非连接池借出的连接，保持旧行为直接关闭
+            self._close(connection)
+            return
+        
+        if not discard and not getattr(connection, 'open', False):
+            discard = True
+        if not discard and self._expired(record):
+            with self._lock:
+                self._stats['recycled'] += 1
+            discard = True
+        if not discard and connection.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            # 调用方未提交的事务不能带给下一个借用者
+            try:
+                connection.rollback()
+            except Exception as e:
+                logger.error(f"归还连接时回滚失败: {e}")
+                discard = True
+        
+        if discard:
+            self._close(connection)
+            self._release_slot()
+            return
+        
+        record.last_used = time.monotonic()
+        with self._available:
+            self._idle.append(record)
+            self._available.notify()
+    
+    def close_all(self):
+        """关闭所有空闲连接（借出中的连接归还时会按需重建）"""
+        with self._available:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._available.notify_all()
+        for record in idle:
+            self._close(record.connection)
+    
+    def get_stats(self):
+        """获取连接池统计：借出延迟与饱和度"""
+        with self._lock:
+            in_use = len(self._in_use)
+            checkouts = self._stats['checkouts']
+            waits = sorted(self._recent_waits)
+            stats = dict(self._stats)
+            idle = len(self._idle)
+            size = self._size
+            waiting = self._waiting
+        
+        def percentile(p):
+            if not waits:
+                return 0
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))] * 1000, 3)
+        
+        return {
+            'max_connections': self.max_connections,
+            'min_idle': self.min_idle,
+            'size': size,
+            'in_use': in_use,
+            'idle': idle,
+            'waiting': waiting,
+            'saturation': round(in_use / self.max_connections * 100, 2) if self.max_connections else 0,
+            'peak_in_use': stats['peak_in_use'],
+            'checkouts': checkouts,
+            'waited_checkouts': stats['waited_checkouts'],
+            'timeouts': stats['timeouts'],
+            'created': stats['created'],
+            'recycled': stats['recycled'],
+            'ping_failures': stats['ping_failures'],
+            'discarded': stats['discarded'],
+            'checkout_latency_ms': {
+                'avg': round(stats['total_wait_time'] / checkouts * 1000, 3) if checkouts else 0,
+                'max': round(stats['max_wait_time'] * 1000, 3),
+                'p50': percentile(0.5),
+                'p95': percentile(0.95),
+                'p99': percentile(0.99)
+            }
+        }
+    
+    def _create(self):
+        connection = self._connection_factory()
+        with self._lock:
+            self._stats['created'] += 1
+        return _PooledConnection(connection)
+    
+    def _validate(self, record):
+        """借出前检查：超过生命周期则回收，空闲过久则ping"""
+        if self._expired(record):
+            with self._lock:
+                self._stats['recycled'] += 1
+            self._close(record.connection)
+            return False
+        if time.monotonic() - record.last_used >= self.ping_interval:
+            try:
+                record.connection.ping(reconnect=False)
+            except Exception as e:
+                logger.warning(f"连接池连接存活检测失败，丢弃重建: {e}")
+                with self._lock:
+                    self._stats['ping_failures'] += 1
+                self._close(record.connection)
+                return False
+        return True
+    
+    def _expired(self, record):
+        return self.max_lifetime > 0 and time.monotonic() - record.created_at >= self.max_lifetime
+    
+    def _release_slot(self):
+        with self._available:
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._available.notify()
+    
+    @staticmethod
+    def _close(connection):
         try:
-            if connection:
-                connection.close()
+            connection.close()
         except Exception as e:
-            logger.error(f"归还数据库连接失败: {e}")
+            logger.debug(f"关闭数据库连接失败: {e}")
 
-# 全局连接池实例（为未来使用）
+# 全局共享连接池实例
 connection_pool = DatabaseConnectionPool()
 
 @contextmanager 
@@ -242,6 +479,7 @@ optimized_executor = OptimizedQueryExecutor()
 def get_database_performance_report():
     """获取数据库性能报告"""
     return {
+        'connection_pool': connection_pool.get_stats(),
         'query_stats': db_optimizer.get_query_stats(),
         'slow_queries': db_optimizer.get_slow_queries(),
         'optimization_suggestions': db_optimizer.get_optimization_suggestions(),
@@ -0,0 +1,116 @@
+"""
+后台任务选主
+
+gunicorn 多 worker 时每个进程都会执行 create_app，站点拨测、Jenkins构建同步这类周期任务
+只应在一个进程中运行。LeaderLock 用一条独立的 MySQL 连接持有 GET_LOCK 命名锁：
+
+- 拿到锁的进程调用 on_acquire 启动任务，之后定期确认锁仍由本连接持有
+- 锁随连接断开自动释放（进程退出、崩溃、网络中断），其他进程在下一次重试时接管
+- 发现锁丢失（连接断开）时调用 on_release 停止本进程的任务，再重新参与选主
+"""
+import os
+import threading
+from typing import Callable, Optional
+
+from app.utils.database import get_database_config, get_db_connection
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+RETRY_SECONDS = float(os.getenv('BACKGROUND_LEADER_RETRY_SECONDS', '30'))
+
+# MySQL 锁名最长 64 个字符
+MAX_LOCK_NAME_LENGTH = 64
+
+class LeaderLock:
+    """基于 MySQL GET_LOCK 的进程间选主，同一数据库下同名锁只有一个进程持有"""
+
+    def __init__(self, name: str, on_acquire: Callable[[], None],
+                 on_release: Callable[[], None] = None, retry_interval: float = None):
+        self.name = name
+        self.on_acquire = on_acquire
+        self.on_release = on_release
+        self.retry_interval = RETRY_SECONDS if retry_interval is None else retry_interval
+        self._lock_name = name
+        self._conn = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._conn is not None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        # 锁名带上库名，多套环境共用一个 MySQL 实例时互不影响
+        database = get_database_config().get('db') or ''
+        self._lock_name = f"{database}:{self.name}"[:MAX_LOCK_NAME_LENGTH]
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f'leader-{self.name}', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止选主；持有锁时先停止任务再释放锁"""
+        self._stop_event.set()
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                if self._conn is None:
+                    self._try_acquire()
+                elif not self._still_held():
+                    logger.warning(f"后台任务锁 {self.name} 已丢失，停止本进程的任务")
+                    self._resign()
+            except Exception as e:
+                logger.error(f"后台任务选主异常 {self.name}: {e}")
+                self._resign()
+            self._stop_event.wait(self.retry_interval)
+        self._resign()
+
+    def _try_acquire(self) -> None:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT GET_LOCK(%s, 0) AS acquired", (self._lock_name,))
+                acquired = cursor.fetchone()['acquired'] == 1
+        except Exception:
+            conn.close()
+            raise
+        if not acquired:
+            conn.close()
+            return
+
+        self._conn = conn
+        logger.info(f"本进程 (pid {os.getpid()}) 获得后台任务锁 {self.name}")
+        try:
+            self.on_acquire()
+        except Exception as e:
+            logger.error(f"后台任务启动失败 {self.name}: {e}")
+            self._resign()
+
+    def _still_held(self) -> bool:
+        """同时起到保活作用，避免连接因 wait_timeout 被服务端关闭"""
+        try:
+            with self._conn.cursor() as cursor:
+                cursor.execute("SELECT IS_USED_LOCK(%s) = CONNECTION_ID() AS held", (self._lock_name,))
+                return cursor.fetchone()['held'] == 1
+        except Exception as e:
+            logger.warning(f"检查后台任务锁 {self.name} 失败: {e}")
+            return False
+
+    def _resign(self) -> None:
+        """停止任务并释放锁（关闭连接即释放）"""
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if self.on_release is not None:
+            try:
+                self.on_release()
+            except Exception as e:
+                logger.error(f"后台任务停止失败 {self.name}: {e}")
+        try:
+            conn.close()
+        except Exception:
+            pass
+        logger.info(f"本进程 (pid {os.getpid()}) 释放后台任务锁 {self.name}")
@@ -3,14 +3,18 @@
 提供API响应时间监控、缓存管理、并发控制等功能
 """
 
+import os
+import sys
 import time
+import hashlib
 import functools
 import threading
 import logging
 from typing import Dict, Any, Optional, Callable
 from datetime import datetime, timedelta
-from collections import defaultdict, deque
+from collections import defaultdict, deque, OrderedDict
 import json
+from flask import g, has_request_context, request
 
 logger = logging.getLogger(__name__)
 
@@ -184,88 +188,228 @@ def monitor_performance(endpoint_name: str = None):
     return decorator
 
 class SimpleCache:
-    """简单的内存缓存实现"""
+    """
+    有界的内存LRU缓存实现
+    
+    - 条目数与估算字节数双重上限，超出时按最近最少使用淘汰
+    - 每个键独立TTL，后台线程定期清理过期键
+    - 统计命中/未命中/淘汰/过期次数
+    """
     
-    def __init__(self, default_ttl: int = 300):  # 默认5分钟TTL
-        self._cache = {}
-        self._ttl = {}
+    def __init__(self, default_ttl: int = 300, max_entries: int = None,
+                 max_bytes: int = None, sweep_interval: int = None):  # 默认5分钟TTL
+        self._cache = OrderedDict()  # key -> (value, expires_at, size)
         self._lock = threading.Lock()
         self._default_ttl = default_ttl
+        self._max_entries = max_entries or int(os.getenv('CACHE_MAX_ENTRIES', '1000'))
+        self._max_bytes = max_bytes or int(os.getenv('CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        self._sweep_interval = sweep_interval or int(os.getenv('CACHE_SWEEP_INTERVAL', '60'))
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._sweeper = None
         
     def get(self, key: str) -> Optional[Any]:
         """获取缓存值"""
         with self._lock:
-            if key not in self._cache:
+            entry = self._cache.get(key)
+            if entry is None:
+                self._misses += 1
                 return None
             
             # 检查是否过期
-            if key in self._ttl and datetime.now() > self._ttl[key]:
-                del self._cache[key]
-                del self._ttl[key]
+            value, expires_at, _ = entry
+            if expires_at is not None and time.monotonic() > expires_at:
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
                 return None
             
-            return self._cache[key]
+            self._cache.move_to_end(key)
+            self._hits += 1
+            return value
     
     def set(self, key: str, value: Any, ttl: int = None) -> None:
         """设置缓存值"""
+        if ttl is None:
+            ttl = self._default_ttl
+        size = _estimate_size(value)
+        if size > self._max_bytes:
+            logger.debug(f"缓存值过大({size}字节)，跳过缓存: {key}")
+            return
+        
+        expires_at = time.monotonic() + ttl if ttl > 0 else None
         with self._lock:
-            self._cache[key] = value
+            if key in self._cache:
+                self._remove(key)
+            self._cache[key] = (value, expires_at, size)
+            self._total_bytes += size
             
-            # 设置过期时间
-            if ttl is None:
-                ttl = self._default_ttl
-            
-            if ttl > 0:
-                self._ttl[key] = datetime.now() + timedelta(seconds=ttl)
+            # 超出上限时淘汰最久未使用的条目
+            while len(self._cache) > self._max_entries or self._total_bytes > self._max_bytes:
+                oldest_key = next(iter(self._cache))
+                self._remove(oldest_key)
+                self._evictions += 1
+        
+        self._ensure_sweeper()
     
     def delete(self, key: str) -> None:
         """删除缓存值"""
         with self._lock:
-            self._cache.pop(key, None)
-            self._ttl.pop(key, None)
+            if key in self._cache:
+                self._remove(key)
     
     def clear(self) -> None:
         """清空缓存"""
         with self._lock:
             self._cache.clear()
-            self._ttl.clear()
+            self._total_bytes = 0
+    
+    def sweep(self) -> int:
+        """清理所有已过期的键，返回清理数量"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                key for key, (_, expires_at, _) in self._cache.items()
+                if expires_at is not None and now > expires_at
+            ]
+            for key in expired:
+                self._remove(key)
+            self._expirations += len(expired)
+        if expired:
+            logger.debug(f"缓存后台清理: 移除 {len(expired)} 个过期键")
+        return len(expired)
     
     def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
         with self._lock:
-            current_time = datetime.now()
-            active_keys = 0
-            expired_keys = 0
-            
-            for key in self._cache:
-                if key in self._ttl and current_time > self._ttl[key]:
-                    expired_keys += 1
-                else:
-                    active_keys += 1
+            now = time.monotonic()
+            expired_keys = sum(
+                1 for _, expires_at, _ in self._cache.values()
+                if expires_at is not None and now > expires_at
+            )
+            lookups = self._hits + self._misses
             
             return {
                 'total_keys': len(self._cache),
-                'active_keys': active_keys,
+                'active_keys': len(self._cache) - expired_keys,
                 'expired_keys': expired_keys,
-                'cache_size_mb': len(str(self._cache)) / 1024 / 1024
+                'cache_size_mb': round(self._total_bytes / 1024 / 1024, 3),
+                'max_entries': self._max_entries,
+                'max_size_mb': round(self._max_bytes / 1024 / 1024, 3),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups * 100, 2) if lookups else 0,
+                'evictions': self._evictions,
+                'expirations': self._expirations
             }
+    
+    def _remove(self, key: str) -> None:
+        """移除条目（调用方需持有锁）"""
+        _, _, size = self._cache.pop(key)
+        self._total_bytes -= size
+    
+    def _ensure_sweeper(self) -> None:
+        """首次写入时启动后台过期清理线程"""
+        if self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='cache-sweeper', daemon=True)
+            self._sweeper.start()
+    
+    def _sweep_loop(self) -> None:
+        while True:
+            time.sleep(self._sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"缓存后台清理失败: {e}")
+
+def _estimate_size(value: Any) -> int:
+    """估算缓存值占用的字节数"""
+    if isinstance(value, tuple):
+        return sum(_estimate_size(item) for item in value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if hasattr(value, 'get_data'):
+        # Flask Response
+        try:
+            return len(value.get_data())
+        except Exception:
+            pass
+    try:
+        return len(json.dumps(value, default=str))
+    except Exception:
+        return sys.getsizeof(value)
 
 # 全局缓存实例
 simple_cache = SimpleCache()
 
-def cached(ttl: int = 300, key_prefix: str = ""):
+# 生成缓存键时忽略的常见防缓存参数
+CACHE_BUSTING_ARGS = frozenset(['_', '_t', 'timestamp'])
+
+def make_cache_key(func: Callable, args: tuple, kwargs: dict, key_prefix: str = "",
+                   vary_on_user: bool = False) -> str:
+    """
+    构造缓存键：视图参数 + 规范化后的查询参数 + (可选)当前用户
+    
+    查询参数按键排序并去除首尾空白，忽略空值和防缓存参数，
+    保证 ?days=7&limit=20 与 ?limit=20&days=7 命中同一条缓存。
+    """
+    parts = {
+        'args': [str(arg) for arg in args],
+        'kwargs': sorted((k, str(v)) for k, v in kwargs.items())
+    }
+    
+    if has_request_context():
+        query = []
+        for name in sorted(request.args.keys()):
+            if name in CACHE_BUSTING_ARGS:
+                continue
+            values = [v.strip() for v in request.args.getlist(name) if v.strip()]
+            if values:
+                query.append((name, values))
+        parts['query'] = query
+        
+        if vary_on_user:
+            user_id = getattr(g, 'current_user_id', None)
+            if user_id is None:
+                auth_header = request.headers.get('Authorization', '')
+                user_id = hashlib.sha1(auth_header.encode()).hexdigest() if auth_header else request.remote_addr
+            parts['user'] = str(user_id)
+    
+    digest = hashlib.sha1(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+    return f"{key_prefix}{func.__name__}:{digest}"
+
+def _is_cacheable(result: Any) -> bool:
+    """错误响应不写入缓存"""
+    status = None
+    if isinstance(result, tuple) and len(result) > 1 and isinstance(result[1], int):
+        status = result[1]
+    elif hasattr(result, 'status_code'):
+        status = result.status_code
+    return status is None or status < 400
+
+def cached(ttl: int = 300, key_prefix: str = "", vary_on_user: bool = False):
     """
     缓存装饰器
     
     Args:
         ttl: 缓存生存时间(秒) 
         key_prefix: 缓存键前缀
+        vary_on_user: 是否按用户区分缓存
     """
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         def cached_wrapper(*args, **kwargs):
             # 生成缓存键
-            cache_key = f"{key_prefix}{func.__name__}:{hash(str(args) + str(sorted(kwargs.items())))}"
+            cache_key = make_cache_key(func, args, kwargs, key_prefix, vary_on_user)
             
             # 尝试从缓存获取
             cached_result = simple_cache.get(cache_key)
@@ -275,22 +419,56 @@ def cached(ttl: int = 300, key_prefix: str = ""):
             
             # 执行函数并缓存结果
             result = func(*args, **kwargs)
-            simple_cache.set(cache_key, result, ttl)
-            logger.debug(f"缓存设置: {cache_key}")
+            if _is_cacheable(result):
+                simple_cache.set(cache_key, result, ttl)
+                logger.debug(f"缓存设置: {cache_key}")
             
             return result
         
         return cached_wrapper
     return decorator
 
+class _TokenBucket:
+    """单个标识符的令牌桶状态：剩余令牌数与上次补充时间"""
+    __slots__ = ('tokens', 'updated')
+    
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
 class RateLimiter:
-    """简单的速率限制器"""
+    """
+    令牌桶速率限制器
+    
+    每个标识符只保存两个浮点数（剩余令牌、上次补充时间），
+    以 max_requests/window_seconds 的速率补充令牌，桶容量为 max_requests。
+    已补满的空闲桶与不存在的桶等价，定期清理以保持内存恒定。
+    """
     
-    def __init__(self, max_requests: int = 100, window_seconds: int = 60):
+    def __init__(self, max_requests: int = 100, window_seconds: int = 60, name: str = None):
         self._max_requests = max_requests
         self._window_seconds = window_seconds
-        self._requests = defaultdict(deque)
+        self._rate = max_requests / window_seconds if window_seconds > 0 else float('inf')
+        self._name = name
+        self._buckets = {}
         self._lock = threading.Lock()
+        self._cleanup_interval = max(window_seconds, 60)
+        self._last_cleanup = time.monotonic()
+        self._allowed = 0
+        self._blocked = 0
+    
+    def _refill(self, identifier: str, now: float) -> _TokenBucket:
+        """补充令牌（调用方需持有锁）"""
+        bucket = self._buckets.get(identifier)
+        if bucket is None:
+            bucket = _TokenBucket(float(self._max_requests), now)
+            self._buckets[identifier] = bucket
+        else:
+            elapsed = now - bucket.updated
+            if elapsed > 0:
+                bucket.tokens = min(float(self._max_requests), bucket.tokens + elapsed * self._rate)
+                bucket.updated = now
+        return bucket
     
     def is_allowed(self, identifier: str) -> bool:
         """
@@ -303,44 +481,106 @@ class RateLimiter:
             True表示允许，False表示超过限制
         """
         with self._lock:
-            current_time = time.time()
-            window_start = current_time - self._window_seconds
-            
-            # 清理过期的请求记录
-            requests = self._requests[identifier]
-            while requests and requests[0] < window_start:
-                requests.popleft()
+            now = time.monotonic()
+            if now - self._last_cleanup >= self._cleanup_interval:
+                self._evict_idle(now)
             
-            # 检查是否超过限制
-            if len(requests) >= self._max_requests:
-                return False
+            bucket = self._refill(identifier, now)
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                self._allowed += 1
+                return True
             
-            # 记录当前请求
-            requests.append(current_time)
-            return True
+            self._blocked += 1
+            return False
+    
+    def _evict_idle(self, now: float) -> None:
+        """清理已补满的空闲桶（调用方需持有锁）"""
+        full_after = self._window_seconds
+        idle = [
+            key for key, bucket in self._buckets.items()
+            if now - bucket.updated >= full_after
+        ]
+        for key in idle:
+            del self._buckets[key]
+        self._last_cleanup = now
+        if idle:
+            logger.debug(f"限流器 {self._name or ''} 清理 {len(idle)} 个空闲标识符")
     
     def get_stats(self, identifier: str) -> Dict[str, Any]:
         """获取速率限制统计"""
         with self._lock:
-            current_time = time.time()
-            window_start = current_time - self._window_seconds
+            now = time.monotonic()
+            bucket = self._buckets.get(identifier)
+            tokens = float(self._max_requests)
+            if bucket is not None:
+                tokens = min(float(self._max_requests), bucket.tokens + (now - bucket.updated) * self._rate)
             
-            # 清理过期记录
-            requests = self._requests[identifier]
-            while requests and requests[0] < window_start:
-                requests.popleft()
+            remaining = int(tokens)
+            seconds_to_full = (self._max_requests - tokens) / self._rate if self._rate else 0
             
             return {
                 'identifier': identifier,
-                'current_requests': len(requests),
+                'current_requests': self._max_requests - remaining,
+                'max_requests': self._max_requests,
+                'window_seconds': self._window_seconds,
+                'remaining_requests': remaining,
+                'reset_time': time.time() + seconds_to_full
+            }
+    
+    def get_summary(self) -> Dict[str, Any]:
+        """获取限流器整体统计"""
+        with self._lock:
+            return {
+                'name': self._name,
                 'max_requests': self._max_requests,
                 'window_seconds': self._window_seconds,
-                'remaining_requests': max(0, self._max_requests - len(requests)),
-                'reset_time': window_start + self._window_seconds
+                'tracked_identifiers': len(self._buckets),
+                'allowed_requests': self._allowed,
+                'blocked_requests': self._blocked
             }
 
 # 全局限流器实例
-rate_limiter = RateLimiter()
+rate_limiter = RateLimiter(name='global')
+
+# 每个被装饰端点（及其限流参数）一个持久限流器
+_rate_limiters: Dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(name: str, max_requests: int = 100, window_seconds: int = 60) -> RateLimiter:
+    """
+    获取（或创建）指定端点的限流器
+
+    键中包含限流参数：同一端点叠加了不同参数的限流装饰器（例如 rate_limit 与
+    enhanced_rate_limit）时各自使用独立的限流器，不会共用先创建的那个的参数。
+    """
+    key = f"{name}:{max_requests}/{window_seconds}s"
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(max_requests, window_seconds, name=name)
+            _rate_limiters[key] = limiter
+        return limiter
+
+def get_rate_limit_stats() -> Dict[str, Any]:
+    """获取所有端点限流器的统计信息"""
+    with _rate_limiters_lock:
+        limiters = dict(_rate_limiters)
+    summaries = {name: limiter.get_summary() for name, limiter in limiters.items()}
+    return {
+        'total_requests': sum(s['allowed_requests'] + s['blocked_requests'] for s in summaries.values()),
+        'blocked_requests': sum(s['blocked_requests'] for s in summaries.values()),
+        'limiters': summaries
+    }
+
+def default_rate_limit_identifier() -> str:
+    """默认限流标识：已登录用户按用户，否则按客户端IP"""
+    if not has_request_context():
+        return 'global'
+    user_id = getattr(g, 'current_user_id', None)
+    if user_id:
+        return f"user_{user_id}"
+    return f"ip_{request.remote_addr}"
 
 def rate_limit(max_requests: int = 100, window_seconds: int = 60, identifier_func: Callable = None):
     """
@@ -352,20 +592,20 @@ def rate_limit(max_requests: int = 100, window_seconds: int = 60, identifier_fun
         identifier_func: 标识符提取函数
     """
     def decorator(func: Callable) -> Callable:
+        limiter = get_rate_limiter(f"{func.__module__}.{func.__name__}", max_requests, window_seconds)
+        
         @functools.wraps(func)
         def rate_limit_wrapper(*args, **kwargs):
             # 提取请求标识符
             if identifier_func:
                 identifier = identifier_func(*args, **kwargs)
             else:
-                # 默认使用函数名作为标识符
-                identifier = f"{func.__name__}_global"
+                identifier = default_rate_limit_identifier()
             
             # 检查速率限制
-            limiter = RateLimiter(max_requests, window_seconds)
             if not limiter.is_allowed(identifier):
                 from flask import jsonify
-                logger.warning(f"速率限制触发: {identifier} 超过 {max_requests}/{window_seconds}s 限制")
+                logger.warning(f"速率限制触发: {func.__name__} {identifier} 超过 {max_requests}/{window_seconds}s 限制")
                 return jsonify({
                     'success': False,
                     'message': '请求过于频繁，请稍后重试',
@@ -375,4 +615,4 @@ def rate_limit(max_requests: int = 100, window_seconds: int = 60, identifier_fun
             return func(*args, **kwargs)
         
         return rate_limit_wrapper
-    return decorator
\ No newline at end of file
+    return decorator
@@ -430,6 +430,9 @@ def enhanced_rate_limit(max_requests: int = 100, window_seconds: int = 60,
                        per_user: bool = True):
     """增强的速率限制装饰器"""
     def decorator(func: Callable) -> Callable:
+        from app.utils.performance import get_rate_limiter
+        limiter = get_rate_limiter(f"{func.__module__}.{func.__name__}", max_requests, window_seconds)
+        
         @wraps(func)
         def enhanced_rate_limit_wrapper(*args, **kwargs):
             user_id = getattr(g, 'current_user_id', None)
@@ -442,10 +445,8 @@ def enhanced_rate_limit(max_requests: int = 100, window_seconds: int = 60,
                 limit_key = f"ip_{ip_address}"
             
             # 这里应该使用Redis等外部存储来实现分布式限流
-            # 简化实现，使用内存存储
-            from app.utils.performance import rate_limiter
-            
-            if not rate_limiter.is_allowed(limit_key):
+            # 简化实现，使用进程内的端点限流器
+            if not limiter.is_allowed(limit_key):
                 # 记录限流事件
                 security_auditor.log_security_event(
                     'rate_limit_exceeded',
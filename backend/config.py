@@ -53,7 +53,98 @@ class Config:
     PERFORMANCE_MONITOR_ENABLED = os.getenv('PERFORMANCE_MONITOR_ENABLED', 'true').lower() == 'true'
     DATABASE_POOL_SIZE = int(os.getenv('DATABASE_POOL_SIZE', '20'))
     DATABASE_POOL_TIMEOUT = int(os.getenv('DATABASE_POOL_TIMEOUT', '30'))
+    DATABASE_POOL_MIN_IDLE = int(os.getenv('DATABASE_POOL_MIN_IDLE', '2'))
+    DATABASE_POOL_RECYCLE = int(os.getenv('DATABASE_POOL_RECYCLE', '3600'))
+    DATABASE_POOL_PING_INTERVAL = int(os.getenv('DATABASE_POOL_PING_INTERVAL', '30'))
     CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', '300'))
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1000'))
+    CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    CACHE_SWEEP_INTERVAL = int(os.getenv('CACHE_SWEEP_INTERVAL', '60'))
+    
+    # 后台任务选主：未持有锁的进程重试间隔（秒）
+    BACKGROUND_LEADER_RETRY_SECONDS = float(os.getenv('BACKGROUND_LEADER_RETRY_SECONDS', '30'))
+    
+    # Jenkins构建历史同步配置
+    JENKINS_BUILD_SYNC_ENABLED = os.getenv('JENKINS_BUILD_SYNC_ENABLED', 'true').lower() == 'true'
+    JENKINS_BUILD_SYNC_INTERVAL = int(os.getenv('JENKINS_BUILD_SYNC_INTERVAL', '60'))
+    JENKINS_BUILD_SYNC_BACKFILL = int(os.getenv('JENKINS_BUILD_SYNC_BACKFILL', '100'))
+    JENKINS_BUILD_SYNC_WORKERS = int(os.getenv('JENKINS_BUILD_SYNC_WORKERS', '4'))
+    JENKINS_HTTP_POOL_SIZE = int(os.getenv('JENKINS_HTTP_POOL_SIZE', '10'))
+    JENKINS_HTTP_WORKERS = int(os.getenv('JENKINS_HTTP_WORKERS', '16'))
+    JENKINS_CREDENTIAL_CACHE_TTL = int(os.getenv('JENKINS_CREDENTIAL_CACHE_TTL', '300'))
+    JENKINS_VIEW_CACHE_TTL = int(os.getenv('JENKINS_VIEW_CACHE_TTL', '30'))
+    JENKINS_LOG_MAX_RANGE_BYTES = int(os.getenv('JENKINS_LOG_MAX_RANGE_BYTES', str(2 * 1024 * 1024)))
+    JENKINS_LOG_POLL_INTERVAL = float(os.getenv('JENKINS_LOG_POLL_INTERVAL', '1.0'))
+    JENKINS_LOG_FOLLOW_TIMEOUT = int(os.getenv('JENKINS_LOG_FOLLOW_TIMEOUT', '1800'))
+    SSH_POOL_MAX_SESSIONS_PER_HOST = int(os.getenv('SSH_POOL_MAX_SESSIONS_PER_HOST', '8'))
+    SSH_POOL_IDLE_TIMEOUT = int(os.getenv('SSH_POOL_IDLE_TIMEOUT', '300'))
+    SSH_POOL_ACQUIRE_TIMEOUT = int(os.getenv('SSH_POOL_ACQUIRE_TIMEOUT', '60'))
+    SSH_POOL_KEEPALIVE = int(os.getenv('SSH_POOL_KEEPALIVE', '30'))
+    BATCH_COMMAND_ENGINE = os.getenv('BATCH_COMMAND_ENGINE', 'thread')
+    BATCH_COMMAND_MAX_HOSTS = int(os.getenv('BATCH_COMMAND_MAX_HOSTS', '2000'))
+    BATCH_COMMAND_CONCURRENCY = int(os.getenv('BATCH_COMMAND_CONCURRENCY', '200'))
+    BATCH_COMMAND_HOST_TIMEOUT = float(os.getenv('BATCH_COMMAND_HOST_TIMEOUT', '60'))
+    BATCH_COMMAND_CONNECT_TIMEOUT = float(os.getenv('BATCH_COMMAND_CONNECT_TIMEOUT', '10'))
+    BATCH_COMMAND_MAX_OUTPUT_BYTES = int(os.getenv('BATCH_COMMAND_MAX_OUTPUT_BYTES', str(64 * 1024)))
+    BATCH_COMMAND_IDLE_TIMEOUT = int(os.getenv('BATCH_COMMAND_IDLE_TIMEOUT', '300'))
+    # 批量命令输出：整批内存上限，超出部分落盘供下载（单个输出流/整批的落盘上限，文件保留时间，秒）
+    BATCH_OUTPUT_MAX_TOTAL_BYTES = int(os.getenv('BATCH_OUTPUT_MAX_TOTAL_BYTES', str(32 * 1024 * 1024)))
+    BATCH_OUTPUT_SPILL_ENABLED = os.getenv('BATCH_OUTPUT_SPILL_ENABLED', 'true').lower() == 'true'
+    BATCH_OUTPUT_SPILL_DIR = os.getenv('BATCH_OUTPUT_SPILL_DIR', '')
+    BATCH_OUTPUT_SPILL_MAX_BYTES = int(os.getenv('BATCH_OUTPUT_SPILL_MAX_BYTES', str(256 * 1024 * 1024)))
+    BATCH_OUTPUT_SPILL_MAX_TOTAL_BYTES = int(os.getenv('BATCH_OUTPUT_SPILL_MAX_TOTAL_BYTES', str(1024 * 1024 * 1024)))
+    BATCH_OUTPUT_SPILL_TTL = int(os.getenv('BATCH_OUTPUT_SPILL_TTL', '3600'))
+    
+    # 站点监控后台拨测
+    SITE_MONITOR_ENABLED = os.getenv('SITE_MONITOR_ENABLED', 'true').lower() == 'true'
+    SITE_MONITOR_CONCURRENCY = int(os.getenv('SITE_MONITOR_CONCURRENCY', '50'))
+    SITE_MONITOR_JITTER = float(os.getenv('SITE_MONITOR_JITTER', '0.1'))
+    SITE_MONITOR_MIN_INTERVAL = int(os.getenv('SITE_MONITOR_MIN_INTERVAL', '10'))
+    SITE_MONITOR_RELOAD_INTERVAL = int(os.getenv('SITE_MONITOR_RELOAD_INTERVAL', '60'))
+    SITE_MONITOR_KEEPALIVE = int(os.getenv('SITE_MONITOR_KEEPALIVE', '60'))
+    SITE_MONITOR_DNS_CACHE_TTL = int(os.getenv('SITE_MONITOR_DNS_CACHE_TTL', '300'))
+    SITE_MONITOR_MAX_BODY_BYTES = int(os.getenv('SITE_MONITOR_MAX_BODY_BYTES', str(1024 * 1024)))
+    SITE_MONITOR_FLUSH_INTERVAL = float(os.getenv('SITE_MONITOR_FLUSH_INTERVAL', '2'))
+    SITE_MONITOR_FLUSH_SIZE = int(os.getenv('SITE_MONITOR_FLUSH_SIZE', '200'))
+    SITE_MONITOR_ROLLUP_INTERVAL = int(os.getenv('SITE_MONITOR_ROLLUP_INTERVAL', '60'))
+    # 手动批量拨测任务超过该秒数仍未结束视为失败
+    SITE_MONITOR_PROBE_JOB_TIMEOUT = int(os.getenv('SITE_MONITOR_PROBE_JOB_TIMEOUT', '600'))
+    # 拨测历史保留天数（0 表示不清理），天汇总永久保留
+    SITE_MONITOR_HISTORY_RETENTION_DAYS = int(os.getenv('SITE_MONITOR_HISTORY_RETENTION_DAYS', '7'))
+    SITE_MONITOR_MINUTE_ROLLUP_RETENTION_DAYS = int(os.getenv('SITE_MONITOR_MINUTE_ROLLUP_RETENTION_DAYS', '30'))
+    SITE_MONITOR_HOUR_ROLLUP_RETENTION_DAYS = int(os.getenv('SITE_MONITOR_HOUR_ROLLUP_RETENTION_DAYS', '365'))
+    
+    # 阿里云ECS同步：并行查询的区域数，区域列表缓存时间（秒）
+    ALIYUN_SYNC_CONCURRENCY = int(os.getenv('ALIYUN_SYNC_CONCURRENCY', '8'))
+    ALIYUN_REGION_CACHE_TTL = int(os.getenv('ALIYUN_REGION_CACHE_TTL', '3600'))
+    
+    # 仪表板统计：缓存最长有效期（秒），数据变更后合并推送的等待时间（秒），
+    # 多 worker 时检查其他进程变更的间隔（秒）
+    DASHBOARD_STATS_TTL = float(os.getenv('DASHBOARD_STATS_TTL', '30'))
+    DASHBOARD_STATS_DEBOUNCE = float(os.getenv('DASHBOARD_STATS_DEBOUNCE', '1'))
+    DASHBOARD_STATS_SYNC_INTERVAL = float(os.getenv('DASHBOARD_STATS_SYNC_INTERVAL', '2'))
+    # 登录事件保留天数（按天汇总的登录次数长期保留）
+    LOGIN_EVENT_RETENTION_DAYS = int(os.getenv('LOGIN_EVENT_RETENTION_DAYS', '180'))
+    
+    # Web终端：单次读取合并的最大字节数，浏览器接收慢时暂停/恢复读取的缓冲水位，发送线程数
+    TERMINAL_READ_SIZE = int(os.getenv('TERMINAL_READ_SIZE', str(64 * 1024)))
+    TERMINAL_BUFFER_HIGH = int(os.getenv('TERMINAL_BUFFER_HIGH', str(256 * 1024)))
+    TERMINAL_BUFFER_LOW = int(os.getenv('TERMINAL_BUFFER_LOW', str(64 * 1024)))
+    TERMINAL_SEND_WORKERS = int(os.getenv('TERMINAL_SEND_WORKERS', '16'))
+    # 连接断开后SSH会话保留的秒数（0 表示断开即关闭）及用于重连补发的输出缓冲字节数；
+    # 会话登记在进程内，未设置时多 worker（GUNICORN_WORKERS / WEB_CONCURRENCY 大于 1）默认为 0
+    GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS') or os.getenv('WEB_CONCURRENCY') or '1')
+    TERMINAL_DETACH_GRACE_SECONDS = float(os.getenv('TERMINAL_DETACH_GRACE_SECONDS')
+                                          or ('300' if GUNICORN_WORKERS <= 1 else '0'))
+    TERMINAL_SCROLLBACK_BYTES = int(os.getenv('TERMINAL_SCROLLBACK_BYTES', str(256 * 1024)))
+    # Web终端录制（默认关闭）：是否录制键盘输入、分块写盘的时间/大小、保留天数
+    TERMINAL_RECORDING_ENABLED = os.getenv('TERMINAL_RECORDING_ENABLED', 'false').lower() == 'true'
+    TERMINAL_RECORDING_INPUT = os.getenv('TERMINAL_RECORDING_INPUT', 'false').lower() == 'true'
+    TERMINAL_RECORDING_DIR = os.getenv('TERMINAL_RECORDING_DIR', '')
+    TERMINAL_RECORDING_CHUNK_SECONDS = float(os.getenv('TERMINAL_RECORDING_CHUNK_SECONDS', '10'))
+    TERMINAL_RECORDING_CHUNK_BYTES = int(os.getenv('TERMINAL_RECORDING_CHUNK_BYTES', str(256 * 1024)))
+    TERMINAL_RECORDING_MAX_BUFFER_BYTES = int(os.getenv('TERMINAL_RECORDING_MAX_BUFFER_BYTES', str(8 * 1024 * 1024)))
+    TERMINAL_RECORDING_RETENTION_DAYS = int(os.getenv('TERMINAL_RECORDING_RETENTION_DAYS', '90'))
     
     # 安全配置
     ENCRYPTION_MASTER_KEY = os.getenv('ENCRYPTION_MASTER_KEY')
@@ -1,7 +1,9 @@
+import os
+
 from app import create_app
 
-# 创建应用实例
-app = create_app()
+# 创建应用实例；debug 模式下 reloader 父进程只负责监视文件变化，后台任务在处理请求的子进程中启动
+app = create_app(start_background_jobs=__name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5002, debug=True) 
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5002, debug=True)
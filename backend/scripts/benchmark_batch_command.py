@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+批量命令执行引擎基准测试
+在本机启动一个模拟SSH服务器（asyncssh），用 127.x.y.z 地址模拟大量不同主机，
+对比原线程池实现（10线程、每台主机新建paramiko连接）与 asyncio 引擎的吞吐（主机/秒）
+
+用法: python scripts/benchmark_batch_command.py [主机数] [命令耗时毫秒] [并发数]
+"""
+
+import asyncio
+import importlib.util
+import ipaddress
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import asyncssh
+
+BACKEND_DIR = Path(__file__).parent.parent
+PASSWORD = 'bench'
+# 127.0.0.1 起的连续回环地址，每个地址视为一台主机
+LOOPBACK_BASE = int(ipaddress.IPv4Address('127.0.0.1'))
+
+def _load(name, relative_path):
+    """直接加载模块文件，避免导入整个 app 包（需要数据库等环境配置）"""
+    spec = importlib.util.spec_from_file_location(name, BACKEND_DIR / relative_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+for package in ('app', 'app.utils', 'app.services'):
+    sys.modules.setdefault(package, types.ModuleType(package))
+_load('app.utils.logger', 'app/utils/logger.py')
+_load('app.services.command_output', 'app/services/command_output.py')
+batch_executor = _load('app.services.batch_executor', 'app/services/batch_executor.py')
+
+class BenchServer(asyncssh.SSHServer):
+    connections = 0
+
+    def connection_made(self, conn):
+        BenchServer.connections += 1
+
+    def begin_auth(self, username):
+        return True
+
+    def password_auth_supported(self):
+        return True
+
+    def validate_password(self, username, password):
+        return password == PASSWORD
+
+def start_server(latency):
+    """在后台线程启动模拟SSH服务器，返回端口"""
+    ready = threading.Event()
+    state = {}
+
+    async def handle(process):
+        await asyncio.sleep(latency)
+        process.stdout.write(f"ok {process.command}\n")
+        process.exit(0)
+
+    def run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        host_key = asyncssh.generate_private_key('ssh-ed25519')
+        server = loop.run_until_complete(asyncssh.create_server(
+            BenchServer, '0.0.0.0', 0, server_host_keys=[host_key], process_factory=handle
+        ))
+        state['port'] = server.sockets[0].getsockname()[1]
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait()
+    return state['port']
+
+def make_targets(count, port):
+    return [
+        {
+            'hostname': f'host-{i}',
+            'ip': str(ipaddress.IPv4Address(LOOPBACK_BASE + i)),
+            'port': port,
+            'username': 'root',
+            'password': PASSWORD
+        }
+        for i in range(count)
+    ]
+
+def legacy_run(targets, command):
+    """原实现：固定10线程，每台主机新建 paramiko 连接"""
+    import paramiko
+
+    def execute(host):
+        ssh = paramiko.SSHClient()
+        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            ssh.connect(hostname=host['ip'], port=host['port'], username=host['username'],
+                        password=host['password'], timeout=10, look_for_keys=False, allow_agent=False)
+            stdin, stdout, stderr = ssh.exec_command(command)
+            return stdout.read().decode().strip()
+        finally:
+            ssh.close()
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        return list(executor.map(execute, targets))
+
+def main():
+    host_count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 200) / 1000
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+    port = start_server(latency)
+    targets = make_targets(host_count, port)
+    command = 'uptime'
+    print(f"📊 主机数: {host_count}, 命令耗时: {latency * 1000:.0f}ms, 并发: {concurrency}")
+
+    try:
+        started = time.perf_counter()
+        legacy_run(targets, command)
+        elapsed = time.perf_counter() - started
+        print(f"  线程池(10)+paramiko   {elapsed:7.2f}s  {host_count / elapsed:8.1f} 主机/秒")
+    except ImportError:
+        print("  未安装 paramiko，跳过原实现")
+
+    executor = batch_executor.AsyncBatchExecutor(concurrency=concurrency, host_timeout=60)
+    connections_before = BenchServer.connections
+    started = time.perf_counter()
+    results = executor.run(targets, command)
+    elapsed = time.perf_counter() - started
+    failed = [r for r in results if r['status'] != 'success']
+    print(f"  asyncio 引擎(首次)     {elapsed:7.2f}s  {host_count / elapsed:8.1f} 主机/秒  "
+          f"新建连接 {BenchServer.connections - connections_before}  失败 {len(failed)}")
+
+    connections_before = BenchServer.connections
+    started = time.perf_counter()
+    executor.run(targets, command)
+    elapsed = time.perf_counter() - started
+    print(f"  asyncio 引擎(复用连接) {elapsed:7.2f}s  {host_count / elapsed:8.1f} 主机/秒  "
+          f"新建连接 {BenchServer.connections - connections_before}")
+
+    if failed:
+        print(f"  示例错误: {failed[0]['output']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Jenkins构建统计基准测试
+对比逐条循环实现与 BuildFrame 列式实现在 5 万条构建下的耗时
+
+用法: python scripts/benchmark_build_frame.py [构建数] [任务数]
+"""
+
+import sys
+import random
+import time
+import importlib.util
+from datetime import datetime
+from pathlib import Path
+
+# 直接加载模块文件，避免导入整个 app 包（需要数据库等环境配置）
+_module_path = Path(__file__).parent.parent / 'app' / 'utils' / 'build_frame.py'
+_spec = importlib.util.spec_from_file_location('build_frame', _module_path)
+build_frame = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(build_frame)
+BuildFrame = build_frame.BuildFrame
+
+RESULTS = ['SUCCESS'] * 8 + ['FAILURE', 'ABORTED', 'UNSTABLE', None]
+
+def generate_jobs_data(total_builds, total_jobs, days=30):
+    """生成 jobs[name,builds[...]] 结构的测试数据"""
+    random.seed(42)
+    now = int(time.time() * 1000)
+    span = days * 24 * 60 * 60 * 1000
+    jobs = [{'name': f'job-{i}', 'builds': []} for i in range(total_jobs)]
+    for number in range(total_builds):
+        job = jobs[random.randrange(total_jobs)]
+        job['builds'].append({
+            'number': len(job['builds']) + 1,
+            'timestamp': now - random.randrange(span),
+            'result': random.choice(RESULTS),
+            'duration': random.randint(10_000, 1_800_000),
+            'estimatedDuration': random.randint(0, 1_800_000),
+            'triggeredBy': 'bench'
+        })
+    return {'jobs': jobs}
+
+def legacy_analytics(jobs_data, start_time):
+    """原 get_jenkins_analytics 的逐条统计"""
+    all_builds = []
+    job_stats = {}
+    for job in jobs_data['jobs']:
+        job_name = job['name']
+        job_stats[job_name] = {'totalBuilds': 0, 'successBuilds': 0, 'failedBuilds': 0, 'totalDuration': 0}
+        for build in job['builds']:
+            if build['timestamp'] >= start_time:
+                status = build['result'].lower() if build['result'] else 'building'
+                all_builds.append({'jobName': job_name, 'status': status, 'startTime': build['timestamp'], 'duration': build['duration']})
+                job_stats[job_name]['totalBuilds'] += 1
+                job_stats[job_name]['totalDuration'] += build['duration']
+                if status == 'success':
+                    job_stats[job_name]['successBuilds'] += 1
+                elif status == 'failure':
+                    job_stats[job_name]['failedBuilds'] += 1
+    all_builds.sort(key=lambda x: x['startTime'], reverse=True)
+    success = len([b for b in all_builds if b['status'] == 'success'])
+    failure = len([b for b in all_builds if b['status'] == 'failure'])
+    return job_stats, success, failure, all_builds[:100]
+
+def legacy_trends(jobs_data, start_time, time_format='%Y-%m-%d'):
+    """原 get_jenkins_trends 的逐条分桶"""
+    buckets = {}
+    for job in jobs_data['jobs']:
+        for build in job['builds']:
+            if build['timestamp'] >= start_time:
+                key = datetime.fromtimestamp(build['timestamp'] / 1000).strftime(time_format)
+                stats = buckets.setdefault(key, {'total': 0, 'success': 0, 'totalDuration': 0})
+                stats['total'] += 1
+                stats['totalDuration'] += build['duration']
+                if build['result'] == 'SUCCESS':
+                    stats['success'] += 1
+    return [dict(time=k, **buckets[k]) for k in sorted(buckets)]
+
+def legacy_metrics(jobs_data, start_time):
+    """原 get_jenkins_metrics 的按任务效率计算（每个任务扫描全部最近构建）"""
+    recent_builds = []
+    for job in jobs_data['jobs']:
+        for build in job['builds']:
+            if build['timestamp'] >= start_time:
+                estimated = build['estimatedDuration']
+                recent_builds.append({
+                    'jobName': job['name'],
+                    'efficiency': (build['duration'] / estimated * 100) if estimated > 0 else 100
+                })
+    efficiency = {}
+    for job in jobs_data['jobs']:
+        job_builds = [b for b in recent_builds if b['jobName'] == job['name']]
+        if job_builds:
+            efficiency[job['name']] = sum(b['efficiency'] for b in job_builds) / len(job_builds)
+    return efficiency
+
+def frame_all(jobs_data, start_time):
+    """BuildFrame 实现的同等统计"""
+    frame = BuildFrame.from_jobs_data(jobs_data).since(start_time)
+    job_stats = frame.job_stats()
+    counts = frame.status_counts()
+    latest = list(frame.latest(100))
+    trends = frame.time_series('daily')
+    efficiency = build_frame.np.divide(
+        frame.duration * 100.0, frame.estimated_duration,
+        out=build_frame.np.full(len(frame), 100.0), where=frame.estimated_duration > 0
+    )
+    job_efficiency = frame.job_mean(efficiency)
+    percentiles = frame.job_percentiles()
+    return job_stats, counts, latest, trends, job_efficiency, percentiles
+
+def timed(func, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+def main():
+    total_builds = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    total_jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    jobs_data = generate_jobs_data(total_builds, total_jobs)
+    start_time = int(time.time() * 1000) - 30 * 24 * 60 * 60 * 1000
+
+    print(f"📊 构建数: {total_builds}, 任务数: {total_jobs}")
+
+    analytics_ms, legacy_result = timed(legacy_analytics, jobs_data, start_time)
+    trends_ms, legacy_trend = timed(legacy_trends, jobs_data, start_time)
+    metrics_ms, _ = timed(legacy_metrics, jobs_data, start_time, repeat=1)
+    legacy_total = analytics_ms + trends_ms + metrics_ms
+    print(f"  逐条循环  analytics {analytics_ms:8.1f}ms  trends {trends_ms:8.1f}ms  metrics {metrics_ms:8.1f}ms  合计 {legacy_total:8.1f}ms")
+
+    frame_ms, frame_result = timed(frame_all, jobs_data, start_time)
+    build_ms, _ = timed(BuildFrame.from_jobs_data, jobs_data)
+    print(f"  BuildFrame 全部统计(含分位数) {frame_ms:8.1f}ms  其中列构建 {build_ms:.1f}ms  加速 {legacy_total / frame_ms:.1f}x")
+
+    # 校验结果一致
+    job_stats = frame_result[0]
+    for name, stats in legacy_result[0].items():
+        assert job_stats[name]['totalBuilds'] == stats['totalBuilds']
+        assert job_stats[name]['successBuilds'] == stats['successBuilds']
+        assert job_stats[name]['totalDuration'] == stats['totalDuration']
+    assert [t['total'] for t in frame_result[3]] == [t['total'] for t in legacy_trend]
+    print("  ✓ 统计结果一致")
+
+if __name__ == '__main__':
+    main()
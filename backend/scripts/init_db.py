@@ -12,7 +12,7 @@ logger = get_logger(__name__)
 
 def execute_sql_files():
     """执行 SQL 文件夹下的所有 SQL 文件"""
-    app = create_app()
+    app = create_app(start_background_jobs=False)
     
     # 获取数据库配置
     db_config = {
@@ -0,0 +1,35 @@
+-- Jenkins构建历史表
+-- 由后台同步任务增量写入，分析类接口直接读取，避免每次请求全量拉取Jenkins构建树
+CREATE TABLE IF NOT EXISTS `jenkins_build_history` (
+  `id` bigint NOT NULL AUTO_INCREMENT,
+  `instance_id` int NOT NULL COMMENT 'Jenkins实例ID',
+  `job_name` varchar(255) NOT NULL COMMENT '任务名称',
+  `build_number` int NOT NULL COMMENT '构建号',
+  `timestamp` bigint NOT NULL DEFAULT 0 COMMENT '构建开始时间(毫秒)',
+  `duration` bigint NOT NULL DEFAULT 0 COMMENT '构建时长(毫秒)',
+  `estimated_duration` bigint NOT NULL DEFAULT 0 COMMENT '预计时长(毫秒)',
+  `result` varchar(20) DEFAULT NULL COMMENT '构建结果，构建中为NULL',
+  `building` tinyint(1) NOT NULL DEFAULT 0 COMMENT '是否构建中',
+  `triggered_by` varchar(100) DEFAULT NULL COMMENT '触发者',
+  `commit_sha` varchar(64) DEFAULT NULL COMMENT '构建版本',
+  `executor` varchar(100) DEFAULT NULL COMMENT '执行节点',
+  `causes` text DEFAULT NULL COMMENT '触发原因(JSON)',
+  `synced_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '同步时间',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `unique_build` (`instance_id`, `job_name`, `build_number`),
+  KEY `idx_instance_time` (`instance_id`, `timestamp`),
+  KEY `idx_instance_building` (`instance_id`, `building`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Jenkins构建历史表';
+
+-- Jenkins构建历史同步状态表
+CREATE TABLE IF NOT EXISTS `jenkins_build_sync_status` (
+  `instance_id` int NOT NULL COMMENT 'Jenkins实例ID',
+  `last_sync_time` timestamp NULL DEFAULT NULL COMMENT '最后成功同步时间',
+  `sync_status` enum('running','completed','failed') NOT NULL DEFAULT 'completed' COMMENT '同步状态',
+  `job_names` mediumtext DEFAULT NULL COMMENT '当前任务列表(JSON)',
+  `builds_synced` int DEFAULT 0 COMMENT '本次同步写入的构建数',
+  `error_message` text DEFAULT NULL COMMENT '错误信息',
+  `sync_duration` int DEFAULT NULL COMMENT '同步耗时(毫秒)',
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`instance_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='Jenkins构建历史同步状态表';
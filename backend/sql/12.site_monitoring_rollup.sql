@@ -0,0 +1,63 @@
+-- 站点拨测汇总表
+-- 后台调度按分钟/小时/天汇总 site_monitoring_history，长时间范围的历史和SLA统计直接读取汇总表
+-- 直方图桶上界(毫秒): 5,10,25,50,75,100,150,200,300,400,500,750,1000,1500,2000,3000,5000,7500,10000,15000,30000,60000,+inf
+
+CREATE TABLE IF NOT EXISTS `site_monitoring_rollup_minute` (
+  `site_id` int NOT NULL COMMENT '站点ID',
+  `bucket_start` datetime NOT NULL COMMENT '时间桶开始时间',
+  `check_count` int NOT NULL DEFAULT 0 COMMENT '拨测次数',
+  `up_count` int NOT NULL DEFAULT 0 COMMENT '在线次数',
+  `timeout_count` int NOT NULL DEFAULT 0 COMMENT '超时次数',
+  `error_count` int NOT NULL DEFAULT 0 COMMENT '离线/错误次数',
+  `latency_count` int NOT NULL DEFAULT 0 COMMENT '有响应时间的次数',
+  `latency_sum` bigint NOT NULL DEFAULT 0 COMMENT '响应时间合计(毫秒)',
+  `latency_min` int DEFAULT NULL COMMENT '最小响应时间(毫秒)',
+  `latency_max` int DEFAULT NULL COMMENT '最大响应时间(毫秒)',
+  `p50` int DEFAULT NULL COMMENT 'P50响应时间(毫秒)',
+  `p95` int DEFAULT NULL COMMENT 'P95响应时间(毫秒)',
+  `p99` int DEFAULT NULL COMMENT 'P99响应时间(毫秒)',
+  `latency_histogram` varchar(512) NOT NULL DEFAULT '' COMMENT '响应时间直方图(逗号分隔计数)',
+  PRIMARY KEY (`site_id`, `bucket_start`),
+  KEY `idx_bucket_start` (`bucket_start`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='站点拨测分钟汇总表';
+
+CREATE TABLE IF NOT EXISTS `site_monitoring_rollup_hour` (
+  `site_id` int NOT NULL COMMENT '站点ID',
+  `bucket_start` datetime NOT NULL COMMENT '时间桶开始时间',
+  `check_count` int NOT NULL DEFAULT 0 COMMENT '拨测次数',
+  `up_count` int NOT NULL DEFAULT 0 COMMENT '在线次数',
+  `timeout_count` int NOT NULL DEFAULT 0 COMMENT '超时次数',
+  `error_count` int NOT NULL DEFAULT 0 COMMENT '离线/错误次数',
+  `latency_count` int NOT NULL DEFAULT 0 COMMENT '有响应时间的次数',
+  `latency_sum` bigint NOT NULL DEFAULT 0 COMMENT '响应时间合计(毫秒)',
+  `latency_min` int DEFAULT NULL COMMENT '最小响应时间(毫秒)',
+  `latency_max` int DEFAULT NULL COMMENT '最大响应时间(毫秒)',
+  `p50` int DEFAULT NULL COMMENT 'P50响应时间(毫秒)',
+  `p95` int DEFAULT NULL COMMENT 'P95响应时间(毫秒)',
+  `p99` int DEFAULT NULL COMMENT 'P99响应时间(毫秒)',
+  `latency_histogram` varchar(512) NOT NULL DEFAULT '' COMMENT '响应时间直方图(逗号分隔计数)',
+  PRIMARY KEY (`site_id`, `bucket_start`),
+  KEY `idx_bucket_start` (`bucket_start`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='站点拨测小时汇总表';
+
+CREATE TABLE IF NOT EXISTS `site_monitoring_rollup_day` (
+  `site_id` int NOT NULL COMMENT '站点ID',
+  `bucket_start` datetime NOT NULL COMMENT '时间桶开始时间',
+  `check_count` int NOT NULL DEFAULT 0 COMMENT '拨测次数',
+  `up_count` int NOT NULL DEFAULT 0 COMMENT '在线次数',
+  `timeout_count` int NOT NULL DEFAULT 0 COMMENT '超时次数',
+  `error_count` int NOT NULL DEFAULT 0 COMMENT '离线/错误次数',
+  `latency_count` int NOT NULL DEFAULT 0 COMMENT '有响应时间的次数',
+  `latency_sum` bigint NOT NULL DEFAULT 0 COMMENT '响应时间合计(毫秒)',
+  `latency_min` int DEFAULT NULL COMMENT '最小响应时间(毫秒)',
+  `latency_max` int DEFAULT NULL COMMENT '最大响应时间(毫秒)',
+  `p50` int DEFAULT NULL COMMENT 'P50响应时间(毫秒)',
+  `p95` int DEFAULT NULL COMMENT 'P95响应时间(毫秒)',
+  `p99` int DEFAULT NULL COMMENT 'P99响应时间(毫秒)',
+  `latency_histogram` varchar(512) NOT NULL DEFAULT '' COMMENT '响应时间直方图(逗号分隔计数)',
+  PRIMARY KEY (`site_id`, `bucket_start`),
+  KEY `idx_bucket_start` (`bucket_start`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='站点拨测天汇总表';
+
+-- 已有部署补充历史表的 (site_id, check_time) 索引（应用启动时也会自动检查并添加）
+-- ALTER TABLE site_monitoring_history ADD INDEX idx_site_check_time (site_id, check_time);
@@ -0,0 +1,12 @@
+-- 站点拨测分阶段耗时
+-- 新部署已包含在 8.site_monitoring.sql 中；已有部署执行以下语句（应用启动时也会自动检查并添加）
+
+-- ALTER TABLE site_monitoring
+--     ADD COLUMN reuse_connection tinyint(1) NOT NULL DEFAULT 1 COMMENT '拨测是否复用连接';
+
+-- ALTER TABLE site_monitoring_history
+--     ADD COLUMN dns_time int DEFAULT NULL COMMENT 'DNS解析耗时(毫秒)',
+--     ADD COLUMN connect_time int DEFAULT NULL COMMENT 'TCP连接耗时(毫秒)',
+--     ADD COLUMN tls_time int DEFAULT NULL COMMENT 'TLS握手耗时(毫秒)',
+--     ADD COLUMN ttfb int DEFAULT NULL COMMENT '首字节耗时(毫秒)',
+--     ADD COLUMN connection_reused tinyint(1) DEFAULT NULL COMMENT '是否复用已有连接';
@@ -0,0 +1,7 @@
+-- 阿里云同步状态：记录每次同步的差异统计
+-- 新部署已包含在 7.aliyun_ecs_cache.sql 中；已有部署执行以下语句（应用首次更新同步状态时也会自动检查并添加）
+
+-- ALTER TABLE aliyun_sync_status
+--     ADD COLUMN added_count int(11) DEFAULT 0 COMMENT '新增数量',
+--     ADD COLUMN changed_count int(11) DEFAULT 0 COMMENT '变化数量',
+--     ADD COLUMN removed_count int(11) DEFAULT 0 COMMENT '删除数量';
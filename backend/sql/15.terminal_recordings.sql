@@ -0,0 +1,19 @@
+-- Web终端会话录制元数据（录制文件保存在 TERMINAL_RECORDING_DIR 目录）
+CREATE TABLE IF NOT EXISTS terminal_recordings (
+    id CHAR(32) PRIMARY KEY COMMENT '录制ID',
+    operator VARCHAR(100) COMMENT '操作用户',
+    host VARCHAR(255) NOT NULL COMMENT '目标主机',
+    port INT COMMENT 'SSH端口',
+    username VARCHAR(100) COMMENT 'SSH用户名',
+    instance_id VARCHAR(100) COMMENT '云实例ID',
+    status VARCHAR(20) NOT NULL DEFAULT 'recording' COMMENT '状态: recording/completed',
+    started_at DATETIME NOT NULL COMMENT '开始时间',
+    ended_at DATETIME COMMENT '结束时间',
+    duration DECIMAL(12,3) COMMENT '时长（秒）',
+    output_chars BIGINT DEFAULT 0 COMMENT '终端输出字符数',
+    file_bytes BIGINT DEFAULT 0 COMMENT '录制文件字节数',
+    chunk_count INT DEFAULT 0 COMMENT '分块数',
+    dropped_events INT DEFAULT 0 COMMENT '缓冲溢出丢弃的事件数',
+    INDEX idx_started_at (started_at),
+    INDEX idx_host_started (host, started_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='Web终端会话录制';
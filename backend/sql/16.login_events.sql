@@ -0,0 +1,20 @@
+-- 登录事件（AuthService.login 写入，超过 LOGIN_EVENT_RETENTION_DAYS 天的事件自动清理）
+CREATE TABLE IF NOT EXISTS login_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(100) COMMENT '登录用户名',
+    success TINYINT(1) NOT NULL COMMENT '是否成功',
+    reason VARCHAR(255) COMMENT '失败原因',
+    ip VARCHAR(64) COMMENT '客户端IP',
+    user_agent VARCHAR(255) COMMENT '客户端User-Agent',
+    created_at DATETIME NOT NULL COMMENT '登录时间',
+    INDEX idx_created_at (created_at),
+    INDEX idx_success_created (success, created_at),
+    INDEX idx_username_created (username, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='登录事件';
+
+-- 登录次数按天汇总（与登录事件在同一事务中累加，长期保留）
+CREATE TABLE IF NOT EXISTS login_daily_stats (
+    stat_date DATE PRIMARY KEY COMMENT '日期',
+    success_count INT NOT NULL DEFAULT 0 COMMENT '登录成功次数',
+    failure_count INT NOT NULL DEFAULT 0 COMMENT '登录失败次数'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='登录次数按天汇总';
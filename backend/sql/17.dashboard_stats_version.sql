@@ -0,0 +1,6 @@
+-- 仪表板统计跨进程失效计数（DashboardStats.invalidate 加一，各 worker 定期读取，变化时刷新本进程缓存）
+CREATE TABLE IF NOT EXISTS dashboard_stats_version (
+    id TINYINT UNSIGNED NOT NULL PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0 COMMENT '变更计数',
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '最近变更时间'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='仪表板统计跨进程失效计数';
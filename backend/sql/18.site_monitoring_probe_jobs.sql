@@ -0,0 +1,13 @@
+-- 站点手动批量拨测任务（POST /api/sites/batch-test 创建，后台拨测结束后更新；应用启动时也会自动创建）
+CREATE TABLE IF NOT EXISTS `site_monitoring_probe_jobs` (
+  `id` char(32) NOT NULL COMMENT '任务ID',
+  `status` varchar(16) NOT NULL DEFAULT 'running' COMMENT 'running/done/failed',
+  `site_ids` text NOT NULL COMMENT '拨测的站点ID(JSON数组)',
+  `total` int NOT NULL DEFAULT 0 COMMENT '站点数',
+  `online` int DEFAULT NULL COMMENT '在线站点数',
+  `error_message` varchar(500) DEFAULT NULL COMMENT '失败原因',
+  `created_at` datetime NOT NULL COMMENT '创建时间',
+  `finished_at` datetime DEFAULT NULL COMMENT '结束时间',
+  PRIMARY KEY (`id`),
+  KEY `idx_status_created` (`status`, `created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='站点手动批量拨测任务';
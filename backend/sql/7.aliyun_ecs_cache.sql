@@ -36,6 +36,9 @@ CREATE TABLE IF NOT EXISTS `aliyun_sync_status` (
   `total_count` int(11) DEFAULT 0 COMMENT '总数量',
   `error_message` text DEFAULT NULL COMMENT '错误信息',
   `sync_duration` int(11) DEFAULT NULL COMMENT '同步耗时(秒)',
+  `added_count` int(11) DEFAULT 0 COMMENT '新增数量',
+  `changed_count` int(11) DEFAULT 0 COMMENT '变化数量',
+  `removed_count` int(11) DEFAULT 0 COMMENT '删除数量',
   `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
   PRIMARY KEY (`id`),
@@ -17,6 +17,7 @@ CREATE TABLE IF NOT EXISTS site_monitoring (
     last_check_time DATETIME COMMENT '最后检查时间',
     last_response_time INT COMMENT '最后响应时间（毫秒）',
     failure_count INT DEFAULT 0 COMMENT '连续失败次数',
+    reuse_connection BOOLEAN NOT NULL DEFAULT TRUE COMMENT '拨测是否复用连接',
     description TEXT COMMENT '描述信息',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
@@ -34,10 +35,16 @@ CREATE TABLE IF NOT EXISTS site_monitoring_history (
     response_time INT COMMENT '响应时间（毫秒）',
     http_code INT COMMENT 'HTTP状态码',
     error_message TEXT COMMENT '错误信息',
+    dns_time INT COMMENT 'DNS解析耗时（毫秒）',
+    connect_time INT COMMENT 'TCP连接耗时（毫秒）',
+    tls_time INT COMMENT 'TLS握手耗时（毫秒）',
+    ttfb INT COMMENT '首字节耗时（毫秒）',
+    connection_reused BOOLEAN COMMENT '是否复用已有连接',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (site_id) REFERENCES site_monitoring(id) ON DELETE CASCADE,
     INDEX idx_site_id (site_id),
     INDEX idx_check_time (check_time),
+    INDEX idx_site_check_time (site_id, check_time),
     INDEX idx_status (status)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='站点监控历史记录表';
 
@@ -79,6 +79,14 @@ except ImportError as e:
     fi
 fi
 
+# gunicorn 参数：使用 gthread 线程 worker。仪表板统计推送（SSE）和 Web 终端（WebSocket）
+# 在整个连接期间各占用一个线程，sync worker 下每个连接会独占一个进程；
+# 可同时保持的长连接数约为 GUNICORN_WORKERS * GUNICORN_THREADS。
+# Web 终端会话登记在进程内，多 worker 时默认断开即关闭（TERMINAL_DETACH_GRACE_SECONDS 说明见 .env.example）
+export GUNICORN_WORKERS=${GUNICORN_WORKERS:-4}
+GUNICORN_THREADS=${GUNICORN_THREADS:-32}
+GUNICORN_OPTS="--worker-class gthread -w $GUNICORN_WORKERS --threads $GUNICORN_THREADS -b 0.0.0.0:5001 --timeout 120"
+
 # 启动选项
 echo ""
 echo "请选择启动模式:"
@@ -107,7 +115,7 @@ case $choice in
         echo "访问地址: http://localhost:5001"
         echo "按 Ctrl+C 停止服务"
         echo ""
-        gunicorn -w 4 -b 0.0.0.0:5001 --timeout 120 run:app
+        gunicorn $GUNICORN_OPTS run:app
         ;;
     3)
         echo "🚀 启动后台运行模式..."
@@ -120,7 +128,7 @@ case $choice in
         pkill -f "gunicorn.*run:app" || true
         
         # 启动后台进程
-        nohup gunicorn -w 4 -b 0.0.0.0:5001 --timeout 120 run:app > logs/gunicorn.log 2>&1 &
+        nohup gunicorn $GUNICORN_OPTS run:app > logs/gunicorn.log 2>&1 &
         
         sleep 2
         
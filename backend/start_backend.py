@@ -13,7 +13,8 @@ from app import create_app
 
 if __name__ == '__main__':
     # 创建应用
-    app = create_app('development')
+    # debug 模式下 reloader 父进程不启动后台任务
+    app = create_app('development', start_background_jobs=os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
     
     print("🚀 启动SREManage后端服务...")
     print("📡 API地址: http://localhost:5001")
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# 测试从 backend 目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 配置类在导入时校验的必填项，测试中不连接真实服务
+os.environ.setdefault('JWT_SECRET_KEY', 'test-jwt-secret')
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+for name, value in (('DB_HOST', '127.0.0.1'), ('DB_USER', 'test'), ('DB_PASSWORD', 'test'), ('DB_NAME', 'test')):
+    os.environ.setdefault(name, value)
@@ -0,0 +1,86 @@
+"""
+批量命令参数类型测试
+
+timeout/concurrency 以数字字符串提交（IntegerValidator 允许）时，
+两种执行引擎和流式接口都应拿到整数，而不是在执行时抛出 TypeError。
+"""
+import json
+
+import pytest
+from flask import Flask
+
+from app.routes import ops
+
+HOST = {'hostname': 'web-1', 'ip': '10.0.0.1', 'port': 22, 'username': 'root', 'password': 'secret'}
+PAYLOAD = {'hosts': ['manual_1'], 'command': 'uptime', 'timeout': '30', 'concurrency': '5'}
+
+class FakeAsyncExecutor:
+    def __init__(self):
+        self.calls = []
+
+    def run(self, targets, command, concurrency=None, host_timeout=None):
+        self.calls.append({'concurrency': concurrency, 'host_timeout': host_timeout})
+        return [{'hostname': HOST['hostname'], 'ip': HOST['ip'], 'status': 'success', 'output': 'ok'}]
+
+    def stream(self, targets, command, concurrency=None, host_timeout=None, with_output=False):
+        self.calls.append({'concurrency': concurrency, 'host_timeout': host_timeout})
+        yield 'result', 0, {'hostname': HOST['hostname'], 'ip': HOST['ip'], 'status': 'success', 'output': 'ok'}
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config['TESTING'] = True
+    app.register_blueprint(ops.bp)
+    return app.test_client()
+
+@pytest.fixture
+def fake_async(monkeypatch):
+    executor = FakeAsyncExecutor()
+    monkeypatch.setattr(ops, 'ASYNC_ENGINE_AVAILABLE', True)
+    monkeypatch.setattr(ops, 'async_batch_executor', executor)
+    monkeypatch.setattr(ops, '_resolve_batch_targets', lambda host_ids: ([None], [HOST], [0]))
+    return executor
+
+@pytest.fixture
+def fake_thread(monkeypatch):
+    calls = []
+
+    def execute_on_host(host_id, host, command, on_line=None, budget=None, timeout=None):
+        calls.append({'timeout': timeout})
+        return {'hostname': host['hostname'], 'ip': host['ip'], 'status': 'success', 'output': 'ok'}
+
+    monkeypatch.setattr(ops, '_resolve_batch_hosts', lambda host_ids: {'manual_1': HOST})
+    monkeypatch.setattr(ops, '_execute_on_host', execute_on_host)
+    return calls
+
+def test_async_engine_converts_string_options(client, fake_async):
+    response = client.post('/api/ops/batch-command', json={**PAYLOAD, 'engine': 'async'})
+
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
+    assert fake_async.calls == [{'concurrency': 5, 'host_timeout': 30}]
+
+def test_thread_engine_converts_string_timeout(client, fake_thread):
+    response = client.post('/api/ops/batch-command', json={**PAYLOAD, 'engine': 'thread'})
+
+    assert response.status_code == 200
+    assert response.get_json()['success'] is True
+    assert fake_thread == [{'timeout': 30}]
+
+def test_stream_converts_string_options(client, fake_async):
+    response = client.post('/api/ops/batch-command/stream', json={**PAYLOAD, 'engine': 'async'})
+    events = [
+        json.loads(line[len('data: '):])
+        for line in response.get_data(as_text=True).splitlines()
+        if line.startswith('data: ')
+    ]
+
+    assert [event['type'] for event in events] == ['start', 'result', 'summary']
+    assert fake_async.calls == [{'concurrency': 5, 'host_timeout': 30}]
+
+def test_missing_options_stay_none(client, fake_async):
+    payload = {'hosts': ['manual_1'], 'command': 'uptime', 'engine': 'async'}
+    response = client.post('/api/ops/batch-command', json=payload)
+
+    assert response.status_code == 200
+    assert fake_async.calls == [{'concurrency': None, 'host_timeout': None}]
@@ -0,0 +1,82 @@
+"""
+批量命令输出落盘测试
+
+落盘空间由一次批量执行的所有输出流共享，用完后文件只含前面的部分并标记 spillTruncated；
+异步引擎的落盘写文件不在事件循环线程中进行。
+"""
+import asyncio
+import os
+import threading
+
+import pytest
+
+from app.services import command_output
+from app.services.batch_executor import AsyncBatchExecutor
+from app.services.command_output import OutputBudget, OutputCollector, SpillStore, collector_result
+
+@pytest.fixture(autouse=True)
+def spill_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(command_output, 'spill_store', SpillStore(directory=str(tmp_path)))
+    return tmp_path
+
+def spill_size(collector):
+    return os.path.getsize(command_output.spill_store.path(collector.spill_id))
+
+def test_spill_budget_is_shared_across_streams():
+    budget = OutputBudget(total_bytes=10, spill_bytes=100)
+    first = OutputCollector(budget, limit=10, spill=True)
+    second = OutputCollector(budget, limit=10, spill=True)
+
+    first.feed(b'a' * 80)
+    second.feed(b'b' * 80)
+    first_text, second_text = first.finish(), second.finish()
+
+    assert budget.spilled == 100
+    assert spill_size(first) == 80 and not first.spill_truncated
+    assert spill_size(second) == 20 and second.spill_truncated
+    assert '完整输出可下载' in first_text
+    assert '已落盘的前 20 字节可下载' in second_text
+    assert collector_result(second, OutputCollector(budget))['spillTruncated'] is True
+
+def test_no_spill_file_once_budget_is_used_up():
+    budget = OutputBudget(total_bytes=0, spill_bytes=10)
+    OutputCollector(budget, limit=0, spill=True).feed(b'x' * 10)
+
+    collector = OutputCollector(budget, limit=0, spill=True)
+    collector.feed(b'y' * 10)
+    text = collector.finish()
+
+    assert collector.spill_id is None
+    assert collector.truncated and collector.spill_truncated
+    assert text.endswith('超出部分已截断]')
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+
+    async def read(self, size):
+        return self.chunks.pop(0) if self.chunks else b''
+
+def test_async_reader_writes_spill_off_the_loop_thread(monkeypatch):
+    budget = OutputBudget(total_bytes=4)
+    collector = OutputCollector(budget, limit=4, spill=True)
+    writer_threads = []
+    write_spill = collector.write_spill
+
+    def record_thread(data):
+        writer_threads.append(threading.current_thread())
+        write_spill(data)
+
+    monkeypatch.setattr(collector, 'write_spill', record_thread)
+
+    async def run():
+        await AsyncBatchExecutor._read_into(FakeStream([b'abcd', b'efgh', b'ijkl']), collector)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(run())
+    collector.finish()
+
+    assert len(writer_threads) == 2
+    assert all(thread is not loop_thread for thread in writer_threads)
+    with open(command_output.spill_store.path(collector.spill_id), 'rb') as f:
+        assert f.read() == b'abcdefghijkl'
@@ -0,0 +1,116 @@
+"""
+仪表板统计跨进程失效测试
+
+两个 DashboardStats 实例代表两个 gunicorn worker，共用一张 dashboard_stats_version 表：
+一个进程 invalidate() 后，另一个进程在 sync_interval 内发现计数变化并重新统计。
+"""
+from contextlib import contextmanager
+
+import pytest
+
+from app.services import dashboard_stats as module
+from app.services.dashboard_stats import DashboardStats
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.row = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        sql = ' '.join(sql.split())
+        if sql.startswith('CREATE TABLE'):
+            self.row = None
+        elif sql.startswith('INSERT INTO dashboard_stats_version'):
+            self.db.version += 1
+            self.db.last_insert_id = self.db.version
+        elif sql == 'SELECT LAST_INSERT_ID() AS version':
+            self.row = {'version': self.db.last_insert_id}
+        elif sql.startswith('SELECT version FROM dashboard_stats_version'):
+            self.row = {'version': self.db.version} if self.db.version else None
+        else:
+            raise AssertionError(f'unexpected SQL: {sql}')
+
+    def fetchone(self):
+        return self.row
+
+class FakeDatabase:
+    def __init__(self):
+        self.version = 0
+        self.last_insert_id = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+@pytest.fixture
+def shared_db(monkeypatch):
+    db = FakeDatabase()
+
+    @contextmanager
+    def connection():
+        yield db
+
+    monkeypatch.setattr(module, 'database_connection', connection)
+    monkeypatch.setattr(module, 'database_transaction', connection)
+    return db
+
+def make_stats(counter):
+    stats = DashboardStats(ttl=3600, debounce=0, sync_interval=0)
+
+    def query():
+        counter.append(1)
+        return {'stats': {'hosts_count': len(counter)}, 'host_types': [], 'connectivity': []}
+
+    stats._query = query
+    return stats
+
+def test_invalidate_in_one_process_refreshes_the_other(shared_db):
+    queries_a, queries_b = [], []
+    worker_a, worker_b = make_stats(queries_a), make_stats(queries_b)
+    worker_a.get()
+    worker_b.get()
+
+    worker_a.invalidate('添加主机')
+    assert shared_db.version == 1
+
+    worker_b.get()
+    worker_a.get()
+    assert len(queries_b) == 2
+    # 自己的变更只重新统计一次，不会因为读到自己加的计数再失效
+    assert len(queries_a) == 2
+    worker_a.get()
+    assert len(queries_a) == 2
+
+def test_sync_is_throttled(shared_db):
+    queries = []
+    stats = make_stats(queries)
+    stats.sync_interval = 3600
+    stats.get()
+
+    shared_db.version += 1  # 其他进程的变更
+    stats.get()
+    assert len(queries) == 1
+
+    stats._synced_at = 0.0
+    stats.get()
+    assert len(queries) == 2
+
+def test_push_thread_picks_up_remote_change(shared_db):
+    queries_a, queries_b = [], []
+    worker_a, worker_b = make_stats(queries_a), make_stats(queries_b)
+    worker_b.sync_interval = 0.05
+    worker_b.get()
+    subscriber = worker_b.subscribe()
+    try:
+        worker_a.invalidate('站点状态变化')
+        snapshot = subscriber.get(timeout=2)
+        assert snapshot['stats']['hosts_count'] == 2
+    finally:
+        thread = worker_b._thread
+        worker_b.unsubscribe(subscriber)
+        thread.join(timeout=2)
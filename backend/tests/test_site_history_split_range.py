@@ -0,0 +1,46 @@
+"""
+SLA 查询区段拆分测试
+
+split_range 返回的区段必须互不重叠且首尾相接，否则 get_sla 合并各粒度汇总时会重复统计。
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.site_history import GRANULARITIES, HOUR_RETENTION_DAYS, MINUTE_RETENTION_DAYS, split_range
+
+NOW = datetime(2026, 10, 18, 13, 27, 45)
+
+def assert_contiguous(segments, start, end):
+    assert segments, '区段为空'
+    for (_, _, previous_end), (_, next_start, _) in zip(segments, segments[1:]):
+        assert previous_end == next_start, f'区段重叠或有空档: {segments}'
+    assert segments[0][1] <= start
+    assert segments[-1][2] >= end
+    for granularity, seg_start, seg_end in segments:
+        assert granularity in GRANULARITIES
+        assert seg_start < seg_end
+
+def test_last_365_days_has_no_overlap():
+    start = NOW - timedelta(days=365)
+    segments = split_range(start, NOW, NOW)
+
+    assert_contiguous(segments, start, NOW)
+    # 超出小时汇总保留期的开头扩大成整天，之后的小时区段不能再覆盖这一天
+    assert segments[0][0] == 'day'
+
+@pytest.mark.parametrize('days', [1, 7, MINUTE_RETENTION_DAYS, MINUTE_RETENTION_DAYS + 1, 90,
+                                  HOUR_RETENTION_DAYS, HOUR_RETENTION_DAYS + 3])
+@pytest.mark.parametrize('offset_minutes', [0, 1, 59, 61, 24 * 60 - 1])
+def test_ranges_are_contiguous(days, offset_minutes):
+    end = NOW - timedelta(minutes=offset_minutes)
+    start = end - timedelta(days=days, minutes=offset_minutes)
+    assert_contiguous(split_range(start, end, NOW), start, end)
+
+def test_recent_range_keeps_minute_precision():
+    start = NOW - timedelta(hours=2)
+    segments = split_range(start, NOW, NOW)
+
+    assert_contiguous(segments, start, NOW)
+    assert segments[0] == ('minute', datetime(2026, 10, 18, 11, 27), datetime(2026, 10, 18, 12, 0))
+    assert segments[-1] == ('minute', datetime(2026, 10, 18, 13, 0), NOW)
@@ -0,0 +1,68 @@
+"""
+手动批量拨测任务测试
+
+start_check_job 立即返回，拨测在调度器的事件循环中进行；结果保存后再把任务记为结束，
+保存失败时任务记为失败。
+"""
+import threading
+
+import pytest
+
+from app.services import site_monitor
+from app.services.site_monitor import SiteMonitorScheduler
+
+SITES = [{'id': 1, 'site_url': 'https://a.example.com', 'timeout': 5},
+         {'id': 2, 'site_url': 'https://b.example.com', 'timeout': 5}]
+
+class FakeStore:
+    def __init__(self, fail_record=False):
+        self.fail_record = fail_record
+        self.recorded = []
+        self.finished = threading.Event()
+        self.job = None
+
+    def record_results(self, results):
+        if self.fail_record:
+            raise RuntimeError('db down')
+        self.recorded.extend(results)
+
+    def finish_probe_job(self, job_id, results=None, error=None):
+        self.job = {'id': job_id, 'results': results, 'error': error, 'recorded': list(self.recorded)}
+        self.finished.set()
+
+@pytest.fixture
+def scheduler():
+    scheduler = SiteMonitorScheduler(concurrency=4)
+    release = threading.Event()
+
+    async def probe(site):
+        await scheduler._loop.run_in_executor(None, release.wait, 5)
+        return {'status': 'online' if site['id'] == 1 else 'offline', 'response_time': 10,
+                'http_code': 200, 'error_message': None}
+
+    scheduler._client.probe = probe
+    scheduler.release = release
+    return scheduler
+
+def test_job_runs_in_background_and_finishes_after_saving(scheduler, monkeypatch):
+    store = FakeStore()
+    monkeypatch.setattr(site_monitor, 'site_history_store', store)
+
+    scheduler.start_check_job('job-1', SITES)
+    assert not store.finished.is_set()  # 调用方不等待拨测
+
+    scheduler.release.set()
+    assert store.finished.wait(5)
+    assert store.job['id'] == 'job-1' and store.job['error'] is None
+    assert [r['status'] for r in store.job['results']] == ['online', 'offline']
+    assert len(store.job['recorded']) == 2  # 结果先保存，任务再结束
+
+def test_job_fails_when_results_are_not_saved(scheduler, monkeypatch):
+    store = FakeStore(fail_record=True)
+    monkeypatch.setattr(site_monitor, 'site_history_store', store)
+
+    scheduler.release.set()
+    scheduler.start_check_job('job-2', SITES)
+
+    assert store.finished.wait(5)
+    assert store.job['error'] == '保存拨测结果失败'